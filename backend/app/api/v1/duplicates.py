@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from app.core.jwt_handler import get_current_admin
+from app.schemas.schemas import (
+    DuplicateCandidateItem, DuplicateReview, DuplicateScanStatus, PaginatedDuplicates,
+)
+from app.services.deduplication import (
+    DeduplicationError, bulk_scan_status, list_duplicates, review_duplicate, start_bulk_scan,
+)
+
+router = APIRouter(prefix="/admin/duplicates", tags=["Duplicate Enrollments"])
+
+
+def _item(row) -> DuplicateCandidateItem:
+    return DuplicateCandidateItem(
+        id=row["id"],
+        identityNumber=row["identity_number"],
+        fullName=row["full_name"],
+        matchedIdentityNumber=row["matched_identity_number"],
+        matchedFullName=row["matched_full_name"],
+        score=row["score"],
+        source=row["source"],
+        status=row["status"],
+        reviewedBy=row["reviewed_by"],
+        reviewedAt=row["reviewed_at"],
+        createdAt=row["created_at"],
+    )
+
+
+def _scan_status(progress: dict) -> DuplicateScanStatus:
+    return DuplicateScanStatus(
+        running=progress["running"],
+        processed=progress["processed"],
+        total=progress["total"],
+        flagged=progress["flagged"],
+        startedAt=progress["started_at"],
+        finishedAt=progress["finished_at"],
+        error=progress["error"],
+    )
+
+
+@router.get("", response_model=PaginatedDuplicates)
+async def get_duplicates(
+        status_filter: Optional[str] = Query(None, alias="status"),
+        page: int = Query(1, ge=1),
+        per_page: int = Query(20, ge=1, le=100),
+        admin: str = Depends(get_current_admin)
+):
+    """Possible duplicate enrollments, newest first (optionally by review status)."""
+    total, rows = await list_duplicates(status_filter, per_page, (page - 1) * per_page)
+    return PaginatedDuplicates(
+        total=total,
+        page=page,
+        per_page=per_page,
+        duplicates=[_item(row) for row in rows]
+    )
+
+
+@router.patch("/{pair_id}", response_model=DuplicateCandidateItem)
+async def review(pair_id: int, request: DuplicateReview, admin: str = Depends(get_current_admin)):
+    """Confirm or dismiss a possible duplicate."""
+    try:
+        row = await review_duplicate(pair_id, request.status, admin)
+    except DeduplicationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Duplicate pair not found")
+    # Names are not part of the update; list the pair again to see them
+    return _item({**row, "full_name": None, "matched_full_name": None})
+
+
+@router.post("/scan", response_model=DuplicateScanStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_scan(admin: str = Depends(get_current_admin)):
+    """Deduplicate every existing enrollment in the background."""
+    try:
+        return _scan_status(start_bulk_scan())
+    except DeduplicationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.get("/scan", response_model=DuplicateScanStatus)
+async def scan_status(admin: str = Depends(get_current_admin)):
+    """Progress of the current (or last) bulk duplicate scan."""
+    return _scan_status(bulk_scan_status())
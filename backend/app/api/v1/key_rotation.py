@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.core.jwt_handler import get_current_admin
+from app.schemas.schemas import KeyRotationProgress, KeyRotationStatus
+from app.services.key_rotation import (
+    KeyRotationError, key_rotation_status, pause_key_rotation, start_key_rotation,
+)
+
+router = APIRouter(prefix="/admin/key-rotation", tags=["Key Rotation"])
+
+
+def _status(state: dict) -> KeyRotationStatus:
+    row = state["rotation"]
+    rotation = None
+    if row is not None:
+        rotation = KeyRotationProgress(
+            id=row["id"],
+            keyId=row["key_id"],
+            status=row["status"],
+            lastId=row["last_id"],
+            processed=row["processed"],
+            rotated=row["rotated"],
+            skipped=row["skipped"],
+            total=row["total"],
+            startedBy=row["started_by"],
+            error=row["error"],
+            startedAt=row["started_at"],
+            updatedAt=row["updated_at"],
+            finishedAt=row["finished_at"],
+        )
+    return KeyRotationStatus(activeKeyId=state["active_key_id"], running=state["running"], rotation=rotation)
+
+
+@router.post("", response_model=KeyRotationStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_rotation(admin: str = Depends(get_current_admin)):
+    """Re-encrypt every template under the active key in the background (resumes an unfinished rotation)."""
+    try:
+        return _status(await start_key_rotation(admin))
+    except KeyRotationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.post("/pause", response_model=KeyRotationStatus)
+async def pause_rotation(admin: str = Depends(get_current_admin)):
+    """Stop the running rotation at its last checkpoint."""
+    try:
+        return _status(await pause_key_rotation())
+    except KeyRotationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.get("", response_model=KeyRotationStatus)
+async def rotation_status(admin: str = Depends(get_current_admin)):
+    """Progress of the current (or last) key rotation."""
+    return _status(await key_rotation_status())
@@ -1,38 +1,30 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.db.db import get_db
-from app.models.models import applications
+import math
+from fastapi import APIRouter, HTTPException, Query
 from app.schemas.schemas import PaginatedApplications, ApplicationListItem
-from typing import List
+from app.services.application_list import InvalidCursorError, application_count, list_applications
+from typing import Optional
 
 router = APIRouter(prefix="/applications-info", tags=["Applications Status"])
 
 
 @router.get("/applications-list", response_model=PaginatedApplications)
 async def get_applications(
-        db: AsyncSession = Depends(get_db),
         page: int = Query(1, ge=1),
-        per_page: int = Query(10, ge=1, le=100)
+        per_page: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of an earlier page"),
+        exact_count: bool = Query(False, description="Count every row instead of using the cached total"),
 ):
-    offset = (page - 1) * per_page
-
-    # Count total rows
-    total_result = await db.execute(select(func.count()).select_from(applications))
-    total = total_result.scalar()
-
-    result = await db.execute(
-        select(applications)
-        .order_by(applications.c.id.desc())
-        .offset(offset)
-        .limit(per_page)
-    )
-    rows = result.fetchall()
+    """Applications newest first; follow the cursors for constant-cost paging."""
+    try:
+        rows, next_cursor, prev_cursor = await list_applications(per_page, cursor, page)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total, total_exact = await application_count(exact=exact_count)
 
     apps = []
     for row in rows:
-        app_data = dict(row._mapping)
-        status = "Enrolled" if app_data.get("fingerprint_encrypted") else "Pending"
+        app_data = dict(row)
+        status = "Enrolled" if app_data["enrolled"] else "Pending"
         apps.append(
             ApplicationListItem(
                 id=app_data["id"],
@@ -47,7 +39,11 @@ async def get_applications(
 
     return PaginatedApplications(
         total=total,
+        total_exact=total_exact,
+        total_pages=max(1, math.ceil(total / per_page)),
         page=page,
         per_page=per_page,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         applications=apps
     )
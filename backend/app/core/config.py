@@ -1,12 +1,28 @@
 import os
+from typing import Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # One async connection pool per process (queries and ORM sessions);
+    # asyncpg caches up to DB_STATEMENT_CACHE_SIZE prepared statements per connection
+    DB_POOL_SIZE: int = Field(5)
+    DB_MAX_OVERFLOW: int = Field(10)
+    DB_POOL_TIMEOUT: int = Field(30)
+    DB_POOL_RECYCLE: int = Field(1800)
+    DB_STATEMENT_CACHE_SIZE: int = Field(256)
     SECUGEN_SGFPLIB_DLL_PATH: str
-    FERNET_KEY: str = Field(default="default-fernet-key-for-development")
+    # Required: 32 url-safe base64 bytes (Fernet.generate_key()); the server
+    # refuses to start without a valid key
+    FERNET_KEY: str = Field(default="")
+    # Template encryption keys ("id:key,..."), the one new blobs are written
+    # with (0 = derived from FERNET_KEY), and threads for bulk (de)cryption
+    # (0 = one per CPU)
+    ENCRYPTION_KEYS: str = Field("")
+    ENCRYPTION_KEY_ID: int = Field(0)
+    ENCRYPTION_WORKERS: int = Field(0)
     SCAN_SESSION_TIMEOUT: int = Field(600)
     LOG_LEVEL: str = Field("INFO")
     ACCESS_TOKEN_EXPIRY: int = Field(3400)
@@ -15,6 +31,129 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
+    # Fingerprint device backend: "secugen" (hardware) or "simulated" (replay)
+    DEVICE_BACKEND: str = Field(default="secugen")
+
+    # Warm device pool: comma-separated reader IDs kept open across sessions,
+    # or "auto" to enumerate every attached reader at startup
+    DEVICE_IDS: str = Field(default="auto")
+    DEVICE_MAX_READERS: int = Field(10)
+    DEVICE_BRIGHTNESS: int = Field(50)
+    DEVICE_HEALTH_CHECK_INTERVAL: int = Field(30)
+    DEVICE_ACQUIRE_TIMEOUT: int = Field(60)
+
+    # Capture mode: "poll" probes for a finger with short cancellable calls and
+    # captures once one is detected; "blocking" waits inside one long GetImageEx
+    CAPTURE_MODE: str = Field(default="poll")
+    CAPTURE_WAIT_SECONDS: int = Field(15)
+    CAPTURE_TIMEOUT_MS: int = Field(3000)
+    FINGER_PROBE_MS: int = Field(150)
+    FINGER_POLL_INTERVAL_MS: int = Field(30)
+    FINGER_PRESENCE_QUALITY: int = Field(10)
+
+    # Best-of-N burst capture: frames taken while the finger stays down,
+    # per-frame capture timeout, and the quality that ends the burst early
+    BURST_CAPTURE_FRAMES: int = Field(5)
+    BURST_FRAME_TIMEOUT_MS: int = Field(1000)
+    BURST_EXCELLENT_QUALITY: int = Field(70)
+
+    # Template engine: "sdk" (SGFPM_CreateTemplate) or "numpy" (app.services.minutiae)
+    TEMPLATE_ENGINE: str = Field(default="sdk")
+
+    # 1:1 verification: NumPy matcher score (0-100) needed to accept, SDK
+    # security level (1-9) for SDK templates, and the decrypted-template cache
+    MATCH_THRESHOLD: int = Field(15)
+    SDK_MATCH_SECURITY_LEVEL: int = Field(5)
+    TEMPLATE_CACHE_SIZE: int = Field(10000)
+    TEMPLATE_CACHE_TTL: int = Field(900)
+
+    # Batch verification (POST /api/verify/batch): pairs matched per worker
+    # hop, and match worker processes (0 = worker threads in the API process)
+    VERIFY_BATCH_MAX_ITEMS: int = Field(5000)
+    VERIFY_BATCH_CHUNK_SIZE: int = Field(64)
+    VERIFY_BATCH_WORKERS: int = Field(0)
+
+    # 1:N identification: in-memory gallery of NumPy templates loaded at
+    # startup, candidates returned, and rows reranked with the 1:1 matcher.
+    # Strategy "index" screens only the rows the minutia triplet index
+    # retrieves (IDENTIFY_INDEX_CANDIDATES); "screen" screens every row.
+    # IDENTIFY_SCREEN picks the first-stage screen before the 1:1 rerank:
+    # "cylinder" (binary cylinder codes, XOR/popcount) or "hough".
+    IDENTIFICATION_ENABLED: bool = Field(True)
+    IDENTIFY_TOP_K: int = Field(5)
+    IDENTIFY_SHORTLIST: int = Field(64)
+    IDENTIFY_STRATEGY: str = Field("index")
+    IDENTIFY_INDEX_CANDIDATES: int = Field(1000)
+    IDENTIFY_SCREEN: str = Field("cylinder")
+
+    # Gallery worker processes: 0 keeps the gallery in the API process;
+    # set to the core count to shard it so searches use every core
+    IDENTIFY_WORKERS: int = Field(0)
+    IDENTIFY_WORKER_TIMEOUT: float = Field(30.0)
+    IDENTIFY_WORKER_HEALTH_CHECK_INTERVAL: int = Field(30)
+
+    # Gallery snapshots: with a directory set, startup restores the gallery
+    # from its encrypted snapshot and re-reads only newer enrollments.
+    # Plaintext map files go to IDENTIFY_SNAPSHOT_RUNTIME_DIR (/dev/shm by
+    # default); keep it on a RAM-backed filesystem. Without /dev/shm (e.g.
+    # Windows) it must be set, or snapshots are not restored.
+    IDENTIFY_SNAPSHOT_DIR: str = Field("")
+    IDENTIFY_SNAPSHOT_INTERVAL: int = Field(300)
+    IDENTIFY_SNAPSHOT_RUNTIME_DIR: str = Field("")
+
+    # Partition galleries: searches scoped by these applications columns
+    # (comma-separated) load only the matching enrollments on first use and
+    # drop them after IDENTIFY_PARTITION_IDLE_SECONDS without a search.
+    # IDENTIFY_GLOBAL_GALLERY=false serves scoped searches only.
+    IDENTIFY_PARTITION_KEYS: str = Field("subject")
+    IDENTIFY_PARTITION_IDLE_SECONDS: int = Field(900)
+    IDENTIFY_MAX_PARTITIONS: int = Field(16)
+    IDENTIFY_GLOBAL_GALLERY: bool = Field(True)
+
+    # Duplicate enrollment detection: new enrollments are searched against
+    # the gallery in the background; pairs scoring at least DEDUP_THRESHOLD
+    # (1:1 matcher scale, like MATCH_THRESHOLD) are recorded for review
+    DEDUP_ENABLED: bool = Field(True)
+    DEDUP_THRESHOLD: int = Field(15)
+    DEDUP_TOP_K: int = Field(5)
+    DEDUP_BULK_BATCH_SIZE: int = Field(200)
+    DEDUP_BULK_CONCURRENCY: int = Field(4)
+
+    # Applications list: the total is cached for APPLICATIONS_COUNT_TTL
+    # seconds, and estimated from table statistics past ESTIMATE_ABOVE rows
+    APPLICATIONS_COUNT_TTL: int = Field(60)
+    APPLICATIONS_COUNT_ESTIMATE_ABOVE: int = Field(100000)
+
+    # Online key rotation: templates not yet under ENCRYPTION_KEY_ID are
+    # re-encrypted in batches, at most KEY_ROTATION_ROWS_PER_SECOND
+    # enrollments rows scanned per second (0 = unthrottled)
+    KEY_ROTATION_BATCH_SIZE: int = Field(500)
+    KEY_ROTATION_ROWS_PER_SECOND: int = Field(1000)
+
+    # NumPy pre-screen run on every capture before any SDK call
+    PRESCREEN_ENABLED: bool = Field(True)
+    PRESCREEN_MIN_COVERAGE: float = Field(0.25)
+    PRESCREEN_MIN_CONTRAST: float = Field(0.2)
+    PRESCREEN_MIN_COHERENCE: float = Field(0.25)
+    PRESCREEN_MAX_DRYNESS: float = Field(0.8)
+    PRESCREEN_MAX_WETNESS: float = Field(0.35)
+
+    # Simulated device (load testing without hardware)
+    SIMULATOR_IMAGE_PATH: str = Field(default="app/logs/fingerprint_image.raw")
+    SIMULATOR_TEMPLATE_PATH: str = Field(default="app/logs/fingerprint_template.bin")
+    SIMULATOR_IMAGE_WIDTH: int = Field(300)
+    SIMULATOR_IMAGE_HEIGHT: int = Field(400)
+    SIMULATOR_CAPTURE_LATENCY_MS: int = Field(800)
+    SIMULATOR_LATENCY_JITTER_MS: int = Field(200)
+    SIMULATOR_SCAN_MS: int = Field(50)
+    SIMULATOR_DWELL_MS: int = Field(1500)
+    SIMULATOR_EXTRACT_LATENCY_MS: int = Field(60)
+    SIMULATOR_TIMEOUT_RATE: float = Field(0.0)
+    SIMULATOR_FAILURE_RATE: float = Field(0.0)
+    SIMULATOR_QUALITY: int = Field(75)
+    SIMULATOR_SEED: Optional[int] = Field(default=None)
+    SIMULATOR_READER_COUNT: int = Field(1)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
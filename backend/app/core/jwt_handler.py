@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
 from app.core.config import settings
 
+bearer_scheme = HTTPBearer(auto_error=False)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     # ACCESS_TOKEN_EXPIRY may come from env as string; ensure int minutes
@@ -17,3 +21,14 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> str:
+    """Dependency for admin-only endpoints: the username from a valid bearer token."""
+    payload = decode_access_token(credentials.credentials) if credentials else None
+    if not payload or not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload["sub"]
@@ -1,8 +1,7 @@
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.models.models import Admin
+from app.db.db import database
+from app.models.models import admins
 
-async def get_admin_by_username(db: AsyncSession, username: str):
-    query = select(Admin).where(Admin.username == username)
-    result = await db.execute(query)
-    return result.scalar_one_or_none()
+async def get_admin_by_username(username: str):
+    query = select(admins.c.id, admins.c.username, admins.c.password).where(admins.c.username == username)
+    return await database.fetch_one(query)
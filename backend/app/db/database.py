@@ -0,0 +1,166 @@
+"""
+Async Query Layer
+-----------------
+The query API the services and routes use (fetch_one, fetch_all,
+fetch_val, execute, execute_many, iterate, transaction), on top of the one
+SQLAlchemy AsyncEngine in app.db.db, so a worker process holds a single
+connection pool.
+
+Rows are returned as read-only mappings (rec["column"], dict(rec)). Each
+statement runs in its own short transaction on a pooled connection, unless
+the calling task is inside transaction(): then every statement of that task
+shares the transaction's connection.
+"""
+
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, List, Mapping, Optional, Sequence, Union
+from sqlalchemy import text
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.sql import ClauseElement
+
+
+Query = Union[ClauseElement, str]
+
+
+class Database:
+    """Query helpers over an AsyncEngine, with connection pool metrics."""
+
+    def __init__(self, engine: AsyncEngine, max_connections: int):
+        self.engine = engine
+        self.max_connections = max_connections
+        self._connection: ContextVar[Optional[AsyncConnection]] = ContextVar("connection", default=None)
+        self._acquired = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    # ============================================================
+    # Lifecycle
+    # ============================================================
+
+    async def connect(self):
+        """Open (and check) a first pooled connection."""
+        await self.fetch_val("SELECT 1")
+
+    async def disconnect(self):
+        """Close every pooled connection."""
+        await self.engine.dispose()
+
+    # ============================================================
+    # Connections
+    # ============================================================
+
+    @contextlib.asynccontextmanager
+    async def _begin(self) -> AsyncIterator[AsyncConnection]:
+        started = time.perf_counter()
+        async with self.engine.begin() as connection:
+            waited = time.perf_counter() - started
+            self._acquired += 1
+            self._wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+            yield connection
+
+    @contextlib.asynccontextmanager
+    async def _use(self) -> AsyncIterator[AsyncConnection]:
+        """The task's transaction connection, or a pooled one for one statement."""
+        connection = self._connection.get()
+        if connection is not None:
+            yield connection
+            return
+        async with self._begin() as connection:
+            yield connection
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """
+        Run the enclosed statements of this task in one transaction
+        (a savepoint when nested); rolled back if the block raises.
+        """
+        connection = self._connection.get()
+        if connection is not None:
+            async with connection.begin_nested():
+                yield
+            return
+        async with self._begin() as connection:
+            token = self._connection.set(connection)
+            try:
+                yield
+            finally:
+                self._connection.reset(token)
+
+    @staticmethod
+    def _statement(query: Query) -> ClauseElement:
+        return text(query) if isinstance(query, str) else query
+
+    # ============================================================
+    # Queries
+    # ============================================================
+
+    async def fetch_all(self, query: Query, values: Optional[Mapping[str, Any]] = None) -> List[RowMapping]:
+        async with self._use() as connection:
+            result = await connection.execute(self._statement(query), values or {})
+            return [row._mapping for row in result]
+
+    async def fetch_one(self, query: Query, values: Optional[Mapping[str, Any]] = None) -> Optional[RowMapping]:
+        async with self._use() as connection:
+            result = await connection.execute(self._statement(query), values or {})
+            row = result.first()
+            return row._mapping if row is not None else None
+
+    async def fetch_val(self, query: Query, values: Optional[Mapping[str, Any]] = None) -> Any:
+        async with self._use() as connection:
+            result = await connection.execute(self._statement(query), values or {})
+            return result.scalar()
+
+    async def execute(self, query: Query, values: Optional[Mapping[str, Any]] = None) -> Any:
+        """
+        Run a statement.
+
+        Returns:
+            The first column of the first returned row (RETURNING), the new
+            primary key of an INSERT, or else the number of rows affected
+        """
+        statement = self._statement(query)
+        async with self._use() as connection:
+            result = await connection.execute(statement, values or {})
+            if result.returns_rows:
+                return result.scalar()
+            if getattr(statement, "is_insert", False) and result.inserted_primary_key:
+                return result.inserted_primary_key[0]
+            return result.rowcount
+
+    async def execute_many(self, query: Query, values: Sequence[Mapping[str, Any]]):
+        """Run a statement once per parameter set (one round trip batch)."""
+        if not values:
+            return
+        async with self._use() as connection:
+            await connection.execute(self._statement(query), list(values))
+
+    async def iterate(self, query: Query, values: Optional[Mapping[str, Any]] = None) -> AsyncIterator[RowMapping]:
+        """Stream rows through a server-side cursor (holds one connection until exhausted)."""
+        async with self._use() as connection:
+            result = await connection.stream(self._statement(query), values or {})
+            async for row in result:
+                yield row._mapping
+
+    # ============================================================
+    # Metrics
+    # ============================================================
+
+    def pool_stats(self) -> dict:
+        """Connection pool saturation for the health endpoint."""
+        pool = self.engine.pool
+        checked_out = pool.checkedout()
+        return {
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_connections": self.max_connections,
+            "saturation": round(checked_out / self.max_connections, 3) if self.max_connections else 0.0,
+            "acquired": self._acquired,
+            "mean_acquire_ms": round(1000 * self._wait_seconds / self._acquired, 2) if self._acquired else 0.0,
+            "max_acquire_ms": round(1000 * self._max_wait_seconds, 2),
+        }
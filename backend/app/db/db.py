@@ -1,44 +1,20 @@
-from sqlalchemy import create_engine, MetaData
-from databases import Database
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import MetaData
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.config import settings
+from app.db.database import Database
 
-# SQLAlchemy engine for Alembic / synchronous migrations with connection pooling
-engine = create_engine(
-    settings.DATABASE_URL,
-    future=True,
-    pool_size=5,  # Number of connections to maintain in pool
-    max_overflow=10,  # Additional connections beyond pool_size
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=3600,  # Recycle connections after 1 hour
-)
-
-# Async engine for async sessions
-async_engine = create_async_engine(
+# The one connection pool per process, used through the query layer (database)
+engine = create_async_engine(
     settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    future=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
-
-# Session factory
-AsyncSessionLocal = sessionmaker(
-    bind=async_engine,
-    expire_on_commit=False,
-    class_=AsyncSession,
+    pool_size=settings.DB_POOL_SIZE,  # Connections kept open in the pool
+    max_overflow=settings.DB_MAX_OVERFLOW,  # Extra connections under load, closed when returned
+    pool_timeout=settings.DB_POOL_TIMEOUT,  # Seconds to wait for a free connection
+    pool_pre_ping=True,  # Verify connections before use
+    pool_recycle=settings.DB_POOL_RECYCLE,  # Recycle connections after this many seconds
+    connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
 )
 
-# databases Database instance for async queries
-database = Database(settings.DATABASE_URL)
-
-Base = declarative_base()
-
-# Dependency for FastAPI endpoints
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+# Async query helpers (fetch_one, fetch_all, execute, ...) on the same pool
+database = Database(engine, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
 
 metadata = MetaData()
@@ -0,0 +1,78 @@
+"""
+Schema Migrations
+-----------------
+metadata.create_all() creates missing tables but never changes existing
+ones. Columns added to a table after it first shipped are listed here and
+applied at startup with idempotent DDL (PostgreSQL ADD COLUMN IF NOT
+EXISTS), so existing databases pick them up without a migration tool;
+indexes added later are created the same way (CREATE INDEX IF NOT EXISTS).
+
+Fingerprints in the legacy applications column are moved into enrollments
+once, by hand (python -m app.utils.move_legacy_fingerprints), never at
+startup: startup only warns while some are left.
+"""
+
+from sqlalchemy import text
+from app.utils.logger import logger
+
+
+# (table, column, SQL type) added after the table was first created
+ADDED_COLUMNS = []
+
+# (index, table, column) added after the table was first created
+ADDED_INDEXES = [
+    ("ix_applications_subject", "applications", "subject"),
+]
+
+
+# Legacy applications fingerprints -> enrollments (finger position 0,
+# unknown; captured when the application was created). Only the rows
+# actually copied are cleared at the source: one that conflicts with an
+# existing enrollment keeps its legacy column.
+MOVE_LEGACY_FINGERPRINTS = """
+    WITH moved AS (
+        INSERT INTO enrollments (identity_number, finger_position, template_encrypted, captured_at)
+        SELECT a.identity_number, 0, a.fingerprint_encrypted, COALESCE(a.created_at, now())
+        FROM applications AS a
+        WHERE a.fingerprint_encrypted IS NOT NULL
+        ON CONFLICT (identity_number, finger_position) DO NOTHING
+        RETURNING identity_number, template_encrypted
+    )
+    UPDATE applications AS a
+    SET fingerprint_encrypted = NULL
+    FROM moved
+    WHERE a.identity_number = moved.identity_number AND a.fingerprint_encrypted = moved.template_encrypted
+    RETURNING a.id
+"""
+
+LEGACY_FINGERPRINTS_LEFT = "SELECT count(*) FROM applications WHERE fingerprint_encrypted IS NOT NULL"
+
+
+def move_legacy_fingerprints(conn) -> tuple:
+    """
+    Move legacy applications fingerprints into enrollments (one-off; on a
+    sync connection: run through AsyncConnection.run_sync).
+
+    Returns:
+        tuple: (fingerprints moved, fingerprints left in the legacy column
+            because the identity already has a finger 0 enrollment)
+    """
+    moved = len(conn.execute(text(MOVE_LEGACY_FINGERPRINTS)).all())
+    left = conn.execute(text(LEGACY_FINGERPRINTS_LEFT)).scalar()
+    return moved, left
+
+
+def apply_migrations(conn):
+    """
+    Add any missing columns and indexes listed in ADDED_COLUMNS and
+    ADDED_INDEXES (on a sync connection: run through AsyncConnection.run_sync).
+    """
+    for table, column, sql_type in ADDED_COLUMNS:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {sql_type}"))
+    for index, table, column in ADDED_INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+    if conn.execute(text("SELECT EXISTS (SELECT 1 FROM applications WHERE fingerprint_encrypted IS NOT NULL)")).scalar():
+        logger.warning("Fingerprints are still stored in the legacy applications column and are not matched; "
+                       "move them with: python -m app.utils.move_legacy_fingerprints")
+    logger.info("Schema migrations applied ({} added column(s), {} added index(es) checked)",
+                len(ADDED_COLUMNS), len(ADDED_INDEXES))
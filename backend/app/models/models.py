@@ -1,10 +1,9 @@
-from sqlalchemy import Table, Column, Integer, String, Text, DateTime, Boolean, LargeBinary
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import (
+    Table, Column, Integer, String, Text, DateTime, Boolean, LargeBinary, Index, ForeignKey, UniqueConstraint
+)
 from sqlalchemy.sql import func
 from app.db.db import metadata
 
-Base = declarative_base()
-
 applications = Table(
     "applications",
     metadata,
@@ -16,14 +15,34 @@ applications = Table(
     Column("country", String(10)),
     Column("identity_number", String(13), unique=True, nullable=False),
     Column("address", String(100)),
-    Column("subject", String(25)),
+    Column("subject", String(25), index=True),  # identification partition key
     Column("cnic_front_path", String(256), nullable=True),
     Column("cnic_back_path", String(256), nullable=True),
     Column("student_image_path", String(256), nullable=True),
-    Column("fingerprint_encrypted", LargeBinary, nullable=True),  # encrypted template
+    # Legacy fingerprint column: moved to enrollments by app.utils.move_legacy_fingerprints
+    Column("fingerprint_encrypted", LargeBinary, nullable=True),
     Column("created_at", DateTime(timezone=True), server_default=func.now()),
 )
 
+# Biometric enrollments, one row per captured finger of a person. Kept out
+# of applications so listing applications never reads template bytes.
+enrollments = Table(
+    "enrollments",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("identity_number", String(13), ForeignKey("applications.identity_number", ondelete="CASCADE"),
+           nullable=False),
+    Column("finger_position", Integer, nullable=False, server_default="0"),  # ISO/ANSI finger code; 0 = unknown
+    Column("template_encrypted", LargeBinary, nullable=False),  # encrypted template
+    Column("cylinders_encrypted", LargeBinary, nullable=True),  # encrypted cylinder codes
+    Column("template_format", String(16), nullable=True),  # numpy | ansi378 | iso19794 | sdk; NULL if moved
+    Column("template_size", Integer, nullable=True),  # plaintext bytes; NULL if moved
+    Column("quality", Integer, nullable=True),  # image quality of the captured frame (0-100)
+    Column("version", Integer, nullable=False, server_default="1"),  # bumped on each re-enrollment
+    Column("captured_at", DateTime(timezone=True), nullable=False, server_default=func.now(), index=True),
+    UniqueConstraint("identity_number", "finger_position", name="uq_enrollments_finger"),
+)
+
 sessions = Table(
     "scan_sessions",
     metadata,
@@ -36,6 +55,50 @@ sessions = Table(
     Column("created_at", DateTime(timezone=True), server_default=func.now()),
 )
 
+# Possible duplicate enrollments: the same finger under two identities.
+# identity_number is the enrollment that was checked, matched_identity_number
+# the existing one it matched; a pair is stored once whichever side found it.
+duplicate_candidates = Table(
+    "duplicate_candidates",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("identity_number", String(13), nullable=False, index=True),
+    Column("matched_identity_number", String(13), nullable=False, index=True),
+    Column("score", Integer, nullable=False),
+    Column("source", String(16), nullable=False),  # enrollment | bulk
+    Column("status", String(16), nullable=False, server_default="pending"),  # pending | confirmed | dismissed
+    Column("reviewed_by", String(50), nullable=True),
+    Column("reviewed_at", DateTime(timezone=True), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Index(
+    "uq_duplicate_candidates_pair",
+    func.least(duplicate_candidates.c.identity_number, duplicate_candidates.c.matched_identity_number),
+    func.greatest(duplicate_candidates.c.identity_number, duplicate_candidates.c.matched_identity_number),
+    unique=True,
+)
+
+# Template re-encryption jobs (app.services.key_rotation). last_id is the
+# checkpoint: enrollments rows up to it have been re-encrypted under key_id.
+key_rotations = Table(
+    "key_rotations",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("key_id", Integer, nullable=False),
+    Column("status", String(16), nullable=False),  # running | paused | finished | failed
+    Column("last_id", Integer, nullable=False, server_default="0"),
+    Column("processed", Integer, nullable=False, server_default="0"),
+    Column("rotated", Integer, nullable=False, server_default="0"),
+    Column("skipped", Integer, nullable=False, server_default="0"),
+    Column("total", Integer, nullable=False, server_default="0"),
+    Column("started_by", String(50), nullable=True),
+    Column("error", Text, nullable=True),
+    Column("started_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+    Column("finished_at", DateTime(timezone=True), nullable=True),
+)
+
 # Create admins table using metadata to ensure it's included in create_all
 admins = Table(
     "admins",
@@ -44,10 +107,3 @@ admins = Table(
     Column("username", String(50), unique=True, nullable=False),
     Column("password", String(255), nullable=False),
 )
-
-class Admin(Base):
-    __tablename__ = "admins"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), unique=True, nullable=False)
-    password = Column(String(255), nullable=False)
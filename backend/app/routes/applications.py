@@ -5,13 +5,18 @@ from pydantic import constr
 from app.schemas.schemas import ApplicationCreate, ApplicationResponse
 from app.db.db import database
 from app.models import models
+from app.services.application_list import note_application_stored
 from app.utils.logger import logger
 from app.core.config import settings
 import os
-import asyncpg
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
 router = APIRouter()
 
+# PostgreSQL SQLSTATE of a unique constraint violation
+UNIQUE_VIOLATION = "23505"
+
 # helper to store files on filesystem (you can replace with S3 later)
 UPLOAD_DIR = os.path.join(os.getcwd(), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -58,11 +63,15 @@ async def create_application(
             student_image_path=pimg,
         )
         rec_id = await database.execute(query)
+        note_application_stored()
         logger.info("Application stored id=%s identity=%s", rec_id, identityNumber)
 
         return ApplicationResponse(identityNumber=identityNumber, fullName=fullName)
     
-    except asyncpg.exceptions.UniqueViolationError as e:
+    except IntegrityError as e:
+        if getattr(e.orig, "sqlstate", None) != UNIQUE_VIOLATION:
+            logger.error("Error storing application: {}", str(e))
+            raise HTTPException(status_code=500, detail="Failed to store application")
         logger.warning("Duplicate CNIC attempt: %s", identityNumber)
         raise HTTPException(
             status_code=409, 
@@ -74,7 +83,8 @@ async def create_application(
 
 @router.get("/applications/{identity_number}", response_model=ApplicationResponse)
 async def get_application(identity_number: str):
-    query = models.applications.select().where(models.applications.c.identity_number == identity_number)
+    table = models.applications
+    query = select(table.c.identity_number, table.c.full_name).where(table.c.identity_number == identity_number)
     rec = await database.fetch_one(query)
     if not rec:
         raise HTTPException(status_code=404, detail="Application not found")
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Request
+from app.schemas.schemas import IdentificationCandidate, IdentificationResponse
+from app.services.identification import IdentificationError, identify_finger
+from app.routes.verification import FAILURE_EVENTS
+from app.utils.logger import logger
+
+router = APIRouter()
+
+
+@router.post("/identify", response_model=IdentificationResponse)
+async def identify_fingerprint(request: Request):
+    """
+    1:N identification on a server-attached reader: capture a probe and
+    return the best matching enrollments, without a CNIC.
+    Query parameters (e.g. ?subject=Physics) scope the search to one
+    gallery partition.
+    """
+    last_failure = {}
+
+    async def record_event(payload: dict):
+        if payload.get("type") in FAILURE_EVENTS:
+            last_failure["message"] = payload.get("message")
+
+    try:
+        results = await identify_finger(record_event, dict(request.query_params))
+    except IdentificationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if results is None:
+        logger.warning("Identification capture failed")
+        raise HTTPException(
+            status_code=422,
+            detail=last_failure.get("message") or "No valid fingerprint captured"
+        )
+
+    candidates = [
+        IdentificationCandidate(
+            identityNumber=r["identity_number"],
+            fullName=r["full_name"],
+            fingerPosition=r["finger_position"],
+            score=r["score"],
+            matched=r["matched"]
+        )
+        for r in results
+    ]
+    return IdentificationResponse(
+        identified=bool(candidates) and candidates[0].matched,
+        candidates=candidates
+    )
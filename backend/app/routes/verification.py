@@ -0,0 +1,75 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.jwt_handler import get_current_admin
+from app.schemas.schemas import BatchVerificationRequest, VerificationResponse
+from app.services.batch_verification import prepare_batch, run_batch
+from app.services.verification import VerificationError, verify_identity
+from app.utils.logger import logger
+
+router = APIRouter()
+
+# Scan events that explain why no probe was captured
+FAILURE_EVENTS = {"error", "capture_error", "timeout", "image_rejected"}
+
+
+# Declared before /verify/{identity_number}, which would otherwise match it
+@router.post("/verify/batch")
+async def verify_batch(request: BatchVerificationRequest, admin: str = Depends(get_current_admin)):
+    """
+    Verify many (CNIC, base64 probe template) pairs captured elsewhere, e.g.
+    verifications a kiosk queued while offline (admin only). Streams one
+    NDJSON line per item as it is decided, in completion order: index
+    (position in items), identityNumber and either fullName/matched or
+    error/status. Scores are not returned, so the endpoint cannot be used to
+    tune a probe against an enrolled template.
+    """
+    if len(request.items) > settings.VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may hold at most {settings.VERIFY_BATCH_MAX_ITEMS} items."
+        )
+
+    logger.info("Batch verification of {} item(s) requested by {}", len(request.items), admin)
+    # Enrollments are fetched before streaming starts, so a database error is still a 5xx
+    batch = await prepare_batch([(item.identityNumber, item.template) for item in request.items])
+
+    async def ndjson():
+        async for result in run_batch(batch):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.post("/verify/{identity_number}", response_model=VerificationResponse)
+async def verify_fingerprint(identity_number: str):
+    """
+    1:1 verification on a server-attached reader: capture a probe and match it
+    against the fingerprint enrolled for the CNIC.
+    """
+    last_failure = {}
+
+    async def record_event(payload: dict):
+        if payload.get("type") in FAILURE_EVENTS:
+            last_failure["message"] = payload.get("message")
+
+    try:
+        result, full_name = await verify_identity(identity_number, record_event)
+    except VerificationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if result is None:
+        logger.warning("Verification capture failed for {}", identity_number)
+        raise HTTPException(
+            status_code=422,
+            detail=last_failure.get("message") or "No valid fingerprint captured"
+        )
+
+    return VerificationResponse(
+        identityNumber=identity_number,
+        fullName=full_name,
+        matched=result.matched,
+        score=result.score,
+        engine=result.engine
+    )
@@ -4,21 +4,40 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from app.services.fingerprint_session import ScanSession
 from app.db.db import database
 from app.models import models
-from app.services.crypto import encrypt_bytes
+from app.services.cylinder_codes import template_cylinder_codes
+from app.services.deduplication import schedule_enrollment_check
+from app.services.enrollments import FINGER_POSITIONS, FINGER_UNKNOWN, save_enrollment
+from app.services.identification import IdentificationError, enroll_in_gallery, identify_finger
+from app.services.verification import VerificationError, template_cache, verify_identity
 from app.utils.logger import logger
 
 router = APIRouter()
 
 
+def _make_event_sender(ws: WebSocket):
+    """Build a helper that safely sends JSON messages to the frontend."""
+    async def send_event(payload: dict):
+        try:
+            await ws.send_text(json.dumps(payload))
+        except RuntimeError:
+            # Happens if the client disconnects mid-send
+            logger.warning("WebSocket send attempted on closed socket.")
+        except Exception as e:
+            logger.warning("Failed to send WS event: {}", e)
+
+    return send_event
+
+
 @router.websocket("/ws/scan/{identity_number}")
-async def ws_scan(ws: WebSocket, identity_number: str):
+async def ws_scan(ws: WebSocket, identity_number: str, finger: int = FINGER_UNKNOWN):
     """
     WebSocket endpoint for fingerprint scanning.
 
     Flow:
-    1️⃣ Client connects to /ws/scan/{identity_number}
+    1️⃣ Client connects to /ws/scan/{identity_number} (?finger=1-10 for an
+       ISO/ANSI finger position; re-scanning a finger replaces it)
     2️⃣ Backend verifies student exists
-    3️⃣ Device connects and starts blinking
+    3️⃣ A free reader is checked out and its LED starts blinking
     4️⃣ User places finger → capture success
     5️⃣ Fingerprint encrypted and saved
     6️⃣ WebSocket closes normally
@@ -26,19 +45,18 @@ async def ws_scan(ws: WebSocket, identity_number: str):
     await ws.accept()
     logger.info("WebSocket connected for identity %s", identity_number)
 
-    async def send_event(payload: dict):
-        """Helper to safely send JSON messages to the frontend."""
-        try:
-            await ws.send_text(json.dumps(payload))
-        except RuntimeError:
-            # Happens if the client disconnects mid-send
-            logger.warning("WebSocket send attempted on closed socket.")
-        except Exception as e:
-            logger.warning("Failed to send WS event: %s", e)
-
+    send_event = _make_event_sender(ws)
     session = None
 
     try:
+        if finger not in FINGER_POSITIONS:
+            await send_event({
+                "type": "error",
+                "message": f"Invalid finger position {finger} (0-10)."
+            })
+            await ws.close(code=4000)
+            return
+
         # --- Step 1: Verify student record ---
         query = models.applications.select().where(models.applications.c.identity_number == identity_number)
         rec = await database.fetch_one(query)
@@ -72,6 +90,7 @@ async def ws_scan(ws: WebSocket, identity_number: str):
         if disconnect_task in done:
             # Client disconnected or sent cancel signal
             logger.warning("Client disconnected or cancelled scan for %s", identity_number)
+            await session.cancel()
             if not scan_task.done():
                 scan_task.cancel()
             # Cancel any pending tasks
@@ -96,15 +115,15 @@ async def ws_scan(ws: WebSocket, identity_number: str):
 
         # --- Step 4: Encrypt + save ---
         try:
-            enc = encrypt_bytes(template)
-            upd = (
-                models.applications
-                .update()
-                .where(models.applications.c.identity_number == identity_number)
-                .values(fingerprint_encrypted=enc)
-            )
-            await database.execute(upd)
-            logger.info("Encrypted fingerprint saved for %s", identity_number)
+            # Binary cylinder codes for 1:N screening (None for SDK templates)
+            cylinders = template_cylinder_codes(template)
+            version = await save_enrollment(identity_number, template, cylinders, session.quality, finger)
+            # Verifications must not keep matching the previous template
+            template_cache.invalidate(identity_number)
+            enroll_in_gallery(identity_number, template, cylinders, rec, finger)
+            # Runs in the background; capture_success is not held up by it
+            schedule_enrollment_check(identity_number, template)
+            logger.info("Encrypted fingerprint saved for {} (finger {}, version {})", identity_number, finger, version)
         except Exception as e:
             logger.exception("Failed to encrypt/save fingerprint: %s", e)
             await send_event({
@@ -128,12 +147,13 @@ async def ws_scan(ws: WebSocket, identity_number: str):
     except WebSocketDisconnect:
         logger.warning("WebSocket disconnected during scan for %s", identity_number)
         if session:
-            session.device.stop_blink()
+            await session.cancel()
 
     except asyncio.CancelledError:
         logger.warning("Scan task cancelled for %s", identity_number)
         if session:
-            session.device.stop_blink()
+            await session.cancel()
+        raise
 
     except Exception as e:
         logger.exception("Unhandled exception in ws_scan: %s", e)
@@ -144,3 +164,194 @@ async def ws_scan(ws: WebSocket, identity_number: str):
             })
         finally:
             await ws.close(code=1011)
+
+
+@router.websocket("/ws/verify/{identity_number}")
+async def ws_verify(ws: WebSocket, identity_number: str):
+    """
+    WebSocket endpoint for 1:1 fingerprint verification.
+
+    Flow:
+    1️⃣ Client connects to /ws/verify/{identity_number}
+    2️⃣ Enrolled template is taken from the cache (or fetched and decrypted)
+    3️⃣ A free reader captures a probe (same events as /ws/scan)
+    4️⃣ Probe is matched against the enrolled template
+    5️⃣ Decision and score are sent and the WebSocket closes
+    """
+    await ws.accept()
+    logger.info("Verification WebSocket connected for identity {}", identity_number)
+
+    send_event = _make_event_sender(ws)
+    verify_task = None
+
+    try:
+        await send_event({
+            "type": "device_init",
+            "message": "Initializing fingerprint scanner..."
+        })
+
+        # Run verification in parallel to allow detecting disconnects
+        verify_task = asyncio.create_task(verify_identity(identity_number, send_event))
+        disconnect_task = asyncio.create_task(ws.receive_text())
+
+        done, pending = await asyncio.wait(
+            {verify_task, disconnect_task},
+            return_when=asyncio.FIRST_COMPLETED
+        )
+
+        if disconnect_task in done:
+            logger.warning("Client disconnected or cancelled verification for {}", identity_number)
+            # Cancelling the task stops the capture and returns the reader
+            for task in pending:
+                task.cancel()
+            await ws.close(code=1001)
+            return
+
+        disconnect_task.cancel()
+
+        try:
+            result, full_name = await verify_task
+        except VerificationError as e:
+            await send_event({
+                "type": "error",
+                "message": str(e)
+            })
+            await ws.close(code=4000)
+            return
+
+        if result is None:
+            await send_event({
+                "type": "capture_failed",
+                "message": "No valid fingerprint captured. Please retry or restart the verification."
+            })
+            return  # keep socket open, frontend decides next step
+
+        await send_event({
+            "type": "verification_result",
+            "message": "Fingerprint verified." if result.matched else "Fingerprint does not match.",
+            "identity_number": identity_number,
+            "full_name": full_name,
+            **result.to_dict()
+        })
+        await send_event({
+            "type": "done",
+            "message": "Verification completed."
+        })
+        await ws.close(code=1000)
+
+    except WebSocketDisconnect:
+        logger.warning("WebSocket disconnected during verification for {}", identity_number)
+        if verify_task:
+            verify_task.cancel()
+
+    except asyncio.CancelledError:
+        logger.warning("Verification cancelled for {}", identity_number)
+        if verify_task:
+            verify_task.cancel()
+        raise
+
+    except Exception as e:
+        logger.exception("Unhandled exception in ws_verify: {}", e)
+        try:
+            await send_event({
+                "type": "error",
+                "message": f"Unexpected error: {str(e)}"
+            })
+        finally:
+            await ws.close(code=1011)
+
+
+@router.websocket("/ws/identify")
+async def ws_identify(ws: WebSocket):
+    """
+    WebSocket endpoint for 1:N fingerprint identification (no CNIC).
+
+    Flow:
+    1️⃣ Client connects to /ws/identify
+    2️⃣ A free reader captures a probe (same events as /ws/scan)
+    3️⃣ Probe is searched against every enrolled NumPy template (or only
+       the partition named by query parameters, e.g. ?subject=Physics)
+    4️⃣ Top candidates are sent and the WebSocket closes
+    """
+    await ws.accept()
+    logger.info("Identification WebSocket connected")
+
+    send_event = _make_event_sender(ws)
+    identify_task = None
+
+    try:
+        await send_event({
+            "type": "device_init",
+            "message": "Initializing fingerprint scanner..."
+        })
+
+        # Run identification in parallel to allow detecting disconnects
+        identify_task = asyncio.create_task(identify_finger(send_event, dict(ws.query_params)))
+        disconnect_task = asyncio.create_task(ws.receive_text())
+
+        done, pending = await asyncio.wait(
+            {identify_task, disconnect_task},
+            return_when=asyncio.FIRST_COMPLETED
+        )
+
+        if disconnect_task in done:
+            logger.warning("Client disconnected or cancelled identification")
+            # Cancelling the task stops the capture and returns the reader
+            for task in pending:
+                task.cancel()
+            await ws.close(code=1001)
+            return
+
+        disconnect_task.cancel()
+
+        try:
+            candidates = await identify_task
+        except IdentificationError as e:
+            await send_event({
+                "type": "error",
+                "message": str(e)
+            })
+            await ws.close(code=4000)
+            return
+
+        if candidates is None:
+            await send_event({
+                "type": "capture_failed",
+                "message": "No valid fingerprint captured. Please retry or restart the identification."
+            })
+            return  # keep socket open, frontend decides next step
+
+        identified = bool(candidates) and candidates[0]["matched"]
+        await send_event({
+            "type": "identification_result",
+            "message": (f"Identified as {candidates[0]['full_name']}." if identified
+                        else "No enrolled fingerprint matches."),
+            "identified": identified,
+            "candidates": candidates
+        })
+        await send_event({
+            "type": "done",
+            "message": "Identification completed."
+        })
+        await ws.close(code=1000)
+
+    except WebSocketDisconnect:
+        logger.warning("WebSocket disconnected during identification")
+        if identify_task:
+            identify_task.cancel()
+
+    except asyncio.CancelledError:
+        logger.warning("Identification cancelled")
+        if identify_task:
+            identify_task.cancel()
+        raise
+
+    except Exception as e:
+        logger.exception("Unhandled exception in ws_identify: {}", e)
+        try:
+            await send_event({
+                "type": "error",
+                "message": f"Unexpected error: {str(e)}"
+            })
+        finally:
+            await ws.close(code=1011)
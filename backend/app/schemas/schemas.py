@@ -31,6 +31,36 @@ class ApplicationResponse(BaseModel):
     fullName: str
 
 
+class VerificationResponse(BaseModel):
+    identityNumber: str
+    fullName: str
+    matched: bool
+    score: int
+    engine: str
+
+
+class BatchVerificationItem(BaseModel):
+    identityNumber: str
+    template: str  # base64 NumPy minutiae probe template
+
+
+class BatchVerificationRequest(BaseModel):
+    items: List[BatchVerificationItem] = Field(min_length=1)
+
+
+class IdentificationCandidate(BaseModel):
+    identityNumber: str
+    fullName: Optional[str]
+    fingerPosition: int = 0  # the person's best-matching enrolled finger
+    score: int
+    matched: bool
+
+
+class IdentificationResponse(BaseModel):
+    identified: bool
+    candidates: List[IdentificationCandidate]
+
+
 class ApplicationListItem(BaseModel):
     id: int
     full_name: str
@@ -46,6 +76,67 @@ class ApplicationListItem(BaseModel):
 
 class PaginatedApplications(BaseModel):
     total: int
+    total_exact: bool = True
+    total_pages: int
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
     applications: List[ApplicationListItem]
+
+
+class DuplicateCandidateItem(BaseModel):
+    id: int
+    identityNumber: str
+    fullName: Optional[str]
+    matchedIdentityNumber: str
+    matchedFullName: Optional[str]
+    score: int
+    source: str
+    status: str
+    reviewedBy: Optional[str]
+    reviewedAt: Optional[datetime]
+    createdAt: Optional[datetime]
+
+
+class PaginatedDuplicates(BaseModel):
+    total: int
+    page: int
+    per_page: int
+    duplicates: List[DuplicateCandidateItem]
+
+
+class DuplicateReview(BaseModel):
+    status: str = Field(..., description="confirmed or dismissed")
+
+
+class DuplicateScanStatus(BaseModel):
+    running: bool
+    processed: int
+    total: int
+    flagged: int
+    startedAt: Optional[float]
+    finishedAt: Optional[float]
+    error: Optional[str]
+
+
+class KeyRotationProgress(BaseModel):
+    id: int
+    keyId: int
+    status: str
+    lastId: int
+    processed: int
+    rotated: int
+    skipped: int
+    total: int
+    startedBy: Optional[str]
+    error: Optional[str]
+    startedAt: Optional[datetime]
+    updatedAt: Optional[datetime]
+    finishedAt: Optional[datetime]
+
+
+class KeyRotationStatus(BaseModel):
+    activeKeyId: int
+    running: bool
+    rotation: Optional[KeyRotationProgress]
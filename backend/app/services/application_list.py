@@ -0,0 +1,178 @@
+"""
+Applications List
+-----------------
+Pages of applications for the admin list, newest first, without the two
+queries that grow with the table: a full count(*) per request and an
+OFFSET that reads and discards every row before the page.
+
+Process Flow:
+1. Keyset pagination on id DESC: a page ends with opaque next/prev cursors
+   naming the id to continue from, so any page costs one index range scan
+   of per_page rows (page numbers still work, through OFFSET)
+2. The total comes from a cached count, refreshed every
+   APPLICATIONS_COUNT_TTL seconds and incremented as applications are
+   stored; beyond APPLICATIONS_COUNT_ESTIMATE_ABOVE rows the refresh uses
+   the planner's estimate (pg_class.reltuples) instead of count(*)
+3. exact=True counts the table and refreshes the cache with the result
+4. Rows carry only the listed columns plus an enrolled flag (EXISTS on
+   enrollments), never template bytes
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select, text
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.enrollments import enrolled
+from app.utils.logger import logger
+
+
+CURSOR_VERSION = 1
+DIRECTION_NEXT = "next"   # older applications: id below the cursor
+DIRECTION_PREV = "prev"   # newer applications: id above the cursor
+
+_count_lock = asyncio.Lock()
+_count = {"value": None, "exact": True, "refreshed_at": 0.0}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor was not issued by this service."""
+
+
+# ============================================================
+# Cursors
+# ============================================================
+
+def encode_cursor(row_id: int, direction: str) -> str:
+    payload = json.dumps({"v": CURSOR_VERSION, "id": row_id, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        row_id, direction = payload["id"], payload["d"]
+        # type() rather than isinstance(): JSON true/false must not pass as an id
+        valid = payload.get("v") == CURSOR_VERSION and type(row_id) is int and \
+            direction in (DIRECTION_NEXT, DIRECTION_PREV)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise InvalidCursorError("Invalid pagination cursor")
+    return row_id, direction
+
+
+# ============================================================
+# Counts
+# ============================================================
+
+async def _exact_count() -> int:
+    return await database.fetch_val(select(func.count()).select_from(models.applications))
+
+
+async def _estimated_count() -> Optional[int]:
+    """Planner row estimate; None if the table has never been analyzed."""
+    estimate = await database.fetch_val(
+        text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": models.applications.name},
+    )
+    return int(estimate) if estimate is not None and estimate >= 0 else None
+
+
+async def application_count(exact: bool = False) -> Tuple[int, bool]:
+    """
+    Number of applications.
+
+    Returns:
+        tuple: (count, whether it is exact); cached counts are exact as of
+            their last refresh plus applications stored since
+    """
+    if not exact and _count["value"] is not None \
+            and time.monotonic() - _count["refreshed_at"] < settings.APPLICATIONS_COUNT_TTL:
+        return _count["value"], _count["exact"]
+
+    async with _count_lock:
+        # Refreshed by another request while this one waited
+        if not exact and _count["value"] is not None \
+                and time.monotonic() - _count["refreshed_at"] < settings.APPLICATIONS_COUNT_TTL:
+            return _count["value"], _count["exact"]
+        value, is_exact = None, True
+        if not exact:
+            estimate = await _estimated_count()
+            if estimate is not None and estimate > settings.APPLICATIONS_COUNT_ESTIMATE_ABOVE:
+                value, is_exact = estimate, False
+        if value is None:
+            value = await _exact_count()
+        _count.update(value=value, exact=is_exact, refreshed_at=time.monotonic())
+        logger.debug("Applications count refreshed: {} ({})", value, "exact" if is_exact else "estimated")
+        return value, is_exact
+
+
+def note_application_stored():
+    """Keep the cached count in step with an application just stored."""
+    if _count["value"] is not None:
+        _count["value"] += 1
+
+
+# ============================================================
+# Pages
+# ============================================================
+
+async def list_applications(per_page: int, cursor: Optional[str] = None, page: int = 1
+                            ) -> Tuple[list, Optional[str], Optional[str]]:
+    """
+    One page of applications, newest first.
+
+    Args:
+        per_page: Rows per page
+        cursor: next_cursor / prev_cursor of an earlier page; takes
+            precedence over page
+        page: 1-based page number (OFFSET; prefer cursors for deep pages)
+
+    Returns:
+        tuple: (rows, next_cursor, prev_cursor); a cursor is None when
+            there is nothing further that way
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    table = models.applications
+    query = select(
+        table.c.id, table.c.full_name, table.c.father_name, table.c.identity_number, table.c.subject,
+        table.c.created_at, enrolled().label("enrolled"),
+    )
+    direction = DIRECTION_NEXT
+    if cursor:
+        row_id, direction = decode_cursor(cursor)
+        if direction == DIRECTION_NEXT:
+            query = query.where(table.c.id < row_id).order_by(table.c.id.desc())
+        else:
+            query = query.where(table.c.id > row_id).order_by(table.c.id.asc())
+    else:
+        query = query.order_by(table.c.id.desc()).offset((page - 1) * per_page)
+
+    # One extra row tells whether there is more beyond this page
+    rows: List = await database.fetch_all(query.limit(per_page + 1))
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == DIRECTION_PREV:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    if direction == DIRECTION_NEXT:
+        has_older, has_newer = more, bool(cursor) or page > 1
+    else:
+        has_older, has_newer = True, more
+    next_cursor = encode_cursor(rows[-1]["id"], DIRECTION_NEXT) if has_older else None
+    prev_cursor = encode_cursor(rows[0]["id"], DIRECTION_PREV) if has_newer else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,222 @@
+"""
+Batch Verification Service
+--------------------------
+Bulk 1:1 verification of probe templates captured elsewhere (e.g. kiosks
+replaying verifications queued while they were offline), without a reader.
+
+Process Flow:
+1. Decode and parse every base64 probe (ANSI 378 / ISO 19794-2 records are
+   converted to NumPy templates); invalid probes get an error result
+2. Fetch the enrolled templates (every finger) for all distinct CNICs with
+   one IN query
+3. Decrypt them in one batch (app.services.crypto.decrypt_many)
+4. Match each probe against its person's fingers in chunks, on
+   VERIFY_BATCH_WORKERS processes (worker threads if 0), and yield the best
+   finger's result as chunks finish
+
+Results are yielded in completion order, carry the index of their item in
+the request and give only the decision, never the score. Only NumPy
+minutiae templates (or standard records) can be matched here; SDK
+templates need the SDK on a reader (use /verify/{identity_number}).
+"""
+
+import asyncio
+import base64
+import binascii
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.crypto import decrypt_many
+from app.services.matcher import match_template_pairs
+from app.services.minutiae import TemplateFormatError, decode_template, is_minutiae_template
+from app.services.template_formats import detect_format, normalize_template
+from app.utils.logger import logger
+
+
+# Match jobs: (item index, probe, the person's enrolled NumPy templates)
+MatchJob = Tuple[int, bytes, List[bytes]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class BatchVerification:
+    """A batch with its enrollments loaded, ready to be matched."""
+
+    def __init__(self, items: Sequence[Tuple[str, str]]):
+        self.items = items
+        self.full_names: Dict[str, str] = {}
+        self.jobs: List[MatchJob] = []
+        self.failures: List[dict] = []
+
+
+def _chunks(rows: list, size: int) -> List[list]:
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def _failure(index: int, identity_number: str, message: str, status_code: int) -> dict:
+    return {"index": index, "identityNumber": identity_number, "error": message, "status": status_code}
+
+
+def _decode_probe(probe: str) -> Optional[bytes]:
+    try:
+        return base64.b64decode(probe, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _numpy_probe(probe: bytes) -> Optional[bytes]:
+    """The probe as a valid NumPy template, None if it is malformed."""
+    try:
+        probe = normalize_template(probe)
+        decode_template(probe)
+    except TemplateFormatError:
+        return None
+    return probe
+
+
+async def _fetch_enrolled(identity_numbers: List[str]) -> Tuple[Dict[str, List[bytes]], Dict[str, str]]:
+    """
+    Fetch and decrypt the enrolled templates of many identities.
+
+    Returns:
+        tuple: ({identity: decrypted templates, one per finger; empty if not
+            enrolled or unreadable}, {identity: full name}); unknown
+            identities are absent
+    """
+    table, enrollments = models.applications, models.enrollments
+    query = (
+        select(table.c.identity_number, table.c.full_name, enrollments.c.template_encrypted)
+        .select_from(table.outerjoin(enrollments, enrollments.c.identity_number == table.c.identity_number))
+        .where(table.c.identity_number.in_(identity_numbers))
+    )
+    rows = await database.fetch_all(query)
+
+    full_names = {rec["identity_number"]: rec["full_name"] for rec in rows}
+    enrolled = [rec for rec in rows if rec["template_encrypted"]]
+    decrypted = await asyncio.to_thread(decrypt_many, [rec["template_encrypted"] for rec in enrolled])
+    templates: Dict[str, List[bytes]] = {identity_number: [] for identity_number in full_names}
+    for rec, template in zip(enrolled, decrypted):
+        if template is None:
+            logger.warning("Unreadable template for {}", rec["identity_number"])
+            continue
+        templates[rec["identity_number"]].append(template)
+    return templates, full_names
+
+
+async def prepare_batch(items: Sequence[Tuple[str, str]]) -> BatchVerification:
+    """
+    Decode the probes and load the enrolled templates of a batch.
+
+    Args:
+        items: (CNIC, base64 probe template) pairs
+
+    Returns:
+        BatchVerification: Pairs to match, and results already decided
+            (invalid or malformed probe, unknown CNIC, not enrolled, SDK template)
+    """
+    batch = BatchVerification(items)
+    templates, batch.full_names = await _fetch_enrolled(sorted({identity for identity, _ in items}))
+
+    for index, (identity_number, probe) in enumerate(items):
+        probe = _decode_probe(probe)
+        numpy_probe = _numpy_probe(probe) if probe is not None else None
+        enrolled = [template for template in templates.get(identity_number, []) if is_minutiae_template(template)]
+        if probe is None:
+            batch.failures.append(_failure(index, identity_number, "Probe template is not valid base64.", 422))
+        elif identity_number not in templates:
+            batch.failures.append(_failure(index, identity_number, f"No student found for CNIC {identity_number}.", 404))
+        elif not templates[identity_number]:
+            batch.failures.append(
+                _failure(index, identity_number, f"No fingerprint enrolled for CNIC {identity_number}.", 409)
+            )
+        elif detect_format(probe) is None or not enrolled:
+            batch.failures.append(
+                _failure(index, identity_number, "SDK templates can only be verified on a reader.", 422)
+            )
+        elif numpy_probe is None:
+            batch.failures.append(_failure(index, identity_number, "Probe template is malformed.", 422))
+        else:
+            batch.jobs.append((index, numpy_probe, enrolled))
+    return batch
+
+
+def _match_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.VERIFY_BATCH_WORKERS > 0 and _pool is None:
+        _pool = ProcessPoolExecutor(settings.VERIFY_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        logger.info("Batch verification pool started: {} worker process(es)", settings.VERIFY_BATCH_WORKERS)
+    return _pool
+
+
+async def _match_chunk(batch: BatchVerification, chunk: List[MatchJob]) -> List[dict]:
+    pairs = [(probe, template) for _, probe, enrolled in chunk for template in enrolled]
+    pool = _match_pool()
+    if pool is None:
+        pair_scores = await asyncio.to_thread(match_template_pairs, pairs)
+    else:
+        pair_scores = await asyncio.get_running_loop().run_in_executor(pool, match_template_pairs, pairs)
+
+    # Each item's score is its best readable finger's
+    scores, start = [], 0
+    for _, _, enrolled in chunk:
+        finger_scores = [score for score in pair_scores[start:start + len(enrolled)] if score is not None]
+        scores.append(max(finger_scores) if finger_scores else None)
+        start += len(enrolled)
+
+    results = []
+    for (index, _, _), score in zip(chunk, scores):
+        identity_number = batch.items[index][0]
+        if score is None:
+            logger.warning("No parseable enrolled template for {}", identity_number)
+            results.append(_failure(index, identity_number, "Enrolled template could not be parsed.", 409))
+            continue
+        results.append({
+            "index": index,
+            "identityNumber": identity_number,
+            "fullName": batch.full_names.get(identity_number),
+            "matched": score >= settings.MATCH_THRESHOLD,
+        })
+    return results
+
+
+async def run_batch(batch: BatchVerification) -> AsyncIterator[dict]:
+    """Yield the batch's results (decided ones first, then as match chunks finish)."""
+    for failure in batch.failures:
+        yield failure
+
+    chunks = _chunks(batch.jobs, settings.VERIFY_BATCH_CHUNK_SIZE)
+    # At most one chunk queued per worker beyond the ones running
+    semaphore = asyncio.Semaphore(2 * max(1, settings.VERIFY_BATCH_WORKERS))
+
+    async def match(chunk):
+        async with semaphore:
+            return await _match_chunk(batch, chunk)
+
+    tasks = [asyncio.create_task(match(chunk)) for chunk in chunks]
+    matched = unmatchable = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for result in await finished:
+                if "error" in result:
+                    unmatchable += 1
+                else:
+                    matched += result["matched"]
+                yield result
+    finally:
+        # The client went away mid-stream: drop the chunks not started yet
+        for task in tasks:
+            task.cancel()
+    logger.info("Batch verification: {} item(s), {} matched, {} not verifiable",
+                len(batch.items), matched, len(batch.failures) + unmatchable)
+
+
+def stop_batch_verification():
+    """Shut down the match worker processes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
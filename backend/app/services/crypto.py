@@ -1,21 +1,246 @@
-from cryptography.fernet import Fernet
-from app.core.config import settings
+"""
+Template Encryption
+-------------------
+Encryption at rest for fingerprint templates (and other sensitive blobs).
+New blobs are written as a versioned AEAD envelope:
+
+    version u8 (1) | key id u16 (big-endian) | nonce (12 bytes) | AES-256-GCM ciphertext + tag (16 bytes)
+
+The version and key id header is authenticated along with the ciphertext.
+Blobs written before the envelope existed are Fernet tokens (base64 text,
+always starting with "gAAAAA"); they are still decrypted with FERNET_KEY.
+
+Keys:
+    key id 0   derived from FERNET_KEY (HKDF-SHA256), so a deployment that
+               only sets FERNET_KEY works unchanged
+    ENCRYPTION_KEYS    further keys, "id:key,..." (id 1-65535, key: url-safe
+               base64 of 32 random bytes)
+    ENCRYPTION_KEY_ID  the key new envelopes are written with
+
+Keys are built on first use, or by load_keys(), which the server's startup
+hook calls so an invalid configuration stops it before it serves anything
+(a key made up at startup would leave every stored template unreadable).
+Importing this module never fails, so offline tools can load it.
+
+encrypt_many() / decrypt_many() split large batches (gallery loads, batch
+verification) across ENCRYPTION_WORKERS threads.
+"""
+
 import base64
+import binascii
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from app.core.config import settings
+
+
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = struct.Struct(">BH")
+NONCE_BYTES = 12
+TAG_BYTES = 16
+KEY_BYTES = 32
+DERIVED_KEY_ID = 0
+DERIVED_KEY_INFO = b"fingerprint-template-envelope-v1"
+FERNET_PREFIX = b"gAAAAA"
+
+# Blobs per thread-pool task in encrypt_many / decrypt_many
+BATCH_CHUNK_SIZE = 256
+
+_executor: Optional[ThreadPoolExecutor] = None
+_keys: Optional[Tuple[Fernet, Dict[int, AESGCM]]] = None
+_keys_lock = threading.Lock()
+
 
-# Generate a proper Fernet key if the provided one is invalid
-def get_fernet_instance():
+class KeyConfigurationError(RuntimeError):
+    """Raised when FERNET_KEY / ENCRYPTION_KEYS cannot be used (see load_keys)."""
+
+
+class DecryptionError(ValueError):
+    """Raised when a blob is not a readable envelope or Fernet token."""
+
+
+# ============================================================
+# Keys
+# ============================================================
+
+def _fernet_key() -> Fernet:
+    if not settings.FERNET_KEY:
+        raise KeyConfigurationError(
+            "FERNET_KEY is not set. Generate one with "
+            "python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
+        )
     try:
         return Fernet(settings.FERNET_KEY.encode())
-    except (ValueError, TypeError):
-        # If the key is invalid, generate a new one
-        # This is for development purposes only
-        new_key = Fernet.generate_key()
-        return Fernet(new_key)
+    except (ValueError, TypeError, binascii.Error):
+        raise KeyConfigurationError(
+            "FERNET_KEY is not a valid Fernet key (32 url-safe base64-encoded bytes). "
+            "Stored templates can only be read with the key they were written with; generate a new key with "
+            "python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
+        ) from None
+
+
+def _derived_key() -> bytes:
+    secret = base64.urlsafe_b64decode(settings.FERNET_KEY.encode())
+    return HKDF(algorithm=hashes.SHA256(), length=KEY_BYTES, salt=None, info=DERIVED_KEY_INFO).derive(secret)
+
+
+def _configured_keys() -> Dict[int, bytes]:
+    keys = {}
+    for entry in settings.ENCRYPTION_KEYS.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        label, _, encoded = entry.partition(":")
+        try:
+            key_id = int(label)
+            key = base64.urlsafe_b64decode(encoded.strip().encode())
+        except (ValueError, binascii.Error):
+            raise KeyConfigurationError(f"ENCRYPTION_KEYS entry {label!r} is not id:base64-key") from None
+        if not 1 <= key_id <= 0xFFFF:
+            raise KeyConfigurationError(f"ENCRYPTION_KEYS id {key_id} is outside 1-65535 (0 is FERNET_KEY's)")
+        if len(key) != KEY_BYTES:
+            raise KeyConfigurationError(f"ENCRYPTION_KEYS key {key_id} is {len(key)} bytes, not {KEY_BYTES}")
+        if key_id in keys:
+            raise KeyConfigurationError(f"ENCRYPTION_KEYS lists key {key_id} twice")
+        keys[key_id] = key
+    return keys
+
+
+def load_keys() -> Tuple[Fernet, Dict[int, AESGCM]]:
+    """
+    Build the Fernet key and the envelope ciphers from settings (once).
+
+    Returns:
+        tuple: (Fernet for legacy tokens, {key id: AESGCM})
+
+    Raises:
+        KeyConfigurationError: If FERNET_KEY, ENCRYPTION_KEYS or
+            ENCRYPTION_KEY_ID cannot be used
+    """
+    global _keys
+    with _keys_lock:
+        if _keys is None:
+            fernet = _fernet_key()
+            ciphers = {
+                key_id: AESGCM(key)
+                for key_id, key in {DERIVED_KEY_ID: _derived_key(), **_configured_keys()}.items()
+            }
+            if settings.ENCRYPTION_KEY_ID not in ciphers:
+                raise KeyConfigurationError(
+                    f"ENCRYPTION_KEY_ID {settings.ENCRYPTION_KEY_ID} is not in ENCRYPTION_KEYS"
+                )
+            _keys = fernet, ciphers
+        return _keys
 
-fernet = get_fernet_instance()
 
-def encrypt_bytes(data: bytes) -> bytes:
-    return fernet.encrypt(data)
+active_key_id = settings.ENCRYPTION_KEY_ID
+
+
+def key_ids() -> List[int]:
+    """Ids of every configured key (the active one included)."""
+    return sorted(load_keys()[1])
+
+
+def token_key_id(token: bytes) -> Optional[int]:
+    """Key id of an envelope; None for a legacy Fernet token."""
+    token = bytes(token)
+    if token[:1] == bytes([ENVELOPE_VERSION]) and len(token) >= ENVELOPE_HEADER.size:
+        return ENVELOPE_HEADER.unpack_from(token)[1]
+    return None
+
+
+# ============================================================
+# Single blobs
+# ============================================================
+
+def encrypt_bytes(data: bytes, key_id: int = None) -> bytes:
+    """Encrypt a blob into an envelope under the active key (or key_id)."""
+    key_id = active_key_id if key_id is None else key_id
+    header = ENVELOPE_HEADER.pack(ENVELOPE_VERSION, key_id)
+    nonce = os.urandom(NONCE_BYTES)
+    return header + nonce + load_keys()[1][key_id].encrypt(nonce, bytes(data), header)
+
 
 def decrypt_bytes(token: bytes) -> bytes:
-    return fernet.decrypt(token)
+    """
+    Decrypt an envelope or a legacy Fernet token.
+
+    Raises:
+        DecryptionError: If the blob is corrupt, or was written with a key
+            that is not configured
+    """
+    fernet, ciphers = load_keys()
+    token = bytes(token)
+    if token[:len(FERNET_PREFIX)] == FERNET_PREFIX:
+        try:
+            return fernet.decrypt(token)
+        except InvalidToken:
+            raise DecryptionError("Fernet token does not decrypt with FERNET_KEY") from None
+
+    header_end = ENVELOPE_HEADER.size + NONCE_BYTES
+    if len(token) < header_end + TAG_BYTES or token[0] != ENVELOPE_VERSION:
+        raise DecryptionError("Not an encrypted envelope")
+    _, key_id = ENVELOPE_HEADER.unpack_from(token)
+    cipher = ciphers.get(key_id)
+    if cipher is None:
+        raise DecryptionError(f"Envelope key {key_id} is not configured")
+    try:
+        return cipher.decrypt(token[ENVELOPE_HEADER.size:header_end], token[header_end:], token[:ENVELOPE_HEADER.size])
+    except InvalidTag:
+        raise DecryptionError(f"Envelope does not authenticate with key {key_id}") from None
+
+
+# ============================================================
+# Batches
+# ============================================================
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.ENCRYPTION_WORKERS or os.cpu_count() or 1,
+                                       thread_name_prefix="crypto")
+    return _executor
+
+
+def _run_chunked(function, blobs: Sequence) -> list:
+    blobs = list(blobs)
+    if len(blobs) <= BATCH_CHUNK_SIZE or settings.ENCRYPTION_WORKERS == 1:
+        return function(blobs)
+    chunks = [blobs[start:start + BATCH_CHUNK_SIZE] for start in range(0, len(blobs), BATCH_CHUNK_SIZE)]
+    return [result for chunk in _pool().map(function, chunks) for result in chunk]
+
+
+def _encrypt_chunk(blobs: List[bytes]) -> List[bytes]:
+    return [encrypt_bytes(blob) for blob in blobs]
+
+
+def _decrypt_chunk(tokens: List[Optional[bytes]]) -> List[Optional[bytes]]:
+    decrypted = []
+    for token in tokens:
+        try:
+            decrypted.append(decrypt_bytes(token) if token is not None else None)
+        except DecryptionError:
+            decrypted.append(None)
+    return decrypted
+
+
+def encrypt_many(blobs: Sequence[bytes]) -> List[bytes]:
+    """encrypt_bytes() for many blobs, in order (blocking; call off the event loop)."""
+    return _run_chunked(_encrypt_chunk, blobs)
+
+
+def decrypt_many(tokens: Sequence[Optional[bytes]]) -> List[Optional[bytes]]:
+    """
+    decrypt_bytes() for many blobs, in order (blocking; call off the event loop).
+
+    Returns:
+        list: Plaintexts; None where the token was None or could not be decrypted
+    """
+    return _run_chunked(_decrypt_chunk, tokens)
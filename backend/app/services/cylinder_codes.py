@@ -0,0 +1,186 @@
+"""
+Binary Cylinder Codes
+---------------------
+Fixed-length binary descriptors derived from a NumPy minutiae template,
+after Minutia Cylinder-Code (MCC): every described minutia gets a bit
+vector recording which neighbouring minutiae lie where around it, and at
+which relative direction. Positions are taken in the minutia's own frame
+(rotated to its direction), so the bits don't change when the finger is
+rotated or shifted on the sensor.
+
+Layout:
+    A cylinder is NS x NS spatial cells (2 * RADIUS pixels across) times
+    ND direction sections = 256 bits, packed into WORDS uint64 words.
+    A template's codes are CYLINDERS cylinders (best-quality minutiae with
+    at least MIN_NEIGHBOURS neighbours first), zero-padded:
+    (CYLINDERS x WORDS) uint64, 512 bytes per enrollment.
+
+Matching (bulk, no alignment):
+    distance(a, b) = popcount(a ^ b) / (popcount(a) + popcount(b))
+    For each probe cylinder keep its closest enrolled cylinder, then
+    similarity = 1 - mean of the TOP_CYLINDERS smallest distances.
+    Computed for many enrollments at once with XOR + np.bitwise_count over
+    packed uint64 arrays, one word at a time.
+
+Codes are stored encrypted in enrollments.cylinders_encrypted next to the
+template (serialized with a short header, like templates).
+"""
+
+import struct
+from typing import Optional
+import numpy as np
+from app.services.minutiae import decode_template, is_minutiae_template
+
+
+CODES_MAGIC = b"NPCC"
+CODES_VERSION = 1
+CODES_HEADER = struct.Struct("<4sBBB")
+
+RADIUS = 70.0                  # cylinder radius in pixels (~3.5 mm at 500 dpi)
+NS = 8                         # spatial cells across the cylinder
+ND = 4                         # direction sections
+CELL = 2 * RADIUS / NS
+CELL_REACH = 0.93              # cells within this many cell widths of a neighbour light up
+BITS = NS * NS * ND
+WORDS = BITS // 64
+CYLINDERS = 16                 # cylinders kept per template
+MIN_NEIGHBOURS = 2             # emptier cylinders describe nothing
+TOP_CYLINDERS = 8              # best probe cylinders averaged into the similarity
+CHUNK_ROWS = 1024
+
+# Cell centres in the cylinder frame, and the cells inside the circle
+_CELL_CENTRES = (np.arange(NS) + 0.5) * CELL - RADIUS
+_CELL_X, _CELL_Y = np.meshgrid(_CELL_CENTRES, _CELL_CENTRES, indexing="xy")
+_CELL_INSIDE = (_CELL_X ** 2 + _CELL_Y ** 2) <= RADIUS ** 2
+
+
+def cylinder_codes(minutiae: np.ndarray) -> np.ndarray:
+    """
+    Build the cylinder codes for a minutiae set.
+
+    Args:
+        minutiae: MINUTIA_DTYPE records, best quality first
+
+    Returns:
+        np.ndarray: (CYLINDERS x WORDS) uint64, unused cylinders zero
+    """
+    codes = np.zeros((CYLINDERS, WORDS), dtype=np.uint64)
+    if len(minutiae) <= MIN_NEIGHBOURS:
+        return codes
+
+    x = minutiae["x"].astype(np.float32)
+    y = minutiae["y"].astype(np.float32)
+    theta = minutiae["angle"].astype(np.float32) * np.float32(2 * np.pi / 256)
+
+    # Neighbour offsets in every minutia's own frame, indexed [centre, neighbour]
+    dx, dy = x[None, :] - x[:, None], y[None, :] - y[:, None]
+    cos, sin = np.cos(theta)[:, None], np.sin(theta)[:, None]
+    local_x, local_y = cos * dx + sin * dy, cos * dy - sin * dx
+    near = dx ** 2 + dy ** 2 <= (RADIUS + CELL_REACH * CELL) ** 2
+    np.fill_diagonal(near, False)
+
+    centres = np.flatnonzero(near.sum(axis=1) >= MIN_NEIGHBOURS)[:CYLINDERS]
+    if len(centres) == 0:
+        return codes
+    near = near[centres]
+    local_x, local_y = local_x[centres], local_y[centres]
+    centre, neighbour = np.nonzero(near)
+
+    # Spatial cells lit by each (centre, neighbour) pair
+    distance2 = (local_x[centre, neighbour][:, None, None] - _CELL_X) ** 2 \
+        + (local_y[centre, neighbour][:, None, None] - _CELL_Y) ** 2
+    lit = (distance2 <= (CELL_REACH * CELL) ** 2) & _CELL_INSIDE
+    pair, cell = np.nonzero(lit.reshape(len(centre), -1))
+
+    # Direction section of the neighbour relative to the centre; neighbours
+    # near a section boundary light the adjacent section too
+    relative = (theta[neighbour] - theta[centres][centre]) % np.float32(2 * np.pi)
+    position = relative * np.float32(ND / (2 * np.pi))
+    section = np.floor(position).astype(np.int64) % ND
+    fraction = position - np.floor(position)
+    adjacent = np.where(fraction < 0.5, section - 1, section + 1) % ND
+    boundary = np.abs(fraction - 0.5) > 0.25
+
+    bits = np.zeros(len(centres) * BITS, dtype=bool)
+    bits[(centre[pair] * ND + section[pair]) * NS * NS + cell] = True
+    spill = boundary[pair]
+    bits[(centre[pair][spill] * ND + adjacent[pair][spill]) * NS * NS + cell[spill]] = True
+
+    packed = np.packbits(bits.reshape(len(centres), BITS), axis=1, bitorder="little")
+    codes[:len(centres)] = packed.view("<u8")
+    return codes
+
+
+def cylinder_bits(codes: np.ndarray) -> np.ndarray:
+    """Set bits per cylinder: (... x CYLINDERS) uint16."""
+    return np.bitwise_count(codes).sum(axis=-1, dtype=np.uint16)
+
+
+def cylinder_similarity(probe_codes: np.ndarray, codes: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    """
+    Similarity of a probe's codes to many enrollments' codes.
+
+    Args:
+        probe_codes: (CYLINDERS x WORDS) uint64 from the live capture
+        codes: (rows x CYLINDERS x WORDS) uint64
+        bits: (rows x CYLINDERS) set bits per enrolled cylinder
+
+    Returns:
+        np.ndarray: float32 similarity per row (0-1, higher is closer)
+    """
+    probe_bits = cylinder_bits(probe_codes)
+    # Empty probe cylinders would match empty enrolled cylinders perfectly
+    described = probe_bits > 0
+    probe_codes, probe_bits = probe_codes[described], probe_bits[described].astype(np.float32)
+    rows, count = len(codes), len(probe_codes)
+    similarity = np.zeros(rows, dtype=np.float32)
+    if count == 0:
+        return similarity
+    top = min(TOP_CYLINDERS, count)
+
+    for start in range(0, rows, CHUNK_ROWS):
+        stop = min(rows, start + CHUNK_ROWS)
+        # XOR + popcount one word at a time: (chunk x probe x enrolled) distances
+        differing = np.zeros((stop - start, count, CYLINDERS), dtype=np.uint16)
+        for word in range(WORDS):
+            differing += np.bitwise_count(probe_codes[None, :, None, word] ^ codes[start:stop, None, :, word])
+        total = probe_bits[None, :, None] + bits[start:stop, None, :]
+        distance = np.divide(differing, total, dtype=np.float32)
+        closest = distance.min(axis=2)
+        best = np.partition(closest, top - 1, axis=1)[:, :top]
+        similarity[start:stop] = 1 - best.mean(axis=1)
+    return similarity
+
+
+def encode_cylinder_codes(codes: np.ndarray) -> bytes:
+    """Serialize codes for storage."""
+    return CODES_HEADER.pack(CODES_MAGIC, CODES_VERSION, CYLINDERS, WORDS) + codes.astype("<u8").tobytes()
+
+
+def decode_cylinder_codes(blob: bytes) -> np.ndarray:
+    """
+    Parse stored codes.
+
+    Raises:
+        ValueError: If the blob is not a cylinder code blob of this layout
+    """
+    blob = bytes(blob)
+    if len(blob) < CODES_HEADER.size:
+        raise ValueError("Cylinder code blob is truncated")
+    magic, version, cylinders, words = CODES_HEADER.unpack_from(blob)
+    if magic != CODES_MAGIC or version != CODES_VERSION:
+        raise ValueError("Not a cylinder code blob")
+    if (cylinders, words) != (CYLINDERS, WORDS):
+        raise ValueError(f"Cylinder code layout {cylinders}x{words} does not match {CYLINDERS}x{WORDS}")
+    body = blob[CODES_HEADER.size:]
+    if len(body) != CYLINDERS * WORDS * 8:
+        raise ValueError("Cylinder code blob is truncated")
+    return np.frombuffer(body, dtype="<u8").astype(np.uint64).reshape(CYLINDERS, WORDS)
+
+
+def template_cylinder_codes(template) -> Optional[bytes]:
+    """Serialized codes for a NumPy minutiae template; None for SDK templates."""
+    if not is_minutiae_template(template):
+        return None
+    minutiae, _, _ = decode_template(template)
+    return encode_cylinder_codes(cylinder_codes(minutiae))
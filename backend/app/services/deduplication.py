@@ -0,0 +1,300 @@
+"""
+Duplicate Enrollment Detection
+------------------------------
+identity_number is the only uniqueness check on enrollments, so the same
+finger can be enrolled under two CNICs. This service searches enrolled
+templates against the identification gallery and records pairs that match
+in the duplicate_candidates table for admins to review.
+
+Process Flow:
+1. Enrollment check: ws_scan schedules check_enrollment() right after the
+   encrypted template is saved; it runs as a background task, so the
+   capture_success event is not delayed
+2. Bulk scan (admin-triggered): every enrolled finger is read in
+   keyset-paginated batches, decrypted off the event loop and searched
+   with up to DEDUP_BULK_CONCURRENCY searches in flight
+3. Matches scoring at least DEDUP_THRESHOLD (excluding the enrollment
+   itself) are inserted; a pair already recorded from either side, or
+   already reviewed, is left as it is
+
+Only NumPy minutiae templates can be checked (the gallery holds no SDK
+templates), and checks are skipped until the gallery has loaded.
+"""
+
+import asyncio
+import time
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.crypto import decrypt_many
+from app.services.gallery import Candidate
+from app.services.gallery_shards import GalleryShardError
+from app.services.identification import gallery_ready, search_gallery
+from app.services.minutiae import TemplateFormatError, decode_template, is_minutiae_template
+from app.utils.logger import logger
+
+
+REVIEW_STATUSES = ("confirmed", "dismissed")
+
+# Enrollment checks in flight (kept referenced until they finish)
+_enrollment_checks: Set[asyncio.Task] = set()
+_bulk_task: Optional[asyncio.Task] = None
+_bulk_progress = {
+    "running": False,
+    "processed": 0,
+    "total": 0,
+    "flagged": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+
+
+class DeduplicationError(Exception):
+    """Raised when a duplicate scan cannot start or a review is invalid."""
+
+    def __init__(self, message: str, status_code: int = 409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ============================================================
+# Searching and recording
+# ============================================================
+
+async def _record(identity_number: str, candidates: List[Candidate], source: str) -> int:
+    """Insert matches above the threshold; returns how many were new."""
+    rows = [
+        {
+            "identity_number": identity_number,
+            "matched_identity_number": c.identity_number,
+            "score": c.score,
+            "source": source,
+        }
+        for c in candidates
+        if c.identity_number != identity_number and c.score >= settings.DEDUP_THRESHOLD
+    ]
+    flagged = 0
+    for row in rows:
+        query = (
+            insert(models.duplicate_candidates)
+            .values(**row)
+            .on_conflict_do_nothing()
+            .returning(models.duplicate_candidates.c.id)
+        )
+        if await database.fetch_one(query):
+            flagged += 1
+            logger.warning("Possible duplicate enrollment: {} matches {} (score {})",
+                           identity_number, row["matched_identity_number"], row["score"])
+    return flagged
+
+
+async def _check(identity_number: str, minutiae, source: str) -> int:
+    # One extra candidate: the enrollment usually finds itself first
+    candidates = await search_gallery(minutiae, settings.DEDUP_TOP_K + 1)
+    return await _record(identity_number, candidates, source)
+
+
+async def check_enrollment(identity_number: str, template) -> int:
+    """
+    Search a newly saved template against the gallery and record duplicates.
+
+    Returns:
+        int: Newly recorded duplicate pairs
+    """
+    if not is_minutiae_template(template):
+        return 0
+    if not gallery_ready():
+        logger.info("Skipping duplicate check for {}: gallery still loading", identity_number)
+        return 0
+    try:
+        minutiae, _, _ = decode_template(template)
+    except TemplateFormatError as e:
+        logger.warning("Skipping duplicate check for {}: unreadable template ({})", identity_number, e)
+        return 0
+    try:
+        return await _check(identity_number, minutiae, "enrollment")
+    except GalleryShardError as e:
+        logger.error("Duplicate check for {} failed: {}", identity_number, e)
+        return 0
+
+
+def schedule_enrollment_check(identity_number: str, template):
+    """Run check_enrollment in the background (the caller does not wait)."""
+    if not settings.DEDUP_ENABLED or not settings.IDENTIFICATION_ENABLED:
+        return
+
+    async def run():
+        try:
+            await check_enrollment(identity_number, template)
+        except Exception as e:
+            logger.exception("Duplicate check for {} failed: {}", identity_number, e)
+
+    task = asyncio.create_task(run())
+    _enrollment_checks.add(task)
+    task.add_done_callback(_enrollment_checks.discard)
+
+
+# ============================================================
+# Bulk scan
+# ============================================================
+
+def _decode_batch(rows) -> List[Tuple[str, object]]:
+    """Decrypt and decode a batch of enrollments; SDK and unreadable templates are skipped."""
+    probes = []
+    for rec, template in zip(rows, decrypt_many([rec["template_encrypted"] for rec in rows])):
+        if template is None:
+            logger.warning("Skipping unreadable template for {}", rec["identity_number"])
+            continue
+        if not is_minutiae_template(template):
+            continue
+        try:
+            probes.append((rec["identity_number"], decode_template(template)[0]))
+        except TemplateFormatError as e:
+            logger.warning("Skipping malformed template for {}: {}", rec["identity_number"], e)
+    return probes
+
+
+async def _bulk_scan(batch_size: int, concurrency: int):
+    table = models.enrollments
+    _bulk_progress["total"] = await database.fetch_val(select(func.count()).select_from(table))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_one(identity_number: str, minutiae) -> int:
+        async with semaphore:
+            return await _check(identity_number, minutiae, "bulk")
+
+    last_id = 0
+    while True:
+        query = (
+            select(table.c.id, table.c.identity_number, table.c.template_encrypted)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        rows = await database.fetch_all(query)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        probes = await asyncio.to_thread(_decode_batch, rows)
+        flagged = await asyncio.gather(*(check_one(identity, minutiae) for identity, minutiae in probes))
+        _bulk_progress["processed"] += len(rows)
+        _bulk_progress["flagged"] += sum(flagged)
+
+
+async def _run_bulk_scan(batch_size: int, concurrency: int):
+    started = time.monotonic()
+    try:
+        await _bulk_scan(batch_size, concurrency)
+        logger.info("Duplicate scan finished: {} enrollments checked, {} new pair(s) in {:.1f}s",
+                    _bulk_progress["processed"], _bulk_progress["flagged"], time.monotonic() - started)
+    except asyncio.CancelledError:
+        _bulk_progress["error"] = "cancelled"
+        raise
+    except Exception as e:
+        logger.exception("Duplicate scan failed: {}", e)
+        _bulk_progress["error"] = str(e)
+    finally:
+        _bulk_progress["running"] = False
+        _bulk_progress["finished_at"] = time.time()
+
+
+def start_bulk_scan(batch_size: int = None, concurrency: int = None) -> dict:
+    """
+    Start deduplicating every existing enrollment in the background.
+
+    Raises:
+        DeduplicationError: If a scan is already running (409) or the
+            gallery has not loaded yet (503)
+    """
+    global _bulk_task
+    if not settings.IDENTIFICATION_ENABLED:
+        raise DeduplicationError("Identification is disabled on this server.", status_code=503)
+    if not gallery_ready():
+        raise DeduplicationError("Identification is starting up, please retry shortly.", status_code=503)
+    if _bulk_task is not None and not _bulk_task.done():
+        raise DeduplicationError("A duplicate scan is already running.")
+
+    _bulk_progress.update(running=True, processed=0, total=0, flagged=0,
+                          started_at=time.time(), finished_at=None, error=None)
+    _bulk_task = asyncio.create_task(_run_bulk_scan(
+        batch_size or settings.DEDUP_BULK_BATCH_SIZE,
+        concurrency or settings.DEDUP_BULK_CONCURRENCY,
+    ))
+    logger.info("Duplicate scan started")
+    return bulk_scan_status()
+
+
+def bulk_scan_status() -> dict:
+    """Progress of the current (or last) bulk scan."""
+    return dict(_bulk_progress)
+
+
+async def stop_deduplication():
+    """Cancel the bulk scan and any enrollment checks still running."""
+    tasks = list(_enrollment_checks)
+    if _bulk_task is not None and not _bulk_task.done():
+        tasks.append(_bulk_task)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ============================================================
+# Review
+# ============================================================
+
+async def list_duplicates(status: Optional[str], limit: int, offset: int) -> Tuple[int, list]:
+    """Recorded pairs with both names, newest first."""
+    pairs = models.duplicate_candidates
+    enrolled = models.applications.alias("enrolled")
+    matched = models.applications.alias("matched")
+
+    where = [pairs.c.status == status] if status else []
+    total = await database.fetch_val(select(func.count()).select_from(pairs).where(*where))
+    query = (
+        select(
+            pairs,
+            enrolled.c.full_name.label("full_name"),
+            matched.c.full_name.label("matched_full_name"),
+        )
+        .select_from(
+            pairs
+            .outerjoin(enrolled, enrolled.c.identity_number == pairs.c.identity_number)
+            .outerjoin(matched, matched.c.identity_number == pairs.c.matched_identity_number)
+        )
+        .where(*where)
+        .order_by(pairs.c.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return total, await database.fetch_all(query)
+
+
+async def review_duplicate(pair_id: int, status: str, admin: str):
+    """
+    Mark a pair confirmed or dismissed.
+
+    Returns:
+        The updated row, or None if there is no such pair
+
+    Raises:
+        DeduplicationError: If the status is not a review status (422)
+    """
+    if status not in REVIEW_STATUSES:
+        raise DeduplicationError(f"Status must be one of {', '.join(REVIEW_STATUSES)}.", status_code=422)
+    pairs = models.duplicate_candidates
+    query = (
+        pairs.update()
+        .where(pairs.c.id == pair_id)
+        .values(status=status, reviewed_by=admin, reviewed_at=func.now())
+        .returning(*pairs.c)
+    )
+    row = await database.fetch_one(query)
+    if row:
+        logger.info("Duplicate pair {} marked {} by {}", pair_id, status, admin)
+    return row
@@ -0,0 +1,117 @@
+"""
+Fingerprint Device Backends
+---------------------------
+Common interface shared by every fingerprint reader implementation.
+
+ScanSession only talks to this interface, so the capture workflow can run
+against real SecuGen hardware (Windows SDK) or against the simulated reader
+used on Linux build and load-test machines.
+
+Available backends (selected with the DEVICE_BACKEND setting):
+- "secugen":   SecuGenDevice, drives the SecuGen SDK through ctypes
+- "simulated": SimulatedDevice, replays recorded captures from disk
+"""
+
+from typing import Optional, Dict, Any, List, Tuple
+from app.core.config import settings
+
+
+class FingerprintDevice:
+    """
+    Base interface for fingerprint reader backends.
+
+    Every method is blocking and is expected to be called from an executor
+    thread, exactly like the underlying SDK calls.
+    """
+
+    # Quality threshold used by the SDK for GetImageEx captures
+    DEFAULT_QUALITY_THRESHOLD = 30
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.max_template_size = 0
+
+    # Device lifecycle
+    def create(self):
+        raise NotImplementedError
+
+    def init(self, device_name: int = None):
+        raise NotImplementedError
+
+    def open(self, device_id: int = 0):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def terminate(self):
+        raise NotImplementedError
+
+    def is_alive(self) -> bool:
+        """Cheap probe used by the device pool to detect dead handles."""
+        raise NotImplementedError
+
+    def enumerate_devices(self, max_devices: int = 10) -> List[int]:
+        """Return the IDs of attached readers (requires create() and init())."""
+        raise NotImplementedError
+
+    # Information & configuration
+    def get_device_info(self) -> Dict[str, Any]:
+        return {
+            'width': self.width,
+            'height': self.height,
+        }
+
+    def set_brightness(self, brightness: int):
+        raise NotImplementedError
+
+    def set_template_format(self, format_type: int = None):
+        raise NotImplementedError
+
+    # LED control (patterns are scheduled by app.services.led_signals)
+    def set_led(self, on: bool):
+        raise NotImplementedError
+
+    # Capture & extraction
+    def is_finger_present(self, probe_ms: int = 150, presence_quality: int = 10) -> bool:
+        """Short, bounded probe for a finger on the sensor (used by polling capture)."""
+        raise NotImplementedError
+
+    def capture_image_ex(self, timeout_ms: int = 10000, quality_threshold: int = 30,
+                         slot: int = 0) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def get_image_quality(self, img_buffer: bytes, width: int, height: int) -> int:
+        raise NotImplementedError
+
+    def create_template(self, img_buffer: bytes, quality: int = 50) -> Optional[bytes]:
+        raise NotImplementedError
+
+    # Matching (SDK templates; NumPy templates use app.services.matcher)
+    def match_template(self, template1: bytes, template2: bytes,
+                       security_level: int = 5) -> Tuple[bool, int]:
+        """Compare two templates, returning (matched, SDK score 0-199)."""
+        raise NotImplementedError
+
+
+def create_device(backend: str = None) -> FingerprintDevice:
+    """
+    Instantiate the configured fingerprint device backend.
+
+    Args:
+        backend: Backend name (default: settings.DEVICE_BACKEND)
+
+    Returns:
+        FingerprintDevice: Unconnected device wrapper
+    """
+    backend = (backend or settings.DEVICE_BACKEND).lower()
+
+    if backend == "secugen":
+        from app.services.secu_gen import SecuGenDevice
+        return SecuGenDevice()
+    if backend == "simulated":
+        from app.services.simulated_device import SimulatedDevice
+        return SimulatedDevice()
+
+    raise ValueError(f"Unknown fingerprint device backend: {backend}")
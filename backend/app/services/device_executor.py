@@ -0,0 +1,231 @@
+"""
+Per-Device Executor
+-------------------
+Each physical fingerprint reader owns one pinned worker thread that serves
+an ordered command queue. Every blocking SDK call for that reader goes
+through it, so:
+
+- calls for one handle always run on the same thread, in submission order
+- SDK work never competes with other blocking tasks in the default executor
+- queue depth and wait/run times are visible per reader
+
+Commands can be cancelled while queued and can carry a deadline; a command
+whose deadline passes before it starts is dropped without touching the SDK.
+A command that is already running cannot be interrupted (the SDK call
+blocks), so its caller stops waiting but the thread finishes the call.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+from app.utils.logger import logger
+
+
+class DeviceCommandTimeout(TimeoutError):
+    """Raised when a device command misses its deadline."""
+    pass
+
+
+class _Command:
+    """A queued blocking call and the future awaiting its result."""
+
+    __slots__ = ("fn", "args", "kwargs", "future", "loop", "deadline",
+                 "enqueued_at", "cancelled")
+
+    def __init__(self, fn, args, kwargs, future, loop, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.loop = loop
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+
+class DeviceExecutor:
+    """
+    Single worker thread serving an ordered async command queue for one reader.
+    """
+
+    _STOP = object()
+
+    def __init__(self, name: str):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._running_since: Optional[float] = None
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    # ============================================================
+    # Lifecycle
+    # ============================================================
+
+    def start(self):
+        """Start the worker thread (idempotent)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._worker, name=f"device-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Ask the worker thread to exit once the queued commands are drained."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                self._queue.put(self._STOP)
+            self._thread = None
+
+    # ============================================================
+    # Submission
+    # ============================================================
+
+    async def call(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """
+        Run a blocking call on the reader's worker thread.
+
+        Args:
+            fn: Blocking callable (usually a device method)
+            *args: Positional arguments for fn
+            timeout: Seconds from submission until the command's deadline
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The callable's return value
+
+        Raises:
+            DeviceCommandTimeout: If the deadline passes before the result arrives
+            asyncio.CancelledError: If the awaiting task is cancelled
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        command = _Command(fn, args, kwargs, future, loop, deadline)
+
+        self.submitted += 1
+        self._queue.put(command)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+        try:
+            if timeout is None:
+                return await future
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            command.cancelled = True
+            raise DeviceCommandTimeout(
+                f"Device command {getattr(fn, '__name__', fn)} missed its {timeout}s deadline"
+            )
+        except asyncio.CancelledError:
+            # Skipped by the worker if it has not started yet
+            command.cancelled = True
+            raise
+
+    def post(self, fn: Callable, *args, **kwargs):
+        """
+        Queue a short blocking call without waiting for its result
+        (e.g. LED updates). Errors are logged by the worker thread.
+        """
+        self.start()
+        self.submitted += 1
+        self._queue.put(_Command(fn, args, kwargs, None, None, None))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    # ============================================================
+    # Worker thread
+    # ============================================================
+
+    def _worker(self):
+        while True:
+            command = self._queue.get()
+            if command is self._STOP:
+                return
+
+            started = time.monotonic()
+            if command.cancelled:
+                self.cancelled += 1
+                continue
+            if command.deadline is not None and started > command.deadline:
+                self.expired += 1
+                self._resolve(command, exception=DeviceCommandTimeout(
+                    f"Device command {getattr(command.fn, '__name__', command.fn)} expired in queue"
+                ))
+                continue
+
+            self._total_wait += started - command.enqueued_at
+            self._running_since = started
+            try:
+                result = command.fn(*command.args, **command.kwargs)
+            except BaseException as e:
+                self.failed += 1
+                self._resolve(command, exception=e)
+            else:
+                self.completed += 1
+                self._resolve(command, result=result)
+            finally:
+                self._running_since = None
+                self._total_run += time.monotonic() - started
+
+    @staticmethod
+    def _resolve(command: _Command, result: Any = None, exception: BaseException = None):
+        """Complete the awaiting future on its own event loop."""
+        if command.future is None:
+            # Posted without a waiter
+            if exception is not None:
+                logger.warning("Device command {} failed: {}",
+                               getattr(command.fn, '__name__', command.fn), exception)
+            return
+
+        def _set():
+            if command.future.done():
+                return
+            if exception is not None:
+                command.future.set_exception(exception)
+            else:
+                command.future.set_result(result)
+
+        try:
+            command.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            logger.debug("Dropping device command result: event loop closed")
+
+    # ============================================================
+    # Metrics
+    # ============================================================
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> dict:
+        """Queue and timing metrics for health endpoints and diagnostics."""
+        started = self.completed + self.failed
+        running_since = self._running_since
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "busy": running_since is not None,
+            "current_command_ms": round((time.monotonic() - running_since) * 1000, 1) if running_since else 0.0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+            "avg_run_ms": round(self._total_run / started * 1000, 2) if started else 0.0,
+        }
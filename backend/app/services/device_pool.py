@@ -0,0 +1,387 @@
+"""
+Fingerprint Device Pool
+-----------------------
+Keeps fingerprint reader handles created, initialized, opened and configured
+for the lifetime of the process, instead of paying the SDK and USB setup
+cost (Create → Init → OpenDevice → brightness → template format) on every
+scan session.
+
+The pool also acts as the device manager for a bank of readers: every
+attached reader is enumerated at startup, each scan session is routed to
+a free reader, and sessions queue in FIFO order while all readers are busy.
+
+Process Flow:
+1. start(): enumerate readers, open and configure a handle for each
+2. acquire(): check a warm handle out for one scan session (or queue)
+3. release: settle the LED and hand the handle to the next queued session
+4. Background health check probes idle handles and reopens dead ones
+5. stop(): close and terminate every handle on shutdown
+"""
+
+import asyncio
+import contextlib
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+from app.core.config import settings
+from app.services.device_backend import FingerprintDevice, create_device
+from app.services.device_executor import DeviceExecutor
+from app.services.led_signals import LedSignaller
+from app.services.secu_gen import SecuGenError
+from app.utils.logger import logger
+
+
+class PooledDevice:
+    """A warm device handle owned by the pool."""
+
+    def __init__(self, device_id: int):
+        self.device_id = device_id
+        self.device: Optional[FingerprintDevice] = None
+        # Every SDK call for this reader runs on its own pinned thread
+        self.executor = DeviceExecutor(str(device_id))
+        self.led = LedSignaller(self.executor)
+        self.healthy = False
+        self.in_use = False
+        # Set while the handle is being torn down and reopened
+        self.reopening = False
+        self.last_used = 0.0
+        self.sessions_served = 0
+        self.reopen_count = 0
+
+
+class _Waiter:
+    """A queued scan session waiting for a free reader."""
+
+    __slots__ = ("future", "moved")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        # Resolved with the PooledDevice handed to this session
+        self.future = loop.create_future()
+        # Resolved whenever this session's queue position changes
+        self.moved = loop.create_future()
+
+
+QueuePositionCallback = Callable[[int, int], Awaitable[None]]
+
+
+class DevicePool:
+    """
+    Long-lived pool of opened and configured fingerprint reader handles.
+
+    Handles are checked out per scan session with `acquire()` and returned
+    automatically when the session finishes. Handles that fail the check-in
+    probe or the idle health check are reopened.
+    """
+
+    def __init__(self, device_ids: List[int] = None, health_check_interval: int = None):
+        if device_ids is None and settings.DEVICE_IDS.strip().lower() != "auto":
+            device_ids = [int(x) for x in settings.DEVICE_IDS.split(",") if x.strip()]
+        # None means "enumerate attached readers on start()"
+        self._device_ids = device_ids
+        self.health_check_interval = health_check_interval or settings.DEVICE_HEALTH_CHECK_INTERVAL
+        self._slots: List[PooledDevice] = []
+        self._idle = deque()
+        self._waiters = deque()
+        self._health_task = None
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    # ============================================================
+    # Lifecycle
+    # ============================================================
+
+    async def start(self):
+        """Open and configure every reader handle and start health checks."""
+        async with self._start_lock:
+            if self._started:
+                return
+
+            device_ids = self._device_ids
+            if device_ids is None:
+                device_ids = await self._enumerate_readers()
+            self._slots = [PooledDevice(device_id) for device_id in device_ids]
+
+            for slot in self._slots:
+                await self._open_slot(slot)
+
+            self._started = True
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info("Device pool started: {}/{} reader(s) ready",
+                        len(self._idle), len(self._slots))
+
+    async def stop(self):
+        """Stop health checks and release every reader handle."""
+        if self._health_task:
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+
+        for slot in self._slots:
+            await self._close_slot(slot)
+            slot.executor.stop()
+        self._idle.clear()
+        self._started = False
+        logger.info("Device pool stopped")
+
+    async def _enumerate_readers(self) -> List[int]:
+        """Probe for attached readers once, on a temporary executor thread."""
+        executor = DeviceExecutor("enumerate")
+        device = None
+        try:
+            device = create_device()
+            await executor.call(device.create)
+            await executor.call(device.init)
+            device_ids = await executor.call(device.enumerate_devices, settings.DEVICE_MAX_READERS)
+        except Exception as e:
+            logger.warning("Reader enumeration failed, falling back to reader 0: {}", e)
+            device_ids = []
+        finally:
+            if device is not None:
+                with contextlib.suppress(Exception):
+                    await executor.call(device.terminate)
+            executor.stop()
+
+        logger.info("Enumerated {} fingerprint reader(s): {}", len(device_ids), device_ids)
+        # Keep one slot so the health check can pick up a reader plugged in later
+        return device_ids or [0]
+
+    async def _open_slot(self, slot: PooledDevice) -> bool:
+        """Create, initialize, open and configure the handle for one slot."""
+        call = slot.executor.call
+        device = None
+        try:
+            device = create_device()
+            await call(device.create)
+            await call(device.init)
+            await call(device.open, slot.device_id)
+            await self._configure(slot, device)
+        except Exception as e:
+            logger.warning("Could not open reader {}: {}", slot.device_id, e)
+            if device is not None:
+                with contextlib.suppress(Exception):
+                    await call(device.close)
+                    await call(device.terminate)
+            slot.healthy = False
+            return False
+
+        slot.device = device
+        slot.led.attach(device)
+        slot.healthy = True
+        self._make_idle(slot)
+        logger.info("Reader {} opened and configured ({}x{})",
+                    slot.device_id, device.width, device.height)
+        return True
+
+    async def _configure(self, slot: PooledDevice, device: FingerprintDevice):
+        """Apply brightness and template format once per handle."""
+        try:
+            await slot.executor.call(device.set_brightness, settings.DEVICE_BRIGHTNESS)
+        except Exception as e:
+            logger.warning("Could not set brightness (non-fatal): {}", e)
+        await slot.executor.call(device.set_template_format)
+
+    async def _close_slot(self, slot: PooledDevice):
+        """Close and terminate the handle for one slot."""
+        call = slot.executor.call
+        device, slot.device, slot.healthy = slot.device, None, False
+        with contextlib.suppress(ValueError):
+            self._idle.remove(slot)
+        if device is None:
+            return
+        # Detaching stops any pattern and queues LED-off ahead of close
+        slot.led.attach(None)
+        await call(device.close)
+        await call(device.terminate)
+
+    async def _reopen_slot(self, slot: PooledDevice) -> bool:
+        """Tear down a dead handle and open a fresh one."""
+        logger.warning("Reopening reader {}", slot.device_id)
+        await self._close_slot(slot)
+        slot.reopen_count += 1
+        return await self._open_slot(slot)
+
+    async def _reopen_claimed(self, slot: PooledDevice) -> bool:
+        """
+        Reopen a slot while keeping it busy, so neither a checkout nor the
+        health check can hand out or reopen the same reader concurrently.
+        """
+        slot.in_use = True
+        slot.reopening = True
+        try:
+            reopened = await self._reopen_slot(slot)
+        except Exception as e:
+            logger.warning("Reader {} reopen failed: {}", slot.device_id, e)
+            reopened = False
+        finally:
+            slot.reopening = False
+        if not reopened:
+            slot.in_use = False
+        return reopened
+
+    # ============================================================
+    # Checkout / check-in
+    # ============================================================
+
+    def _make_idle(self, slot: PooledDevice):
+        """Hand the slot to the oldest waiter, or park it in the idle set."""
+        slot.in_use = False
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.future.done():
+                slot.in_use = True
+                waiter.future.set_result(slot)
+                self._notify_queue_moved()
+                return
+        self._idle.append(slot)
+
+    def _notify_queue_moved(self):
+        """Wake every queued session so it can report its new position."""
+        for waiter in self._waiters:
+            if not waiter.moved.done():
+                waiter.moved.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, timeout: float = None, on_queue_position: QueuePositionCallback = None):
+        """
+        Check out a warm device handle for the duration of a scan session.
+
+        Sessions are routed to the least recently used free reader. When every
+        reader is busy the session queues (FIFO) until one is released.
+
+        Args:
+            timeout: Seconds to wait for a free reader (None waits forever)
+            on_queue_position: Awaited with (position, queue_length) when the
+                session has to queue, and again every time it moves up
+
+        Yields:
+            PooledDevice: Opened and configured device slot
+
+        Raises:
+            SecuGenError: If no reader could be opened
+            asyncio.TimeoutError: If no reader became free in time
+        """
+        if not self._started:
+            await self.start()
+
+        slot = await self._checkout(timeout, on_queue_position)
+        slot.last_used = time.monotonic()
+        try:
+            yield slot
+        finally:
+            slot.sessions_served += 1
+            slot.last_used = time.monotonic()
+            await self._checkin(slot)
+
+    async def _checkout(self, timeout: float = None,
+                        on_queue_position: QueuePositionCallback = None) -> PooledDevice:
+        if not self._idle and not any(slot.healthy or slot.reopening for slot in self._slots):
+            # Nothing open: try to bring a reader back before giving up
+            for slot in self._slots:
+                if not slot.in_use and await self._reopen_claimed(slot):
+                    break
+            else:
+                raise SecuGenError("No fingerprint reader available")
+
+        if self._idle:
+            slot = self._idle.popleft()
+            slot.in_use = True
+            return slot
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop)
+        self._waiters.append(waiter)
+        deadline = loop.time() + timeout if timeout is not None else None
+        try:
+            while not waiter.future.done():
+                if on_queue_position is not None:
+                    await on_queue_position(self._waiters.index(waiter) + 1, len(self._waiters))
+                    if waiter.future.done():
+                        break
+
+                remaining = deadline - loop.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError("Timed out waiting for a free fingerprint reader")
+                await asyncio.wait({waiter.future, waiter.moved}, timeout=remaining,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if waiter.moved.done():
+                    waiter.moved = loop.create_future()
+            return waiter.future.result()
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._notify_queue_moved()
+            if waiter.future.done() and not waiter.future.cancelled():
+                # A slot was handed over just as we gave up: give it back
+                self._make_idle(waiter.future.result())
+            raise
+
+    async def _checkin(self, slot: PooledDevice):
+        """Settle the LED, probe the handle and return it to the pool."""
+        slot.led.release()
+        try:
+            alive = await slot.executor.call(slot.device.is_alive)
+        except Exception as e:
+            logger.warning("Reader {} failed check-in probe: {}", slot.device_id, e)
+            alive = False
+
+        if alive:
+            self._make_idle(slot)
+            return
+
+        # SDK errors may leave the handle in an unknown state: reopen it.
+        # The slot stays checked out until the fresh handle is ready.
+        slot.healthy = False
+        await self._reopen_claimed(slot)
+
+    # ============================================================
+    # Health checks
+    # ============================================================
+
+    async def _health_loop(self):
+        """Periodically probe idle handles and reopen dead readers."""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in list(self._slots):
+                if slot.in_use:
+                    continue
+                if slot.healthy and slot in self._idle:
+                    # Take the slot out while probing so it isn't handed out
+                    self._idle.remove(slot)
+                    slot.in_use = True
+                    try:
+                        alive = await slot.executor.call(slot.device.is_alive)
+                    except Exception:
+                        alive = False
+                    if alive:
+                        self._make_idle(slot)
+                        continue
+                    slot.healthy = False
+                if not slot.healthy:
+                    await self._reopen_claimed(slot)
+
+    def stats(self) -> dict:
+        """Pool state for health endpoints and diagnostics."""
+        return {
+            "readers": len(self._slots),
+            "healthy": sum(1 for slot in self._slots if slot.healthy),
+            "idle": len(self._idle),
+            "in_use": sum(1 for slot in self._slots if slot.in_use),
+            "waiting": sum(1 for waiter in self._waiters if not waiter.future.done()),
+            "devices": [
+                {
+                    "device_id": slot.device_id,
+                    "healthy": slot.healthy,
+                    "in_use": slot.in_use,
+                    "reopening": slot.reopening,
+                    "sessions_served": slot.sessions_served,
+                    "reopen_count": slot.reopen_count,
+                    "executor": slot.executor.metrics(),
+                }
+                for slot in self._slots
+            ],
+        }
+
+
+# Process-wide pool shared by every scan session
+device_pool = DevicePool()
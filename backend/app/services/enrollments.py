@@ -0,0 +1,72 @@
+"""
+Enrollments
+-----------
+Stored fingerprints (models.enrollments): one encrypted template per
+captured finger of a person, with its format, size, capture quality,
+capture time and a version bumped on every re-enrollment.
+
+Process Flow:
+1. ws_scan saves a capture with save_enrollment(); re-enrolling a finger
+   replaces its template in place (same row, version + 1)
+2. Matching services (verification, identification, duplicate checks) use
+   every enrolled finger of a person: a probe matches the person if it
+   matches any of them (gallery rows are keyed per finger,
+   app.services.gallery.enrollment_key)
+3. Lists and status checks only need enrolled(): an EXISTS on the
+   (identity_number, finger_position) unique index, no template bytes
+"""
+
+from typing import Optional
+from sqlalchemy import exists, func
+from sqlalchemy.dialects.postgresql import insert
+from app.db.db import database
+from app.models import models
+from app.services.crypto import encrypt_bytes
+from app.services.template_formats import detect_format
+
+
+FINGER_UNKNOWN = 0
+FINGER_POSITIONS = range(0, 11)   # ISO/ANSI finger codes: 0 unknown, 1-10 right thumb .. left little
+FORMAT_SDK = "sdk"
+
+
+def enrolled(identity_number=None):
+    """EXISTS expression: the application (or identity) has an enrollment."""
+    table = models.enrollments
+    identity_number = models.applications.c.identity_number if identity_number is None else identity_number
+    return exists().where(table.c.identity_number == identity_number)
+
+
+async def save_enrollment(identity_number: str, template: bytes, cylinders: Optional[bytes] = None,
+                          quality: Optional[int] = None, finger_position: int = FINGER_UNKNOWN) -> int:
+    """
+    Encrypt and store a captured template (replacing the finger's previous one).
+
+    Args:
+        identity_number: CNIC of an existing application
+        template: Plaintext template
+        cylinders: Plaintext cylinder codes (None for SDK templates)
+        quality: Image quality of the captured frame (0-100)
+        finger_position: ISO/ANSI finger code (0 = unknown)
+
+    Returns:
+        int: The enrollment's version (1 for a first enrollment)
+    """
+    table = models.enrollments
+    values = {
+        "template_encrypted": encrypt_bytes(template),
+        "cylinders_encrypted": encrypt_bytes(cylinders) if cylinders else None,
+        "template_format": detect_format(template) or FORMAT_SDK,
+        "template_size": len(template),
+        "quality": quality,
+    }
+    query = (
+        insert(table)
+        .values(identity_number=identity_number, finger_position=finger_position, **values)
+        .on_conflict_do_update(
+            constraint="uq_enrollments_finger",
+            set_={**values, "version": table.c.version + 1, "captured_at": func.now()},
+        )
+        .returning(table.c.version)
+    )
+    return await database.fetch_val(query)
@@ -1,24 +1,30 @@
 import asyncio
 import secrets
-import contextlib
 from datetime import datetime, timedelta
 from app.core.config import settings
-from app.services.secu_gen import SecuGenDevice
+from app.services.device_backend import FingerprintDevice
+from app.services.device_pool import device_pool
+from app.services.image_quality import assess_image
+from app.services.matcher import MatchResult, match_templates
+from app.services.minutiae import decode_template, extract_template, is_minutiae_template
+from app.services.template_formats import normalize_template
 from app.utils.logger import logger
 
 
 class ScanSession:
     """
-    Fingerprint scan session that interacts with the SecuGen device.
+    Fingerprint scan session that interacts with the configured fingerprint
+    device backend (SecuGen hardware or the simulated reader).
     
     Process Flow:
-    1. Initialize device and open connection
-    2. Configure device settings (brightness, template format)
-    3. Blink LED to indicate readiness
-    4. Capture fingerprint IMAGE with quality checking
-    5. Verify image quality
-    6. Create TEMPLATE from captured image
-    7. Return template for storage/matching
+    1. Check out a warm device from the device pool
+    2. Device settings (brightness, template format) are applied by the pool
+    3. Signal readiness with the reader LED (async pattern, no thread held)
+    4. Capture fingerprint IMAGE with quality checking (NumPy pre-screen
+       rejects blank, smudged or partial frames before any SDK call)
+    5. Burst-capture more frames while the finger stays on the sensor,
+       scoring each one and extracting a TEMPLATE from the best so far
+    6. Return the best template for storage/matching
     
     Keeps the WebSocket alive through errors and only terminates when:
       - a valid fingerprint template is created, or
@@ -26,112 +32,120 @@ class ScanSession:
       - WebSocket manually closes.
     """
 
-    def __init__(self, identity_number: str, full_name: str, timeout_seconds: int = None):
+    def __init__(self, identity_number: str, full_name: str, timeout_seconds: int = None,
+                 template_engine: str = None):
         self.identity_number = identity_number
         self.full_name = full_name
         self.token = secrets.token_urlsafe(32)
         self.expires_at = datetime.utcnow() + timedelta(seconds=timeout_seconds or settings.SCAN_SESSION_TIMEOUT)
         self.active = True
         self.device = None
-        self._blink_task = None
+        self.executor = None
+        self.device_id = None
+        self.led = None
+        # Verification uses the engine that produced the enrolled template
+        self.template_engine = template_engine or settings.TEMPLATE_ENGINE
         self._capture_attempts = 0
         self._max_attempts = 3
+        # Image quality of the frame the last scan's template came from
+        self.quality = None
 
     async def run_scan(self, send_event_callable):
         """
         Main scan workflow:
-        1. Initialize device
+        1. Check out a free warm device from the device pool (queueing if all are busy)
         2. Capture fingerprint IMAGE
-        3. Verify image quality
-        4. Create TEMPLATE from image
-        5. Return template
+        3. Burst-capture, score and extract a TEMPLATE from the best frame
+        4. Return template
         """
-        try:
-            # Step 1: Initialize device
-            logger.info("Initializing SecuGen device for session %s", self.token)
-            self.device = SecuGenDevice()
-            
-            await asyncio.get_event_loop().run_in_executor(None, self.device.create)
-            logger.debug("Device object created")
-            
-            await asyncio.get_event_loop().run_in_executor(None, self.device.init)
-            logger.debug("Device initialized")
-            
-            await asyncio.get_event_loop().run_in_executor(None, self.device.open, 0)
-            logger.info("Device connected for session %s", self.token)
-
-            # Step 2: Configure device
-            await self._configure_device(send_event_callable)
+        return await self._with_device(send_event_callable, self._scan_with_device)
 
-            # Step 3: Get device info for image dimensions
-            device_info = await asyncio.get_event_loop().run_in_executor(
-                None, self.device.get_device_info
-            )
-            width = device_info.get('width', 300)
-            height = device_info.get('height', 400)
-            logger.info("Device image size: %dx%d", width, height)
+    async def run_verification(self, send_event_callable, enrolled_templates):
+        """
+        1:1 verification workflow: capture a probe exactly like run_scan, then
+        match it against each of the person's enrolled templates (one per
+        finger) on the same reader checkout.
 
-            # Step 4: Blink LED twice to indicate readiness
-            await asyncio.get_event_loop().run_in_executor(None, self.device.blink_led, 2, 0.3)
-            await send_event_callable({
-                "type": "device_ready",
-                "message": "Device is ready. Please place your thumb firmly on the scanner."
-            })
+        Args:
+            send_event_callable: Function to send WebSocket events
+            enrolled_templates: Decrypted enrolled templates (bytes or bytearray)
 
-            # Step 5: Capture fingerprint IMAGE with retries
-            img_buffer = await self._capture_image_with_retry(send_event_callable, width, height)
-            
-            if img_buffer is None:
-                await send_event_callable({
-                    "type": "error",
-                    "message": "Failed to capture fingerprint after multiple attempts."
-                })
+        Returns:
+            MatchResult: The best finger's decision and score, None if no
+                probe could be captured
+        """
+        async def scan_and_match(send):
+            probe = await self._scan_with_device(send)
+            if probe is None:
                 return None
+            best = None
+            for enrolled_template in enrolled_templates:
+                result = await self._match(probe, enrolled_template)
+                if best is None or (result.matched, result.score) > (best.matched, best.score):
+                    best = result
+            logger.info("Verification for {}: matched={} score={} ({}, {} finger(s))",
+                        self.identity_number, best.matched, best.score, best.engine, len(enrolled_templates))
+            return best
+
+        return await self._with_device(send_event_callable, scan_and_match)
+
+    async def run_identification(self, send_event_callable, gallery, top_k, shortlist, retrieve=None,
+                                 screen="cylinder"):
+        """
+        1:N identification workflow: capture a probe exactly like run_scan and
+        search the gallery with it. The reader is returned before the search,
+        so the next session can start capturing while this one is scored.
 
-            # Step 6: Verify image quality
-            quality_score = await self._verify_image_quality(img_buffer, width, height, send_event_callable)
-            
-            if quality_score < 40:
-                logger.warning("Image quality too low: %d", quality_score)
-                await send_event_callable({
-                    "type": "warning",
-                    "message": f"Image quality low ({quality_score}). Please try again with a cleaner, drier finger."
-                })
-                # Allow continuation but warn user
-            else:
-                logger.info("Image quality acceptable: %d", quality_score)
+        Args:
+            send_event_callable: Function to send WebSocket events
+            gallery: Gallery of enrolled NumPy minutiae
+            top_k: Candidates to return
+            shortlist: Rows passed from screening to the 1:1 matcher
+            retrieve: Rows taken from the triplet index (None screens all)
+            screen: First-stage screening, "cylinder" or "hough"
 
-            # Step 7: Create TEMPLATE from captured image
-            await send_event_callable({
-                "type": "processing",
-                "message": "Processing fingerprint..."
-            })
+        Returns:
+            list: Candidates, best score first; None if no probe could be captured
+        """
+        probe = await self._with_device(send_event_callable, self._scan_with_device)
+        if probe is None:
+            return None
 
-            template = await asyncio.get_event_loop().run_in_executor(
-                None, 
-                self.device.create_template, 
-                img_buffer,
-                quality_score
-            )
+        await send_event_callable({
+            "type": "identifying",
+            "message": "Searching enrolled fingerprints...",
+            "gallery_size": len(gallery)
+        })
+        minutiae, _, _ = decode_template(probe)
+        return await asyncio.to_thread(gallery.identify, minutiae, top_k, shortlist, retrieve, screen)
+
+    async def _with_device(self, send_event_callable, workflow):
+        """Check out a reader, run a workflow on it and return the reader."""
+        try:
+            # Step 1: Check out an opened and configured device
+            logger.info("Acquiring fingerprint device for session {}", self.token)
 
-            if template is None:
-                logger.error("Template creation failed")
+            async def report_queue_position(position: int, queue_length: int):
                 await send_event_callable({
-                    "type": "error",
-                    "message": "Failed to create fingerprint template. Please try again."
+                    "type": "queued",
+                    "message": f"All scanners are busy. You are number {position} in line.",
+                    "position": position,
+                    "queue_length": queue_length
                 })
-                return None
 
-            logger.info("Fingerprint template created successfully. Template size: %d bytes", len(template))
-            
-            await send_event_callable({
-                "type": "capture_success",
-                "message": f"Fingerprint scan successful! Quality: {quality_score}/100",
-                "quality": quality_score,
-                "template_size": len(template)
-            })
-
-            return template
+            async with device_pool.acquire(
+                timeout=settings.DEVICE_ACQUIRE_TIMEOUT,
+                on_queue_position=report_queue_position
+            ) as slot:
+                self.device = slot.device
+                self.executor = slot.executor
+                self.device_id = slot.device_id
+                self.led = slot.led
+                logger.info("Device {} checked out for session {}", slot.device_id, self.token)
+                try:
+                    return await workflow(send_event_callable)
+                finally:
+                    await self._cleanup_device()
 
         except Exception as e:
             logger.exception("Error in run_scan: %s", e)
@@ -141,37 +155,81 @@ class ScanSession:
             })
             return None
 
-        finally:
-            # Ensure device is properly closed
-            await self._cleanup_device()
-
-    async def _configure_device(self, send_event_callable):
+    async def _scan_with_device(self, send_event_callable):
         """
-        Configure device settings for optimal capture.
+        Capture workflow on a checked-out device (already opened and configured).
         """
-        try:
-            logger.debug("Configuring device settings...")
-            
-            # Set brightness to optimal level (50)
-            await asyncio.get_event_loop().run_in_executor(
-                None, self.device.set_brightness, 50
-            )
-            logger.debug("Brightness set to 50")
+        # Step 2: Device settings were applied when the pool opened the handle
+        await send_event_callable({
+            "type": "device_configured",
+            "message": "Device configured successfully.",
+            "device_id": self.device_id
+        })
+
+        # Step 3: Get device info for image dimensions
+        device_info = await self.executor.call(self.device.get_device_info)
+        width = device_info.get('width', 300)
+        height = device_info.get('height', 400)
+        logger.info("Device image size: {}x{}", width, height)
+
+        # Step 4: Blink LED until a finger is captured to indicate readiness
+        self.led.play("ready")
+        await send_event_callable({
+            "type": "device_ready",
+            "message": "Device is ready. Please place your thumb firmly on the scanner."
+        })
+
+        # Step 5: Capture fingerprint IMAGE with retries
+        img_buffer = await self._capture_image_with_retry(send_event_callable, width, height)
+        
+        if img_buffer is None:
+            self.led.play("error")
+            await send_event_callable({
+                "type": "error",
+                "message": "Failed to capture fingerprint after multiple attempts."
+            })
+            return None
 
-            # Set template format to SG400 (default)
-            await asyncio.get_event_loop().run_in_executor(
-                None, self.device.set_template_format
-            )
-            logger.debug("Template format configured")
+        self.led.play("busy")
 
+        # Step 6: Keep capturing while the finger is down; templates are
+        # extracted from the best frame so far between captures
+        quality_score, template, prescreen = await self._capture_best_of_n(
+            img_buffer, width, height, send_event_callable
+        )
+        self.quality = quality_score
+        await self._report_quality(quality_score, send_event_callable, prescreen)
+
+        if quality_score < 40:
+            logger.warning("Image quality too low: {}", quality_score)
             await send_event_callable({
-                "type": "device_configured",
-                "message": "Device configured successfully."
+                "type": "warning",
+                "message": f"Image quality low ({quality_score}). Please try again with a cleaner, drier finger."
             })
+            # Allow continuation but warn user
+        else:
+            logger.info("Image quality acceptable: {}", quality_score)
 
-        except Exception as e:
-            logger.warning("Device configuration error (non-fatal): %s", e)
-            # Continue even if configuration fails
+        if template is None:
+            logger.error("Template creation failed")
+            self.led.play("error")
+            await send_event_callable({
+                "type": "error",
+                "message": "Failed to create fingerprint template. Please try again."
+            })
+            return None
+
+        logger.info("Fingerprint template created successfully. Template size: {} bytes", len(template))
+        self.led.play("success")
+        
+        await send_event_callable({
+            "type": "capture_success",
+            "message": f"Fingerprint scan successful! Quality: {quality_score}/100",
+            "quality": quality_score,
+            "template_size": len(template)
+        })
+
+        return template
 
     async def _capture_image_with_retry(self, send_event_callable, width, height, max_attempts=3):
         """
@@ -186,7 +244,6 @@ class ScanSession:
         Returns:
             bytes: Raw image buffer if successful, None otherwise
         """
-        timeout_ms = 15000  # 15 seconds per attempt
         quality_threshold = 30  # Lower threshold for initial capture
         
         for attempt in range(1, max_attempts + 1):
@@ -202,14 +259,18 @@ class ScanSession:
 
             try:
                 # Capture image using GetImageEx with quality checking
-                img_buffer = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    self.device.capture_image_ex,
-                    timeout_ms,
-                    quality_threshold
-                )
-
-                if img_buffer is not None and len(img_buffer) == width * height:
+                img_buffer = await self._capture_image(quality_threshold)
+
+                report = self._prescreen(img_buffer, width, height) if img_buffer is not None else None
+                if report is not None and report.rejected:
+                    logger.warning("Image rejected by pre-screen on attempt {}: {}",
+                                   attempt, report.reject_reason)
+                    await send_event_callable({
+                        "type": "image_rejected",
+                        "message": f"Image rejected ({report.reject_reason}). Lift and place your finger again.",
+                        "prescreen": report.to_dict()
+                    })
+                elif img_buffer is not None and len(img_buffer) == width * height:
                     logger.info("Image captured successfully on attempt %d", attempt)
                     await send_event_callable({
                         "type": "image_captured",
@@ -245,119 +306,287 @@ class ScanSession:
         logger.error("Failed to capture image after %d attempts", max_attempts)
         return None
 
-    async def _verify_image_quality(self, img_buffer, width, height, send_event_callable):
+    async def _capture_image(self, quality_threshold):
         """
-        Verify the quality of captured fingerprint image.
-        
+        Capture one image using the configured CAPTURE_MODE.
+
+        "poll": wait for a finger with short probes, then run a short capture.
+        "blocking": one GetImageEx call that waits for the whole capture window.
+        """
+        if settings.CAPTURE_MODE == "poll":
+            if not await self._wait_for_finger(settings.CAPTURE_WAIT_SECONDS):
+                raise TimeoutError("No finger detected within timeout period")
+            timeout_ms = settings.CAPTURE_TIMEOUT_MS
+        else:
+            timeout_ms = settings.CAPTURE_WAIT_SECONDS * 1000
+
+        return await self.executor.call(
+            self.device.capture_image_ex,
+            timeout_ms,
+            quality_threshold,
+            # Deadline covers queue wait plus the SDK's own capture timeout
+            timeout=timeout_ms / 1000 + 5
+        )
+
+    async def _wait_for_finger(self, wait_seconds):
+        """
+        Poll the sensor for a finger with short, bounded probes.
+
+        Each probe holds the reader for at most FINGER_PROBE_MS, so a cancelled
+        or abandoned session releases the reader almost immediately.
+
+        Returns:
+            bool: True once a finger is detected, False if the window elapsed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        probe_ms = settings.FINGER_PROBE_MS
+
+        while self.active and loop.time() < deadline:
+            present = await self.executor.call(
+                self.device.is_finger_present,
+                probe_ms,
+                settings.FINGER_PRESENCE_QUALITY,
+                timeout=probe_ms / 1000 + 2
+            )
+            if present:
+                logger.debug("Finger detected for session {}", self.token)
+                return True
+            await asyncio.sleep(settings.FINGER_POLL_INTERVAL_MS / 1000)
+
+        return False
+
+    async def _capture_best_of_n(self, first_image, width, height, send_event_callable):
+        """
+        Best-of-N burst capture.
+
+        Takes up to BURST_CAPTURE_FRAMES images while the finger stays on the
+        sensor and scores each one as it arrives. Frames failing the NumPy
+        pre-screen are dropped without an SDK call. Whenever a frame beats the
+        best so far, its template extraction is queued on the reader's thread
+        (superseded extractions are cancelled), so extraction runs between
+        captures instead of after the burst. Stops early once a frame reaches
+        BURST_EXCELLENT_QUALITY or the finger is lifted.
+
         Args:
-            img_buffer: Raw image bytes
+            first_image: Image returned by _capture_image_with_retry (slot 0)
             width: Image width
             height: Image height
             send_event_callable: Function to send WebSocket events
-            
+
         Returns:
-            int: Quality score (0-100)
+            tuple: (quality_score, template, prescreen) for the best frame;
+                template is None if extraction failed, prescreen is None
+                when the pre-screen is disabled
         """
+        frames = max(1, settings.BURST_CAPTURE_FRAMES)
+        frame_timeout_ms = settings.BURST_FRAME_TIMEOUT_MS
+        best_quality = -1
+        best_frame = 0
+        best_report = None
+        template_task = None
+        img_buffer = first_image
+        frame = 1
+
         try:
-            logger.debug("Verifying image quality...")
-            
-            quality_score = await asyncio.get_event_loop().run_in_executor(
-                None,
-                self.device.get_image_quality,
-                img_buffer,
-                width,
-                height
-            )
+            while True:
+                report = self._prescreen(img_buffer, width, height)
+                rejected = report is not None and report.rejected
+                if rejected:
+                    logger.info("Burst frame {}/{} rejected by pre-screen: {}",
+                                frame, frames, report.reject_reason)
+                    quality_score = 0
+                else:
+                    quality_score = await self._score_image(img_buffer, width, height)
+                    logger.info("Burst frame {}/{} quality: {}", frame, frames, quality_score)
+
+                if not rejected and quality_score > best_quality:
+                    if template_task is not None:
+                        template_task.cancel()
+                    best_quality = quality_score
+                    best_frame = frame
+                    best_report = report
+                    template_task = asyncio.ensure_future(
+                        self._create_template(img_buffer, width, height, quality_score)
+                    )
+
+                if frames > 1:
+                    await send_event_callable({
+                        "type": "burst_frame",
+                        "message": f"Frame {frame}/{frames} captured (quality {quality_score}/100).",
+                        "frame": frame,
+                        "frames": frames,
+                        "quality": quality_score,
+                        "best_quality": best_quality
+                    })
 
-            logger.info("Image quality score: %d/100", quality_score)
-            
-            # Determine quality level
-            if quality_score >= 70:
-                quality_level = "EXCELLENT"
-                quality_msg = "Image quality is excellent for registration."
-            elif quality_score >= 50:
-                quality_level = "GOOD"
-                quality_msg = "Image quality is good."
-            elif quality_score >= 40:
-                quality_level = "ACCEPTABLE"
-                quality_msg = "Image quality is acceptable for verification."
-            else:
-                quality_level = "LOW"
-                quality_msg = "Image quality is low. Consider recapturing."
+                if best_quality >= settings.BURST_EXCELLENT_QUALITY or frame >= frames or not self.active:
+                    break
+
+                # Each frame gets its own image buffer slot, so a capture never
+                # overwrites an image whose template is still being extracted
+                try:
+                    img_buffer = await self.executor.call(
+                        self.device.capture_image_ex,
+                        frame_timeout_ms,
+                        FingerprintDevice.DEFAULT_QUALITY_THRESHOLD,
+                        frame,
+                        timeout=frame_timeout_ms / 1000 + 5
+                    )
+                except Exception as e:
+                    # Finger lifted or frame rejected: settle for the best so far
+                    logger.info("Burst ended after {} frame(s): {}", frame, e)
+                    break
+
+                if img_buffer is None or len(img_buffer) != width * height:
+                    break
+                frame += 1
 
             await send_event_callable({
-                "type": "quality_check",
-                "message": quality_msg,
-                "quality_score": quality_score,
-                "quality_level": quality_level
+                "type": "processing",
+                "message": "Processing fingerprint..."
             })
 
-            return quality_score
+            template = None
+            if template_task is not None:
+                try:
+                    template = await template_task
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Template creation failed: {}", e)
+                template_task = None
 
-        except Exception as e:
-            logger.warning("Quality verification failed: %s", e)
-            # Return default score if verification fails
-            return 50
+            logger.info("Best of {} frame(s): frame {}, quality {}", frame, best_frame, best_quality)
+            return best_quality, template, best_report
 
-    async def _cleanup_device(self):
+        finally:
+            if template_task is not None:
+                template_task.cancel()
+
+    async def _create_template(self, img_buffer, width, height, quality_score):
+        """
+        Create a template with the configured TEMPLATE_ENGINE.
+
+        "sdk": SGFPM_CreateTemplate on the reader's own thread. ANSI 378 /
+        ISO 19794-2 records are converted to NumPy templates here, once;
+        SG400 templates are kept as they are.
+        "numpy": NumPy minutiae extraction on a worker thread, so it runs
+        alongside the next capture instead of queueing behind it.
+        """
+        if self.template_engine == "numpy":
+            return await asyncio.to_thread(extract_template, img_buffer, width, height)
+        template = await self.executor.call(
+            self.device.create_template,
+            img_buffer,
+            quality_score
+        )
+        return normalize_template(template)
+
+    async def _match(self, probe, enrolled_template):
+        """
+        Match a probe against an enrolled template.
+
+        NumPy minutiae templates use the NumPy matcher; SDK templates are
+        matched by the SDK on the reader that captured the probe.
         """
-        Cleanup device resources.
+        if is_minutiae_template(probe) and is_minutiae_template(enrolled_template):
+            score = await asyncio.to_thread(match_templates, probe, enrolled_template)
+            result = MatchResult(score >= settings.MATCH_THRESHOLD, score, "numpy")
+        else:
+            matched, score = await self.executor.call(
+                self.device.match_template,
+                probe,
+                enrolled_template,
+                settings.SDK_MATCH_SECURITY_LEVEL
+            )
+            result = MatchResult(matched, score, "sdk")
+        return result
+
+    @staticmethod
+    def _prescreen(img_buffer, width, height):
         """
+        Run the NumPy pre-screen on a captured image (no SDK call).
+
+        Returns:
+            QualityReport: Pre-screen scores, or None if PRESCREEN_ENABLED is
+                off or the pre-screen failed (the frame is then scored by the SDK)
+        """
+        if not settings.PRESCREEN_ENABLED:
+            return None
         try:
-            if self.device:
-                logger.debug("Cleaning up device...")
-                
-                # Stop any LED blinking
-                await self._stop_led(asyncio.get_event_loop())
-                
-                # Close device
-                await asyncio.get_event_loop().run_in_executor(
-                    None, self.device.close
-                )
-                
-                # Terminate device object
-                await asyncio.get_event_loop().run_in_executor(
-                    None, self.device.terminate
-                )
-                
-                logger.info("Device cleanup completed")
-                
+            return assess_image(img_buffer, width, height)
         except Exception as e:
-            logger.warning("Error during device cleanup: %s", e)
+            logger.warning("Pre-screen failed, falling back to SDK scoring: {}", e)
+            return None
 
-    # ------------------------------------------------------------
-    # Internal helpers
-    # ------------------------------------------------------------
-    async def _blink_led_background(self):
+    async def _score_image(self, img_buffer, width, height):
         """
-        Runs LED blinking in background thread.
-        Automatically stops if cancelled or an exception occurs.
+        Score one captured image with the SDK.
+
+        Returns:
+            int: Quality score (0-100), 50 if scoring fails
         """
-        loop = asyncio.get_running_loop()
         try:
-            logger.debug("Starting LED blink thread.")
-            await loop.run_in_executor(None, self.device.blink_led, 20, 0.4)
-        except asyncio.CancelledError:
-            # Expected when finger detected or session ends
-            logger.debug("LED blink task cancelled (finger detected).")
-            await loop.run_in_executor(None, self.device.set_led, False)
+            return await self.executor.call(
+                self.device.get_image_quality,
+                img_buffer,
+                width,
+                height
+            )
         except Exception as e:
-            logger.warning("LED blink encountered error: %s", e)
-            await loop.run_in_executor(None, self.device.set_led, False)
+            logger.warning("Quality verification failed: %s", e)
+            # Return default score if verification fails
+            return 50
 
-    async def _stop_led(self, loop):
+    async def _report_quality(self, quality_score, send_event_callable, prescreen=None):
         """
-        Cancels LED blink task (if running) and ensures LED is turned off.
+        Report the quality of the selected fingerprint image.
+        
+        Args:
+            quality_score: Quality score (0-100)
+            send_event_callable: Function to send WebSocket events
+            prescreen: QualityReport from the NumPy pre-screen, if it ran
+        """
+        logger.info("Image quality score: {}/100", quality_score)
+
+        # Determine quality level
+        if quality_score >= 70:
+            quality_level = "EXCELLENT"
+            quality_msg = "Image quality is excellent for registration."
+        elif quality_score >= 50:
+            quality_level = "GOOD"
+            quality_msg = "Image quality is good."
+        elif quality_score >= 40:
+            quality_level = "ACCEPTABLE"
+            quality_msg = "Image quality is acceptable for verification."
+        else:
+            quality_level = "LOW"
+            quality_msg = "Image quality is low. Consider recapturing."
+
+        event = {
+            "type": "quality_check",
+            "message": quality_msg,
+            "quality_score": quality_score,
+            "quality_level": quality_level
+        }
+        if prescreen is not None:
+            event["prescreen"] = prescreen.to_dict()
+        await send_event_callable(event)
+
+    async def _cleanup_device(self):
+        """
+        Stop session activity on the device.
+        The handle itself stays open and is returned to the device pool.
         """
         try:
-            if self._blink_task and not self._blink_task.done():
-                self._blink_task.cancel()
-                with contextlib.suppress(asyncio.CancelledError):
-                    await self._blink_task
-            await loop.run_in_executor(None, self.device.set_led, False)
-            logger.debug("LED manually turned off.")
+            if self.led:
+                # Looping patterns stop now; success/error patterns finish on their own
+                self.led.release()
+                logger.debug("Device cleanup completed")
+
         except Exception as e:
-            logger.warning("Failed to stop LED cleanly: %s", e)
+            logger.warning("Error during device cleanup: %s", e)
 
     def is_expired(self):
         """Check if session has expired."""
@@ -367,4 +596,5 @@ class ScanSession:
         """Cancel the scan session."""
         logger.info("Cancelling scan session %s", self.token)
         self.active = False
-        await self._cleanup_device()
+        if self.led:
+            self.led.stop()
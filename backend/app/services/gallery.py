@@ -0,0 +1,551 @@
+"""
+Identification Gallery
+----------------------
+In-memory 1:N gallery of enrolled NumPy minutiae templates, searched with
+batched NumPy operations instead of one 1:1 comparison per enrollee.
+
+Layout (struct of arrays, one row per enrolled finger, grown by doubling):
+    identities        row -> enrollment key "CNIC/finger position"
+                      (enrollment_key(); key -> row map kept alongside)
+    minutiae          every enrolled minutia, concatenated (MINUTIA_DTYPE);
+                      row r owns minutiae[offsets[r]:offsets[r] + counts[r]]
+    screen_x/y/angle  (rows x SCREEN_MINUTIAE) int32/uint8 copies of each
+                      row's best-quality minutiae, padded, for Hough screening
+    cylinders         (rows x CYLINDERS x WORDS) uint64 binary cylinder codes
+                      (app.services.cylinder_codes) and their set-bit counts,
+                      for cylinder screening
+    active            False for rows replaced by a re-enrollment
+
+Search:
+1. Retrieval (optional): the minutia triplet index
+   (app.services.triplet_index) picks the rows sharing the most triangles
+   with the probe, so only a small fraction of the gallery is screened
+2. Screening every row (or every retrieved row) at once, either
+   - "cylinder": XOR/popcount similarity of binary cylinder codes, or
+   - "hough": Hough voting in chunks of SCREEN_CHUNK_ROWS. Rotation is
+     limited to +-MAX_ROTATION (fingers are placed roughly upright on the
+     sensor), which discards most minutia pairs before any translation is
+     computed; translation cells wrap around so every row has a small
+     fixed-size histogram.
+3. Rerank: the best rows by screening votes are scored with the 1:1
+   matcher (app.services.matcher.match_minutiae)
+4. Keep each person's best-scoring finger and return the top-k people by
+   matcher score
+
+Rows are only ever appended (or rebuilt into new arrays by compaction), so
+a search works on a snapshot of the arrays taken under the lock and can run
+on a worker thread while enrollments are added.
+
+The arrays can be saved to and restored from an on-disk snapshot
+(app.services.gallery_snapshot); a restored gallery runs on copy-on-write
+memory maps until it outgrows their spare capacity.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.cylinder_codes import (
+    CYLINDERS, WORDS, cylinder_bits, cylinder_codes, cylinder_similarity, decode_cylinder_codes,
+)
+from app.services.matcher import match_minutiae
+from app.services.minutiae import MINUTIA_DTYPE, decode_template, is_minutiae_template
+from app.services.triplet_index import TripletIndex
+
+
+SCREEN_MINUTIAE = 32           # minutiae per row used for screening (power of two)
+SCREEN_SHIFT = 5               # log2(SCREEN_MINUTIAE)
+MAX_ROTATION = 20              # angle steps (~28 degrees) either way
+ROTATION_STEP = 4              # angle steps per rotation bin (~5.6 degrees)
+ROTATION_BINS = 2 * MAX_ROTATION // ROTATION_STEP + 1
+TRANSLATION_STEP = 20          # pixels per translation cell
+TRANSLATION_CELLS = 16         # cells per axis before wrapping (power of two)
+SCREEN_CELLS = ROTATION_BINS * TRANSLATION_CELLS * TRANSLATION_CELLS
+SCREEN_CHUNK_ROWS = 256
+INITIAL_ROWS = 1024
+COMPACT_FRACTION = 0.25        # compact once this share of rows is replaced
+
+# Rotation (in radians) at the centre of each screening rotation bin
+_BIN_ROTATIONS = (np.arange(ROTATION_BINS) * ROTATION_STEP - MAX_ROTATION) * (2 * np.pi / 256)
+
+# Offset rotation (0..2*MAX_ROTATION angle steps) -> nearest rotation bin
+_ROTATION_BIN_OF = np.zeros(256, dtype=np.int32)
+_ROTATION_BIN_OF[:2 * MAX_ROTATION + 1] = (np.arange(2 * MAX_ROTATION + 1) + ROTATION_STEP // 2) // ROTATION_STEP
+
+
+def enrollment_key(identity_number: str, finger_position: int = 0) -> str:
+    """Gallery key of one enrolled finger."""
+    return f"{identity_number}/{finger_position}"
+
+
+def split_key(key: str) -> Tuple[str, int]:
+    """(CNIC, finger position) of a gallery key; a bare CNIC is finger 0."""
+    identity_number, _, finger_position = key.partition("/")
+    return identity_number, int(finger_position or 0)
+
+
+class Candidate:
+    """One identification candidate: a person and their best-matching finger."""
+
+    __slots__ = ("identity_number", "finger_position", "score")
+
+    def __init__(self, identity_number: str, score: int, finger_position: int = 0):
+        self.identity_number = identity_number
+        self.finger_position = finger_position
+        self.score = score
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"identity_number": self.identity_number, "finger_position": self.finger_position,
+                "score": self.score}
+
+
+def _screen(probe: np.ndarray, screen_x: np.ndarray, screen_y: np.ndarray,
+            screen_angle: np.ndarray, screen_counts: np.ndarray) -> np.ndarray:
+    """
+    Best Hough vote count of the probe against every row.
+
+    Args:
+        probe: MINUTIA_DTYPE records, best quality first
+        screen_x, screen_y, screen_angle: (rows x SCREEN_MINUTIAE) padded rows
+        screen_counts: Valid minutiae per row
+
+    Returns:
+        np.ndarray: int32 votes per row
+    """
+    rows = len(screen_counts)
+    n = min(len(probe), SCREEN_MINUTIAE)
+    probe_angle = np.zeros(SCREEN_MINUTIAE, dtype=np.uint8)
+    probe_angle[:n] = probe["angle"][:n]
+    probe_valid = np.arange(SCREEN_MINUTIAE) < n
+
+    # Probe coordinates rotated by every bin's rotation, indexed [bin, minutia]
+    px = probe["x"][:n].astype(np.float32)
+    py = probe["y"][:n].astype(np.float32)
+    cos, sin = np.cos(_BIN_ROTATIONS)[:, None], np.sin(_BIN_ROTATIONS)[:, None]
+    rotated_x = np.zeros((ROTATION_BINS, SCREEN_MINUTIAE), dtype=np.int32)
+    rotated_y = np.zeros((ROTATION_BINS, SCREEN_MINUTIAE), dtype=np.int32)
+    rotated_x[:, :n] = np.rint(cos * px - sin * py)
+    rotated_y[:, :n] = np.rint(sin * px + cos * py)
+    rotated_x, rotated_y = rotated_x.ravel(), rotated_y.ravel()
+
+    flat_x = screen_x.ravel()
+    flat_y = screen_y.ravel()
+    slot_valid = np.arange(SCREEN_MINUTIAE)[None, :] < screen_counts[:, None]
+    pair_mask = (1 << 2 * SCREEN_SHIFT) - 1
+    cell_mask = TRANSLATION_CELLS - 1
+    votes = np.zeros(rows, dtype=np.int32)
+
+    for start in range(0, rows, SCREEN_CHUNK_ROWS):
+        stop = min(rows, start + SCREEN_CHUNK_ROWS)
+        # Rotation in angle steps, offset so the allowed range is 0..2*MAX_ROTATION
+        # (uint8 arithmetic wraps around the circle for free)
+        turn = screen_angle[start:stop, None, :] - probe_angle[None, :, None] + np.uint8(MAX_ROTATION)
+        keep = (turn <= 2 * MAX_ROTATION) & slot_valid[start:stop, None, :] & probe_valid[None, :, None]
+
+        # Flat index = (row << 2 * SHIFT) | (probe minutia << SHIFT) | row minutia
+        pairs = np.flatnonzero(keep).astype(np.int32)
+        row = pairs >> (2 * SCREEN_SHIFT)
+        probe_slot = (pairs & pair_mask) >> SCREEN_SHIFT
+        row_slot = pairs & (SCREEN_MINUTIAE - 1)
+
+        rot_bin = _ROTATION_BIN_OF[turn.ravel()[pairs]]
+        table = (rot_bin << SCREEN_SHIFT) | probe_slot
+        enrolled = ((row + start) << SCREEN_SHIFT) | row_slot
+        cell_x = ((flat_x[enrolled] - rotated_x[table]) // TRANSLATION_STEP) & cell_mask
+        cell_y = ((flat_y[enrolled] - rotated_y[table]) // TRANSLATION_STEP) & cell_mask
+
+        cells = ((row * ROTATION_BINS + rot_bin) * TRANSLATION_CELLS + cell_x) * TRANSLATION_CELLS + cell_y
+        histogram = np.bincount(cells, minlength=(stop - start) * SCREEN_CELLS)
+        votes[start:stop] = histogram.reshape(stop - start, SCREEN_CELLS).max(axis=1)
+
+    return votes
+
+
+class Gallery:
+    """
+    Packed in-memory gallery of enrolled minutiae.
+    Mutations and snapshots are guarded by a lock; searches run unlocked on
+    a snapshot, so they can be moved to a worker thread.
+    """
+
+    def __init__(self, indexed: bool = True):
+        self._lock = threading.Lock()
+        self._index = TripletIndex() if indexed else None
+        self._reset(INITIAL_ROWS, INITIAL_ROWS * SCREEN_MINUTIAE)
+
+        # Retrieval metrics (indexed searches only)
+        self.searches = 0
+        self.retrieved = 0
+        self.penetration = 0.0
+
+    def _reset(self, row_capacity: int, minutia_capacity: int):
+        self._identities: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._minutiae_used = 0
+        self._replaced = 0
+        self._offsets = np.zeros(row_capacity, dtype=np.int64)
+        self._counts = np.zeros(row_capacity, dtype=np.int32)
+        self._active = np.zeros(row_capacity, dtype=bool)
+        self._screen_x = np.zeros((row_capacity, SCREEN_MINUTIAE), dtype=np.int32)
+        self._screen_y = np.zeros((row_capacity, SCREEN_MINUTIAE), dtype=np.int32)
+        self._screen_angle = np.zeros((row_capacity, SCREEN_MINUTIAE), dtype=np.uint8)
+        self._screen_counts = np.zeros(row_capacity, dtype=np.int32)
+        self._cylinders = np.zeros((row_capacity, CYLINDERS, WORDS), dtype=np.uint64)
+        self._cylinder_bits = np.zeros((row_capacity, CYLINDERS), dtype=np.uint16)
+        self._minutiae = np.zeros(minutia_capacity, dtype=MINUTIA_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def keys(self) -> List[str]:
+        """Every enrollment key."""
+        with self._lock:
+            return list(self._rows)
+
+    # ----------------------------------------------------------
+    # Mutations
+    # ----------------------------------------------------------
+
+    def add(self, key: str, minutiae: np.ndarray, cylinders: Optional[np.ndarray] = None):
+        """
+        Add (or replace) an enrollment.
+
+        Args:
+            key: Enrollment key of the finger (enrollment_key())
+            minutiae: MINUTIA_DTYPE records, best quality first
+            cylinders: Stored cylinder codes (computed from minutiae if None)
+        """
+        if cylinders is None:
+            cylinders = cylinder_codes(minutiae)
+        with self._lock:
+            previous = self._rows.pop(key, None)
+            if previous is not None:
+                self._deactivate(previous)
+
+            self._ensure_capacity(self._size + 1, self._minutiae_used + len(minutiae))
+            row = self._size
+            start = self._minutiae_used
+            self._minutiae[start:start + len(minutiae)] = minutiae
+            self._offsets[row] = start
+            self._counts[row] = len(minutiae)
+
+            k = min(len(minutiae), SCREEN_MINUTIAE)
+            self._screen_x[row, :k] = minutiae["x"][:k]
+            self._screen_y[row, :k] = minutiae["y"][:k]
+            self._screen_angle[row, :k] = minutiae["angle"][:k]
+            self._screen_counts[row] = k
+            self._cylinders[row] = cylinders
+            self._cylinder_bits[row] = cylinder_bits(cylinders)
+            self._active[row] = True
+            if self._index is not None:
+                self._index.add(row, minutiae)
+
+            self._identities.append(key)
+            self._rows[key] = row
+            self._size += 1
+            self._minutiae_used += len(minutiae)
+
+            if self._replaced > COMPACT_FRACTION * self._size and self._replaced >= INITIAL_ROWS:
+                self._compact()
+
+    def add_template(self, key: str, template, cylinders=None) -> bool:
+        """
+        Add an enrollment from a decrypted template (and its stored cylinder
+        codes, if any). SDK templates cannot be searched here; any previous
+        NumPy enrollment under the key is dropped instead.
+
+        Returns:
+            bool: True if the template was added
+        """
+        if not is_minutiae_template(template):
+            self.remove(key)
+            return False
+        minutiae, _, _ = decode_template(template)
+        self.add(key, minutiae, decode_cylinder_codes(cylinders) if cylinders else None)
+        return True
+
+    def add_templates(self, items: List[Tuple[str, bytes, Optional[bytes]]]) -> int:
+        """
+        Add a batch of decrypted (key, template, cylinder codes) items
+        (see add_template).
+
+        Returns:
+            int: How many templates were searchable NumPy templates
+        """
+        return sum(self.add_template(*item) for item in items)
+
+    def remove(self, key: str):
+        """Drop an enrollment, if any."""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None:
+                self._deactivate(row)
+
+    def clear(self):
+        """Drop every enrollment and release the arrays."""
+        with self._lock:
+            self._reset(INITIAL_ROWS, INITIAL_ROWS * SCREEN_MINUTIAE)
+            if self._index is not None:
+                self._index.reset()
+
+    def index_needs_merge(self) -> bool:
+        """True when enough enrollments were indexed since the last merge."""
+        return self._index is not None and self._index.needs_merge()
+
+    def merge_index(self):
+        """Fold recent enrollments into the index snapshot (CPU-bound)."""
+        if self._index is not None:
+            self._index.merge()
+
+    def _deactivate(self, row: int):
+        self._active[row] = False
+        self._identities[row] = None
+        self._replaced += 1
+
+    def _ensure_capacity(self, rows: int, minutiae: int):
+        """Grow into new arrays, so snapshots held by searches stay valid."""
+        if rows > len(self._offsets):
+            capacity = max(rows, 2 * len(self._offsets))
+            self._offsets = self._grown(self._offsets, capacity)
+            self._counts = self._grown(self._counts, capacity)
+            self._active = self._grown(self._active, capacity)
+            self._screen_x = self._grown(self._screen_x, capacity)
+            self._screen_y = self._grown(self._screen_y, capacity)
+            self._screen_angle = self._grown(self._screen_angle, capacity)
+            self._screen_counts = self._grown(self._screen_counts, capacity)
+            self._cylinders = self._grown(self._cylinders, capacity)
+            self._cylinder_bits = self._grown(self._cylinder_bits, capacity)
+        if minutiae > len(self._minutiae):
+            self._minutiae = self._grown(self._minutiae, max(minutiae, 2 * len(self._minutiae)))
+
+    @staticmethod
+    def _grown(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _compact(self):
+        """Rebuild the arrays (and renumber the index) without replaced rows."""
+        old_size = self._size
+        keep = np.flatnonzero(self._active[:self._size])
+        counts = self._counts[keep]
+        owned = np.repeat(self._active[:self._size], self._counts[:self._size])
+        minutiae = self._minutiae[:self._minutiae_used][owned]
+        identities = [self._identities[row] for row in keep]
+
+        capacity = max(INITIAL_ROWS, 2 * len(keep))
+        screen = (self._screen_x[keep], self._screen_y[keep], self._screen_angle[keep], self._screen_counts[keep])
+        cylinders, bits = self._cylinders[keep], self._cylinder_bits[keep]
+        self._reset(capacity, max(INITIAL_ROWS * SCREEN_MINUTIAE, 2 * len(minutiae)))
+
+        size = len(keep)
+        self._offsets[:size] = np.concatenate(([0], np.cumsum(counts[:-1]))) if size else []
+        self._counts[:size] = counts
+        self._active[:size] = True
+        self._screen_x[:size], self._screen_y[:size], self._screen_angle[:size], self._screen_counts[:size] = screen
+        self._cylinders[:size], self._cylinder_bits[:size] = cylinders, bits
+        self._minutiae[:len(minutiae)] = minutiae
+        self._identities = identities
+        self._rows = {identity: row for row, identity in enumerate(identities)}
+        self._size = size
+        self._minutiae_used = len(minutiae)
+
+        if self._index is not None:
+            mapping = np.full(old_size, -1, dtype=np.int32)
+            mapping[keep] = np.arange(size, dtype=np.int32)
+            self._index.remap(mapping)
+
+    # ----------------------------------------------------------
+    # Snapshots (app.services.gallery_snapshot)
+    # ----------------------------------------------------------
+
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Every used row's arrays, for a snapshot. Rows below the current size
+        are never rewritten in place (except active/identities, which are
+        copied), so the arrays can be written out after the lock is released.
+        """
+        self.merge_index()
+        with self._lock:
+            size = self._size
+            width = max([len(identity) for identity in self._rows] + [1])
+            columns = {
+                "identities": np.array([identity or "" for identity in self._identities], dtype=f"S{width}"),
+                "active": self._active[:size].copy(),
+                "offsets": self._offsets[:size],
+                "counts": self._counts[:size],
+                "screen_x": self._screen_x[:size],
+                "screen_y": self._screen_y[:size],
+                "screen_angle": self._screen_angle[:size],
+                "screen_counts": self._screen_counts[:size],
+                "cylinders": self._cylinders[:size],
+                "cylinder_bits": self._cylinder_bits[:size],
+                "minutiae": self._minutiae[:self._minutiae_used],
+            }
+            if self._index is not None:
+                for name, column in self._index.export().items():
+                    columns[f"index_{name}"] = column
+        return columns
+
+    def adopt_columns(self, columns: Dict[str, np.ndarray], lengths: Dict[str, int]):
+        """
+        Replace the gallery with exported columns.
+
+        Args:
+            columns: Arrays from export_columns(); they may be longer than
+                the used part (spare capacity, e.g. memory maps)
+            lengths: Used length of each column
+        """
+        size = lengths["identities"]
+        identities = [identity.decode() or None for identity in columns["identities"][:size].tolist()]
+        with self._lock:
+            self._identities = identities
+            self._rows = {identity: row for row, identity in enumerate(identities) if identity is not None}
+            self._size = size
+            self._replaced = size - len(self._rows)
+            self._minutiae_used = lengths["minutiae"]
+            self._offsets, self._counts, self._active = columns["offsets"], columns["counts"], columns["active"]
+            self._screen_x, self._screen_y = columns["screen_x"], columns["screen_y"]
+            self._screen_angle, self._screen_counts = columns["screen_angle"], columns["screen_counts"]
+            self._cylinders, self._cylinder_bits = columns["cylinders"], columns["cylinder_bits"]
+            self._minutiae = columns["minutiae"]
+            if self._index is not None:
+                self._index.reset()
+                if "index_keys" in columns:
+                    index = {name[len("index_"):]: column for name, column in columns.items()
+                             if name.startswith("index_")}
+                    self._index.adopt(index, lengths["index_keys"])
+                else:
+                    # Snapshot of an unindexed gallery: index every row again
+                    for row in np.flatnonzero(self._active[:size]).tolist():
+                        start = self._offsets[row]
+                        self._index.add(row, self._minutiae[start:start + self._counts[row]])
+        if self._index is not None and "index_keys" not in columns:
+            self._index.merge()
+
+    def export_entries(self, keys) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Enrolled minutiae and cylinder codes of some enrollments, for a delta
+        snapshot.
+
+        Returns:
+            tuple: (keys found, minutiae counts, concatenated
+                MINUTIA_DTYPE minutiae, cylinder codes)
+        """
+        with self._lock:
+            rows = [(key, self._rows[key]) for key in keys if key in self._rows]
+            found = [key for key, _ in rows]
+            rows = np.array([row for _, row in rows], dtype=np.int64)
+            counts = self._counts[rows].copy()
+            minutiae = (np.concatenate([self._minutiae[self._offsets[row]:self._offsets[row] + self._counts[row]]
+                                        for row in rows.tolist()])
+                        if len(rows) else np.zeros(0, dtype=MINUTIA_DTYPE))
+            cylinders = self._cylinders[rows].copy()
+        return found, counts, minutiae, cylinders
+
+    # ----------------------------------------------------------
+    # Search
+    # ----------------------------------------------------------
+
+    def identify(self, probe: np.ndarray, top_k: int = 5, shortlist: int = 64,
+                 retrieve: Optional[int] = None, screen: str = "cylinder") -> List[Candidate]:
+        """
+        Search the gallery for a probe (CPU-bound; call off the event loop).
+
+        Args:
+            probe: MINUTIA_DTYPE records from the live capture
+            top_k: Candidates to return
+            shortlist: Rows passed from screening to the 1:1 matcher
+            retrieve: Rows taken from the triplet index for screening;
+                None screens the whole gallery
+            screen: "cylinder" (cylinder codes) or "hough" (Hough voting)
+
+        Returns:
+            list: Candidates (one per person, their best finger), best
+                matcher score first
+        """
+        with self._lock:
+            size = self._size
+            identities = list(self._identities)
+            offsets, counts = self._offsets[:size], self._counts[:size]
+            active = self._active[:size].copy()
+            if screen == "cylinder":
+                columns = (self._cylinders[:size], self._cylinder_bits[:size])
+            else:
+                columns = (self._screen_x[:size], self._screen_y[:size],
+                           self._screen_angle[:size], self._screen_counts[:size])
+            minutiae = self._minutiae
+            index = self._index.snapshot() if self._index is not None and retrieve else None
+
+        if size == 0 or len(probe) == 0:
+            return []
+
+        if index is not None:
+            rows, _ = self._index.candidates(probe, retrieve, active, snapshot=index)
+            rows = rows[rows < size]
+            self._record_retrieval(len(rows), int(active.sum()))
+            columns = tuple(column[rows] for column in columns)
+        else:
+            rows = np.flatnonzero(active)
+            columns = tuple(column[rows] for column in columns) if len(rows) < size else columns
+
+        if len(rows) == 0:
+            return []
+
+        if screen == "cylinder":
+            screen_score = cylinder_similarity(cylinder_codes(probe), *columns)
+        else:
+            votes = _screen(probe, *columns)
+            # Same normalization as the matcher score, on screening minutiae only
+            screen_score = votes.astype(np.float32) ** 2 / np.maximum(columns[3], 1)
+
+        shortlist = min(shortlist, len(rows))
+        best_rows = rows[np.argpartition(-screen_score, shortlist - 1)[:shortlist]]
+
+        best: Dict[str, Candidate] = {}
+        for row in best_rows.tolist():
+            enrolled = minutiae[offsets[row]:offsets[row] + counts[row]]
+            identity_number, finger_position = split_key(identities[row])
+            score = match_minutiae(probe, enrolled)
+            if identity_number not in best or score > best[identity_number].score:
+                best[identity_number] = Candidate(identity_number, score, finger_position)
+        candidates = sorted(best.values(), key=lambda c: c.score, reverse=True)
+        return candidates[:top_k]
+
+    def retrieve(self, probe: np.ndarray, limit: int) -> List[str]:
+        """Identity numbers the triplet index retrieves for a probe (diagnostics and benchmarks)."""
+        if self._index is None:
+            return []
+        with self._lock:
+            identities = list(self._identities)
+            active = self._active[:self._size].copy()
+            index = self._index.snapshot()
+        rows, _ = self._index.candidates(probe, limit, active, snapshot=index)
+        retrieved = [split_key(identities[row])[0] for row in rows.tolist() if row < len(identities)]
+        return list(dict.fromkeys(retrieved))
+
+    def _record_retrieval(self, retrieved: int, enrolled: int):
+        """Running retrieval metrics: rows retrieved and penetration (share of the gallery screened)."""
+        self.searches += 1
+        self.retrieved += retrieved
+        self.penetration += retrieved / enrolled if enrolled else 0.0
+
+    def stats(self) -> dict:
+        """Gallery state for health endpoints and diagnostics."""
+        arrays = (self._minutiae, self._offsets, self._counts, self._active, self._screen_x, self._screen_y,
+                  self._screen_angle, self._screen_counts, self._cylinders, self._cylinder_bits)
+        return {
+            "enrollments": len(self._rows),
+            "rows": self._size,
+            "minutiae": self._minutiae_used,
+            "memory_bytes": int(sum(array.nbytes for array in arrays)),
+            # Restored from a snapshot and still shared with other processes
+            "mapped_bytes": int(sum(array.nbytes for array in arrays if isinstance(array, np.memmap))),
+            "index": self._index.stats() if self._index is not None else None,
+            "indexed_searches": self.searches,
+            "mean_retrieved": round(self.retrieved / self.searches, 1) if self.searches else 0.0,
+            "mean_penetration": round(self.penetration / self.searches, 4) if self.searches else 0.0,
+        }
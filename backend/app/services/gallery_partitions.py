@@ -0,0 +1,200 @@
+"""
+Partitioned Identification Galleries
+------------------------------------
+Check-ins happen for one exam subject at a time, so a probe only needs to
+be searched against the enrollments of that subject. This module keeps one
+small Gallery (app.services.gallery) per partition, keyed by the values of
+IDENTIFY_PARTITION_KEYS columns of applications (e.g. subject=Physics).
+
+Process Flow:
+1. use(scope): the first search for a scope loads its partition from the
+   database (through the loader callback); concurrent searches for the
+   same scope share one load
+2. Enrollments saved while a partition is loaded are added to it
+3. A background loop evicts partitions idle for IDENTIFY_PARTITION_IDLE_SECONDS;
+   beyond IDENTIFY_MAX_PARTITIONS the least recently used idle partition
+   is evicted as soon as a new one is created
+
+A partition in use by a search is never evicted.
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+from app.services.gallery import Gallery
+from app.utils.logger import logger
+
+
+ScopeKey = Tuple[Tuple[str, str], ...]
+PartitionLoader = Callable[[Gallery, Dict[str, str]], Awaitable[int]]
+
+
+class _Partition:
+    """One loaded (or loading) partition gallery."""
+
+    def __init__(self, key: ScopeKey, gallery: Gallery):
+        self.key = key
+        self.gallery = gallery
+        self.loader: Optional[asyncio.Task] = None
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.searches = 0
+
+
+class PartitionedGalleries:
+    """Lazily loaded, idle-evicted galleries keyed by partition column values."""
+
+    def __init__(self, keys: List[str], loader: PartitionLoader, indexed: bool = True,
+                 idle_seconds: int = 900, max_partitions: int = 16):
+        self.keys = keys
+        self.indexed = indexed
+        self.idle_seconds = idle_seconds
+        self.max_partitions = max_partitions
+        self._loader = loader
+        self._partitions: Dict[ScopeKey, _Partition] = {}
+        self._eviction_task = None
+
+    # ============================================================
+    # Lifecycle
+    # ============================================================
+
+    def start(self):
+        """Start the idle eviction loop."""
+        if self._eviction_task is None:
+            self._eviction_task = asyncio.create_task(self._eviction_loop())
+
+    async def stop(self):
+        """Stop eviction and drop every partition."""
+        if self._eviction_task:
+            self._eviction_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._eviction_task
+            self._eviction_task = None
+        for partition in list(self._partitions.values()):
+            if partition.loader and not partition.loader.done():
+                partition.loader.cancel()
+            self._evict(partition)
+
+    async def _eviction_loop(self):
+        """Periodically drop partitions nobody has searched for a while."""
+        while True:
+            await asyncio.sleep(max(1, min(60, self.idle_seconds // 4)))
+            now = time.monotonic()
+            for partition in list(self._partitions.values()):
+                if self._idle(partition) and now - partition.last_used >= self.idle_seconds:
+                    self._evict(partition)
+
+    # ============================================================
+    # Partitions
+    # ============================================================
+
+    def scope_key(self, scope: Mapping[str, str]) -> ScopeKey:
+        """
+        Normalize a search scope to a partition key.
+
+        Raises:
+            ValueError: If the scope uses a column that is not a partition key
+        """
+        unknown = set(scope) - set(self.keys)
+        if unknown:
+            raise ValueError(f"Cannot scope identification by {', '.join(sorted(unknown))}; "
+                             f"partition keys are {', '.join(self.keys) or 'not configured'}")
+        return tuple((key, str(scope[key])) for key in self.keys if scope.get(key) is not None)
+
+    def loaded(self) -> bool:
+        """True if any partition is loaded or loading."""
+        return bool(self._partitions)
+
+    @contextlib.asynccontextmanager
+    async def use(self, scope: Mapping[str, str]):
+        """
+        Check out the gallery for a scope, loading it on first use.
+
+        Raises:
+            ValueError: If the scope uses a column that is not a partition key
+            Exception: Whatever the loader raised, if the partition failed to load
+        """
+        key = self.scope_key(scope)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = _Partition(key, Gallery(indexed=self.indexed))
+            partition.loader = asyncio.create_task(self._load(partition))
+            self._partitions[key] = partition
+            self._evict_over_limit()
+
+        partition.users += 1
+        try:
+            # A cancelled search must not cancel a load other searches share
+            await asyncio.shield(partition.loader)
+            partition.searches += 1
+            yield partition.gallery
+        finally:
+            partition.users -= 1
+            partition.last_used = time.monotonic()
+
+    def is_loaded(self, scope: Mapping[str, str]) -> bool:
+        """True if the scope's partition has finished loading."""
+        partition = self._partitions.get(self.scope_key(scope))
+        return partition is not None and partition.loader.done()
+
+    async def _load(self, partition: _Partition):
+        started = time.monotonic()
+        try:
+            added = await self._loader(partition.gallery, dict(partition.key))
+        except BaseException:
+            # Let the next search retry the load
+            if self._partitions.get(partition.key) is partition:
+                del self._partitions[partition.key]
+            raise
+        logger.info("Gallery partition {} loaded: {} enrollment(s) in {:.1f}s",
+                    self._label(partition.key), added, time.monotonic() - started)
+
+    def add_template(self, values: Mapping[str, str], key: str, template, cylinders=None):
+        """
+        Keep loaded partitions in step with a saved enrollment (blocking;
+        call off the event loop). The enrollment is added to every loaded
+        partition whose scope its application matches.
+        """
+        for partition in list(self._partitions.values()):
+            if all(str(values.get(key)) == value for key, value in partition.key):
+                partition.gallery.add_template(key, template, cylinders)
+
+    @staticmethod
+    def _idle(partition: _Partition) -> bool:
+        return partition.users == 0 and partition.loader.done()
+
+    def _evict(self, partition: _Partition):
+        if self._partitions.get(partition.key) is partition:
+            del self._partitions[partition.key]
+        partition.gallery.clear()
+        logger.info("Gallery partition {} evicted", self._label(partition.key))
+
+    def _evict_over_limit(self):
+        """Evict least recently used idle partitions beyond max_partitions."""
+        excess = len(self._partitions) - self.max_partitions
+        if excess <= 0:
+            return
+        idle = sorted((p for p in self._partitions.values() if self._idle(p)), key=lambda p: p.last_used)
+        for partition in idle[:excess]:
+            self._evict(partition)
+
+    @staticmethod
+    def _label(key: ScopeKey) -> str:
+        return ",".join(f"{column}={value}" for column, value in key) or "(all)"
+
+    def stats(self) -> List[dict]:
+        """Loaded partitions for the health endpoint."""
+        now = time.monotonic()
+        return [
+            {
+                "scope": dict(partition.key),
+                "loading": not partition.loader.done(),
+                "enrollments": len(partition.gallery),
+                "memory_bytes": partition.gallery.stats()["memory_bytes"],
+                "searches": partition.searches,
+                "in_use": partition.users,
+                "idle_seconds": round(now - partition.last_used),
+            }
+            for partition in self._partitions.values()
+        ]
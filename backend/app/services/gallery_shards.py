@@ -0,0 +1,471 @@
+"""
+Sharded Identification Gallery
+------------------------------
+Spreads the 1:N gallery over worker processes, so searches use every core
+instead of competing for the single uvicorn process.
+
+Each worker process owns one shard: a Gallery (app.services.gallery) of
+the enrollments whose identity number hashes to it (crc32 % workers), so
+all of a person's fingers share a shard. Shards are disjoint, so every
+template is held by exactly one process and the API process keeps only the
+enrollment keys it routes by.
+
+Process Flow:
+1. start(): spawn one worker process per shard
+2. add/remove: route each enrollment to its shard over the shard's pipe
+3. identify(): fan the probe out to every shard in parallel; each shard
+   retrieves, screens and reranks its own rows and the top-k are merged
+4. Background health check pings idle workers; a dead or hung worker is
+   restarted and its shard reloaded through the reload callback, and
+   searches answer GalleryShardError until the reload finishes
+5. stop(): ask the workers to exit and terminate stragglers
+
+Each worker saves and restores its own shard's snapshot file
+(app.services.gallery_snapshot), so shard arrays never cross the pipes.
+"""
+
+import asyncio
+import contextlib
+import multiprocessing
+import signal
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.services import gallery_snapshot
+from app.services.gallery import Candidate, Gallery, split_key
+from app.utils.logger import logger
+
+
+# Seconds a stopping worker gets to exit before it is terminated
+STOP_GRACE_SECONDS = 2.0
+# Seconds a health check ping may take before the worker counts as hung
+PING_TIMEOUT = 5.0
+# Seconds a worker may take to save or restore its shard's snapshot
+SNAPSHOT_TIMEOUT = 600.0
+
+ReloadCallback = Callable[[Set[int]], Awaitable[None]]
+
+
+class GalleryShardError(Exception):
+    """Raised when a shard worker is down, reloading, or failed a request."""
+    pass
+
+
+# ============================================================
+# Worker process
+# ============================================================
+
+def _add_templates(gallery: Gallery, items: List[Tuple[str, bytes, Optional[bytes]]]) -> List[str]:
+    added = [item[0] for item in items if gallery.add_template(*item)]
+    if gallery.index_needs_merge():
+        gallery.merge_index()
+    return added
+
+
+def _remove(gallery: Gallery, key: str):
+    gallery.remove(key)
+
+
+def _save_snapshot(gallery: Gallery, path: str, watermark: Optional[float], changed: Optional[List[str]]) -> dict:
+    return gallery_snapshot.save(gallery, path, watermark, changed)
+
+
+def _restore_snapshot(gallery: Gallery, path: str, runtime_dir: str) -> Tuple[dict, List[str]]:
+    return gallery_snapshot.restore(gallery, path, runtime_dir), gallery.keys()
+
+
+_OPERATIONS = {
+    "add_templates": _add_templates,
+    "remove": _remove,
+    "clear": Gallery.clear,
+    "merge_index": Gallery.merge_index,
+    "identify": Gallery.identify,
+    "stats": Gallery.stats,
+    "save_snapshot": _save_snapshot,
+    "restore_snapshot": _restore_snapshot,
+    "ping": lambda gallery: len(gallery),
+}
+
+
+def _shard_worker(conn, indexed: bool):
+    """Serve one shard's requests until told to stop or the pipe closes."""
+    # Ctrl+C reaches the whole process group; the API process stops us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    gallery = Gallery(indexed=indexed)
+    while True:
+        try:
+            operation, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        if operation == "stop":
+            conn.send(("ok", None))
+            return
+        try:
+            conn.send(("ok", _OPERATIONS[operation](gallery, *args)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# ============================================================
+# API process
+# ============================================================
+
+class _Shard:
+    """A worker process and the enrollment keys routed to it."""
+
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        self.process = None
+        self.conn = None
+        # One request in flight per worker; concurrent searches queue here
+        self.lock = threading.Lock()
+        self.members: Set[str] = set()
+        # False while the worker is down or its shard is being reloaded
+        self.ready = False
+        self.restarts = 0
+
+
+class ShardedGallery:
+    """
+    Gallery interface backed by one worker process per shard.
+
+    Mutations and searches block on worker pipes, so call them off the
+    event loop, like the CPU-bound in-process Gallery.
+    """
+
+    def __init__(self, workers: int, indexed: bool = True, request_timeout: float = 30.0,
+                 health_check_interval: int = 30):
+        self.indexed = indexed
+        self.request_timeout = request_timeout
+        self.health_check_interval = health_check_interval
+        self._shards = [_Shard(shard_id) for shard_id in range(workers)]
+        self._context = multiprocessing.get_context("spawn")
+        # Several fan-outs can be in flight; each waits on every shard once
+        self._executor = ThreadPoolExecutor(max_workers=workers * 4, thread_name_prefix="gallery-shard")
+        self._reload: Optional[ReloadCallback] = None
+        self._health_task = None
+
+    def __len__(self) -> int:
+        return sum(len(shard.members) for shard in self._shards)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._shards[self.shard_of(key)].members
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    def shard_of(self, key: str) -> int:
+        """Shard that owns an enrollment key (every finger of a CNIC goes to the same shard)."""
+        return zlib.crc32(split_key(key)[0].encode()) % len(self._shards)
+
+    # ============================================================
+    # Lifecycle
+    # ============================================================
+
+    def open(self):
+        """Spawn every worker (blocking; the health check is not started)."""
+        for shard in self._shards:
+            self._spawn(shard)
+        logger.info("Gallery shards started: {} worker process(es)", len(self._shards))
+
+    def close(self):
+        """Stop every worker (blocking)."""
+        for shard in self._shards:
+            self._kill(shard, graceful=True)
+            shard.members.clear()
+        logger.info("Gallery shards stopped")
+
+    async def start(self, reload: ReloadCallback = None):
+        """Spawn the workers and start health checks."""
+        self._reload = reload
+        await asyncio.to_thread(self.open)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        """Stop health checks and the workers."""
+        if self._health_task:
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        await asyncio.to_thread(self.close)
+
+    def _spawn(self, shard: _Shard):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_worker, args=(child_conn, self.indexed),
+            name=f"gallery-shard-{shard.shard_id}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        shard.process, shard.conn = process, parent_conn
+        shard.ready = True
+
+    def _kill(self, shard: _Shard, graceful: bool = False):
+        """Stop a worker and drop its pipe (callers serialize through the shard lock)."""
+        shard.ready = False
+        process, conn = shard.process, shard.conn
+        shard.process = shard.conn = None
+        if conn is not None:
+            if graceful and process is not None and process.is_alive():
+                with contextlib.suppress(Exception):
+                    conn.send(("stop", ()))
+                    conn.poll(STOP_GRACE_SECONDS)
+            conn.close()
+        if process is not None:
+            process.join(STOP_GRACE_SECONDS if graceful else 0)
+            if process.is_alive():
+                process.terminate()
+                process.join(STOP_GRACE_SECONDS)
+
+    def _restart(self, shard: _Shard):
+        with shard.lock:
+            self._kill(shard)
+            shard.members.clear()
+            self._spawn(shard)
+            # Searches must not run on an empty shard until it is reloaded
+            shard.ready = False
+            shard.restarts += 1
+
+    async def _health_loop(self):
+        """Periodically ping idle workers; restart and reload failed shards."""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for shard in self._shards:
+                if shard.ready and await asyncio.to_thread(self._alive, shard):
+                    continue
+                if shard.process is None or not shard.process.is_alive():
+                    logger.warning("Gallery shard {} is down, restarting it", shard.shard_id)
+                    await asyncio.to_thread(self._restart, shard)
+                await self._reload_shard(shard)
+
+    def _alive(self, shard: _Shard) -> bool:
+        process = shard.process
+        if process is None or not process.is_alive():
+            return False
+        # A worker busy with a request is alive; a hung one hits the request timeout
+        if shard.lock.locked():
+            return True
+        try:
+            self._call(shard, "ping", timeout=PING_TIMEOUT)
+            return True
+        except GalleryShardError:
+            return False
+
+    async def _reload_shard(self, shard: _Shard):
+        if self._reload is None:
+            shard.ready = True
+            return
+        try:
+            await self._reload({shard.shard_id})
+        except Exception as e:
+            logger.error("Reloading gallery shard {} failed, retrying at the next health check: {}",
+                         shard.shard_id, e)
+            return
+        shard.ready = True
+        logger.info("Gallery shard {} reloaded: {} enrollment(s)", shard.shard_id, len(shard.members))
+
+    # ============================================================
+    # Requests
+    # ============================================================
+
+    def _call(self, shard: _Shard, operation: str, *args, timeout: float = None):
+        """Run one operation on a shard's worker and return its result."""
+        with shard.lock:
+            conn = shard.conn
+            if conn is None:
+                raise GalleryShardError(f"Gallery shard {shard.shard_id} is not running")
+            try:
+                conn.send((operation, args))
+                if not conn.poll(timeout or self.request_timeout):
+                    raise TimeoutError(f"no reply to {operation}")
+                status, result = conn.recv()
+            except (OSError, EOFError, TimeoutError) as e:
+                # Dead or hung: kill it so the health check restarts and reloads it
+                logger.error("Gallery shard {} failed: {}", shard.shard_id, e)
+                self._kill(shard)
+                raise GalleryShardError(f"Gallery shard {shard.shard_id} failed: {e}") from e
+        if status == "error":
+            raise GalleryShardError(f"Gallery shard {shard.shard_id}: {result}")
+        return result
+
+    def _fan_out(self, shards: Iterable[_Shard], operation: str, *args) -> list:
+        futures = [self._executor.submit(self._call, shard, operation, *args) for shard in shards]
+        return [future.result() for future in futures]
+
+    # ----------------------------------------------------------
+    # Mutations
+    # ----------------------------------------------------------
+
+    def add_template(self, key: str, template, cylinders=None) -> bool:
+        """Add (or replace) an enrollment from a decrypted template; see Gallery.add_template."""
+        return self.add_templates([(key, template, cylinders)]) == 1
+
+    def add_templates(self, items: List[Tuple[str, bytes, Optional[bytes]]]) -> int:
+        """
+        Add a batch of decrypted (key, template, cylinder codes) items,
+        each shard's share in parallel.
+
+        Returns:
+            int: How many templates were searchable NumPy templates
+        """
+        batches = {}
+        for key, template, cylinders in items:
+            batches.setdefault(self.shard_of(key), []).append(
+                (key, bytes(template), bytes(cylinders) if cylinders else None)
+            )
+
+        shards = [self._shards[shard_id] for shard_id in batches]
+        futures = [
+            self._executor.submit(self._call, shard, "add_templates", batches[shard.shard_id])
+            for shard in shards
+        ]
+        added = 0
+        for shard, future in zip(shards, futures):
+            accepted = set(future.result())
+            for key, _, _ in batches[shard.shard_id]:
+                if key in accepted:
+                    shard.members.add(key)
+                else:
+                    shard.members.discard(key)
+            added += len(accepted)
+        return added
+
+    def remove(self, key: str):
+        """Drop an enrollment, if any."""
+        shard = self._shards[self.shard_of(key)]
+        self._call(shard, "remove", key)
+        shard.members.discard(key)
+
+    def clear(self):
+        """Drop every enrollment (the workers keep running)."""
+        running = [shard for shard in self._shards if shard.conn is not None]
+        self._fan_out(running, "clear")
+        for shard in self._shards:
+            shard.members.clear()
+
+    def index_needs_merge(self) -> bool:
+        """Workers merge their own index after adds; nothing to schedule here."""
+        return False
+
+    def merge_index(self):
+        """Fold recent enrollments into every shard's index."""
+        self._fan_out(self._shards, "merge_index")
+
+    # ----------------------------------------------------------
+    # Snapshots
+    # ----------------------------------------------------------
+
+    def save_snapshot(self, directory: str, watermark: Optional[float], changed: Optional[Set[str]] = None) -> list:
+        """
+        Have every worker save its shard's snapshot (see gallery_snapshot.save):
+        a delta of its share of the changed enrollments, or a base if None.
+        """
+        shards = len(self._shards)
+        futures = []
+        for shard in self._shards:
+            shard_changed = None if changed is None else [
+                key for key in changed if self.shard_of(key) == shard.shard_id
+            ]
+            path = gallery_snapshot.snapshot_path(directory, shard.shard_id, shards)
+            futures.append(self._executor.submit(
+                self._call, shard, "save_snapshot", path, watermark, shard_changed, timeout=SNAPSHOT_TIMEOUT
+            ))
+        return [future.result() for future in futures]
+
+    def restore_snapshot(self, directory: str, runtime_dir: str = "",
+                         shards: Optional[Set[int]] = None) -> Dict[int, dict]:
+        """
+        Have workers restore their shard's snapshot.
+
+        Returns:
+            dict: shard -> restore info (see gallery_snapshot.restore), for
+                the shards restored; the others are left empty
+        """
+        count = len(self._shards)
+        targets = [shard for shard in self._shards if shards is None or shard.shard_id in shards]
+        futures = [
+            (shard, self._executor.submit(
+                self._call, shard, "restore_snapshot",
+                gallery_snapshot.snapshot_path(directory, shard.shard_id, count), runtime_dir,
+                timeout=SNAPSHOT_TIMEOUT
+            ))
+            for shard in targets
+        ]
+        restored = {}
+        for shard, future in futures:
+            try:
+                info, keys = future.result()
+            except GalleryShardError as e:
+                logger.warning("Gallery shard {} not restored from its snapshot: {}", shard.shard_id, e)
+                continue
+            shard.members = set(keys)
+            restored[shard.shard_id] = info
+        return restored
+
+    # ----------------------------------------------------------
+    # Search
+    # ----------------------------------------------------------
+
+    def identify(self, probe: np.ndarray, top_k: int = 5, shortlist: int = 64,
+                 retrieve: Optional[int] = None, screen: str = "cylinder") -> List[Candidate]:
+        """
+        Search every shard for a probe and merge their candidates.
+
+        The shortlist and retrieval budgets are split across shards: an
+        enrollee's screening rank within its shard is about its rank in the
+        whole gallery divided by the shard count.
+
+        Raises:
+            GalleryShardError: If a shard is down or still reloading
+        """
+        down = [shard.shard_id for shard in self._shards if not shard.ready]
+        if down:
+            raise GalleryShardError(f"Gallery shard(s) {down} unavailable")
+
+        count = len(self._shards)
+        shard_shortlist = max(top_k, -(-shortlist // count))
+        shard_retrieve = None if retrieve is None else max(shard_shortlist, -(-retrieve // count))
+        searched = [shard for shard in self._shards if shard.members]
+        results = self._fan_out(searched, "identify", probe, top_k, shard_shortlist, shard_retrieve, screen)
+
+        candidates = [candidate for result in results for candidate in result]
+        candidates.sort(key=lambda c: c.score, reverse=True)
+        return candidates[:top_k]
+
+    def stats(self) -> dict:
+        """Summed shard state plus per-worker health for /health."""
+        futures = [(shard, self._executor.submit(self._call, shard, "stats")) for shard in self._shards]
+        totals = {"enrollments": 0, "rows": 0, "minutiae": 0, "memory_bytes": 0}
+        searches, retrieved, penetration = 0, 0.0, 0.0
+        workers = []
+        for shard, future in futures:
+            try:
+                shard_stats = future.result()
+            except GalleryShardError:
+                shard_stats = None
+            if shard_stats:
+                for key in totals:
+                    totals[key] += shard_stats[key]
+                searches += shard_stats["indexed_searches"]
+                retrieved += shard_stats["mean_retrieved"] * shard_stats["indexed_searches"]
+                penetration += shard_stats["mean_penetration"] * shard_stats["indexed_searches"]
+            workers.append({
+                "shard": shard.shard_id,
+                "pid": shard.process.pid if shard.process else None,
+                "alive": shard_stats is not None,
+                "ready": shard.ready,
+                "enrollments": len(shard.members),
+                "restarts": shard.restarts,
+            })
+        return {
+            **totals,
+            # Every shard serves every search, so its count is the search count
+            "indexed_searches": searches // len(self._shards) if self._shards else 0,
+            "mean_retrieved": round(retrieved / searches * len(self._shards), 1) if searches else 0.0,
+            "mean_penetration": round(penetration / searches, 4) if searches else 0.0,
+            "workers": workers,
+        }
@@ -0,0 +1,482 @@
+"""
+Gallery Snapshots
+-----------------
+On-disk snapshots of an identification gallery (app.services.gallery), so
+a starting process maps its gallery in seconds instead of streaming and
+decrypting every enrolled template from the database.
+
+File format (versioned, little-endian): a sequence of segments
+    header     magic b"NPGS", version u8, kind u8 (base / delta), rows u64,
+               body bytes u64, directory bytes u64, SHA-256 of body + directory
+    body       the segment's columns, concatenated raw, encrypted in
+               CHUNK_BYTES chunks (app.services.crypto envelopes)
+    directory  encrypted JSON: column names, dtypes and shapes,
+               chunk sizes, watermark, SHA-256 of the plaintext columns
+
+The first segment is a base: every Gallery array (export_columns(), with
+the triplet index). Later saves append small delta segments holding the
+enrollments changed since (their minutiae and cylinder codes) and the
+enrollment keys removed; once deltas pass DELTA_FRACTION of the base rows or
+MAX_DELTA_SEGMENTS, the next save rewrites a single base instead. A
+segment that fails its checksum ends the file (e.g. a save interrupted by
+a crash); the watermark of the last good segment says what to re-read
+from the database.
+
+Restoring decrypts the base once into a plaintext map file in the runtime
+directory named after the segment checksum. The runtime directory is
+/dev/shm, so the plaintext never reaches a disk; where there is none (e.g.
+Windows) a directory must be configured explicitly, or the snapshot is not
+used. The owner removes the map file when it releases the gallery
+(remove_map). Every process restoring the same
+snapshot maps that file copy-on-write: pages are shared until a process
+writes to them, and each column has spare capacity so enrollments added
+after the restore stay in the mapping. Deltas are applied on top with
+Gallery.add().
+"""
+
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.crypto import decrypt_bytes, encrypt_bytes
+from app.services.gallery import Gallery
+from app.services.minutiae import MINUTIA_DTYPE
+from app.utils.logger import logger
+
+
+SNAPSHOT_MAGIC = b"NPGS"
+# 2: rows keyed by enrollment key (CNIC/finger); version 1 snapshots were
+# keyed by CNIC and are rebuilt from the database
+SNAPSHOT_VERSION = 2
+SEGMENT_HEADER = struct.Struct("<4sBB2xQQQ32s")
+KIND_BASE = 0
+KIND_DELTA = 1
+CHUNK_BYTES = 16 << 20
+
+MAP_MAGIC = b"NPGSMAP1"
+MAP_HEADER = struct.Struct("<8sQ")
+MAP_ALIGN = 64
+# Columns indexed by gallery row, minutia or posting get spare capacity in
+# the map file; the CSR arrays are replaced wholesale by a merge
+FIXED_COLUMNS = {"index_offsets", "index_sorted_rows"}
+MIN_SPARE_ROWS = 1024
+SPARE_FRACTION = 0.25
+
+DELTA_FRACTION = 0.25
+MAX_DELTA_SEGMENTS = 32
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be read (missing, corrupt or wrong key)."""
+    pass
+
+
+class _Segment:
+    """A verified segment's header and decrypted directory."""
+
+    def __init__(self, offset: int, kind: int, rows: int, body_length: int, checksum: bytes, directory: dict):
+        self.offset = offset
+        self.kind = kind
+        self.rows = rows
+        self.body_length = body_length
+        self.checksum = checksum
+        self.directory = directory
+
+    @property
+    def body_offset(self) -> int:
+        return self.offset + SEGMENT_HEADER.size
+
+
+def snapshot_path(directory: str, shard: Optional[int] = None, shards: Optional[int] = None) -> str:
+    """Snapshot file of the gallery, or of one shard of a sharded gallery."""
+    name = "gallery.snap" if shard is None else f"gallery-{shard}-of-{shards}.snap"
+    return os.path.join(directory, name)
+
+
+def _dtype(descr) -> np.dtype:
+    # JSON turns structured dtype descriptions into nested lists
+    if isinstance(descr, list):
+        descr = [tuple(field) for field in descr]
+    return np.lib.format.descr_to_dtype(descr)
+
+
+def _spare(length: int) -> int:
+    return max(MIN_SPARE_ROWS, int(length * SPARE_FRACTION))
+
+
+# ============================================================
+# Writing
+# ============================================================
+
+def _write_segment(file, kind: int, rows: int, meta: dict, columns: Dict[str, np.ndarray]):
+    """Append one segment at the file's current position."""
+    start = file.tell()
+    file.write(bytes(SEGMENT_HEADER.size))
+    checksum, plaintext = hashlib.sha256(), hashlib.sha256()
+    chunks, pending, body_length = [], [], 0
+
+    def flush():
+        nonlocal body_length
+        token = encrypt_bytes(b"".join(pending))
+        pending.clear()
+        file.write(token)
+        checksum.update(token)
+        chunks.append(len(token))
+        body_length += len(token)
+
+    entries, buffered = [], 0
+    for name, column in columns.items():
+        column = np.ascontiguousarray(column)
+        entries.append({"name": name, "dtype": np.lib.format.dtype_to_descr(column.dtype),
+                        "shape": list(column.shape)})
+        data = column.reshape(-1).view(np.uint8)
+        position = 0
+        while position < len(data):
+            # Pieces are sliced so every chunk but the last is CHUNK_BYTES
+            take = min(len(data) - position, CHUNK_BYTES - buffered)
+            piece = data[position:position + take].tobytes()
+            pending.append(piece)
+            plaintext.update(piece)
+            buffered += take
+            position += take
+            if buffered == CHUNK_BYTES:
+                flush()
+                buffered = 0
+    if pending:
+        flush()
+
+    directory = encrypt_bytes(json.dumps({
+        **meta,
+        "columns": entries,
+        "chunks": chunks,
+        "sha256": plaintext.hexdigest(),
+    }).encode())
+    file.write(directory)
+    checksum.update(directory)
+
+    end = file.tell()
+    file.seek(start)
+    file.write(SEGMENT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind, rows, body_length, len(directory),
+                                   checksum.digest()))
+    file.seek(end)
+
+
+def write_base(gallery: Gallery, path: str, watermark: Optional[float]) -> dict:
+    """Write a new snapshot holding the whole gallery (replaces the file atomically)."""
+    started = time.monotonic()
+    columns = gallery.export_columns()
+    rows = len(columns["identities"])
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as file:
+        _write_segment(file, KIND_BASE, rows, {"created": time.time(), "watermark": watermark}, columns)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+    logger.info("Gallery snapshot written: {} ({} rows, {:.1f}s)", path, rows, time.monotonic() - started)
+    return {"kind": "base", "rows": rows}
+
+
+def append_delta(gallery: Gallery, path: str, watermark: Optional[float], changed: Iterable[str]) -> dict:
+    """Append the changed enrollments (or removals) to a snapshot."""
+    changed = sorted(changed)
+    found, counts, minutiae, cylinders = gallery.export_entries(changed)
+    removed = sorted(set(changed) - set(found))
+    width = max([len(key) for key in changed] + [1])
+    columns = {
+        "identities": np.array(found, dtype=f"S{width}"),
+        "counts": counts,
+        "minutiae": minutiae,
+        "cylinders": cylinders,
+        "removed": np.array(removed, dtype=f"S{width}"),
+    }
+    with open(path, "r+b") as file:
+        file.seek(0, os.SEEK_END)
+        _write_segment(file, KIND_DELTA, len(changed), {"created": time.time(), "watermark": watermark}, columns)
+        file.flush()
+        os.fsync(file.fileno())
+    logger.info("Gallery snapshot delta appended: {} ({} changed)", path, len(changed))
+    return {"kind": "delta", "rows": len(changed)}
+
+
+def _segment_headers(path: str) -> Tuple[List[Tuple[int, int, int]], int]:
+    """
+    (kind, rows, segment bytes) of every complete segment, without
+    verifying them, and the file size.
+    """
+    headers = []
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        offset = 0
+        while offset + SEGMENT_HEADER.size <= size:
+            file.seek(offset)
+            magic, version, kind, rows, body, directory, _ = SEGMENT_HEADER.unpack(file.read(SEGMENT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                break
+            length = SEGMENT_HEADER.size + body + directory
+            if offset + length > size:
+                break
+            headers.append((kind, rows, length))
+            offset += length
+    return headers, size
+
+
+def save(gallery: Gallery, path: str, watermark: Optional[float], changed: Optional[Iterable[str]] = None) -> dict:
+    """
+    Save a gallery: a delta of the changed enrollments when the snapshot
+    has room for one, otherwise a new base.
+
+    Args:
+        gallery: Gallery to save
+        path: Snapshot file
+        watermark: Database time the snapshot is complete up to
+        changed: Identities enrolled or removed since the last save; None
+            forces a base
+    """
+    if changed is not None and os.path.exists(path):
+        headers, size = _segment_headers(path)
+        # A delta appended after a damaged segment would never be read
+        complete = sum(length for _, _, length in headers) == size
+        if complete and headers and headers[0][0] == KIND_BASE:
+            delta_rows = sum(rows for _, rows, _ in headers[1:]) + len(changed)
+            if len(headers) <= MAX_DELTA_SEGMENTS and delta_rows <= DELTA_FRACTION * max(headers[0][1], 1):
+                return append_delta(gallery, path, watermark, changed)
+    return write_base(gallery, path, watermark)
+
+
+# ============================================================
+# Reading
+# ============================================================
+
+def _read_segments(path: str) -> List[_Segment]:
+    """
+    Verify and decrypt every segment's directory; stops at the first bad one.
+
+    Raises:
+        SnapshotError: If the file is missing or its base segment is bad
+    """
+    segments = []
+    try:
+        file = open(path, "rb")
+    except OSError as e:
+        raise SnapshotError(f"Cannot open gallery snapshot {path}: {e}")
+    with file:
+        size = os.fstat(file.fileno()).st_size
+        offset = 0
+        while offset + SEGMENT_HEADER.size <= size:
+            file.seek(offset)
+            magic, version, kind, rows, body_length, directory_length, checksum = \
+                SEGMENT_HEADER.unpack(file.read(SEGMENT_HEADER.size))
+            problem = None
+            if magic != SNAPSHOT_MAGIC:
+                problem = "not a gallery snapshot segment"
+            elif version != SNAPSHOT_VERSION:
+                problem = f"unsupported snapshot version {version}"
+            elif offset + SEGMENT_HEADER.size + body_length + directory_length > size:
+                problem = "truncated"
+            else:
+                digest = hashlib.sha256()
+                remaining = body_length
+                while remaining:
+                    block = file.read(min(remaining, 1 << 20))
+                    digest.update(block)
+                    remaining -= len(block)
+                directory = file.read(directory_length)
+                digest.update(directory)
+                if digest.digest() != checksum:
+                    problem = "checksum mismatch"
+            if problem is None:
+                try:
+                    directory = json.loads(decrypt_bytes(directory))
+                except Exception as e:
+                    problem = f"unreadable directory ({type(e).__name__})"
+            if problem is not None:
+                if not segments:
+                    raise SnapshotError(f"Gallery snapshot {path} is unusable: {problem}")
+                logger.warning("Ignoring gallery snapshot {} from segment {} on: {}", path, len(segments), problem)
+                break
+            segments.append(_Segment(offset, kind, rows, body_length, checksum, directory))
+            offset += SEGMENT_HEADER.size + body_length + directory_length
+
+    if not segments or segments[0].kind != KIND_BASE:
+        raise SnapshotError(f"Gallery snapshot {path} has no base segment")
+    return segments
+
+
+def _plaintext(file, segment: _Segment):
+    """Decrypted body chunks of a segment, in order."""
+    file.seek(segment.body_offset)
+    for length in segment.directory["chunks"]:
+        yield decrypt_bytes(file.read(length))
+
+
+def _read_columns(path: str, segment: _Segment) -> Dict[str, np.ndarray]:
+    """Decrypt a (small) segment's columns into memory."""
+    with open(path, "rb") as file:
+        body = b"".join(_plaintext(file, segment))
+    if hashlib.sha256(body).hexdigest() != segment.directory["sha256"]:
+        raise SnapshotError("Gallery snapshot segment does not match its checksum")
+    columns, offset = {}, 0
+    for entry in segment.directory["columns"]:
+        dtype, shape = _dtype(entry["dtype"]), tuple(entry["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        columns[entry["name"]] = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += count * dtype.itemsize
+    return columns
+
+
+def _map_layout(segment: _Segment) -> Tuple[List[dict], int]:
+    """Offsets and capacities of the base columns in the map file."""
+    layout, offset = [], 0
+    for entry in segment.directory["columns"]:
+        dtype, shape = _dtype(entry["dtype"]), list(entry["shape"])
+        length = shape[0] if shape else 1
+        capacity = length if entry["name"] in FIXED_COLUMNS or entry["name"] == "identities" \
+            else length + _spare(length)
+        row_bytes = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+        layout.append({**entry, "length": length, "capacity": capacity, "offset": offset, "row_bytes": row_bytes})
+        offset += -(-capacity * row_bytes // MAP_ALIGN) * MAP_ALIGN
+    return layout, offset
+
+
+def _build_map(path: str, segment: _Segment, map_path: str):
+    """Decrypt a base segment into a plaintext map file (written to a temp name, then renamed)."""
+    layout, data_bytes = _map_layout(segment)
+    header = json.dumps({"columns": layout}).encode()
+    data_start = -(-(MAP_HEADER.size + len(header)) // MAP_ALIGN) * MAP_ALIGN
+    temp = f"{map_path}.{os.getpid()}.tmp"
+    plaintext = hashlib.sha256()
+
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as snapshot:
+            out.truncate(data_start + data_bytes)
+            out.write(MAP_HEADER.pack(MAP_MAGIC, len(header)) + header)
+            # The plaintext is the columns back to back; place each at its offset
+            columns = iter(layout)
+            column, written = None, 0
+            for chunk in _plaintext(snapshot, segment):
+                plaintext.update(chunk)
+                chunk = memoryview(chunk)
+                while len(chunk):
+                    if column is None or written == column["length"] * column["row_bytes"]:
+                        column, written = next(columns), 0
+                        continue
+                    take = min(len(chunk), column["length"] * column["row_bytes"] - written)
+                    out.seek(data_start + column["offset"] + written)
+                    out.write(chunk[:take])
+                    written += take
+                    chunk = chunk[take:]
+        if plaintext.hexdigest() != segment.directory["sha256"]:
+            raise SnapshotError("Gallery snapshot does not match its checksum")
+        os.replace(temp, map_path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def _open_map(map_path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, int]]:
+    """Map every column of a map file copy-on-write."""
+    with open(map_path, "rb") as file:
+        magic, header_length = MAP_HEADER.unpack(file.read(MAP_HEADER.size))
+        if magic != MAP_MAGIC:
+            raise SnapshotError(f"{map_path} is not a gallery map file")
+        layout = json.loads(file.read(header_length))["columns"]
+    data_start = -(-(MAP_HEADER.size + header_length) // MAP_ALIGN) * MAP_ALIGN
+
+    columns, lengths = {}, {}
+    for entry in layout:
+        dtype, shape = _dtype(entry["dtype"]), [entry["capacity"]] + entry["shape"][1:]
+        if entry["capacity"] == 0:
+            columns[entry["name"]] = np.zeros(shape, dtype=dtype)
+        else:
+            columns[entry["name"]] = np.memmap(map_path, dtype=dtype, mode="c",
+                                               offset=data_start + entry["offset"], shape=tuple(shape))
+        lengths[entry["name"]] = entry["length"]
+    return columns, lengths
+
+
+def runtime_directory(configured: str = "") -> str:
+    """
+    Where plaintext map files go: the configured directory, else /dev/shm.
+
+    Raises:
+        SnapshotError: If nothing is configured and there is no /dev/shm;
+            the temp directory is usually on disk, so it is never a fallback
+    """
+    if configured:
+        return configured
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    raise SnapshotError("No RAM-backed runtime directory for the gallery map "
+                        "(set IDENTIFY_SNAPSHOT_RUNTIME_DIR to use snapshots)")
+
+
+def remove_map(map_path: str):
+    """Delete a restored snapshot's plaintext map file (after the gallery released it)."""
+    try:
+        os.remove(map_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("Could not remove gallery map file {}: {}", map_path, e)
+
+
+def restore(gallery: Gallery, path: str, runtime_dir: str = "") -> dict:
+    """
+    Replace a gallery's contents with a snapshot.
+
+    Returns:
+        dict: watermark (of the last good segment), base rows, delta rows
+            applied, segments read, seconds taken, and the plaintext map
+            file (map_path; see remove_map)
+
+    Raises:
+        SnapshotError: If the snapshot cannot be used (the gallery is left as it was)
+    """
+    started = time.monotonic()
+    runtime_dir = runtime_directory(runtime_dir)
+    segments = _read_segments(path)
+    base = segments[0]
+
+    stem = os.path.basename(path)
+    map_path = os.path.join(runtime_dir, f"{stem}-{base.checksum.hex()[:16]}.map")
+    if not os.path.exists(map_path):
+        _build_map(path, base, map_path)
+        # Maps of older snapshots are only kept alive by processes still using them
+        for name in os.listdir(runtime_dir):
+            if name.startswith(f"{stem}-") and name.endswith(".map") and name != os.path.basename(map_path):
+                try:
+                    os.remove(os.path.join(runtime_dir, name))
+                except OSError:
+                    pass
+    columns, lengths = _open_map(map_path)
+    gallery.adopt_columns(columns, lengths)
+
+    delta_rows = 0
+    for segment in segments[1:]:
+        delta = _read_columns(path, segment)
+        for key in delta["removed"].tolist():
+            gallery.remove(key.decode())
+        offsets = np.concatenate(([0], np.cumsum(delta["counts"], dtype=np.int64)))
+        minutiae = delta["minutiae"].astype(MINUTIA_DTYPE, copy=False)
+        for i, key in enumerate(delta["identities"].tolist()):
+            gallery.add(key.decode(), minutiae[offsets[i]:offsets[i + 1]], delta["cylinders"][i])
+        delta_rows += segment.rows
+    if delta_rows and gallery.index_needs_merge():
+        gallery.merge_index()
+
+    info = {
+        "watermark": segments[-1].directory.get("watermark"),
+        "rows": base.rows,
+        "delta_rows": delta_rows,
+        "segments": len(segments),
+        "seconds": round(time.monotonic() - started, 2),
+        "map_path": map_path,
+    }
+    logger.info("Gallery restored from {}: {} rows + {} delta in {:.2f}s",
+                path, base.rows, delta_rows, info["seconds"])
+    return info
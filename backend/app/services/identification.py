@@ -0,0 +1,526 @@
+"""
+Fingerprint Identification Service
+----------------------------------
+1:N identification: find who a live capture belongs to without a CNIC,
+shared by the WebSocket and REST identification endpoints.
+
+Process Flow:
+1. At startup, load every enrolled NumPy template (and its stored cylinder
+   codes) from the enrollments table into the in-memory gallery, one row
+   per finger, decrypted off the event loop; codes missing from older
+   enrollments are computed and written back
+2. Enrollments saved afterwards are added to the gallery as they happen;
+   their triplet index postings are merged in the background once enough
+   have accumulated
+3. Capture a probe with the NumPy engine on a pooled reader
+4. Search the gallery and return the top-k people (each with their
+   best-matching finger) with names
+
+With IDENTIFY_WORKERS > 0 the gallery is sharded over that many worker
+processes (app.services.gallery_shards); a restarted worker's shard is
+reloaded from the database the same way.
+
+With IDENTIFY_SNAPSHOT_DIR set, step 1 restores the gallery from its
+on-disk snapshot (app.services.gallery_snapshot) and only re-reads the
+enrollments captured since the snapshot's watermark (captured_at);
+enrollments are then saved to the snapshot every IDENTIFY_SNAPSHOT_INTERVAL
+seconds, as a delta or a new base.
+
+A search may be scoped by IDENTIFY_PARTITION_KEYS columns (e.g.
+?subject=Physics): it then runs against a partition gallery holding only
+the matching enrollments (app.services.gallery_partitions), loaded on
+first use and evicted when idle. Partitions live in the API process. With
+IDENTIFY_GLOBAL_GALLERY disabled only scoped searches are served and
+nothing is loaded at startup (duplicate detection needs the global gallery).
+
+Only NumPy minutiae templates can be searched; SDK templates are skipped
+while loading (their owners must re-enroll with TEMPLATE_ENGINE=numpy).
+"""
+
+import asyncio
+import contextlib
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, func, select
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.crypto import decrypt_many, encrypt_many
+from app.services import gallery_snapshot
+from app.services.cylinder_codes import template_cylinder_codes
+from app.services.enrollments import FINGER_UNKNOWN
+from app.services.fingerprint_session import ScanSession
+from app.services.gallery import Candidate, Gallery, enrollment_key
+from app.services.gallery_partitions import PartitionedGalleries
+from app.services.gallery_shards import GalleryShardError, ShardedGallery
+from app.utils.logger import logger
+
+
+# Rows decrypted and added per worker-thread hop while loading
+LOAD_BATCH_SIZE = 1000
+# Seconds before a snapshot's watermark that are re-read after restoring it:
+# an enrollment committed just before the watermark may have reached the
+# gallery only after the snapshot was taken
+SNAPSHOT_WATERMARK_MARGIN = 300
+
+
+class IdentificationError(Exception):
+    """Raised when identification cannot run (gallery loading or empty)."""
+
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _create_gallery():
+    indexed = settings.IDENTIFY_STRATEGY == "index"
+    if settings.IDENTIFY_WORKERS > 0:
+        return ShardedGallery(
+            settings.IDENTIFY_WORKERS,
+            indexed=indexed,
+            request_timeout=settings.IDENTIFY_WORKER_TIMEOUT,
+            health_check_interval=settings.IDENTIFY_WORKER_HEALTH_CHECK_INTERVAL,
+        )
+    return Gallery(indexed=indexed)
+
+
+# Enrollment rows being loaded: (gallery key, stored template, stored
+# cylinder codes, enrollment id)
+EnrollmentRow = Tuple[str, bytes, Optional[bytes], int]
+
+# Process-wide gallery of enrolled NumPy templates
+gallery = _create_gallery()
+_gallery_loaded = False
+# Gallery keys enrolled (or removed) since the last snapshot save, and
+# whether the next save must write a new base
+_snapshot_changes: Set[str] = set()
+_snapshot_needs_base = False
+_snapshot_task: Optional[asyncio.Task] = None
+# Plaintext map files of restored snapshots, removed by close_gallery()
+_snapshot_maps: Set[str] = set()
+
+
+def _add_batch(target, rows: List[EnrollmentRow],
+               replace: bool = False) -> Tuple[int, List[dict]]:
+    """
+    Decrypt a batch of enrollments into a gallery.
+
+    Args:
+        replace: Re-add enrollments the gallery already holds (catching up
+            on a restored snapshot) instead of skipping them
+
+    Returns:
+        tuple: (searchable templates, backfill rows of newly computed
+            encrypted cylinder codes)
+    """
+    pending = []
+    for row in rows:
+        if replace:
+            _snapshot_changes.add(row[0])
+        # Already added by an enrollment saved while the gallery was loading
+        elif row[0] in target:
+            continue
+        pending.append(row)
+
+    # Templates and cylinder codes decrypted in one batch; unreadable (or
+    # missing) cylinder codes are recomputed and backfilled
+    decrypted = decrypt_many([blob for _, template, cylinders, _ in pending for blob in (template, cylinders)])
+    items, computed = [], []
+    for index, (key, _, _, enrollment_id) in enumerate(pending):
+        template, cylinders = decrypted[2 * index], decrypted[2 * index + 1]
+        if template is None:
+            logger.warning("Skipping unreadable template for {}", key)
+            continue
+        if cylinders is None:
+            try:
+                cylinders = template_cylinder_codes(template)
+            except Exception as e:
+                logger.warning("Skipping unreadable template for {}: {}", key, e)
+                continue
+            if cylinders:
+                computed.append((enrollment_id, cylinders))
+        items.append((key, template, cylinders))
+
+    encrypted = encrypt_many([cylinders for _, cylinders in computed])
+    backfill = [
+        {"b_id": enrollment_id, "b_cylinders": token}
+        for (enrollment_id, _), token in zip(computed, encrypted)
+    ]
+    return target.add_templates(items), backfill
+
+
+async def _add_and_backfill(target, batch: List[EnrollmentRow], replace: bool = False) -> int:
+    added, backfill = await asyncio.to_thread(_add_batch, target, batch, replace)
+    if backfill:
+        table = models.enrollments
+        query = (
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(cylinders_encrypted=bindparam("b_cylinders"))
+        )
+        await database.execute_many(query, backfill)
+    return added
+
+
+async def _load_into(target, where: Optional[list] = None, shards: Optional[Set[int]] = None,
+                     replace: bool = False) -> Tuple[int, int]:
+    """
+    Stream every enrolled finger (matching where, conditions on
+    models.enrollments; in the given shards if set) into a gallery.
+    """
+    table = models.enrollments
+    query = (
+        select(table.c.id, table.c.identity_number, table.c.finger_position, table.c.template_encrypted,
+               table.c.cylinders_encrypted)
+        .where(*(where or []))
+    )
+
+    total = added = 0
+    batch = []
+    async for rec in database.iterate(query):
+        key = enrollment_key(rec["identity_number"], rec["finger_position"])
+        if shards is not None and target.shard_of(key) not in shards:
+            continue
+        batch.append((key, rec["template_encrypted"], rec["cylinders_encrypted"], rec["id"]))
+        if len(batch) >= LOAD_BATCH_SIZE:
+            added += await _add_and_backfill(target, batch, replace)
+            total += len(batch)
+            batch = []
+    if batch:
+        added += await _add_and_backfill(target, batch, replace)
+        total += len(batch)
+    await asyncio.to_thread(target.merge_index)
+    return added, total
+
+
+def _snapshot_shards() -> Set[int]:
+    return set(range(gallery.shard_count)) if isinstance(gallery, ShardedGallery) else {0}
+
+
+async def _restore_snapshot(shards: Optional[Set[int]] = None) -> Dict[int, dict]:
+    """Restore the global gallery (or the given shards) from the snapshot; shard -> restore info."""
+    directory, runtime_dir = settings.IDENTIFY_SNAPSHOT_DIR, settings.IDENTIFY_SNAPSHOT_RUNTIME_DIR
+    if isinstance(gallery, ShardedGallery):
+        restored = await asyncio.to_thread(gallery.restore_snapshot, directory, runtime_dir, shards)
+    else:
+        try:
+            info = await asyncio.to_thread(
+                gallery_snapshot.restore, gallery, gallery_snapshot.snapshot_path(directory), runtime_dir
+            )
+        except Exception as e:
+            logger.warning("Identification gallery not restored from its snapshot: {}", e)
+            return {}
+        restored = {0: info}
+    _snapshot_maps.update(info["map_path"] for info in restored.values())
+    return restored
+
+
+async def _load(shards: Optional[Set[int]] = None) -> Tuple[int, int]:
+    """
+    Load enrolled templates into the global gallery (only the given shards'
+    if set): from the snapshot plus the enrollments saved since, or
+    streamed from the database if there is no usable snapshot.
+    """
+    global _snapshot_needs_base
+    wanted = shards if shards is not None else _snapshot_shards()
+    restored = await _restore_snapshot(shards) if settings.IDENTIFY_SNAPSHOT_DIR else {}
+    sharded = isinstance(gallery, ShardedGallery)
+    added = total = 0
+
+    if restored:
+        watermarks = [info["watermark"] for info in restored.values()]
+        since = None if None in watermarks else min(watermarks) - SNAPSHOT_WATERMARK_MARGIN
+        where = [] if since is None else [
+            models.enrollments.c.captured_at > datetime.fromtimestamp(since, timezone.utc)
+        ]
+        caught_up, total = await _load_into(gallery, where, set(restored) if sharded else None, replace=True)
+        added = sum(info["rows"] for info in restored.values()) + caught_up
+        logger.info("Identification gallery restored from its snapshot: {} enrollment(s) re-read from the database",
+                    total)
+
+    missing = wanted - set(restored)
+    if missing:
+        loaded, streamed = await _load_into(gallery, shards=missing if sharded else None)
+        added, total = added + loaded, total + streamed
+        # Without a snapshot for these shards, the next save must write a base
+        _snapshot_needs_base = bool(settings.IDENTIFY_SNAPSHOT_DIR)
+    return added, total
+
+
+async def _save_snapshot():
+    """Save the enrollments changed since the last save (a base if one is needed)."""
+    global _snapshot_needs_base
+    changed, base = set(_snapshot_changes), _snapshot_needs_base
+    if not changed and not base:
+        return
+    # Changes arriving from here on go into the next save
+    _snapshot_changes.difference_update(changed)
+    _snapshot_needs_base = False
+    watermark = (await database.fetch_val(select(func.now()))).timestamp()
+    directory = settings.IDENTIFY_SNAPSHOT_DIR
+    try:
+        if isinstance(gallery, ShardedGallery):
+            await asyncio.to_thread(gallery.save_snapshot, directory, watermark, None if base else changed)
+        else:
+            await asyncio.to_thread(
+                gallery_snapshot.save, gallery, gallery_snapshot.snapshot_path(directory), watermark,
+                None if base else changed
+            )
+    except BaseException:
+        _snapshot_changes.update(changed)
+        _snapshot_needs_base = _snapshot_needs_base or base
+        raise
+
+
+async def _snapshot_loop():
+    """Save the gallery snapshot every IDENTIFY_SNAPSHOT_INTERVAL seconds (right away if it needs a base)."""
+    while True:
+        if not _snapshot_needs_base:
+            await asyncio.sleep(settings.IDENTIFY_SNAPSHOT_INTERVAL)
+        try:
+            await _save_snapshot()
+        except Exception as e:
+            logger.error("Saving the identification gallery snapshot failed: {}", e)
+            await asyncio.sleep(settings.IDENTIFY_SNAPSHOT_INTERVAL)
+
+
+async def _load_partition(target: Gallery, scope: Dict[str, str]) -> int:
+    """Stream the enrollments matching a partition scope into its gallery."""
+    table = models.applications
+    scoped = select(table.c.identity_number).where(*(table.c[column] == value for column, value in scope.items()))
+    added, _ = await _load_into(target, where=[models.enrollments.c.identity_number.in_(scoped)])
+    return added
+
+
+def _partition_keys() -> List[str]:
+    keys = []
+    for key in settings.IDENTIFY_PARTITION_KEYS.split(","):
+        key = key.strip()
+        if not key:
+            continue
+        if key not in models.applications.c:
+            logger.warning("Ignoring partition key {}: applications has no such column", key)
+            continue
+        keys.append(key)
+    return keys
+
+
+# Per-scope galleries, loaded on demand
+partitions = PartitionedGalleries(
+    _partition_keys(),
+    _load_partition,
+    indexed=settings.IDENTIFY_STRATEGY == "index",
+    idle_seconds=settings.IDENTIFY_PARTITION_IDLE_SECONDS,
+    max_partitions=settings.IDENTIFY_MAX_PARTITIONS,
+)
+
+
+async def load_gallery():
+    """Start the gallery workers (if sharded) and load every enrolled template."""
+    global _gallery_loaded
+    partitions.start()
+    if not settings.IDENTIFY_GLOBAL_GALLERY:
+        logger.info("Global identification gallery disabled; partitions load on first scoped search")
+        return
+    try:
+        if isinstance(gallery, ShardedGallery):
+            await gallery.start(reload=_load)
+        added, _ = await _load()
+    except Exception as e:
+        logger.exception("Failed to load identification gallery: {}", e)
+        return
+
+    _gallery_loaded = True
+    logger.info("Identification gallery loaded: {} enrolled templates searchable", added)
+    if settings.IDENTIFY_SNAPSHOT_DIR:
+        global _snapshot_task
+        os.makedirs(settings.IDENTIFY_SNAPSHOT_DIR, exist_ok=True)
+        _snapshot_task = asyncio.create_task(_snapshot_loop())
+
+
+async def close_gallery():
+    """
+    Save pending snapshot changes, release the galleries (and stop the
+    workers, if sharded) and remove the restored snapshot map files.
+    """
+    await partitions.stop()
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _snapshot_task
+        try:
+            await _save_snapshot()
+        except Exception as e:
+            logger.error("Saving the identification gallery snapshot failed: {}", e)
+    if isinstance(gallery, ShardedGallery):
+        await gallery.stop()
+    else:
+        gallery.clear()
+    # The maps hold every enrolled minutia in plaintext: don't leave them behind
+    for map_path in _snapshot_maps:
+        gallery_snapshot.remove_map(map_path)
+    _snapshot_maps.clear()
+
+
+def _enroll(key: str, template, cylinders: Optional[bytes], application: Optional[dict]):
+    try:
+        if application is not None:
+            partitions.add_template(application, key, template, cylinders)
+        if not settings.IDENTIFY_GLOBAL_GALLERY:
+            return
+        if gallery.add_template(key, template, cylinders):
+            logger.info("Added {} to the identification gallery", key)
+        if settings.IDENTIFY_SNAPSHOT_DIR:
+            _snapshot_changes.add(key)
+        if gallery.index_needs_merge():
+            gallery.merge_index()
+    except Exception as e:
+        logger.error("Could not add {} to the identification gallery: {}", key, e)
+
+
+def enroll_in_gallery(identity_number: str, template, cylinders: Optional[bytes] = None,
+                      application: Optional[dict] = None, finger_position: int = FINGER_UNKNOWN):
+    """
+    Keep the galleries in step with a newly saved enrollment (in the background).
+
+    Args:
+        application: The enrollment's applications row; loaded partitions
+            whose scope it matches get the template too
+        finger_position: Finger the template was captured from; the
+            person's other fingers stay in the galleries
+    """
+    if not settings.IDENTIFICATION_ENABLED:
+        return
+    if application is not None:
+        application = {key: application[key] for key in partitions.keys}
+    key = enrollment_key(identity_number, finger_position)
+    # Adding may merge the index or wait on a busy shard worker
+    asyncio.get_running_loop().run_in_executor(None, _enroll, key, template, cylinders, application)
+
+
+def gallery_ready() -> bool:
+    """True once the startup load has finished."""
+    return _gallery_loaded
+
+
+def _retrieve() -> Optional[int]:
+    """Rows taken from the triplet index per search; None screens the whole gallery."""
+    return settings.IDENTIFY_INDEX_CANDIDATES if settings.IDENTIFY_STRATEGY == "index" else None
+
+
+async def search_gallery(minutiae, top_k: int) -> List[Candidate]:
+    """
+    Search the gallery for minutiae that are already extracted (no capture),
+    off the event loop.
+
+    Raises:
+        GalleryShardError: If a shard worker is down or reloading
+    """
+    return await asyncio.to_thread(
+        gallery.identify, minutiae, top_k, settings.IDENTIFY_SHORTLIST, _retrieve(), settings.IDENTIFY_SCREEN
+    )
+
+
+async def gallery_stats() -> dict:
+    """Gallery state for the health endpoint."""
+    return {
+        "loaded": _gallery_loaded,
+        **await asyncio.to_thread(gallery.stats),
+        "partitions": partitions.stats(),
+    }
+
+
+async def _full_names(identity_numbers: List[str]) -> Dict[str, str]:
+    """Fetch full names for a handful of candidates in one query."""
+    if not identity_numbers:
+        return {}
+    query = (
+        select(models.applications.c.identity_number, models.applications.c.full_name)
+        .where(models.applications.c.identity_number.in_(identity_numbers))
+    )
+    rows = await database.fetch_all(query)
+    return {row["identity_number"]: row["full_name"] for row in rows}
+
+
+async def _identify_in(target, send_event_callable) -> Optional[List[dict]]:
+    """Capture a probe and search a loaded gallery for it."""
+    if len(target) == 0:
+        raise IdentificationError("No fingerprints are enrolled for identification.", status_code=409)
+
+    # The gallery only holds NumPy templates, so the probe must be one too
+    session = ScanSession(None, None, template_engine="numpy")
+    try:
+        candidates = await session.run_identification(
+            send_event_callable, target, settings.IDENTIFY_TOP_K, settings.IDENTIFY_SHORTLIST, _retrieve(),
+            settings.IDENTIFY_SCREEN
+        )
+    except GalleryShardError as e:
+        logger.error("Identification failed: {}", e)
+        raise IdentificationError("Identification is recovering from a worker failure, please retry shortly.")
+    if candidates is None:
+        return None
+
+    names = await _full_names([c.identity_number for c in candidates])
+    results = [
+        {
+            **c.to_dict(),
+            "full_name": names.get(c.identity_number),
+            "matched": c.score >= settings.MATCH_THRESHOLD,
+        }
+        for c in candidates
+    ]
+    if results and results[0]["matched"]:
+        logger.info("Identified {} (score {})", results[0]["identity_number"], results[0]["score"])
+    else:
+        logger.info("Identification found no match in {} enrollments", len(target))
+    return results
+
+
+async def identify_finger(send_event_callable, scope: Optional[Dict[str, str]] = None) -> Optional[List[dict]]:
+    """
+    Capture a probe and search the gallery for it.
+    Cancelling the calling task stops the capture and returns the reader.
+
+    Args:
+        send_event_callable: Function to send WebSocket events
+        scope: Partition key values (e.g. {"subject": "Physics"}) to search
+            only the matching enrollments; None or empty searches everyone
+
+    Returns:
+        list: Candidate dicts (identity_number, full_name, score, matched),
+            best first; None if no probe was captured
+
+    Raises:
+        IdentificationError: If the scope is invalid (400), the gallery is
+            still loading, empty or has a shard worker down
+    """
+    if not settings.IDENTIFICATION_ENABLED:
+        raise IdentificationError("Identification is disabled on this server.")
+
+    if scope:
+        try:
+            partitions.scope_key(scope)
+        except ValueError as e:
+            raise IdentificationError(str(e), status_code=400)
+        if not partitions.is_loaded(scope):
+            await send_event_callable({
+                "type": "gallery_loading",
+                "message": "Loading enrolled fingerprints for this scope..."
+            })
+        try:
+            async with partitions.use(scope) as partition:
+                return await _identify_in(partition, send_event_callable)
+        except IdentificationError:
+            raise
+        except Exception as e:
+            logger.exception("Failed to load gallery partition {}: {}", scope, e)
+            raise IdentificationError("Could not load enrollments for this scope, please retry shortly.")
+
+    if not settings.IDENTIFY_GLOBAL_GALLERY:
+        raise IdentificationError(
+            f"Identification must be scoped by {', '.join(partitions.keys) or 'a partition key'}.", status_code=400
+        )
+    if not _gallery_loaded:
+        raise IdentificationError("Identification is starting up, please retry shortly.")
+    return await _identify_in(gallery, send_event_callable)
@@ -0,0 +1,262 @@
+"""
+Online Key Rotation
+-------------------
+Re-encrypts every stored template (and cylinder codes) under the active
+encryption key (ENCRYPTION_KEY_ID, app.services.crypto) while the server
+keeps running, so a key can be retired without an offline script.
+
+Process Flow:
+1. An admin starts a rotation; a paused or interrupted rotation to the same
+   key resumes from its checkpoint instead of starting over
+2. enrollments is walked in id order with keyset pagination,
+   KEY_ROTATION_BATCH_SIZE rows per query; rows already under the active
+   key are passed over
+3. Each batch is decrypted with whichever key wrote it (legacy Fernet
+   included) and re-encrypted with the active key (decrypt_many /
+   encrypt_many, on the crypto threads)
+4. The batch is written back with one UPDATE ... FROM (VALUES ...), in the
+   same transaction as the checkpoint (key_rotations.last_id); a row whose
+   template changed since it was read (re-enrolled) is left as it is
+5. Between batches the job sleeps to stay within KEY_ROTATION_ROWS_PER_SECOND
+
+Rotating away from FERNET_KEY: add a new key to ENCRYPTION_KEYS, make it
+ENCRYPTION_KEY_ID, restart, run a rotation to completion; FERNET_KEY (and
+key 0 derived from it) then encrypts nothing that is still stored. A
+rotation left running by a shutdown resumes at the next startup.
+"""
+
+import asyncio
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.crypto import active_key_id, decrypt_many, encrypt_many, token_key_id
+from app.utils.logger import logger
+
+
+# Rows needing rotation: (id, stored template, stored cylinder codes)
+StoredRow = Tuple[int, bytes, Optional[bytes]]
+
+_task: Optional[asyncio.Task] = None
+
+
+class KeyRotationError(Exception):
+    """Raised when a rotation cannot be started or paused."""
+
+    def __init__(self, message: str, status_code: int = 409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ============================================================
+# Re-encryption
+# ============================================================
+
+def _needs_rotation(template: bytes, cylinders: Optional[bytes]) -> bool:
+    return token_key_id(template) != active_key_id or (
+        cylinders is not None and token_key_id(cylinders) != active_key_id
+    )
+
+
+def _reencrypt(rows: List[StoredRow]) -> List[Tuple[int, bytes, bytes, Optional[bytes]]]:
+    """
+    Re-encrypt a batch under the active key (blocking; call off the event loop).
+
+    Returns:
+        list: (id, stored template, new template, new cylinder codes) for
+            each readable row; cylinder codes that cannot be decrypted are
+            dropped (the gallery recomputes them)
+    """
+    decrypted = decrypt_many([blob for _, template, cylinders in rows for blob in (template, cylinders)])
+    readable = []
+    for index, (row_id, stored, _) in enumerate(rows):
+        template, cylinders = decrypted[2 * index], decrypted[2 * index + 1]
+        if template is None:
+            logger.warning("Key rotation skipped enrollment {}: template does not decrypt", row_id)
+            continue
+        readable.append((row_id, stored, template, cylinders))
+
+    templates = encrypt_many([template for _, _, template, _ in readable])
+    codes = [cylinders for _, _, _, cylinders in readable if cylinders is not None]
+    encrypted_codes = iter(encrypt_many(codes))
+    return [
+        (row_id, stored, template, next(encrypted_codes) if cylinders is not None else None)
+        for (row_id, stored, _, cylinders), template in zip(readable, templates)
+    ]
+
+
+def _update_statement(rows: List[Tuple[int, bytes, bytes, Optional[bytes]]]) -> Tuple[str, dict]:
+    """One UPDATE ... FROM (VALUES ...) for a batch; RETURNING the ids it changed."""
+    tuples, values = [], {}
+    for n, (row_id, stored, template, cylinders) in enumerate(rows):
+        # Typed explicitly: VALUES parameters would otherwise resolve to text
+        tuples.append(f"(CAST(:id_{n} AS INTEGER), CAST(:stored_{n} AS BYTEA), "
+                      f"CAST(:template_{n} AS BYTEA), CAST(:cylinders_{n} AS BYTEA))")
+        values.update({f"id_{n}": row_id, f"stored_{n}": stored,
+                       f"template_{n}": template, f"cylinders_{n}": cylinders})
+    statement = (
+        "UPDATE enrollments AS e "
+        "SET template_encrypted = v.template, cylinders_encrypted = v.cylinders "
+        f"FROM (VALUES {', '.join(tuples)}) AS v (id, stored, template, cylinders) "
+        "WHERE e.id = v.id AND e.template_encrypted = v.stored "
+        "RETURNING e.id"
+    )
+    return statement, values
+
+
+# ============================================================
+# Job
+# ============================================================
+
+async def _checkpoint(rotation_id: int, **values):
+    table = models.key_rotations
+    await database.execute(
+        table.update().where(table.c.id == rotation_id).values(updated_at=func.now(), **values)
+    )
+
+
+async def _rotate(rotation: dict):
+    table = models.enrollments
+    last_id, processed = rotation["last_id"], rotation["processed"]
+    rotated, skipped = rotation["rotated"], rotation["skipped"]
+    rate = settings.KEY_ROTATION_ROWS_PER_SECOND
+    started, scanned = time.monotonic(), 0
+
+    while True:
+        query = (
+            select(table.c.id, table.c.template_encrypted, table.c.cylinders_encrypted)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(settings.KEY_ROTATION_BATCH_SIZE)
+        )
+        rows = await database.fetch_all(query)
+        if not rows:
+            break
+
+        stale = [
+            (rec["id"], rec["template_encrypted"], rec["cylinders_encrypted"])
+            for rec in rows
+            if _needs_rotation(rec["template_encrypted"], rec["cylinders_encrypted"])
+        ]
+        reencrypted = await asyncio.to_thread(_reencrypt, stale) if stale else []
+        last_id = rows[-1]["id"]
+        processed += len(rows)
+        async with database.transaction():
+            updated = 0
+            if reencrypted:
+                statement, values = _update_statement(reencrypted)
+                updated = len(await database.fetch_all(statement, values))
+            rotated += updated
+            skipped += len(stale) - updated
+            await _checkpoint(rotation["id"], last_id=last_id, processed=processed, rotated=rotated, skipped=skipped)
+
+        scanned += len(rows)
+        if rate > 0:
+            await asyncio.sleep(max(0.0, started + scanned / rate - time.monotonic()))
+    return rotated, skipped
+
+
+async def _run(rotation: dict):
+    started = time.monotonic()
+    try:
+        rotated, skipped = await _rotate(rotation)
+        await _checkpoint(rotation["id"], status="finished", finished_at=func.now())
+        logger.info("Key rotation to key {} finished: {} template(s) re-encrypted, {} skipped in {:.1f}s",
+                    rotation["key_id"], rotated, skipped, time.monotonic() - started)
+    except asyncio.CancelledError:
+        # Left "running" (shutdown) or already marked "paused"; resumes from the checkpoint
+        raise
+    except Exception as e:
+        logger.exception("Key rotation to key {} failed: {}", rotation["key_id"], e)
+        await _checkpoint(rotation["id"], status="failed", error=str(e))
+
+
+def _launch(rotation: dict):
+    global _task
+    _task = asyncio.create_task(_run(rotation))
+
+
+def _running() -> bool:
+    return _task is not None and not _task.done()
+
+
+async def _resumable() -> Optional[dict]:
+    """The latest unfinished rotation to the active key, if any."""
+    table = models.key_rotations
+    query = (
+        select(table)
+        .where(table.c.key_id == active_key_id, table.c.status.in_(("running", "paused", "failed")))
+        .order_by(table.c.id.desc())
+        .limit(1)
+    )
+    rec = await database.fetch_one(query)
+    return dict(rec) if rec else None
+
+
+async def start_key_rotation(admin: str) -> dict:
+    """
+    Start re-encrypting every template under the active key, or resume the
+    unfinished rotation to it.
+
+    Raises:
+        KeyRotationError: If a rotation is already running (409)
+    """
+    if _running():
+        raise KeyRotationError("A key rotation is already running.")
+    table = models.key_rotations
+    rotation = await _resumable()
+    if rotation is None:
+        total = await database.fetch_val(select(func.count()).select_from(models.enrollments))
+        rotation_id = await database.execute(
+            table.insert().values(key_id=active_key_id, status="running", total=total, started_by=admin)
+        )
+        rotation = dict(await database.fetch_one(select(table).where(table.c.id == rotation_id)))
+        logger.info("Key rotation to key {} started by {}: {} enrolled template(s)", active_key_id, admin, total)
+    else:
+        await _checkpoint(rotation["id"], status="running", error=None)
+        logger.info("Key rotation to key {} resumed by {} after enrollment {}",
+                    active_key_id, admin, rotation["last_id"])
+    _launch(rotation)
+    return await key_rotation_status()
+
+
+async def pause_key_rotation() -> dict:
+    """
+    Stop the running rotation at its last checkpoint.
+
+    Raises:
+        KeyRotationError: If no rotation is running (409)
+    """
+    rotation = await _resumable()
+    if not _running() or rotation is None:
+        raise KeyRotationError("No key rotation is running.")
+    _task.cancel()
+    await asyncio.gather(_task, return_exceptions=True)
+    await _checkpoint(rotation["id"], status="paused")
+    logger.info("Key rotation to key {} paused after enrollment {}", active_key_id, rotation["last_id"])
+    return await key_rotation_status()
+
+
+async def resume_key_rotation():
+    """At startup: resume a rotation to the active key that a shutdown interrupted."""
+    rotation = await _resumable()
+    if rotation is not None and rotation["status"] == "running" and not _running():
+        logger.info("Resuming key rotation to key {} after enrollment {}", active_key_id, rotation["last_id"])
+        _launch(rotation)
+
+
+async def key_rotation_status() -> dict:
+    """The latest rotation (any key) and whether it is running in this process."""
+    table = models.key_rotations
+    rec = await database.fetch_one(select(table).order_by(table.c.id.desc()).limit(1))
+    rotation = dict(rec) if rec else None
+    return {"active_key_id": active_key_id, "running": _running(), "rotation": rotation}
+
+
+async def stop_key_rotation():
+    """Cancel the running rotation (shutdown); it resumes at the next startup."""
+    if _running():
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
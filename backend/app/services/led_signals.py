@@ -0,0 +1,151 @@
+"""
+Reader LED Signalling
+---------------------
+Async LED pattern scheduler for a fingerprint reader.
+
+Patterns are sequences of (led_on, seconds) steps driven by event-loop
+timers, so no thread sleeps between steps and nothing runs while the LED
+is idle. Steps only record the wanted LED state; at most one
+SGFPM_SetLedOn command per reader is queued on its executor, and it
+applies the latest wanted state when it runs. Steps that fall due while a
+blocking capture holds the reader thread are therefore dropped instead of
+replayed in a burst afterwards, and a state the LED already shows is not
+sent again. Stopping cancels the pending timer immediately and turns the
+LED off with the next (or already queued) command. Each command is bound
+to the handle it was queued for, so a reader detached while a command is
+still queued gets LED-off rather than nothing.
+
+Patterns:
+- ready:   slow blink, repeats until replaced (waiting for a finger)
+- busy:    fast blink, repeats until replaced (processing)
+- success: solid on for one second, then off
+- error:   three quick blinks, then off
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from app.services.device_executor import DeviceExecutor
+from app.utils.logger import logger
+
+
+LedStep = Tuple[bool, float]
+
+# name -> (steps, repeat)
+LED_PATTERNS: Dict[str, Tuple[List[LedStep], bool]] = {
+    "ready": ([(True, 0.4), (False, 0.4)], True),
+    "busy": ([(True, 0.1), (False, 0.1)], True),
+    "success": ([(True, 1.0), (False, 0.0)], False),
+    "error": ([(True, 0.15), (False, 0.15)] * 3, False),
+}
+
+
+class LedSignaller:
+    """
+    Plays LED patterns on one reader using event-loop timers.
+    One signaller belongs to each pooled reader.
+    """
+
+    def __init__(self, executor: DeviceExecutor):
+        self._executor = executor
+        self._device = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._steps: List[LedStep] = []
+        self._repeat = False
+        self._index = 0
+        # Latest requested state, the state last sent to the reader, and
+        # whether a command is queued (read and written across threads;
+        # see _set_led)
+        self._wanted = False
+        self._lit: Optional[bool] = None
+        self._queued = False
+        self.pattern: Optional[str] = None
+
+    def attach(self, device):
+        """
+        Bind the signaller to a (re)opened device handle, or detach it with
+        None. The previous handle's queued command turns its LED off.
+        """
+        self.stop()
+        self._device = device
+        self._lit = None
+        # A command queued for the previous handle no longer covers this one
+        self._queued = False
+
+    def play(self, pattern: str):
+        """
+        Start an LED pattern, replacing whatever is playing.
+
+        Args:
+            pattern: Pattern name from LED_PATTERNS
+        """
+        steps, repeat = LED_PATTERNS[pattern]
+        self._cancel_timer()
+        self.pattern = pattern
+        self._steps = steps
+        self._repeat = repeat
+        self._index = 0
+        self._step()
+
+    def stop(self):
+        """Stop the current pattern immediately and turn the LED off."""
+        was_playing = self.pattern is not None
+        self._cancel_timer()
+        self.pattern = None
+        if was_playing:
+            self._set_led(False)
+
+    def release(self):
+        """
+        Called when the reader goes back to the pool: looping patterns stop,
+        finite ones (success, error) are allowed to finish.
+        """
+        if self._repeat or self.pattern is None:
+            self.stop()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _step(self):
+        self._timer = None
+        if self._index >= len(self._steps):
+            if not self._repeat:
+                self.pattern = None
+                return
+            self._index = 0
+
+        on, duration = self._steps[self._index]
+        self._index += 1
+        self._set_led(on)
+        self._timer = asyncio.get_running_loop().call_later(duration, self._step)
+
+    def _set_led(self, on: bool):
+        """Request an LED state; queues a command unless one is already waiting."""
+        device = self._device
+        if device is None:
+            return
+        self._wanted = on
+        if self._queued:
+            return
+        self._queued = True
+        try:
+            self._executor.post(self._apply_led, device)
+        except Exception as e:
+            self._queued = False
+            logger.warning("Could not queue LED command: {}", e)
+
+    def _apply_led(self, device):
+        # Runs on the reader's thread, ahead of any close queued after it
+        if device is not self._device:
+            # Detached (or replaced) since this was queued: leave it dark
+            device.set_led(False)
+            return
+        # Clearing _queued before reading _wanted means a state requested
+        # after this read queues a new command.
+        self._queued = False
+        on = self._wanted
+        if on == self._lit:
+            return
+        device.set_led(on)
+        self._lit = on
@@ -0,0 +1,156 @@
+"""
+NumPy Minutiae Matcher
+----------------------
+1:1 matcher for NumPy minutiae templates (app.services.minutiae).
+
+Alignment uses Hough voting: every (probe, enrolled) minutia pair votes
+for the rotation and translation that would map one onto the other, and
+the densest cells of the vote histogram (np.unique counts over the
+flattened rotation x dx x dy grid) are the candidate alignments. Each candidate is
+verified by aligning the whole probe and counting minutiae that land
+within distance and angle tolerance of an enrolled minutia.
+
+Score: 100 * matched^2 / (probe_count * enrolled_count), so a score only
+gets high when most minutiae on both sides agree.
+
+Templates are parsed by app.services.template_formats. ANSI 378 /
+ISO 19794-2 records are converted to NumPy templates when they are
+captured, but records stored before that can still be matched. SecuGen
+SG400 templates are matched on a reader instead (see
+FingerprintDevice.match_template); MatchResult carries either kind of score.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.minutiae import TemplateFormatError
+from app.services.template_formats import parse_template
+
+
+ANGLE_STEPS = 256              # template angle resolution (one turn)
+ROTATION_BINS = 32             # Hough rotation resolution (11.25 degrees)
+TRANSLATION_STEP = 12          # Hough translation resolution (pixels)
+CANDIDATE_ALIGNMENTS = 8       # densest Hough cells that are verified
+DISTANCE_TOLERANCE = 12        # pixels between paired minutiae after alignment
+ANGLE_TOLERANCE = 20           # angle steps (~28 degrees) between paired minutiae
+MIN_MINUTIAE = 6               # fewer minutiae than this never match
+
+
+class MatchResult:
+    """Outcome of one 1:1 comparison."""
+
+    __slots__ = ("matched", "score", "engine")
+
+    def __init__(self, matched: bool, score: int, engine: str):
+        self.matched = matched
+        self.score = score
+        self.engine = engine
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"matched": self.matched, "score": self.score, "engine": self.engine}
+
+
+def _angle_diff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Absolute circular difference between angles in template steps."""
+    diff = np.abs(a.astype(np.int16) - b.astype(np.int16)) % ANGLE_STEPS
+    return np.minimum(diff, ANGLE_STEPS - diff)
+
+
+def _count_paired(probe: np.ndarray, enrolled: np.ndarray, rotation: float,
+                  dx: float, dy: float) -> int:
+    """Align the probe and count minutiae paired one-to-one (greedy) with enrolled ones."""
+    cos, sin = np.cos(rotation), np.sin(rotation)
+    px = probe["x"].astype(np.float32)
+    py = probe["y"].astype(np.float32)
+    ax = cos * px - sin * py + dx
+    ay = sin * px + cos * py + dy
+    aa = (probe["angle"].astype(np.int32) + int(round(rotation * ANGLE_STEPS / (2 * np.pi)))) % ANGLE_STEPS
+
+    dist2 = (ax[:, None] - enrolled["x"][None, :].astype(np.float32)) ** 2 \
+        + (ay[:, None] - enrolled["y"][None, :].astype(np.float32)) ** 2
+    close = (dist2 <= DISTANCE_TOLERANCE ** 2) & (_angle_diff(aa[:, None], enrolled["angle"][None, :]) <= ANGLE_TOLERANCE)
+    if not close.any():
+        return 0
+
+    # Greedy one-to-one pairing, nearest pairs first
+    rows, cols = np.nonzero(close)
+    order = np.argsort(dist2[rows, cols], kind="stable")
+    used_rows, used_cols = set(), set()
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+    return len(used_rows)
+
+
+def match_minutiae(probe: np.ndarray, enrolled: np.ndarray) -> int:
+    """
+    Compare two minutiae sets.
+
+    Args:
+        probe: MINUTIA_DTYPE records (or MinutiaeArrays) from the live capture
+        enrolled: MINUTIA_DTYPE records (or MinutiaeArrays) from the stored template
+
+    Returns:
+        int: Similarity score (0-100)
+    """
+    n, m = len(probe), len(enrolled)
+    if n < MIN_MINUTIAE or m < MIN_MINUTIAE:
+        return 0
+
+    # Rotation for every pair, in radians
+    rot_steps = (enrolled["angle"][None, :].astype(np.int32) - probe["angle"][:, None].astype(np.int32)) % ANGLE_STEPS
+    rotation = rot_steps.astype(np.float32) * (2 * np.pi / ANGLE_STEPS)
+    cos, sin = np.cos(rotation), np.sin(rotation)
+
+    # Translation that maps each probe minutia onto each enrolled one
+    px = probe["x"][:, None].astype(np.float32)
+    py = probe["y"][:, None].astype(np.float32)
+    tx = enrolled["x"][None, :].astype(np.float32) - (cos * px - sin * py)
+    ty = enrolled["y"][None, :].astype(np.float32) - (sin * px + cos * py)
+
+    r_bin = (rot_steps * ROTATION_BINS // ANGLE_STEPS).ravel()
+    x_bin = np.floor(tx / TRANSLATION_STEP).astype(np.int64).ravel()
+    y_bin = np.floor(ty / TRANSLATION_STEP).astype(np.int64).ravel()
+    x_bin -= x_bin.min()
+    y_bin -= y_bin.min()
+    nx, ny = int(x_bin.max()) + 1, int(y_bin.max()) + 1
+
+    # Only occupied cells: the full grid is mostly empty
+    cells = (r_bin * nx + x_bin) * ny + y_bin
+    occupied, votes = np.unique(cells, return_counts=True)
+    peaks = occupied[np.argsort(votes, kind="stable")[-CANDIDATE_ALIGNMENTS:]]
+
+    best = 0
+    flat_rotation, flat_tx, flat_ty = rotation.ravel(), tx.ravel(), ty.ravel()
+    for cell in peaks:
+        members = cells == cell
+        # Circular mean keeps rotations near 0/2pi from averaging to pi
+        rot = float(np.arctan2(np.sin(flat_rotation[members]).mean(), np.cos(flat_rotation[members]).mean()))
+        paired = _count_paired(probe, enrolled, rot,
+                               float(flat_tx[members].mean()), float(flat_ty[members].mean()))
+        best = max(best, paired)
+
+    return int(round(100 * best * best / (n * m)))
+
+
+def match_templates(probe_template: bytes, enrolled_template: bytes) -> int:
+    """Compare two NumPy, ANSI 378 or ISO 19794-2 templates (see match_minutiae)."""
+    return match_minutiae(parse_template(probe_template), parse_template(enrolled_template))
+
+
+def match_template_pairs(pairs: List[Tuple[bytes, bytes]]) -> List[Optional[int]]:
+    """
+    Score many (probe, enrolled) template pairs (see match_minutiae).
+    Module-level so batch verification can run it in worker processes.
+
+    Returns:
+        list: One score per pair; None where either template could not be
+            parsed, so one bad pair does not fail the rest
+    """
+    scores = []
+    for probe, enrolled in pairs:
+        try:
+            scores.append(match_templates(probe, enrolled))
+        except TemplateFormatError:
+            scores.append(None)
+    return scores
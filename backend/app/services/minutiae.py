@@ -0,0 +1,354 @@
+"""
+NumPy Minutiae Extraction
+-------------------------
+SDK-independent fingerprint template extraction for the raw width x height
+8-bit grayscale buffers returned by capture_image_ex. Runs anywhere NumPy
+does (no SecuGen DLLs), so stored images can be reprocessed in bulk on Linux
+servers and extraction can be spread over a process pool
+(see app.utils.bulk_extract).
+
+Pipeline:
+1. Normalize: zero mean, unit variance over the print
+2. Segment: foreground mask from local ridge/valley variance
+3. Orientation field: smoothed gradient structure tensor (+ coherence)
+4. Enhance: oriented Gabor filter bank applied in the frequency domain
+5. Binarize: ridges are the negative Gabor response inside the mask
+6. Thin: vectorized Zhang-Suen skeletonization
+7. Detect: crossing number (1 = ridge ending, 3 = bifurcation)
+8. Prune: drop minutiae near the mask border, spurious close pairs and
+   low-coherence points; keep the best MAX_MINUTIAE
+
+Template format (little-endian):
+    header:  magic b"NPMT", version u8, width u16, height u16, count u16
+    records: x u16, y u16, angle u8 (256 steps per turn), type u8, quality u8
+"""
+
+import functools
+import struct
+from typing import Tuple
+import numpy as np
+
+
+TEMPLATE_MAGIC = b"NPMT"
+TEMPLATE_VERSION = 1
+TEMPLATE_HEADER = struct.Struct("<4sBHHH")
+
+MINUTIA_ENDING = 1
+MINUTIA_BIFURCATION = 2
+
+# One record per minutia; also the in-memory layout used by matchers
+MINUTIA_DTYPE = np.dtype([
+    ("x", "<u2"),
+    ("y", "<u2"),
+    ("angle", "u1"),
+    ("type", "u1"),
+    ("quality", "u1"),
+])
+
+# Tuning for 500 dpi sensors (SecuGen Hamster family)
+RIDGE_PERIOD = 9.0            # pixels between neighbouring ridges
+GRADIENT_RADIUS = 8           # structure tensor window (pixels)
+ORIENTATION_RADIUS = 12       # doubled-angle smoothing window (pixels)
+ORIENTATION_BINS = 16         # Gabor filter bank size
+GABOR_SIGMA = 4.0
+GABOR_RADIUS = 11
+SEGMENT_RADIUS = 8
+SEGMENT_STD = 0.25            # local std (normalized units) for foreground
+BORDER_MARGIN = 12            # minutiae closer than this to the mask edge are dropped
+MIN_PAIR_DISTANCE = 8         # closer minutiae pairs are treated as noise
+MIN_QUALITY = 20
+MAX_MINUTIAE = 128
+
+# 8-neighbourhood in clockwise order starting north: (dy, dx)
+_NEIGHBOURS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+
+
+class TemplateFormatError(ValueError):
+    """Raised when a blob is not a NumPy minutiae template."""
+    pass
+
+
+# ============================================================
+# Filters
+# ============================================================
+
+def _box_filter(values: np.ndarray, radius: int, mode: str = "edge") -> np.ndarray:
+    """
+    Mean over a (2r+1)^2 window using an integral image.
+    Edges clamp by default; mode="constant" treats outside the image as zero.
+    """
+    size = 2 * radius + 1
+    padded = np.pad(values, radius + 1, mode=mode).astype(np.float64)
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    total = (integral[size:, size:] - integral[:-size, size:]
+             - integral[size:, :-size] + integral[:-size, :-size])
+    return (total[:values.shape[0], :values.shape[1]] / (size * size)).astype(np.float32)
+
+
+def _fast_len(n: int) -> int:
+    """Smallest 2-3-5 smooth length >= n (fast FFT sizes)."""
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+@functools.lru_cache(maxsize=8)
+def _gabor_bank(shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Frequency responses of the oriented Gabor bank for one padded image shape.
+    Bin k filters ridges running at angle k * pi / ORIENTATION_BINS.
+    """
+    r = GABOR_RADIUS
+    y, x = np.mgrid[-r:r + 1, -r:r + 1].astype(np.float32)
+    bank = []
+    for k in range(ORIENTATION_BINS):
+        theta = k * np.pi / ORIENTATION_BINS
+        # Coordinate across the ridges (along the ridge normal) and along them
+        across = -x * np.sin(theta) + y * np.cos(theta)
+        along = x * np.cos(theta) + y * np.sin(theta)
+        kernel = np.exp(-(across ** 2 + along ** 2) / (2 * GABOR_SIGMA ** 2)) \
+            * np.cos(2 * np.pi * across / RIDGE_PERIOD)
+        kernel -= kernel.mean()
+        # Centre the kernel at the origin so the filtered image is not shifted
+        padded = np.zeros(shape, dtype=np.float32)
+        padded[:kernel.shape[0], :kernel.shape[1]] = kernel
+        padded = np.roll(padded, (-r, -r), axis=(0, 1))
+        bank.append(np.fft.rfft2(padded))
+    bank = np.stack(bank)
+    bank.setflags(write=False)
+    return bank
+
+
+# ============================================================
+# Pipeline stages
+# ============================================================
+
+def _normalize(image: np.ndarray) -> np.ndarray:
+    """Zero mean, unit variance."""
+    std = image.std()
+    return (image - image.mean()) / (std if std > 0 else 1.0)
+
+
+def _segment(norm: np.ndarray) -> np.ndarray:
+    """Foreground mask from local variance."""
+    mean = _box_filter(norm, SEGMENT_RADIUS)
+    var = _box_filter(norm * norm, SEGMENT_RADIUS) - mean * mean
+    mask = np.sqrt(np.maximum(var, 0.0)) > SEGMENT_STD
+    # Close small holes and drop isolated specks
+    return _box_filter(mask.astype(np.float32), SEGMENT_RADIUS) > 0.5
+
+
+def _orientation(norm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ridge orientation (radians in [0, pi)) and coherence (0-1) per pixel.
+    """
+    gy, gx = np.gradient(norm)
+    gxx = _box_filter(gx * gx, GRADIENT_RADIUS)
+    gyy = _box_filter(gy * gy, GRADIENT_RADIUS)
+    gxy = _box_filter(gx * gy, GRADIENT_RADIUS)
+
+    # Doubled-angle vector of the gradient, smoothed, then turned 90 degrees
+    cos2 = _box_filter(gxx - gyy, ORIENTATION_RADIUS)
+    sin2 = _box_filter(2 * gxy, ORIENTATION_RADIUS)
+    theta = (0.5 * np.arctan2(sin2, cos2) + np.pi / 2) % np.pi
+    coherence = np.hypot(cos2, sin2) / np.maximum(_box_filter(gxx + gyy, ORIENTATION_RADIUS), 1e-6)
+    return theta.astype(np.float32), np.clip(coherence, 0.0, 1.0).astype(np.float32)
+
+
+def _enhance(norm: np.ndarray, theta: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Oriented Gabor enhancement: filter with every bank entry, keep the local one."""
+    height, width = norm.shape
+    shape = (_fast_len(height + GABOR_RADIUS), _fast_len(width + GABOR_RADIUS))
+    spectrum = np.fft.rfft2(np.where(mask, norm, 0.0).astype(np.float32), s=shape)
+    filtered = np.fft.irfft2(spectrum[None] * _gabor_bank(shape), s=shape, axes=(1, 2))
+    filtered = filtered[:, :height, :width]
+
+    bins = np.rint(theta * ORIENTATION_BINS / np.pi).astype(np.intp) % ORIENTATION_BINS
+    return np.take_along_axis(filtered, bins[None], axis=0)[0]
+
+
+def _thin(ridges: np.ndarray) -> np.ndarray:
+    """
+    Zhang-Suen thinning, each sub-iteration vectorized over the image.
+
+    After one full pass of both sub-iterations, only pixels next to the last
+    two sub-iterations' removals can change, so later passes work on the
+    bounding box of those removals.
+    """
+    height, width = ridges.shape
+    padded = np.pad(ridges.astype(np.uint8), 1)
+    skeleton = padded[1:-1, 1:-1]
+    # Neighbour planes are views into the padded image, so they track removals
+    planes = [padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] for dy, dx in _NEIGHBOURS]
+    full = (0, height, 0, width)
+    region_box, last_box = full, full
+    idle_steps = 0
+    passes = 0
+    while idle_steps < 2:
+        step = passes % 2
+        y0, y1, x0, x1 = region_box
+        region = (slice(y0, y1), slice(x0, x1))
+        p = [plane[region] for plane in planes]
+        p2, p3, p4, p5, p6, p7, p8, p9 = p
+        count = sum(p)
+        transitions = sum((p[i] < p[(i + 1) % 8]) for i in range(8))
+        if step == 0:
+            cond = ((p2 & p4 & p6) | (p4 & p6 & p8)) == 0
+        else:
+            cond = ((p2 & p4 & p8) | (p2 & p6 & p8)) == 0
+        remove = (skeleton[region] == 1) & (count >= 2) & (count <= 6) & (transitions == 1) & cond
+
+        ys, xs = np.nonzero(remove)
+        passes += 1
+        if ys.size:
+            skeleton[region][remove] = 0
+            idle_steps = 0
+        else:
+            idle_steps += 1
+        box = (max(0, y0 + ys.min() - 2), min(height, y0 + ys.max() + 3),
+               max(0, x0 + xs.min() - 2), min(width, x0 + xs.max() + 3)) if ys.size else None
+        if passes >= 2:
+            boxes = [b for b in (box, last_box) if b is not None]
+            region_box = (min(b[0] for b in boxes), max(b[1] for b in boxes),
+                          min(b[2] for b in boxes), max(b[3] for b in boxes)) if boxes else region_box
+        last_box = box if passes >= 2 else full
+    return skeleton.astype(bool)
+
+
+def _detect(skeleton: np.ndarray):
+    """
+    Crossing-number minutiae detection.
+
+    Returns:
+        tuple: (ys, xs, types, direction_x, direction_y) where the direction
+            is the sum of skeleton neighbour offsets around each minutia
+    """
+    padded = np.pad(skeleton.astype(np.int8), 1)
+    height, width = skeleton.shape
+    p = [padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] for dy, dx in _NEIGHBOURS]
+    crossings = sum(np.abs(p[i] - p[(i + 1) % 8]) for i in range(8)) // 2
+
+    endings = skeleton & (crossings == 1)
+    bifurcations = skeleton & (crossings == 3)
+    ys, xs = np.nonzero(endings | bifurcations)
+    types = np.where(endings[ys, xs], MINUTIA_ENDING, MINUTIA_BIFURCATION).astype(np.uint8)
+
+    vx = sum(p[i][ys, xs].astype(np.float32) * dx for i, (dy, dx) in enumerate(_NEIGHBOURS))
+    vy = sum(p[i][ys, xs].astype(np.float32) * dy for i, (dy, dx) in enumerate(_NEIGHBOURS))
+    return ys, xs, types, vx, vy
+
+
+def _prune(ys, xs, keep):
+    """Drop both members of minutiae pairs closer than MIN_PAIR_DISTANCE."""
+    idx = np.nonzero(keep)[0]
+    if idx.size < 2:
+        return keep
+    dy = ys[idx, None].astype(np.float32) - ys[None, idx]
+    dx = xs[idx, None].astype(np.float32) - xs[None, idx]
+    close = (dx * dx + dy * dy) < MIN_PAIR_DISTANCE ** 2
+    np.fill_diagonal(close, False)
+    keep = keep.copy()
+    keep[idx[close.any(axis=1)]] = False
+    return keep
+
+
+# ============================================================
+# Public API
+# ============================================================
+
+def extract_minutiae(img_buffer, width: int, height: int) -> np.ndarray:
+    """
+    Extract minutiae from a raw grayscale capture.
+
+    Args:
+        img_buffer: Raw image bytes or memoryview (width * height, 8-bit)
+        width: Image width
+        height: Image height
+
+    Returns:
+        np.ndarray: MINUTIA_DTYPE records, best quality first
+
+    Raises:
+        ValueError: If the buffer size does not match width x height
+    """
+    pixels = np.frombuffer(img_buffer, dtype=np.uint8)
+    if pixels.size != width * height:
+        raise ValueError(f"Image buffer is {pixels.size} bytes, expected {width * height}")
+
+    norm = _normalize(pixels.reshape(height, width).astype(np.float32))
+    mask = _segment(norm)
+    if not mask.any():
+        return np.zeros(0, dtype=MINUTIA_DTYPE)
+
+    theta, coherence = _orientation(norm)
+    enhanced = _enhance(norm, theta, mask)
+    skeleton = _thin((enhanced < 0) & mask)
+    ys, xs, types, vx, vy = _detect(skeleton)
+
+    # Stay clear of the print border, where ridges end artificially
+    inner = _box_filter(mask.astype(np.float32), BORDER_MARGIN, mode="constant") > 0.999
+    quality = np.rint(coherence[ys, xs] * 100).astype(np.uint8)
+    keep = inner[ys, xs] & (quality >= MIN_QUALITY)
+    keep = _prune(ys, xs, keep)
+    ys, xs, types, vx, vy, quality = ys[keep], xs[keep], types[keep], vx[keep], vy[keep], quality[keep]
+
+    # Ridge orientation is ambiguous by pi: endings point away from their
+    # ridge, bifurcations towards their fork
+    orient = theta[ys, xs]
+    direction = np.where(types == MINUTIA_ENDING, np.arctan2(-vy, -vx), np.arctan2(vy, vx))
+    flip = np.cos(direction - orient) < 0
+    angle = (orient + np.where(flip, np.pi, 0.0)) % (2 * np.pi)
+
+    order = np.argsort(-quality.astype(np.int16), kind="stable")[:MAX_MINUTIAE]
+    minutiae = np.zeros(order.size, dtype=MINUTIA_DTYPE)
+    minutiae["x"] = xs[order]
+    minutiae["y"] = ys[order]
+    minutiae["angle"] = np.rint(angle[order] * 256 / (2 * np.pi)).astype(np.int32) % 256
+    minutiae["type"] = types[order]
+    minutiae["quality"] = quality[order]
+    return minutiae
+
+
+def encode_template(minutiae: np.ndarray, width: int, height: int) -> bytes:
+    """Serialize MINUTIA_DTYPE records into the compact template format."""
+    minutiae = np.asarray(minutiae, dtype=MINUTIA_DTYPE)
+    header = TEMPLATE_HEADER.pack(TEMPLATE_MAGIC, TEMPLATE_VERSION, width, height, len(minutiae))
+    return header + minutiae.tobytes()
+
+
+def decode_template(blob: bytes) -> Tuple[np.ndarray, int, int]:
+    """
+    Parse a compact template.
+
+    Returns:
+        tuple: (minutiae, width, height); minutiae is a read-only
+            MINUTIA_DTYPE view over the blob
+
+    Raises:
+        TemplateFormatError: If the blob is not a valid template
+    """
+    if len(blob) < TEMPLATE_HEADER.size:
+        raise TemplateFormatError("Template too short")
+    magic, version, width, height, count = TEMPLATE_HEADER.unpack_from(blob)
+    if magic != TEMPLATE_MAGIC or version != TEMPLATE_VERSION:
+        raise TemplateFormatError("Not a NumPy minutiae template")
+    expected = TEMPLATE_HEADER.size + count * MINUTIA_DTYPE.itemsize
+    if len(blob) != expected:
+        raise TemplateFormatError(f"Template is {len(blob)} bytes, expected {expected}")
+    minutiae = np.frombuffer(blob, dtype=MINUTIA_DTYPE, count=count, offset=TEMPLATE_HEADER.size)
+    return minutiae, width, height
+
+
+def is_minutiae_template(blob: bytes) -> bool:
+    """True if the blob starts with the NumPy minutiae template magic."""
+    return blob[:len(TEMPLATE_MAGIC)] == TEMPLATE_MAGIC
+
+
+def extract_template(img_buffer, width: int, height: int) -> bytes:
+    """Extract minutiae from a raw capture and return the compact template."""
+    return encode_template(extract_minutiae(img_buffer, width, height), width, height)
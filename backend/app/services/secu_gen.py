@@ -15,8 +15,8 @@ Key Process Flow:
 
 import ctypes
 import os
-import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from app.services.device_backend import FingerprintDevice
 from app.utils.logger import logger
 
 
@@ -25,10 +25,70 @@ class SecuGenError(Exception):
     pass
 
 
-class SecuGenDevice:
+class SGDeviceInfoParam(ctypes.Structure):
+    """Device information returned by SGFPM_GetDeviceInfo."""
+    _fields_ = [
+        ("DeviceID", ctypes.c_ulong),
+        ("DeviceSN", ctypes.c_char * 16),
+        ("ComPort", ctypes.c_ulong),
+        ("ComSpeed", ctypes.c_ulong),
+        ("ImageWidth", ctypes.c_ulong),
+        ("ImageHeight", ctypes.c_ulong),
+        ("Contrast", ctypes.c_ulong),
+        ("Brightness", ctypes.c_ulong),
+        ("Gain", ctypes.c_ulong),
+        ("ImageDPI", ctypes.c_ulong),
+        ("FWVersion", ctypes.c_ulong),
+    ]
+
+
+class SGFingerInfo(ctypes.Structure):
+    """Finger information passed to SGFPM_CreateTemplate."""
+    _fields_ = [
+        ("FingerNumber", ctypes.c_uint16),
+        ("ViewNumber", ctypes.c_uint16),
+        ("ImpressionType", ctypes.c_uint16),
+        ("ImageQuality", ctypes.c_uint16),
+    ]
+
+
+# SDK function prototypes: name -> (argtypes, restype). All return DWORD error codes.
+_UBYTE_P = ctypes.POINTER(ctypes.c_ubyte)
+_ULONG_P = ctypes.POINTER(ctypes.c_ulong)
+SGFPM_PROTOTYPES = {
+    "SGFPM_Create": ([ctypes.POINTER(ctypes.c_void_p)], ctypes.c_ulong),
+    "SGFPM_Init": ([ctypes.c_void_p, ctypes.c_ulong], ctypes.c_ulong),
+    "SGFPM_OpenDevice": ([ctypes.c_void_p, ctypes.c_ulong], ctypes.c_ulong),
+    "SGFPM_CloseDevice": ([ctypes.c_void_p], ctypes.c_ulong),
+    "SGFPM_Terminate": ([ctypes.c_void_p], ctypes.c_ulong),
+    "SGFPM_GetDeviceInfo": ([ctypes.c_void_p, ctypes.POINTER(SGDeviceInfoParam)], ctypes.c_ulong),
+    "SGFPM_SetBrightness": ([ctypes.c_void_p, ctypes.c_ulong], ctypes.c_ulong),
+    "SGFPM_SetTemplateFormat": ([ctypes.c_void_p, ctypes.c_uint16], ctypes.c_ulong),
+    "SGFPM_GetMaxTemplateSize": ([ctypes.c_void_p, _ULONG_P], ctypes.c_ulong),
+    "SGFPM_SetLedOn": ([ctypes.c_void_p, ctypes.c_int], ctypes.c_ulong),  # BOOL
+    "SGFPM_GetImageEx": ([ctypes.c_void_p, _UBYTE_P, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_ulong],
+                         ctypes.c_ulong),
+    "SGFPM_GetImageQuality": ([ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, _UBYTE_P, _ULONG_P],
+                              ctypes.c_ulong),
+    "SGFPM_CreateTemplate": ([ctypes.c_void_p, ctypes.POINTER(SGFingerInfo), _UBYTE_P, _UBYTE_P],
+                             ctypes.c_ulong),
+    "SGFPM_GetTemplateSize": ([ctypes.c_void_p, _UBYTE_P, _ULONG_P], ctypes.c_ulong),
+    "SGFPM_MatchTemplate": ([ctypes.c_void_p, _UBYTE_P, _UBYTE_P, ctypes.c_ulong, ctypes.POINTER(ctypes.c_int)],
+                            ctypes.c_ulong),
+    "SGFPM_GetMatchingScore": ([ctypes.c_void_p, _UBYTE_P, _UBYTE_P, _ULONG_P], ctypes.c_ulong),
+}
+
+
+class SecuGenDevice(FingerprintDevice):
     """
     SecuGen fingerprint device interface.
     Implements proper SDK workflow: Image capture → Template creation
+
+    Image and template buffers are allocated once per device and reused by
+    every capture. capture_image_ex() returns a memoryview over one of the
+    device's image buffers (one per burst slot), which get_image_quality()
+    and create_template() hand back to the SDK without copying. A view is
+    only valid until the next capture into the same slot.
     """
 
     # SDK paths
@@ -60,16 +120,27 @@ class SecuGenDevice:
     # Impression type
     SG_IMPTYPE_LP = 0x00  # Live-scan plain
 
+    # Matching security levels (SL_LOWEST = 1 ... SL_HIGHEST = 9)
+    SL_NORMAL = 5
+
     # Class-level SDK library (shared across instances)
     _sg = None
     _sdk_loaded = False
 
     def __init__(self):
         """Initialize device wrapper (does not connect to hardware yet)."""
+        super().__init__()
         self.hFPM = ctypes.c_void_p()
-        self.width = 0
-        self.height = 0
-        self.max_template_size = 0
+
+        # Reusable buffers and SDK out-parameters (see _allocate_image_buffer)
+        self._image_buffers = []
+        self._image_views = []
+        self._template_buffer = None
+        self._template_view = None
+        self._finger_info = SGFingerInfo()
+        self._quality_out = ctypes.c_ulong(0)
+        self._size_out = ctypes.c_ulong(0)
+
         self._ensure_sdk_loaded()
 
     @classmethod
@@ -101,8 +172,15 @@ class SecuGenDevice:
             logger.debug("Loaded sgwsqlib.dll")
             
             # Load main library
-            cls._sg = ctypes.CDLL(cls.DLL_SGFPLIB)
+            sg = ctypes.CDLL(cls.DLL_SGFPLIB)
             logger.debug("Loaded sgfplib.dll")
+
+            # Declare prototypes once so calls skip per-call argument conversion
+            for name, (argtypes, restype) in SGFPM_PROTOTYPES.items():
+                func = getattr(sg, name)
+                func.argtypes = argtypes
+                func.restype = restype
+            cls._sg = sg
             
             cls._sdk_loaded = True
             logger.info("SecuGen SDK loaded successfully")
@@ -171,7 +249,7 @@ class SecuGenDevice:
             device_name = self.SG_DEV_AUTO
 
         logger.debug("Initializing SGFPM (device_name=%d)...", device_name)
-        res = self.sg.SGFPM_Init(self.hFPM, ctypes.c_ulong(device_name))
+        res = self.sg.SGFPM_Init(self.hFPM, device_name)
         self._check_error("SGFPM_Init", res)
         logger.info("SGFPM initialized")
 
@@ -183,7 +261,7 @@ class SecuGenDevice:
             device_id: Device ID (0-9 for multiple devices, USB_AUTO_DETECT for auto)
         """
         logger.debug("Opening device (device_id=%d)...", device_id)
-        res = self.sg.SGFPM_OpenDevice(self.hFPM, ctypes.c_ulong(device_id))
+        res = self.sg.SGFPM_OpenDevice(self.hFPM, device_id)
         self._check_error("SGFPM_OpenDevice", res)
         logger.info("Device opened successfully")
 
@@ -222,27 +300,49 @@ class SecuGenDevice:
         finally:
             self.hFPM = ctypes.c_void_p()
 
+    def is_alive(self) -> bool:
+        """
+        Probe the opened device with SGFPM_GetDeviceInfo.
+
+        Returns:
+            bool: True if the device still answers SDK calls
+        """
+        if not self.hFPM:
+            return False
+        info = SGDeviceInfoParam()
+        res = self.sg.SGFPM_GetDeviceInfo(self.hFPM, ctypes.byref(info))
+        if res != self.SGFDX_ERROR_NONE:
+            logger.warning("Device health probe failed (code {})", res)
+            return False
+        return True
+
+    def enumerate_devices(self, max_devices: int = 10) -> List[int]:
+        """
+        Find attached readers by probing SGFPM_OpenDevice for each device ID.
+        Requires create() and init(); the handle is left closed.
+
+        Args:
+            max_devices: Number of device IDs to probe (0..max_devices-1)
+
+        Returns:
+            list: Device IDs that opened successfully
+        """
+        device_ids = []
+        for device_id in range(max_devices):
+            res = self.sg.SGFPM_OpenDevice(self.hFPM, device_id)
+            if res == self.SGFDX_ERROR_NONE:
+                device_ids.append(device_id)
+                self.sg.SGFPM_CloseDevice(self.hFPM)
+            else:
+                logger.debug("No reader at device ID {} (code {})", device_id, res)
+        return device_ids
+
     # ============================================================
     # Device Information & Configuration
     # ============================================================
 
     def _load_device_info(self):
         """Load device information (width, height, etc.)."""
-        class SGDeviceInfoParam(ctypes.Structure):
-            _fields_ = [
-                ("DeviceID", ctypes.c_ulong),
-                ("DeviceSN", ctypes.c_char * 16),
-                ("ComPort", ctypes.c_ulong),
-                ("ComSpeed", ctypes.c_ulong),
-                ("ImageWidth", ctypes.c_ulong),
-                ("ImageHeight", ctypes.c_ulong),
-                ("Contrast", ctypes.c_ulong),
-                ("Brightness", ctypes.c_ulong),
-                ("Gain", ctypes.c_ulong),
-                ("ImageDPI", ctypes.c_ulong),
-                ("FWVersion", ctypes.c_ulong),
-            ]
-
         info = SGDeviceInfoParam()
         res = self.sg.SGFPM_GetDeviceInfo(self.hFPM, ctypes.byref(info))
         
@@ -257,6 +357,51 @@ class SecuGenDevice:
             self.width = 300
             self.height = 400
 
+        self._allocate_image_buffer()
+
+    def _allocate_image_buffer(self):
+        """(Re)allocate the reusable image buffers for the current image size."""
+        img_size = self.width * self.height
+        if not self._image_buffers or len(self._image_buffers[0]) != img_size:
+            self._image_buffers = []
+            self._image_views = []
+            self._image_slot(0)
+
+    def _image_slot(self, slot: int) -> ctypes.Array:
+        """Return the image buffer for a capture slot, allocating it on first use."""
+        if not self._image_buffers and slot > 0:
+            self._allocate_image_buffer()
+        img_size = self.width * self.height
+        while len(self._image_buffers) <= slot:
+            buffer = (ctypes.c_ubyte * img_size)()
+            self._image_buffers.append(buffer)
+            self._image_views.append(memoryview(buffer).cast('B'))
+            logger.debug("Allocated {} byte image buffer (slot {})", img_size, len(self._image_buffers) - 1)
+        return self._image_buffers[slot]
+
+    def _image_pointer(self, img_buffer) -> ctypes.Array:
+        """
+        Resolve an image buffer into a ctypes array the SDK can read.
+
+        The device's own capture view maps straight back to its buffer, and
+        writable buffers (bytearray, numpy arrays) are wrapped in place.
+        Read-only bytes have to be copied once.
+        """
+        if isinstance(img_buffer, memoryview):
+            for buffer in self._image_buffers:
+                if img_buffer.obj is buffer:
+                    return buffer
+        return self._ubyte_array(img_buffer)
+
+    @staticmethod
+    def _ubyte_array(data) -> ctypes.Array:
+        """Wrap a writable buffer in place; read-only buffers are copied once."""
+        view = memoryview(data).cast('B')
+        array_type = ctypes.c_ubyte * len(view)
+        if view.readonly:
+            return array_type.from_buffer_copy(view)
+        return array_type.from_buffer(view)
+
     def get_device_info(self) -> Dict[str, Any]:
         """
         Get device information.
@@ -277,7 +422,7 @@ class SecuGenDevice:
             brightness: Brightness level (0-100, recommended: 50)
         """
         logger.debug("Setting brightness to %d...", brightness)
-        res = self.sg.SGFPM_SetBrightness(self.hFPM, ctypes.c_ulong(brightness))
+        res = self.sg.SGFPM_SetBrightness(self.hFPM, brightness)
         if res == self.SGFDX_ERROR_NONE:
             logger.debug("Brightness set successfully")
         else:
@@ -294,7 +439,7 @@ class SecuGenDevice:
             format_type = self.TEMPLATE_FORMAT_SG400
 
         logger.debug("Setting template format to 0x%04X...", format_type)
-        res = self.sg.SGFPM_SetTemplateFormat(self.hFPM, ctypes.c_uint16(format_type))
+        res = self.sg.SGFPM_SetTemplateFormat(self.hFPM, format_type)
         self._check_error("SGFPM_SetTemplateFormat", res)
         
         # Get max template size after setting format
@@ -302,6 +447,10 @@ class SecuGenDevice:
         res = self.sg.SGFPM_GetMaxTemplateSize(self.hFPM, ctypes.byref(max_size))
         self._check_error("SGFPM_GetMaxTemplateSize", res)
         self.max_template_size = max_size.value
+
+        # Reusable template buffer sized for the selected format
+        self._template_buffer = (ctypes.c_ubyte * self.max_template_size)()
+        self._template_view = memoryview(self._template_buffer).cast('B')
         logger.info("Template format set. Max template size: %d bytes", self.max_template_size)
 
     # ============================================================
@@ -315,28 +464,44 @@ class SecuGenDevice:
         Args:
             on: True to turn on, False to turn off
         """
-        self.sg.SGFPM_SetLedOn(self.hFPM, ctypes.c_bool(on))
-
-    def blink_led(self, times: int = 2, interval: float = 0.3):
-        """
-        Blink LED multiple times.
-        
-        Args:
-            times: Number of blinks
-            interval: Interval between blinks in seconds
-        """
-        logger.debug("Blinking LED %d times...", times)
-        for _ in range(times):
-            self.set_led(True)
-            time.sleep(interval)
-            self.set_led(False)
-            time.sleep(interval)
+        self.sg.SGFPM_SetLedOn(self.hFPM, 1 if on else 0)
 
     # ============================================================
     # Image Capture (Step 1 of fingerprint capture)
     # ============================================================
 
-    def capture_image_ex(self, timeout_ms: int = 10000, quality_threshold: int = 30) -> Optional[bytes]:
+    def is_finger_present(self, probe_ms: int = 150, presence_quality: int = 10) -> bool:
+        """
+        Probe for a finger with a short GetImageEx call.
+
+        The SDK's auto-on facility (SGFPM_EnableAutoOnEvent) reports finger
+        placement as window messages and needs an HWND, which a headless
+        service does not have, so presence is detected with short bounded
+        captures instead. Each probe blocks for at most probe_ms.
+
+        Args:
+            probe_ms: Probe timeout in milliseconds
+            presence_quality: Minimum quality that counts as a finger
+
+        Returns:
+            bool: True if a finger is on the sensor
+        """
+        res = self.sg.SGFPM_GetImageEx(
+            self.hFPM,
+            self._image_slot(0),
+            probe_ms,
+            None,  # HWND - must be None
+            presence_quality
+        )
+        if res == self.SGFDX_ERROR_NONE:
+            return True
+        if res in (self.SGFDX_ERROR_TIMEOUT, self.SGFDX_ERROR_WRONG_IMAGE):
+            return False
+        self._check_error("SGFPM_GetImageEx", res)
+        return False
+
+    def capture_image_ex(self, timeout_ms: int = 10000, quality_threshold: int = 30,
+                         slot: int = 0) -> Optional[memoryview]:
         """
         Capture fingerprint IMAGE with quality checking.
         
@@ -346,32 +511,32 @@ class SecuGenDevice:
         Args:
             timeout_ms: Timeout in milliseconds
             quality_threshold: Minimum quality threshold (0-100)
+            slot: Image buffer slot; burst captures use one slot per frame
             
         Returns:
-            bytes: Raw image buffer if successful, None otherwise
+            memoryview: View over the slot's image buffer if successful, None otherwise.
+                The view is overwritten by the next capture into the same slot.
             
         Raises:
             SecuGenError: On capture failure
         """
         logger.debug("Capturing image (timeout=%dms, quality=%d)...", timeout_ms, quality_threshold)
 
-        # Allocate image buffer
-        img_size = self.width * self.height
-        img_buffer = (ctypes.c_ubyte * img_size)()
+        image_buffer = self._image_slot(slot)
 
-        # Capture image with quality checking
+        # Capture image with quality checking into the reusable buffer
         # CRITICAL: Pass None for HWND, not 0
         res = self.sg.SGFPM_GetImageEx(
             self.hFPM,
-            ctypes.cast(img_buffer, ctypes.POINTER(ctypes.c_ubyte)),
-            ctypes.c_ulong(timeout_ms),
+            image_buffer,
+            timeout_ms,
             None,  # HWND - must be None
-            ctypes.c_ulong(quality_threshold)
+            quality_threshold
         )
 
         if res == self.SGFDX_ERROR_NONE:
-            logger.info("Image captured successfully (%d bytes)", img_size)
-            return bytes(img_buffer)
+            logger.info("Image captured successfully ({} bytes)", len(image_buffer))
+            return self._image_views[slot]
         elif res == self.SGFDX_ERROR_TIMEOUT:
             logger.warning("Capture timeout - no finger detected")
             raise TimeoutError("No finger detected within timeout period")
@@ -382,12 +547,12 @@ class SecuGenDevice:
             self._check_error("SGFPM_GetImageEx", res)
             return None
 
-    def get_image_quality(self, img_buffer: bytes, width: int, height: int) -> int:
+    def get_image_quality(self, img_buffer, width: int, height: int) -> int:
         """
         Get quality score of captured image.
         
         Args:
-            img_buffer: Raw image bytes
+            img_buffer: Raw image (view returned by capture_image_ex, or any buffer)
             width: Image width
             height: Image height
             
@@ -395,22 +560,18 @@ class SecuGenDevice:
             int: Quality score (0-100)
         """
         logger.debug("Checking image quality...")
-        
-        # Convert bytes to ctypes array
-        img_array = (ctypes.c_ubyte * len(img_buffer)).from_buffer_copy(img_buffer)
-        quality = ctypes.c_ulong(0)
 
         res = self.sg.SGFPM_GetImageQuality(
             self.hFPM,
-            ctypes.c_ulong(width),
-            ctypes.c_ulong(height),
-            ctypes.cast(img_array, ctypes.POINTER(ctypes.c_ubyte)),
-            ctypes.byref(quality)
+            width,
+            height,
+            self._image_pointer(img_buffer),
+            ctypes.byref(self._quality_out)
         )
 
         if res == self.SGFDX_ERROR_NONE:
-            logger.debug("Image quality: %d", quality.value)
-            return quality.value
+            logger.debug("Image quality: {}", self._quality_out.value)
+            return self._quality_out.value
         else:
             logger.warning("Could not determine quality (code %d)", res)
             return 0
@@ -419,7 +580,7 @@ class SecuGenDevice:
     # Template Creation (Step 2 of fingerprint capture)
     # ============================================================
 
-    def create_template(self, img_buffer: bytes, quality: int = 50) -> Optional[bytes]:
+    def create_template(self, img_buffer, quality: int = 50) -> Optional[bytes]:
         """
         Create fingerprint TEMPLATE from captured image.
         
@@ -427,7 +588,7 @@ class SecuGenDevice:
         Call this AFTER capture_image_ex().
         
         Args:
-            img_buffer: Raw image bytes from capture_image_ex()
+            img_buffer: Raw image (view returned by capture_image_ex, or any buffer)
             quality: Image quality score
             
         Returns:
@@ -438,54 +599,39 @@ class SecuGenDevice:
         """
         logger.debug("Creating template from image...")
 
-        if self.max_template_size == 0:
+        if self.max_template_size == 0 or self._template_buffer is None:
             raise SecuGenError("Template format not set. Call set_template_format() first.")
 
-        # Prepare finger info structure
-        class SGFingerInfo(ctypes.Structure):
-            _fields_ = [
-                ("FingerNumber", ctypes.c_uint16),
-                ("ViewNumber", ctypes.c_uint16),
-                ("ImpressionType", ctypes.c_uint16),
-                ("ImageQuality", ctypes.c_uint16),
-            ]
-
-        finger_info = SGFingerInfo()
+        finger_info = self._finger_info
         finger_info.FingerNumber = self.SG_FINGPOS_RT
         finger_info.ViewNumber = 0
         finger_info.ImpressionType = self.SG_IMPTYPE_LP
         finger_info.ImageQuality = quality
 
-        # Allocate template buffer
-        template_buffer = (ctypes.c_ubyte * self.max_template_size)()
-
-        # Convert image buffer to ctypes array
-        img_array = (ctypes.c_ubyte * len(img_buffer)).from_buffer_copy(img_buffer)
-
-        # Create template
+        # Create template into the reusable template buffer
         res = self.sg.SGFPM_CreateTemplate(
             self.hFPM,
             ctypes.byref(finger_info),
-            ctypes.cast(img_array, ctypes.POINTER(ctypes.c_ubyte)),
-            ctypes.cast(template_buffer, ctypes.POINTER(ctypes.c_ubyte))
+            self._image_pointer(img_buffer),
+            self._template_buffer
         )
 
         if res == self.SGFDX_ERROR_NONE:
             # Get actual template size
-            template_size = ctypes.c_ulong(0)
             res2 = self.sg.SGFPM_GetTemplateSize(
                 self.hFPM,
-                ctypes.cast(template_buffer, ctypes.POINTER(ctypes.c_ubyte)),
-                ctypes.byref(template_size)
+                self._template_buffer,
+                ctypes.byref(self._size_out)
             )
 
+            # The template outlives the reusable buffer, so this is the one copy made
             if res2 == self.SGFDX_ERROR_NONE:
-                actual_size = template_size.value
+                actual_size = self._size_out.value
                 logger.info("Template created successfully (%d bytes)", actual_size)
-                return bytes(template_buffer[:actual_size])
+                return self._template_view[:actual_size].tobytes()
             else:
                 logger.warning("Could not get template size, using max size")
-                return bytes(template_buffer)
+                return self._template_view.tobytes()
 
         elif res == self.SGFDX_ERROR_FEAT_NUMBER:
             logger.warning("Inadequate number of minutiae in image")
@@ -494,6 +640,36 @@ class SecuGenDevice:
             self._check_error("SGFPM_CreateTemplate", res)
             return None
 
+    # ============================================================
+    # Template Matching
+    # ============================================================
+
+    def match_template(self, template1, template2, security_level: int = SL_NORMAL) -> Tuple[bool, int]:
+        """
+        Compare two SDK templates.
+
+        Args:
+            template1: Template bytes (e.g. the live probe)
+            template2: Template bytes (e.g. the enrolled template; a bytearray
+                is passed to the SDK in place)
+            security_level: SDK security level (1-9, higher is stricter)
+
+        Returns:
+            tuple: (matched at the security level, matching score 0-199)
+        """
+        first = self._ubyte_array(template1)
+        second = self._ubyte_array(template2)
+        matched = ctypes.c_int(0)
+
+        res = self.sg.SGFPM_MatchTemplate(self.hFPM, first, second, security_level, ctypes.byref(matched))
+        self._check_error("SGFPM_MatchTemplate", res)
+
+        res = self.sg.SGFPM_GetMatchingScore(self.hFPM, first, second, ctypes.byref(self._size_out))
+        self._check_error("SGFPM_GetMatchingScore", res)
+
+        logger.info("Template match: {} (score {})", bool(matched.value), self._size_out.value)
+        return bool(matched.value), self._size_out.value
+
 
 # -----------------------------
 # Device Connectivity Test
@@ -0,0 +1,243 @@
+"""
+Simulated Fingerprint Device
+----------------------------
+Hardware-free stand-in for SecuGenDevice, used on Linux build and load-test
+machines where the SecuGen SDK DLLs are not available.
+
+Captures are replayed from recorded files (e.g. app/logs/fingerprint_image.raw
+and app/logs/fingerprint_template.bin). Each SIMULATOR_*_PATH setting may
+point at a single file or at a directory of recordings, which are replayed
+round-robin.
+
+Behaviour is tunable through settings:
+- SIMULATOR_CAPTURE_LATENCY_MS / SIMULATOR_LATENCY_JITTER_MS: time to place a finger
+- SIMULATOR_SCAN_MS: time to read an image once the finger is on the sensor
+- SIMULATOR_DWELL_MS: how long the finger stays down (burst captures)
+- SIMULATOR_TIMEOUT_RATE: probability that a capture times out
+- SIMULATOR_FAILURE_RATE: probability that a capture returns a wrong image
+- SIMULATOR_EXTRACT_LATENCY_MS: time spent creating a template
+- SIMULATOR_QUALITY: base image quality score reported for every capture
+- SIMULATOR_READER_COUNT: number of readers reported by enumeration
+
+Calls block the calling thread the same way the SDK does, so the async
+scan workflow sees realistic executor usage.
+"""
+
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Optional, List, Tuple
+from app.core.config import settings
+from app.services.device_backend import FingerprintDevice
+from app.services.secu_gen import SecuGenError
+from app.utils.logger import logger
+
+
+def _list_recordings(path: str, suffix: str) -> List[str]:
+    """Resolve a recording path (file or directory) into a sorted file list."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.endswith(suffix)
+        )
+    if os.path.isfile(path):
+        return [path]
+    return []
+
+
+class SimulatedDevice(FingerprintDevice):
+    """
+    Simulated fingerprint reader that replays recorded captures.
+    Mirrors SecuGenDevice behaviour, error types and timing.
+    """
+
+    # Recordings are shared by every simulated reader in the process
+    _recordings = None
+    _recordings_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.device_id = None
+        self._created = False
+        self._opened = False
+        self._led_on = False
+        self._current_template = None
+        # Monotonic time the simulated finger lands on the sensor (None: not scheduled)
+        self._finger_placed_at = None
+        self._rng = random.Random(settings.SIMULATOR_SEED)
+        self._ensure_recordings_loaded()
+        self._replay = itertools.cycle(self.__class__._recordings)
+
+    @classmethod
+    def _ensure_recordings_loaded(cls):
+        """Load recorded images and templates once per process."""
+        with cls._recordings_lock:
+            if cls._recordings is not None:
+                return
+
+            images = _list_recordings(settings.SIMULATOR_IMAGE_PATH, ".raw")
+            templates = _list_recordings(settings.SIMULATOR_TEMPLATE_PATH, ".bin")
+            if not images or not templates:
+                raise SecuGenError(
+                    f"Simulator recordings not found: {settings.SIMULATOR_IMAGE_PATH}, "
+                    f"{settings.SIMULATOR_TEMPLATE_PATH}"
+                )
+
+            expected_size = settings.SIMULATOR_IMAGE_WIDTH * settings.SIMULATOR_IMAGE_HEIGHT
+            recordings = []
+            for image_path, template_path in zip(images, itertools.cycle(templates)):
+                with open(image_path, "rb") as f:
+                    image = f.read()
+                if len(image) != expected_size:
+                    logger.warning("Skipping recording {}: {} bytes, expected {}",
+                                   image_path, len(image), expected_size)
+                    continue
+                with open(template_path, "rb") as f:
+                    template = f.read()
+                recordings.append((image, template))
+
+            if not recordings:
+                raise SecuGenError("No usable simulator recordings found")
+
+            cls._recordings = recordings
+            logger.info("Loaded {} simulator recording(s)", len(recordings))
+
+    def _require_open(self, operation: str):
+        if not self._opened:
+            raise SecuGenError(f"{operation} failed: Device not found (Code: 55)")
+
+    def _sleep_ms(self, base_ms: int, jitter_ms: int = 0):
+        delay = base_ms + (self._rng.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    # ============================================================
+    # Device Lifecycle
+    # ============================================================
+
+    def create(self):
+        self._created = True
+        logger.debug("Simulated SGFPM object created")
+
+    def init(self, device_name: int = None):
+        if not self._created:
+            raise SecuGenError("SGFPM_Init failed: SGFPM object creation failed (Code: 1)")
+        self.width = settings.SIMULATOR_IMAGE_WIDTH
+        self.height = settings.SIMULATOR_IMAGE_HEIGHT
+
+    def open(self, device_id: int = 0):
+        if not self._created:
+            raise SecuGenError("SGFPM_OpenDevice failed: SGFPM object creation failed (Code: 1)")
+        self.device_id = device_id
+        self._opened = True
+        logger.info("Simulated device {} opened", device_id)
+
+    def close(self):
+        self._opened = False
+        self._led_on = False
+
+    def terminate(self):
+        self._opened = False
+        self._created = False
+
+    def is_alive(self) -> bool:
+        return self._opened
+
+    def enumerate_devices(self, max_devices: int = 10) -> List[int]:
+        return list(range(min(settings.SIMULATOR_READER_COUNT, max_devices)))
+
+    # ============================================================
+    # Device Information & Configuration
+    # ============================================================
+
+    def set_brightness(self, brightness: int):
+        self._require_open("SGFPM_SetBrightness")
+
+    def set_template_format(self, format_type: int = None):
+        self._require_open("SGFPM_SetTemplateFormat")
+        self.max_template_size = max(len(template) for _, template in self.__class__._recordings)
+
+    # ============================================================
+    # LED Control
+    # ============================================================
+
+    def set_led(self, on: bool):
+        self._led_on = bool(on)
+
+    # ============================================================
+    # Capture & Template Creation
+    # ============================================================
+
+    def _schedule_finger(self) -> float:
+        """Decide when the next finger lands on the sensor."""
+        if (self._finger_placed_at is not None
+                and time.monotonic() > self._finger_placed_at + settings.SIMULATOR_DWELL_MS / 1000.0):
+            # The previous finger has been lifted
+            self._finger_placed_at = None
+        if self._finger_placed_at is None:
+            delay_ms = settings.SIMULATOR_CAPTURE_LATENCY_MS + self._rng.uniform(
+                -settings.SIMULATOR_LATENCY_JITTER_MS, settings.SIMULATOR_LATENCY_JITTER_MS
+            )
+            if self._rng.random() < settings.SIMULATOR_TIMEOUT_RATE:
+                # Nobody shows up for a whole capture window
+                delay_ms += settings.CAPTURE_WAIT_SECONDS * 1000
+            self._finger_placed_at = time.monotonic() + max(0.0, delay_ms) / 1000.0
+        return self._finger_placed_at
+
+    def is_finger_present(self, probe_ms: int = 150, presence_quality: int = 10) -> bool:
+        self._require_open("SGFPM_GetImageEx")
+        placed_at = self._schedule_finger()
+        now = time.monotonic()
+        if now >= placed_at:
+            return True
+        # Block like the SDK probe: until the finger lands or the probe times out
+        wait = min(probe_ms / 1000.0, placed_at - now)
+        time.sleep(wait)
+        return time.monotonic() >= placed_at
+
+    def capture_image_ex(self, timeout_ms: int = 10000, quality_threshold: int = 30,
+                         slot: int = 0) -> Optional[bytes]:
+        self._require_open("SGFPM_GetImageEx")
+
+        placed_at = self._schedule_finger()
+        wait = placed_at - time.monotonic()
+        if wait * 1000 > timeout_ms:
+            # The SDK blocks for the full timeout when no finger is placed
+            self._sleep_ms(timeout_ms)
+            raise TimeoutError("No finger detected within timeout period")
+        if wait > 0:
+            time.sleep(wait)
+        self._sleep_ms(settings.SIMULATOR_SCAN_MS)
+
+        if self._rng.random() < settings.SIMULATOR_FAILURE_RATE:
+            raise SecuGenError("No valid fingerprint detected")
+
+        image, template = next(self._replay)
+        self._current_template = template
+        return image
+
+    def get_image_quality(self, img_buffer: bytes, width: int, height: int) -> int:
+        self._require_open("SGFPM_GetImageQuality")
+        jitter = self._rng.randint(-10, 10)
+        return max(0, min(100, settings.SIMULATOR_QUALITY + jitter))
+
+    def create_template(self, img_buffer: bytes, quality: int = 50) -> Optional[bytes]:
+        self._require_open("SGFPM_CreateTemplate")
+        if self.max_template_size == 0:
+            raise SecuGenError("Template format not set. Call set_template_format() first.")
+
+        self._sleep_ms(settings.SIMULATOR_EXTRACT_LATENCY_MS)
+        # Templates are paired with the recording that was last replayed
+        return self._current_template or self.__class__._recordings[0][1]
+
+    def match_template(self, template1: bytes, template2: bytes,
+                       security_level: int = 5) -> Tuple[bool, int]:
+        self._require_open("SGFPM_MatchTemplate")
+        self._sleep_ms(settings.SIMULATOR_EXTRACT_LATENCY_MS // 4)
+        # Replayed templates are byte-identical for the same recording
+        if bytes(template1) == bytes(template2):
+            return True, 199
+        return False, 0
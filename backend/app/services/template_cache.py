@@ -0,0 +1,176 @@
+"""
+Decrypted Template Cache
+------------------------
+Bounded LRU + TTL cache of decrypted enrolled templates, so repeat
+verifications skip both the database fetch and the decrypt.
+
+Entries are keyed by (identity_number, finger_position): one per enrolled
+finger. A person's fingers are loaded, leased, evicted and invalidated
+together, since a verification compares the probe with every one of them.
+
+Templates are held in bytearrays that are overwritten with zeros when an
+entry is evicted, expires or is invalidated. Callers borrow templates with
+`lease()`; an entry evicted while leased is zeroed as soon as the last
+lease ends, so a verification in progress never sees its template wiped.
+
+Zeroing is best effort: the immutable bytes returned by decrypt_bytes()
+are copied into the cache buffer and dropped immediately, but Python gives
+no way to wipe them.
+"""
+
+import contextlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+# Loader: identity -> ({finger position: decrypted template}, metadata) or
+# None if not enrolled
+TemplateLoader = Callable[[str], Awaitable[Optional[Tuple[Dict[int, bytes], Dict[str, Any]]]]]
+CacheKey = Tuple[str, int]
+
+
+def _zero(buffer: bytearray):
+    """Overwrite a template buffer in place."""
+    buffer[:] = bytes(len(buffer))
+
+
+class CachedTemplate:
+    """One finger's decrypted template and the enrollment metadata loaded with it."""
+
+    __slots__ = ("finger_position", "template", "metadata", "expires_at", "leases", "evicted")
+
+    def __init__(self, finger_position: int, template: bytearray, metadata: Dict[str, Any], expires_at: float):
+        self.finger_position = finger_position
+        self.template = template
+        self.metadata = metadata
+        self.expires_at = expires_at
+        self.leases = 0
+        self.evicted = False
+
+
+class TemplateCache:
+    """
+    LRU cache of decrypted templates with a per-entry time to live.
+    Used from the event loop only, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, CachedTemplate]" = OrderedDict()
+        # identity -> its cached finger positions
+        self._fingers: Dict[str, Tuple[int, ...]] = {}
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @contextlib.asynccontextmanager
+    async def lease(self, identity_number: str, loader: TemplateLoader):
+        """
+        Borrow every decrypted template of an identity, loading them on a miss.
+
+        Args:
+            identity_number: CNIC of the enrolled person
+            loader: Coroutine returning ({finger position: template},
+                metadata), or None if the identity has no enrolled template
+
+        Yields:
+            list or None: CachedTemplate per enrolled finger (templates are
+                bytearrays that must not be kept beyond the lease), None if
+                not enrolled
+        """
+        entries = self._get(identity_number)
+        if entries is None:
+            self.misses += 1
+            loaded = await loader(identity_number)
+            if loaded is None or not loaded[0]:
+                yield None
+                return
+            templates, metadata = loaded
+            entries = self._put(identity_number, templates, metadata)
+        else:
+            self.hits += 1
+
+        for entry in entries:
+            entry.leases += 1
+        try:
+            yield entries
+        finally:
+            for entry in entries:
+                entry.leases -= 1
+                if entry.evicted and entry.leases == 0:
+                    _zero(entry.template)
+
+    def invalidate(self, identity_number: str):
+        """Drop an identity's entries (e.g. after re-enrollment)."""
+        self._drop(identity_number)
+
+    def clear(self):
+        """Drop and zero every entry."""
+        for identity_number in list(self._fingers):
+            self._drop(identity_number)
+
+    def _get(self, identity_number: str) -> Optional[List[CachedTemplate]]:
+        fingers = self._fingers.get(identity_number)
+        if fingers is None:
+            return None
+        keys = [(identity_number, finger) for finger in fingers]
+        entries = [self._entries[key] for key in keys]
+        if min(entry.expires_at for entry in entries) <= time.monotonic():
+            self.expirations += 1
+            self._drop(identity_number)
+            return None
+        for key in keys:
+            self._entries.move_to_end(key)
+        return entries
+
+    def _put(self, identity_number: str, templates: Dict[int, bytes], metadata: Dict[str, Any]
+             ) -> List[CachedTemplate]:
+        self._drop(identity_number)
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        entries = []
+        for finger, template in sorted(templates.items()):
+            entry = CachedTemplate(finger, bytearray(template), metadata, expires_at)
+            self._entries[(identity_number, finger)] = entry
+            entries.append(entry)
+        self._fingers[identity_number] = tuple(sorted(templates))
+
+        # Evict least recently used identities, never the one just loaded
+        while len(self._entries) > self.max_entries:
+            oldest, _ = next(iter(self._entries))
+            if oldest == identity_number:
+                break
+            self.evictions += 1
+            self._drop(oldest)
+        return entries
+
+    def _drop(self, identity_number: str):
+        for finger in self._fingers.pop(identity_number, ()):
+            self._discard(self._entries.pop((identity_number, finger)))
+
+    @staticmethod
+    def _discard(entry: CachedTemplate):
+        """Zero an entry now, or when its last lease ends."""
+        entry.evicted = True
+        if entry.leases == 0:
+            _zero(entry.template)
+
+    def stats(self) -> dict:
+        """Cache state for health endpoints and diagnostics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "identities": len(self._fingers),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,256 @@
+"""
+Minutiae Template Formats
+-------------------------
+Parser and serializer for the standard finger minutiae records the SecuGen
+SDK can produce (set_template_format: ANSI INCITS 378-2004, ISO/IEC
+19794-2:2005), alongside the NumPy template format of
+app.services.minutiae. Every format decodes to one struct-of-arrays form,
+MinutiaeArrays: contiguous x, y, angle, type and quality columns.
+
+MinutiaeArrays can be indexed by field name like MINUTIA_DTYPE records, so
+the NumPy matcher accepts either. Parsing reads the blob in place (bytes,
+or a leased bytearray from the template cache) and returns new columns, so
+nothing parsed keeps a reference to the template buffer.
+
+Standard records are converted to NumPy templates once, where they enter
+the system (normalize_template: reader captures and batch probes), and are
+stored, cached and matched in that form. No parsed minutiae are kept
+between comparisons: decoding a NumPy template is a header check and a
+view over its bytes, so there is no record parsing left to cache.
+
+Standard record layout (big-endian, one finger view is read/written):
+    ANSI 378: "FMR\\0" " 20\\0" length u16 (0: u32 follows), CBEFF product
+              u32, equipment u16, width u16, height u16, x/y resolution u16
+              (pixels/cm), views u8, reserved u8
+    ISO 19794-2: as ANSI, but length is u32 and there is no CBEFF product
+    view:     finger position u8, view/impression u8, quality u8, count u8
+    minutia:  type u2 + x u14, reserved u2 + y u14, angle u8, quality u8
+    then an extended data block length u16 (its contents are skipped)
+
+Conversions to the NumPy template conventions:
+    type:  01 ending, 10 bifurcation (same codes as MINUTIA_ENDING/_BIFURCATION)
+    angle: standards count counterclockwise; NumPy angles follow image
+           axes (y down), so they turn the other way. ANSI stores 2-degree
+           units (180 per turn), ISO 256 per turn like NumPy templates, so
+           ANSI round trips are accurate to one ANSI unit.
+"""
+
+import struct
+from typing import Optional
+import numpy as np
+from app.services.minutiae import (
+    MINUTIA_DTYPE, TEMPLATE_MAGIC, TemplateFormatError, decode_template, encode_template
+)
+
+
+FORMAT_NUMPY = "numpy"
+FORMAT_ANSI378 = "ansi378"
+FORMAT_ISO19794 = "iso19794"
+FORMATS = (FORMAT_NUMPY, FORMAT_ANSI378, FORMAT_ISO19794)
+STANDARD_FORMATS = (FORMAT_ANSI378, FORMAT_ISO19794)
+
+RECORD_MAGIC = b"FMR\x00"
+RECORD_VERSION = b" 20\x00"
+ANSI_HEADER = struct.Struct(">4s4sHIHHHHHBB")
+ANSI_LONG_HEADER = struct.Struct(">4s4sHIIHHHHHBB")
+ISO_HEADER = struct.Struct(">4s4sIHHHHHBB")
+VIEW_HEADER = struct.Struct(">BBBB")
+MINUTIA_RECORD = np.dtype([("type_x", ">u2"), ("y", ">u2"), ("angle", "u1"), ("quality", "u1")])
+
+DEFAULT_RESOLUTION = 197       # pixels per cm (500 dpi)
+ANSI_ANGLE_UNITS = 180
+COORDINATE_MASK = 0x3FFF
+
+
+class MinutiaeArrays:
+    """
+    A template's minutiae as contiguous read-only columns, in NumPy
+    template units (angle: 256 steps per turn, image axes).
+    """
+
+    __slots__ = ("x", "y", "angle", "type", "quality", "width", "height", "x_resolution", "y_resolution")
+
+    def __init__(self, x, y, angle, type, quality, width: int, height: int,
+                 x_resolution: int = DEFAULT_RESOLUTION, y_resolution: int = DEFAULT_RESOLUTION):
+        for field, values in zip(MINUTIA_DTYPE.names, (x, y, angle, type, quality)):
+            column = np.ascontiguousarray(values, dtype=MINUTIA_DTYPE[field])
+            column.flags.writeable = False
+            setattr(self, field, column)
+        self.width, self.height = width, height
+        self.x_resolution, self.y_resolution = x_resolution, y_resolution
+
+    @classmethod
+    def from_records(cls, minutiae: np.ndarray, width: int, height: int, **resolution) -> "MinutiaeArrays":
+        """Columns from MINUTIA_DTYPE records."""
+        return cls(*(minutiae[field] for field in MINUTIA_DTYPE.names), width, height, **resolution)
+
+    def to_records(self) -> np.ndarray:
+        """MINUTIA_DTYPE records (the layout of NumPy templates and the gallery)."""
+        records = np.empty(len(self), dtype=MINUTIA_DTYPE)
+        for field in MINUTIA_DTYPE.names:
+            records[field] = getattr(self, field)
+        return records
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        if field not in MINUTIA_DTYPE.names:
+            raise KeyError(field)
+        return getattr(self, field)
+
+
+# ============================================================
+# Parsing
+# ============================================================
+
+def detect_format(blob: bytes) -> Optional[str]:
+    """Format of a template blob, None if it is none of FORMATS (e.g. SG400)."""
+    if blob[:len(TEMPLATE_MAGIC)] == TEMPLATE_MAGIC:
+        return FORMAT_NUMPY
+    if blob[:4] != RECORD_MAGIC or blob[4:8] != RECORD_VERSION or len(blob) < ISO_HEADER.size:
+        return None
+    # The record length field tells the two apart: u32 in ISO, u16 (or 0 + u32) in ANSI
+    if struct.unpack_from(">I", blob, 8)[0] == len(blob):
+        return FORMAT_ISO19794
+    short_length = struct.unpack_from(">H", blob, 8)[0]
+    if short_length == len(blob):
+        return FORMAT_ANSI378
+    if short_length == 0 and len(blob) >= 14 and struct.unpack_from(">I", blob, 10)[0] == len(blob):
+        return FORMAT_ANSI378
+    return None
+
+
+def _parse_record(blob: bytes, fmt: str) -> MinutiaeArrays:
+    if fmt == FORMAT_ISO19794:
+        header = ISO_HEADER
+        _, _, _, _, width, height, x_res, y_res, views, _ = header.unpack_from(blob)
+    elif struct.unpack_from(">H", blob, 8)[0] == 0:
+        header = ANSI_LONG_HEADER
+        _, _, _, _, _, _, width, height, x_res, y_res, views, _ = header.unpack_from(blob)
+    else:
+        header = ANSI_HEADER
+        _, _, _, _, _, width, height, x_res, y_res, views, _ = header.unpack_from(blob)
+    if views < 1:
+        raise TemplateFormatError("Template record holds no finger view")
+
+    offset = header.size
+    if len(blob) < offset + VIEW_HEADER.size:
+        raise TemplateFormatError("Template record is truncated")
+    _, _, _, count = VIEW_HEADER.unpack_from(blob, offset)
+    offset += VIEW_HEADER.size
+    if len(blob) < offset + count * MINUTIA_RECORD.itemsize:
+        raise TemplateFormatError("Template record is truncated")
+    records = np.frombuffer(blob, dtype=MINUTIA_RECORD, count=count, offset=offset)
+
+    type_x = records["type_x"].astype(np.uint16)
+    if fmt == FORMAT_ANSI378:
+        counterclockwise = records["angle"].astype(np.int32) * 256 / ANSI_ANGLE_UNITS
+        angle = (-np.rint(counterclockwise).astype(np.int32)) % 256
+    else:
+        angle = (-records["angle"].astype(np.int32)) % 256
+    return MinutiaeArrays(
+        type_x & COORDINATE_MASK,
+        records["y"] & COORDINATE_MASK,
+        angle,
+        type_x >> 14,
+        records["quality"],
+        width, height, x_res, y_res,
+    )
+
+
+def parse_template(blob: bytes, fmt: str = None) -> MinutiaeArrays:
+    """
+    Decode a template into columns.
+
+    Args:
+        blob: NumPy, ANSI 378 or ISO 19794-2 template (bytes, bytearray or
+            memoryview; read in place, not copied)
+        fmt: One of FORMATS; detected from the blob if None
+
+    Raises:
+        TemplateFormatError: If the blob is not a (valid) template of the format
+    """
+    fmt = fmt or detect_format(blob)
+    if fmt == FORMAT_NUMPY:
+        minutiae, width, height = decode_template(blob)
+        return MinutiaeArrays.from_records(minutiae, width, height)
+    if fmt in STANDARD_FORMATS:
+        if detect_format(blob) != fmt:
+            raise TemplateFormatError(f"Not an {fmt} template record")
+        return _parse_record(blob, fmt)
+    raise TemplateFormatError("Unsupported template format (SDK proprietary templates cannot be parsed)")
+
+
+# ============================================================
+# Serializing
+# ============================================================
+
+def serialize_template(minutiae: MinutiaeArrays, fmt: str, finger_position: int = 0,
+                       finger_quality: int = None) -> bytes:
+    """
+    Encode columns as a template of the given format.
+
+    Args:
+        minutiae: Columns to encode
+        fmt: One of FORMATS
+        finger_position: Standard finger position code (0 = unknown)
+        finger_quality: View quality (0-100); mean minutia quality if None
+
+    Raises:
+        TemplateFormatError: If the format is unknown or the minutiae do not fit it
+    """
+    if fmt == FORMAT_NUMPY:
+        return encode_template(minutiae.to_records(), minutiae.width, minutiae.height)
+    if fmt not in STANDARD_FORMATS:
+        raise TemplateFormatError(f"Unknown template format {fmt}")
+
+    count = len(minutiae)
+    if count > 255:
+        raise TemplateFormatError(f"{count} minutiae do not fit one finger view (255 at most)")
+    if count and max(int(minutiae.x.max()), int(minutiae.y.max())) > COORDINATE_MASK:
+        raise TemplateFormatError("Minutia coordinates do not fit 14 bits")
+
+    records = np.zeros(count, dtype=MINUTIA_RECORD)
+    records["type_x"] = (minutiae.type.astype(np.uint16) & 0x3) << 14 | minutiae.x
+    records["y"] = minutiae.y
+    counterclockwise = (-minutiae.angle.astype(np.int32)) % 256
+    if fmt == FORMAT_ANSI378:
+        counterclockwise = np.rint(counterclockwise * ANSI_ANGLE_UNITS / 256).astype(np.int32) % ANSI_ANGLE_UNITS
+    records["angle"] = counterclockwise
+    records["quality"] = minutiae.quality
+
+    if finger_quality is None:
+        finger_quality = int(round(float(minutiae.quality.mean()))) if count else 0
+    body = VIEW_HEADER.pack(finger_position, 0, finger_quality, count) + records.tobytes() + b"\x00\x00"
+    size = (minutiae.width, minutiae.height, minutiae.x_resolution, minutiae.y_resolution)
+    if fmt == FORMAT_ISO19794:
+        length = ISO_HEADER.size + len(body)
+        header = ISO_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, length, 0, *size, 1, 0)
+    elif ANSI_HEADER.size + len(body) <= 0xFFFF:
+        length = ANSI_HEADER.size + len(body)
+        header = ANSI_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, length, 0, 0, *size, 1, 0)
+    else:
+        length = ANSI_LONG_HEADER.size + len(body)
+        header = ANSI_LONG_HEADER.pack(RECORD_MAGIC, RECORD_VERSION, 0, length, 0, 0, *size, 1, 0)
+    return header + body
+
+
+def convert_template(blob: bytes, fmt: str) -> bytes:
+    """Re-encode a template in another format."""
+    return serialize_template(parse_template(blob), fmt)
+
+
+def normalize_template(blob: bytes) -> bytes:
+    """
+    Convert an ANSI 378 or ISO 19794-2 record to a NumPy template; NumPy and
+    SDK (SG400) templates are returned as they are.
+
+    Raises:
+        TemplateFormatError: If a standard record is malformed
+    """
+    fmt = detect_format(blob)
+    if fmt in STANDARD_FORMATS:
+        return serialize_template(_parse_record(blob, fmt), FORMAT_NUMPY)
+    return blob
+
@@ -0,0 +1,343 @@
+"""
+Minutia Triplet Index
+---------------------
+Inverted index over enrolled minutiae for sublinear 1:N candidate
+retrieval: a probe looks up its own triangles and only the rows sharing
+enough of them go on to full matching (see app.services.gallery).
+
+Features: every minutia and each pair of its NEIGHBOURS nearest neighbours
+form a triangle. Vertices are ordered by the length of the opposite side,
+longest first, so a triangle is described the same way wherever it sits
+on the sensor and however the finger is rotated:
+    - the three side lengths (SIDE_STEP pixel bins)
+    - each vertex's minutia direction relative to the side leaving it
+      (ANGLE_BINS bins)
+    - handedness (a mirrored triangle is a different key)
+quantized into one integer key in [0, KEY_SPACE).
+
+Storage:
+    postings      (key, row) pairs appended as enrollments arrive
+    CSR snapshot  offsets over the whole key space + rows sorted by key,
+                  covering postings[:merged]
+    delta         postings[merged:], scanned linearly until the next merge
+
+Query: a probe feature within BOUNDARY_MARGIN of a bin edge also probes
+the neighbouring bin (multi-probing), so quantization noise between two
+captures of the same finger does not lose the triangle. Each probe key
+gives one vote to every row holding it; rows are ranked by votes divided
+by sqrt(row triangle count), so rows with many triangles are not favoured.
+"""
+
+import threading
+from typing import Optional, Tuple
+import numpy as np
+
+
+NEIGHBOURS = 4                 # nearest neighbours per minutia (C(4, 2) = 6 triangles each)
+SIDE_STEP = 12.0               # pixels per side-length bin
+SIDE_BINS = 16                 # longest side indexed: SIDE_STEP * SIDE_BINS pixels
+ANGLE_BINS = 8                 # 45-degree bins for the vertex directions
+BOUNDARY_MARGIN = 0.3          # bin fraction near an edge that also probes the neighbour
+KEY_SPACE = SIDE_BINS ** 3 * ANGLE_BINS ** 3 * 2
+MERGE_MIN_DELTA = 200000       # delta postings that trigger a merge...
+MERGE_DELTA_FRACTION = 0.1     # ...once they are also this share of the merged postings
+INITIAL_POSTINGS = 1 << 16
+
+_TWO_PI = 2 * np.pi
+
+
+def triangle_features(minutiae: np.ndarray) -> np.ndarray:
+    """
+    Rotation- and translation-invariant triangle features of one template.
+
+    Args:
+        minutiae: MINUTIA_DTYPE records
+
+    Returns:
+        np.ndarray: (triangles x 7) float32; columns 0-2 are side lengths and
+            3-5 vertex directions, both in (fractional) bin units, 6 is handedness
+    """
+    n = len(minutiae)
+    if n < 3:
+        return np.zeros((0, 7), dtype=np.float32)
+
+    points = np.stack([minutiae["x"], minutiae["y"]], axis=1).astype(np.float32)
+    angles = minutiae["angle"].astype(np.float32) * (_TWO_PI / 256)
+
+    delta = points[:, None, :] - points[None, :, :]
+    dist2 = (delta ** 2).sum(axis=2)
+    np.fill_diagonal(dist2, np.inf)
+    k = min(NEIGHBOURS, n - 1)
+    nearest = np.argpartition(dist2, k - 1, axis=1)[:, :k] if k < n - 1 else np.argsort(dist2, axis=1)[:, :k]
+
+    # Each minutia with every pair of its neighbours; the same triangle found
+    # from several of its vertices is kept once
+    first, second = np.triu_indices(k, 1)
+    triples = np.stack([
+        np.repeat(np.arange(n), len(first)),
+        nearest[:, first].ravel(),
+        nearest[:, second].ravel(),
+    ], axis=1)
+    triples.sort(axis=1)
+    codes = np.unique((triples[:, 0] * n + triples[:, 1]) * n + triples[:, 2])
+    triples = np.stack([codes // (n * n), (codes // n) % n, codes % n], axis=1)
+
+    vertices = points[triples]                     # (T, 3, 2)
+    directions = angles[triples]                   # (T, 3)
+    opposite = np.stack([
+        np.linalg.norm(vertices[:, 1] - vertices[:, 2], axis=1),
+        np.linalg.norm(vertices[:, 2] - vertices[:, 0], axis=1),
+        np.linalg.norm(vertices[:, 0] - vertices[:, 1], axis=1),
+    ], axis=1)
+
+    # Longest opposite side first
+    order = np.argsort(-opposite, axis=1, kind="stable")
+    vertices = np.take_along_axis(vertices, order[:, :, None], axis=1)
+    directions = np.take_along_axis(directions, order, axis=1)
+    opposite = np.take_along_axis(opposite, order, axis=1)
+
+    outgoing = np.roll(vertices, -1, axis=1) - vertices
+    relative = (directions - np.arctan2(outgoing[..., 1], outgoing[..., 0])) % _TWO_PI
+    edge1, edge2 = vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0]
+    handed = (edge1[:, 0] * edge2[:, 1] - edge1[:, 1] * edge2[:, 0]) > 0
+
+    features = np.concatenate([
+        opposite / SIDE_STEP,
+        relative * (ANGLE_BINS / _TWO_PI),
+        handed[:, None],
+    ], axis=1).astype(np.float32)
+    return features[opposite[:, 0] < SIDE_STEP * SIDE_BINS]
+
+
+def _encode(bins: np.ndarray) -> np.ndarray:
+    """(triangles x 7) integer bins -> keys."""
+    key = bins[:, 0]
+    for column, size in ((1, SIDE_BINS), (2, SIDE_BINS), (3, ANGLE_BINS), (4, ANGLE_BINS), (5, ANGLE_BINS), (6, 2)):
+        key = key * size + bins[:, column]
+    return key
+
+
+def triangle_keys(minutiae: np.ndarray) -> np.ndarray:
+    """Distinct index keys of an enrolled template (no multi-probing)."""
+    bins = np.floor(triangle_features(minutiae)).astype(np.int64)
+    bins[:, 3:6] %= ANGLE_BINS
+    return np.unique(_encode(bins)).astype(np.int32)
+
+
+def probe_keys(minutiae: np.ndarray) -> np.ndarray:
+    """Distinct keys to look up for a probe, including neighbouring bins near edges."""
+    features = triangle_features(minutiae)
+    bins = np.floor(features[:, :6]).astype(np.int64)
+    fraction = features[:, :6] - bins
+    # Neighbouring bin on the near side, or 0 offset when not near an edge
+    step = np.where(fraction < BOUNDARY_MARGIN, -1, np.where(fraction > 1 - BOUNDARY_MARGIN, 1, 0))
+    handed = features[:, 6:7].astype(np.int64)
+
+    keys = []
+    for combo in range(1 << 6):
+        use = ((combo >> np.arange(6)) & 1).astype(bool)
+        possible = np.all(step[:, use] != 0, axis=1)
+        if not possible.any():
+            continue
+        variant = bins[possible].copy()
+        variant[:, use] += step[possible][:, use]
+        variant[:, 3:6] %= ANGLE_BINS
+        in_range = np.all((variant[:, :3] >= 0) & (variant[:, :3] < SIDE_BINS), axis=1)
+        keys.append(_encode(np.concatenate([variant, handed[possible]], axis=1)[in_range]))
+    if not keys:
+        return np.zeros(0, dtype=np.int32)
+    return np.unique(np.concatenate(keys)).astype(np.int32)
+
+
+class TripletIndex:
+    """
+    Append-only inverted index from triangle keys to gallery rows.
+    Adds and snapshots are guarded by a lock; merges sort outside it, and
+    queries run on a snapshot, so both can be moved to worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._merge_lock, self._lock:
+            self._keys = np.zeros(INITIAL_POSTINGS, dtype=np.int32)
+            self._rows = np.zeros(INITIAL_POSTINGS, dtype=np.int32)
+            self._used = 0
+            self._triangles = np.zeros(0, dtype=np.int32)
+            self._offsets = np.zeros(KEY_SPACE + 1, dtype=np.int32)
+            self._sorted_rows = np.zeros(0, dtype=np.int32)
+            self._merged = 0
+
+    # ----------------------------------------------------------
+    # Updates
+    # ----------------------------------------------------------
+
+    def add(self, row: int, minutiae: np.ndarray):
+        """Index a gallery row's template."""
+        keys = triangle_keys(minutiae)
+        with self._lock:
+            if self._used + len(keys) > len(self._keys):
+                capacity = max(self._used + len(keys), 2 * len(self._keys))
+                self._keys = self._grown(self._keys, capacity)
+                self._rows = self._grown(self._rows, capacity)
+            if row >= len(self._triangles):
+                self._triangles = self._grown(self._triangles, max(row + 1, 2 * len(self._triangles), 1024))
+            self._keys[self._used:self._used + len(keys)] = keys
+            self._rows[self._used:self._used + len(keys)] = row
+            self._triangles[row] = len(keys)
+            self._used += len(keys)
+
+    @staticmethod
+    def _grown(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros(capacity, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def needs_merge(self) -> bool:
+        delta = self._used - self._merged
+        return delta >= MERGE_MIN_DELTA and delta >= MERGE_DELTA_FRACTION * self._merged
+
+    def merge(self):
+        """
+        Fold the delta into the CSR snapshot. The sort runs without the lock,
+        so adds and queries continue meanwhile; a merge already in progress
+        makes this a no-op.
+        """
+        if not self._merge_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                used = self._used
+                if used == self._merged:
+                    return
+                keys, rows = self._keys[:used], self._rows[:used]
+
+            order = np.argsort(keys, kind="stable")
+            sorted_rows = rows[order]
+            offsets = np.zeros(KEY_SPACE + 1, dtype=np.int32)
+            np.cumsum(np.bincount(keys, minlength=KEY_SPACE), out=offsets[1:])
+
+            with self._lock:
+                self._offsets, self._sorted_rows, self._merged = offsets, sorted_rows, used
+        finally:
+            self._merge_lock.release()
+
+    def remap(self, mapping: np.ndarray):
+        """
+        Renumber rows after gallery compaction and rebuild the snapshot.
+
+        Args:
+            mapping: old row -> new row, -1 for dropped rows
+        """
+        # A merge finishing after the renumbering would install stale rows
+        with self._merge_lock, self._lock:
+            rows = mapping[self._rows[:self._used]]
+            keep = rows >= 0
+            keys, rows = self._keys[:self._used][keep], rows[keep]
+            triangles = np.zeros(max(1024, 2 * int(mapping.max(initial=-1) + 1)), dtype=np.int32)
+            old = np.flatnonzero(mapping >= 0)
+            triangles[mapping[old]] = self._triangles[old]
+            self._keys, self._rows, self._used = keys.copy(), rows.astype(np.int32), len(keys)
+            self._triangles = triangles
+            self._merged = 0
+            self._offsets = np.zeros(KEY_SPACE + 1, dtype=np.int32)
+            self._sorted_rows = np.zeros(0, dtype=np.int32)
+        self.merge()
+
+    # ----------------------------------------------------------
+    # Snapshots (app.services.gallery_snapshot)
+    # ----------------------------------------------------------
+
+    def export(self) -> dict:
+        """Merged postings and CSR arrays for a gallery snapshot (merges first)."""
+        self.merge()
+        with self._merge_lock, self._lock:
+            columns = {
+                "keys": self._keys[:self._used],
+                "rows": self._rows[:self._used],
+                "triangles": self._triangles,
+            }
+            if self._merged == self._used:
+                columns["offsets"], columns["sorted_rows"] = self._offsets, self._sorted_rows
+            return columns
+
+    def adopt(self, columns: dict, used: int):
+        """
+        Take over exported arrays (possibly read-only memory maps with
+        spare capacity past used); CSR arrays missing from columns are
+        rebuilt by a merge.
+        """
+        with self._merge_lock, self._lock:
+            self._keys, self._rows, self._used = columns["keys"], columns["rows"], used
+            self._triangles = columns["triangles"]
+            if "offsets" in columns:
+                self._offsets, self._sorted_rows, self._merged = columns["offsets"], columns["sorted_rows"], used
+            else:
+                self._offsets = np.zeros(KEY_SPACE + 1, dtype=np.int32)
+                self._sorted_rows = np.zeros(0, dtype=np.int32)
+                self._merged = 0
+        if self._merged != used:
+            self.merge()
+
+    # ----------------------------------------------------------
+    # Queries
+    # ----------------------------------------------------------
+
+    def snapshot(self) -> tuple:
+        """Consistent view of the index for candidates(); cheap (no copies)."""
+        with self._lock:
+            return (self._offsets, self._sorted_rows, self._keys[self._merged:self._used],
+                    self._rows[self._merged:self._used], self._triangles)
+
+    def candidates(self, probe: np.ndarray, limit: int, active: Optional[np.ndarray] = None,
+                   snapshot: Optional[tuple] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retrieve the rows that share the most triangles with a probe.
+
+        Args:
+            probe: MINUTIA_DTYPE records from the live capture
+            limit: Maximum rows to return
+            active: Optional boolean mask of rows that may be returned
+            snapshot: View from snapshot() (taken now if omitted)
+
+        Returns:
+            tuple: (rows, votes), most votes (normalized) first
+        """
+        offsets, sorted_rows, delta_keys, delta_rows, triangles = snapshot or self.snapshot()
+
+        keys = probe_keys(probe)
+        if len(keys) == 0 or len(triangles) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # CSR: concatenate the posting ranges of every probe key
+        starts, lengths = offsets[keys], offsets[keys + 1] - offsets[keys]
+        total = int(lengths.sum())
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        hits = [sorted_rows[positions]]
+        if len(delta_keys):
+            hits.append(delta_rows[np.isin(delta_keys, keys)])
+
+        votes = np.bincount(np.concatenate(hits), minlength=len(triangles))
+        if active is not None:
+            votes[:len(active)][~active] = 0
+            votes[len(active):] = 0
+        score = votes / np.sqrt(np.maximum(triangles, 1))
+
+        voted = np.flatnonzero(votes)
+        if len(voted) > limit:
+            voted = voted[np.argpartition(-score[voted], limit - 1)[:limit]]
+        voted = voted[np.argsort(-score[voted], kind="stable")]
+        return voted, votes[voted]
+
+    def stats(self) -> dict:
+        """Index state for health endpoints and diagnostics."""
+        return {
+            "postings": self._used,
+            "merged": self._merged,
+            "delta": self._used - self._merged,
+            "memory_bytes": int(self._keys.nbytes + self._rows.nbytes + self._offsets.nbytes
+                                + self._sorted_rows.nbytes + self._triangles.nbytes),
+        }
@@ -0,0 +1,105 @@
+"""
+Fingerprint Verification Service
+--------------------------------
+1:1 verification of a live capture against the template enrolled for a
+CNIC, shared by the WebSocket and REST verification endpoints.
+
+Process Flow:
+1. Lease the identity's decrypted enrolled templates, one per finger, from
+   the template cache (on a miss: fetch the enrollments and decrypt them)
+2. Run a ScanSession verification on a pooled reader; the probe template
+   is created with the engine that produced the enrolled templates
+3. Match the probe against every enrolled finger of that engine (NumPy
+   matcher or SDK) and return the best finger's decision and score
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.db import database
+from app.models import models
+from app.services.crypto import decrypt_many
+from app.services.fingerprint_session import ScanSession
+from app.services.minutiae import is_minutiae_template
+from app.services.template_cache import TemplateCache
+from app.utils.logger import logger
+
+
+class VerificationError(Exception):
+    """Raised when an identity cannot be verified (unknown or not enrolled)."""
+
+    def __init__(self, message: str, status_code: int = 404):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Process-wide cache of decrypted enrolled templates
+template_cache = TemplateCache(settings.TEMPLATE_CACHE_SIZE, settings.TEMPLATE_CACHE_TTL)
+
+
+async def load_enrolled_templates(identity_number: str) -> Optional[Tuple[Dict[int, bytes], Dict[str, Any]]]:
+    """
+    Fetch and decrypt every enrolled template of an identity. Fingers that
+    cannot be decrypted (e.g. left under a retired key) are skipped.
+
+    Returns:
+        tuple: ({finger position: decrypted template}, {"full_name": ...}),
+            None if no template is enrolled or none could be decrypted
+
+    Raises:
+        VerificationError: If no application exists for the identity
+    """
+    applications, enrollments = models.applications, models.enrollments
+    query = (
+        select(applications.c.full_name, enrollments.c.finger_position, enrollments.c.template_encrypted)
+        .select_from(applications.outerjoin(enrollments, enrollments.c.identity_number == applications.c.identity_number))
+        .where(applications.c.identity_number == identity_number)
+    )
+    rows = await database.fetch_all(query)
+    if not rows:
+        raise VerificationError(f"No student found for CNIC {identity_number}.")
+    enrolled = [rec for rec in rows if rec["template_encrypted"] is not None]
+    decrypted = await asyncio.to_thread(decrypt_many, [rec["template_encrypted"] for rec in enrolled])
+    templates = {}
+    for rec, template in zip(enrolled, decrypted):
+        if template is None:
+            logger.warning("Unreadable template for {} finger {}", identity_number, rec["finger_position"])
+            continue
+        templates[rec["finger_position"]] = template
+    if not templates:
+        return None
+    return templates, {"full_name": rows[0]["full_name"]}
+
+
+async def verify_identity(identity_number: str, send_event_callable):
+    """
+    Capture a probe and verify it against the identity's enrolled fingers.
+    Cancelling the calling task stops the capture and returns the reader.
+
+    Args:
+        identity_number: CNIC to verify
+        send_event_callable: Function to send WebSocket events
+
+    Returns:
+        tuple: (MatchResult of the best-matching finger, or None if no probe
+            was captured, full name)
+
+    Raises:
+        VerificationError: If the identity is unknown or not enrolled
+    """
+    async with template_cache.lease(identity_number, load_enrolled_templates) as enrolled:
+        if enrolled is None:
+            raise VerificationError(f"No fingerprint enrolled for CNIC {identity_number}.", status_code=409)
+
+        full_name = enrolled[0].metadata["full_name"]
+        # A probe is created with one engine, so only that engine's fingers
+        # can be matched; NumPy wins when a person has both kinds
+        numpy_templates = [entry.template for entry in enrolled if is_minutiae_template(entry.template)]
+        engine = "numpy" if numpy_templates else "sdk"
+        templates = numpy_templates or [entry.template for entry in enrolled]
+        session = ScanSession(identity_number, full_name, template_engine=engine)
+
+        logger.info("Verifying {} with {} templates ({} finger(s))", identity_number, engine, len(templates))
+        result = await session.run_verification(send_event_callable, templates)
+        return result, full_name
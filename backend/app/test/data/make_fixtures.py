@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Regenerate the test suite's fixture captures.
+
+fingerprint_image.raw is a synthetic 300x400 8-bit print: concentric ridges
+bent by smooth distortions, with minutiae planted as phase spirals, inside
+an elliptical contact area. No real finger is committed to the repository.
+fingerprint_template.bin stands in for the SDK template the simulated
+reader replays alongside it (the simulator only compares template bytes).
+
+Usage (from the backend directory):
+    python app/test/data/make_fixtures.py
+"""
+
+import os
+import numpy as np
+
+WIDTH, HEIGHT = 300, 400
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_print(width: int = WIDTH, height: int = HEIGHT, seed: int = 0,
+                    minutiae: int = 40, period: float = 9.0) -> np.ndarray:
+    """Synthetic ridge image the NumPy extractor finds stable minutiae in."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float64)
+    cx, cy = width * 0.5, height * 0.45
+
+    # Arcs around a core, bent by a few smooth low-frequency waves
+    phase = np.hypot(xx - cx, (yy - cy) * 0.8) * 2 * np.pi / period
+    for _ in range(4):
+        fx, fy = rng.uniform(0.004, 0.015, 2)
+        phase += rng.uniform(2, 5) * np.sin(fx * xx + fy * yy + rng.uniform(0, 2 * np.pi))
+
+    # Each +-1 phase spiral starts or ends a ridge: one minutia
+    def area(x, y):
+        return ((x - cx) / (width * 0.42)) ** 2 + ((y - height * 0.5) / (height * 0.44)) ** 2
+
+    planted = 0
+    while planted < minutiae:
+        x, y = rng.uniform(0.15, 0.85) * width, rng.uniform(0.12, 0.88) * height
+        if area(x, y) > 0.7:
+            continue
+        phase += rng.choice([-1, 1]) * np.arctan2(yy - y, xx - x)
+        planted += 1
+
+    image = 135 + 95 * np.cos(phase)
+    # Fade to the bright sensor background outside the contact area
+    edge = np.clip((area(xx, yy) - 0.9) / 0.1, 0, 1)
+    image = image * (1 - edge) + 235 * edge
+    image += rng.normal(0, 6, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def main():
+    with open(os.path.join(DATA_DIR, "fingerprint_image.raw"), "wb") as f:
+        f.write(synthetic_print().tobytes())
+    with open(os.path.join(DATA_DIR, "fingerprint_template.bin"), "wb") as f:
+        f.write(np.random.default_rng(1).integers(0, 256, 400, dtype=np.uint8).tobytes())
+
+
+if __name__ == "__main__":
+    main()
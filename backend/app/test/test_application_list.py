@@ -0,0 +1,45 @@
+import base64
+import json
+import pytest
+from app.services.application_list import (
+    DIRECTION_NEXT, DIRECTION_PREV, InvalidCursorError, decode_cursor, encode_cursor,
+)
+
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("row_id", [1, 42, 2 ** 40])
+@pytest.mark.parametrize("direction", [DIRECTION_NEXT, DIRECTION_PREV])
+def test_cursor_round_trip(row_id, direction):
+    cursor = encode_cursor(row_id, direction)
+    # URL-safe and unpadded, so it can go straight into a query string
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == (row_id, direction)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor",
+    "%%%",
+    "ä",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    _raw_cursor([1, "next"]),
+    _raw_cursor({"v": 1, "id": 5}),
+    _raw_cursor({"v": 1, "d": "next"}),
+    _raw_cursor({"v": 2, "id": 5, "d": "next"}),
+    _raw_cursor({"id": 5, "d": "next"}),
+    _raw_cursor({"v": 1, "id": "5", "d": "next"}),
+    _raw_cursor({"v": 1, "id": 5.0, "d": "next"}),
+    _raw_cursor({"v": 1, "id": True, "d": "next"}),
+    _raw_cursor({"v": 1, "id": 5, "d": "sideways"}),
+])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_a_value_error():
+    # Callers that only know ValueError still catch it
+    assert issubclass(InvalidCursorError, ValueError)
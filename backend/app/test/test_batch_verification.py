@@ -0,0 +1,79 @@
+import asyncio
+import base64
+import json
+import pytest
+from app.core.config import settings
+from app.services import batch_verification
+from app.services.batch_verification import prepare_batch, run_batch
+from app.services.matcher import match_template_pairs
+from app.services.template_formats import ANSI_HEADER, FORMAT_ANSI378, FORMAT_NUMPY, convert_template
+
+GENUINE = "4220112345671"
+
+
+@pytest.fixture
+def enrollments(monkeypatch, enrolled_template):
+    """Serve the batch's enrollments from memory instead of the database."""
+    templates = {GENUINE: [enrolled_template]}
+
+    async def fetch_enrolled(identity_numbers):
+        found = [identity for identity in identity_numbers if identity in templates]
+        return {identity: templates[identity] for identity in found}, {identity: "Test Student" for identity in found}
+
+    monkeypatch.setattr(batch_verification, "_fetch_enrolled", fetch_enrolled)
+    return templates
+
+
+def _verify(items) -> list:
+    """Run a batch the way POST /verify/batch does and collect its NDJSON lines."""
+    async def scenario():
+        batch = await prepare_batch([(identity, base64.b64encode(template).decode()) for identity, template in items])
+        return [json.loads(json.dumps(result)) async for result in run_batch(batch)]
+
+    results = asyncio.run(scenario())
+    return sorted(results, key=lambda result: result["index"])
+
+
+def test_batch_streams_a_decision_per_item(enrollments, probe_template):
+    results = _verify([(GENUINE, probe_template), ("0000000000000", probe_template)])
+    assert results[0] == {"index": 0, "identityNumber": GENUINE, "fullName": "Test Student", "matched": True}
+    assert results[1]["status"] == 404
+    # Decisions only: a score would let a client tune probes
+    assert "score" not in results[0]
+
+
+def test_malformed_probe_fails_alone(enrollments, probe_template):
+    # NumPy template magic, truncated body
+    malformed = probe_template[:20]
+    results = _verify([(GENUINE, probe_template), (GENUINE, malformed), (GENUINE, probe_template)])
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[1]["status"] == 422 and "malformed" in results[1]["error"]
+    assert results[0]["matched"] and results[2]["matched"]
+
+
+def test_standard_record_probes_are_converted_once(enrollments, probe_template):
+    record = convert_template(probe_template, FORMAT_ANSI378)
+    # A view claiming more minutiae than the record holds
+    malformed = bytearray(record)
+    malformed[ANSI_HEADER.size + 3] = 255
+    batch = asyncio.run(prepare_batch([(GENUINE, base64.b64encode(record).decode()),
+                                       (GENUINE, base64.b64encode(malformed).decode())]))
+    assert [job[1] for job in batch.jobs] == [convert_template(record, FORMAT_NUMPY)]
+    assert batch.failures[0]["status"] == 422 and "malformed" in batch.failures[0]["error"]
+    assert _verify([(GENUINE, record)])[0]["matched"]
+
+
+def test_unparseable_enrolled_template_fails_alone(enrollments, enrolled_template, probe_template):
+    enrollments["0000000000000"] = [enrolled_template[:20]]
+    enrollments[GENUINE] = [enrolled_template[:20], enrolled_template]
+    results = _verify([("0000000000000", probe_template), (GENUINE, probe_template)])
+    assert results[0]["status"] == 409
+    # The person's readable finger is still matched
+    assert results[1]["matched"]
+
+
+def test_pair_matcher_reports_bad_pairs_instead_of_raising(enrolled_template, probe_template):
+    scores = match_template_pairs([(probe_template, enrolled_template), (probe_template[:20], enrolled_template),
+                                   (probe_template, b"SG400")])
+    assert scores[0] >= settings.MATCH_THRESHOLD
+    assert scores[1:] == [None, None]
@@ -0,0 +1,117 @@
+import base64
+import os
+import pytest
+from cryptography.fernet import Fernet
+from app.core.config import settings
+from app.services import crypto
+from app.services.crypto import (
+    ENVELOPE_VERSION, DecryptionError, KeyConfigurationError, decrypt_bytes, decrypt_many, encrypt_bytes,
+    encrypt_many, load_keys, token_key_id,
+)
+
+
+def _key() -> str:
+    return base64.urlsafe_b64encode(os.urandom(32)).decode()
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """Rebuild the keys from patched settings; the originals come back after the test."""
+    def apply(**values):
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+        monkeypatch.setattr(crypto, "_keys", None)
+        monkeypatch.setattr(crypto, "active_key_id", settings.ENCRYPTION_KEY_ID)
+        return load_keys()
+    return apply
+
+
+# ============================================================
+# Envelopes
+# ============================================================
+
+def test_round_trip_under_the_derived_key():
+    token = encrypt_bytes(b"template")
+    assert token[0] == ENVELOPE_VERSION
+    assert token_key_id(token) == 0
+    assert decrypt_bytes(token) == b"template"
+    # Fresh nonce every time
+    assert encrypt_bytes(b"template") != token
+
+
+def test_legacy_fernet_tokens_still_decrypt():
+    token = Fernet(settings.FERNET_KEY.encode()).encrypt(b"legacy template")
+    assert token_key_id(token) is None
+    assert decrypt_bytes(token) == b"legacy template"
+
+
+def test_fernet_token_under_another_key_is_rejected():
+    token = Fernet(Fernet.generate_key()).encrypt(b"legacy template")
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(token)
+
+
+def test_envelope_under_a_different_key_is_rejected(configure):
+    configure(ENCRYPTION_KEYS=f"1:{_key()}", ENCRYPTION_KEY_ID=1)
+    token = encrypt_bytes(b"template")
+    assert token_key_id(token) == 1
+
+    configure(ENCRYPTION_KEYS=f"1:{_key()}")
+    with pytest.raises(DecryptionError, match="does not authenticate"):
+        decrypt_bytes(token)
+
+
+def test_envelope_under_an_unconfigured_key_is_rejected(configure):
+    configure(ENCRYPTION_KEYS=f"1:{_key()}", ENCRYPTION_KEY_ID=1)
+    token = encrypt_bytes(b"template")
+    configure(ENCRYPTION_KEYS="", ENCRYPTION_KEY_ID=0)
+    with pytest.raises(DecryptionError, match="not configured"):
+        decrypt_bytes(token)
+
+
+def test_wrong_version_and_tampering_are_rejected(configure):
+    configure(ENCRYPTION_KEYS=f"1:{_key()}")
+    token = bytearray(encrypt_bytes(b"template"))
+    with pytest.raises(DecryptionError, match="Not an encrypted envelope"):
+        decrypt_bytes(bytes([ENVELOPE_VERSION + 1]) + bytes(token[1:]))
+    # The header is authenticated: moving the envelope to another key fails
+    relabelled = bytes(token[:1]) + (1).to_bytes(2, "big") + bytes(token[3:])
+    with pytest.raises(DecryptionError, match="does not authenticate"):
+        decrypt_bytes(relabelled)
+    token[-1] ^= 1
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(bytes(token))
+    with pytest.raises(DecryptionError):
+        decrypt_bytes(b"\x01short")
+
+
+def test_batches_keep_order_and_mark_unreadable_blobs(monkeypatch):
+    monkeypatch.setattr(crypto, "BATCH_CHUNK_SIZE", 4)
+    blobs = [bytes([i]) * 10 for i in range(20)]
+    tokens = encrypt_many(blobs)
+    assert decrypt_many(tokens) == blobs
+    assert decrypt_many([tokens[0], None, b"garbage"]) == [blobs[0], None, None]
+
+
+# ============================================================
+# Key configuration
+# ============================================================
+
+def test_key_ids_include_configured_keys(configure):
+    configure(ENCRYPTION_KEYS=f"2:{_key()}, 1:{_key()}", ENCRYPTION_KEY_ID=2)
+    assert crypto.key_ids() == [0, 1, 2]
+    assert token_key_id(encrypt_bytes(b"x")) == 2
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"FERNET_KEY": ""}, "not set"),
+    ({"FERNET_KEY": "default-fernet-key-for-development"}, "not a valid Fernet key"),
+    ({"ENCRYPTION_KEYS": "one:abc"}, "not id:base64-key"),
+    ({"ENCRYPTION_KEYS": f"0:{_key()}"}, "outside 1-65535"),
+    ({"ENCRYPTION_KEYS": "1:" + base64.urlsafe_b64encode(b"short").decode()}, "not 32"),
+    ({"ENCRYPTION_KEYS": f"1:{_key()},1:{_key()}"}, "twice"),
+    ({"ENCRYPTION_KEY_ID": 5}, "not in ENCRYPTION_KEYS"),
+])
+def test_invalid_configuration_raises(configure, values, message):
+    with pytest.raises(KeyConfigurationError, match=message):
+        configure(**values)
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+from cryptography.fernet import Fernet
+from app.core.config import settings
+from app.services import deduplication
+from app.services.crypto import encrypt_bytes
+from app.services.gallery import Candidate
+
+ENROLLED = "4220112345671"
+OTHER = "4220100000002"
+WEAK = "4220100000003"
+DUPLICATE = "4220100000009"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class StubDatabase:
+    """
+    Serves enrollments by keyset page and keeps recorded pairs like the
+    duplicate_candidates unique index (one row per unordered pair).
+    """
+
+    def __init__(self, enrollments=()):
+        self.enrollments = list(enrollments)
+        self.pages = []
+        self.pairs = {}
+
+    async def fetch_val(self, query):
+        return len(self.enrollments)
+
+    async def fetch_all(self, query):
+        params = query.compile().params
+        last_id, limit = params["id_1"], params["param_1"]
+        self.pages.append(last_id)
+        return [rec for rec in self.enrollments if rec["id"] > last_id][:limit]
+
+    async def fetch_one(self, query):
+        row = query.compile().params
+        pair = frozenset((row["identity_number"], row["matched_identity_number"]))
+        if pair in self.pairs:
+            return None
+        self.pairs[pair] = row
+        return {"id": len(self.pairs)}
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = StubDatabase()
+    monkeypatch.setattr(deduplication, "database", database)
+    return database
+
+
+# ============================================================
+# Recording
+# ============================================================
+
+def test_self_match_and_weak_candidates_are_not_recorded(database):
+    candidates = [
+        Candidate(ENROLLED, 100),
+        Candidate(OTHER, settings.DEDUP_THRESHOLD),
+        Candidate(WEAK, settings.DEDUP_THRESHOLD - 1),
+    ]
+    assert run(deduplication._record(ENROLLED, candidates, "enrollment")) == 1
+    assert list(database.pairs) == [frozenset((ENROLLED, OTHER))]
+    assert database.pairs[frozenset((ENROLLED, OTHER))]["source"] == "enrollment"
+
+
+def test_pair_recorded_from_either_side_is_inserted_once(database):
+    assert run(deduplication._record(ENROLLED, [Candidate(OTHER, 80)], "enrollment")) == 1
+    assert run(deduplication._record(OTHER, [Candidate(ENROLLED, 80)], "bulk")) == 0
+    assert run(deduplication._record(ENROLLED, [Candidate(OTHER, 80)], "bulk")) == 0
+    assert len(database.pairs) == 1
+
+
+def test_malformed_template_skips_the_enrollment_check(database, monkeypatch, enrolled_template):
+    monkeypatch.setattr(deduplication, "gallery_ready", lambda: True)
+    assert run(deduplication.check_enrollment(ENROLLED, enrolled_template[:-3])) == 0
+    assert database.pairs == {}
+
+
+# ============================================================
+# Bulk scan
+# ============================================================
+
+def test_bulk_scan_pages_by_id_and_skips_unusable_templates(database, monkeypatch, enrolled_template):
+    retired = Fernet(Fernet.generate_key()).encrypt(enrolled_template)
+    templates = [
+        (3, "4220100000013", encrypt_bytes(enrolled_template)),
+        (4, "4220100000014", encrypt_bytes(b"SG400" + bytes(395))),  # SDK template
+        (9, "4220100000019", encrypt_bytes(enrolled_template[:-3])),  # truncated
+        (10, "4220100000020", retired),  # under a retired key
+        (12, "4220100000022", encrypt_bytes(enrolled_template)),
+    ]
+    database.enrollments = [
+        {"id": id_, "identity_number": identity_number, "template_encrypted": token}
+        for id_, identity_number, token in templates
+    ]
+    searched = []
+
+    async def search_gallery(minutiae, top_k):
+        searched.append(len(minutiae))
+        return [Candidate(DUPLICATE, 90)]
+
+    monkeypatch.setattr(deduplication, "search_gallery", search_gallery)
+    monkeypatch.setattr(deduplication, "_bulk_progress", {"processed": 0, "total": 0, "flagged": 0})
+    run(deduplication._bulk_scan(batch_size=2, concurrency=2))
+
+    # Each page starts after the last id of the previous one
+    assert database.pages == [0, 4, 10, 12]
+    assert len(searched) == 2
+    assert deduplication._bulk_progress == {"processed": 5, "total": 5, "flagged": 2}
+    assert set(database.pairs) == {frozenset(("4220100000013", DUPLICATE)),
+                                   frozenset(("4220100000022", DUPLICATE))}
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.device_executor import DeviceCommandTimeout, DeviceExecutor
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def executor():
+    executor = DeviceExecutor("test")
+    yield executor
+    executor.stop()
+
+
+def test_calls_run_in_order_on_one_pinned_thread(executor):
+    seen = []
+
+    def record(i):
+        seen.append((i, threading.get_ident()))
+        return i * 2
+
+    async def scenario():
+        return await asyncio.gather(*(executor.call(record, i) for i in range(20)))
+
+    assert run(scenario()) == [i * 2 for i in range(20)]
+    assert [i for i, _ in seen] == list(range(20))
+    assert len({thread for _, thread in seen}) == 1
+    assert seen[0][1] != threading.get_ident()
+
+
+def test_errors_reach_the_caller(executor):
+    def fail():
+        raise ValueError("sdk error")
+
+    with pytest.raises(ValueError, match="sdk error"):
+        run(executor.call(fail))
+    assert executor.metrics()["failed"] == 1
+
+
+def test_command_whose_deadline_passes_in_queue_is_never_run(executor):
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.call(time.sleep, 0.3))
+        await asyncio.sleep(0.05)
+        with pytest.raises(DeviceCommandTimeout):
+            await executor.call(ran.append, "late", timeout=0.1)
+        await blocker
+        # Flush the queue: anything left behind the blocker has been handled
+        await executor.call(lambda: None)
+
+    run(scenario())
+    assert ran == []
+    assert executor.metrics()["cancelled"] + executor.metrics()["expired"] == 1
+
+
+def test_running_command_past_its_deadline_releases_the_caller(executor):
+    async def scenario():
+        started = time.monotonic()
+        with pytest.raises(DeviceCommandTimeout):
+            await executor.call(time.sleep, 0.5, timeout=0.1)
+        return time.monotonic() - started
+
+    assert run(scenario()) < 0.4
+
+
+def test_cancelled_caller_skips_its_queued_command(executor):
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.call(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(executor.call(ran.append, "cancelled"))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        await blocker
+        await executor.call(lambda: None)
+
+    run(scenario())
+    assert ran == []
+    assert executor.metrics()["cancelled"] == 1
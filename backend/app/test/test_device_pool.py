@@ -0,0 +1,202 @@
+import asyncio
+from app.services.device_pool import DevicePool
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _started_pool(readers: int) -> DevicePool:
+    pool = DevicePool(device_ids=list(range(readers)), health_check_interval=3600)
+    await pool.start()
+    return pool
+
+
+# ============================================================
+# Checkout / check-in
+# ============================================================
+
+def test_handles_are_opened_once_and_reused():
+    async def scenario():
+        pool = await _started_pool(1)
+        try:
+            async with pool.acquire() as first:
+                device = first.device
+                assert pool.stats()["in_use"] == 1
+            async with pool.acquire() as second:
+                assert second is first
+                assert second.device is device
+            return pool.stats()
+        finally:
+            await pool.stop()
+
+    stats = run(scenario())
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+    assert stats["devices"][0]["sessions_served"] == 2
+    assert stats["devices"][0]["reopen_count"] == 0
+
+
+def test_checkin_reopens_a_dead_handle():
+    async def scenario():
+        pool = await _started_pool(1)
+        try:
+            async with pool.acquire() as slot:
+                dead = slot.device
+                dead.close()
+            assert slot.device is not dead
+            assert slot.healthy
+            return pool.stats()
+        finally:
+            await pool.stop()
+
+    stats = run(scenario())
+    assert stats["idle"] == 1
+    assert stats["devices"][0]["reopen_count"] == 1
+
+
+def test_checkin_after_an_error_still_returns_the_reader():
+    async def scenario():
+        pool = await _started_pool(1)
+        try:
+            try:
+                async with pool.acquire():
+                    raise RuntimeError("scan failed")
+            except RuntimeError:
+                pass
+            return pool.stats()
+        finally:
+            await pool.stop()
+
+    stats = run(scenario())
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_checkin_reopen_keeps_the_reader_busy():
+    async def scenario():
+        pool = await _started_pool(1)
+        reopening, proceed = asyncio.Event(), asyncio.Event()
+        open_slot = pool._open_slot
+
+        async def slow_open(slot):
+            reopening.set()
+            await proceed.wait()
+            return await open_slot(slot)
+
+        pool._open_slot = slow_open
+        held = []
+
+        async def session_b():
+            async with pool.acquire() as slot:
+                slot.device.close()
+
+        async def session_c():
+            async with pool.acquire() as slot:
+                held.append(slot)
+
+        try:
+            b = asyncio.ensure_future(session_b())
+            await reopening.wait()
+            # Session B is still checking its dead reader in: C has to queue
+            c = asyncio.ensure_future(session_c())
+            await asyncio.sleep(0.01)
+            during = pool.stats()
+            proceed.set()
+            await asyncio.gather(b, c)
+            return during, held, pool.stats()
+        finally:
+            await pool.stop()
+
+    during, held, after = run(scenario())
+    assert during["in_use"] == 1 and during["waiting"] == 1
+    assert during["devices"][0]["reopening"]
+    assert len(held) == 1
+    assert after["devices"][0]["reopen_count"] == 1
+    assert after["idle"] == 1 and after["in_use"] == 0
+
+
+def test_failed_checkin_reopen_does_not_escape_the_session():
+    async def scenario():
+        pool = await _started_pool(1)
+
+        async def broken_reopen(slot):
+            raise RuntimeError("USB reset")
+
+        pool._reopen_slot = broken_reopen
+        try:
+            async with pool.acquire() as slot:
+                slot.device.close()
+            return pool.stats()
+        finally:
+            await pool.stop()
+
+    stats = run(scenario())
+    assert stats["in_use"] == 0
+    assert not stats["devices"][0]["reopening"]
+
+
+# ============================================================
+# Routing and queueing
+# ============================================================
+
+def test_sessions_spread_over_free_readers():
+    async def scenario():
+        pool = await _started_pool(2)
+        try:
+            async with pool.acquire() as first, pool.acquire() as second:
+                return first.device_id, second.device_id
+        finally:
+            await pool.stop()
+
+    assert sorted(run(scenario())) == [0, 1]
+
+
+def test_busy_pool_queues_sessions_in_fifo_order():
+    async def scenario():
+        pool = await _started_pool(1)
+        order, positions = [], {}
+
+        async def session(name: str):
+            async def report(position, length):
+                positions.setdefault(name, []).append((position, length))
+
+            async with pool.acquire(on_queue_position=report):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        try:
+            async with pool.acquire():
+                waiting = [asyncio.ensure_future(session(name)) for name in ("a", "b", "c")]
+                await asyncio.sleep(0.05)
+                assert pool.stats()["waiting"] == 3
+            await asyncio.gather(*waiting)
+            return order, positions
+        finally:
+            await pool.stop()
+
+    order, positions = run(scenario())
+    assert order == ["a", "b", "c"]
+    # Each session reports its position on joining (behind the ones already queued)
+    assert [positions[name][0] for name in ("a", "b", "c")] == [(1, 1), (2, 2), (3, 3)]
+    # ... and moves up each time a session ahead of it gets the reader
+    assert [position for position, _ in positions["c"]] == [3, 2, 1]
+
+
+def test_queue_timeout_leaves_the_queue():
+    async def scenario():
+        pool = await _started_pool(1)
+        try:
+            async with pool.acquire():
+                try:
+                    async with pool.acquire(timeout=0.05):
+                        pass
+                except asyncio.TimeoutError:
+                    timed_out = True
+                stats = pool.stats()
+            return timed_out, stats, pool.stats()
+        finally:
+            await pool.stop()
+
+    timed_out, during, after = run(scenario())
+    assert timed_out
+    assert during["waiting"] == 0
+    assert after["idle"] == 1
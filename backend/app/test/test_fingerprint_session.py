@@ -0,0 +1,200 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services import fingerprint_session
+from app.services.device_executor import DeviceExecutor
+from app.services.fingerprint_session import ScanSession
+from app.services.template_formats import FORMAT_ISO19794, convert_template
+
+WIDTH, HEIGHT = 300, 400
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class ScriptedDevice:
+    """Reader stand-in that replays scripted frames and SDK quality scores."""
+
+    def __init__(self, frames=(), present=()):
+        # (image, quality) pairs returned by successive burst captures
+        self.frames = list(frames)
+        self.qualities = {}
+        # Answers to successive finger probes (False once exhausted)
+        self.present = list(present)
+        self.probes = 0
+        self.templates = []
+
+    def is_finger_present(self, probe_ms, presence_quality):
+        self.probes += 1
+        return self.present.pop(0) if self.present else False
+
+    def capture_image_ex(self, timeout_ms, quality_threshold, slot=0):
+        if not self.frames:
+            raise TimeoutError("finger lifted")
+        image, quality = self.frames.pop(0)
+        self.qualities[id(image)] = quality
+        return image
+
+    def get_image_quality(self, img_buffer, width, height):
+        return self.qualities[id(img_buffer)]
+
+    def create_template(self, img_buffer, quality):
+        self.templates.append(quality)
+        return f"template-{quality}".encode()
+
+
+@pytest.fixture
+def session():
+    session = ScanSession("4220112345671", "Test Student", template_engine="sdk")
+    session.executor = DeviceExecutor("session")
+    yield session
+    session.executor.stop()
+
+
+async def _send(event):
+    pass
+
+
+# ============================================================
+# Finger detection
+# ============================================================
+
+def test_polling_stops_once_a_finger_is_detected(session):
+    session.device = ScriptedDevice(present=[False, False, True])
+    assert run(session._wait_for_finger(5)) is True
+    assert session.device.probes == 3
+
+
+def test_polling_gives_up_when_the_window_elapses(session, monkeypatch):
+    monkeypatch.setattr(settings, "FINGER_POLL_INTERVAL_MS", 10)
+    session.device = ScriptedDevice()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        detected = await session._wait_for_finger(0.2)
+        return detected, loop.time() - started
+
+    detected, elapsed = run(scenario())
+    assert detected is False
+    assert 0.2 <= elapsed < 2.0
+    assert session.device.probes > 1
+
+
+def test_capture_times_out_without_a_finger(session, monkeypatch):
+    monkeypatch.setattr(settings, "CAPTURE_MODE", "poll")
+    monkeypatch.setattr(settings, "CAPTURE_WAIT_SECONDS", 0)
+    session.device = ScriptedDevice(frames=[(b"never captured", 80)])
+    with pytest.raises(TimeoutError, match="No finger detected"):
+        run(session._capture_image(50))
+    assert session.device.frames
+
+
+def test_cancelled_session_stops_polling(session):
+    device = ScriptedDevice()
+    probe = device.is_finger_present
+
+    def cancel_on_second_probe(probe_ms, presence_quality):
+        if device.probes == 1:
+            # e.g. the WebSocket closed while the reader was being probed
+            session.active = False
+        return probe(probe_ms, presence_quality)
+
+    device.is_finger_present = cancel_on_second_probe
+    session.device = device
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        detected = await session._wait_for_finger(30)
+        return detected, loop.time() - started
+
+    detected, elapsed = run(scenario())
+    assert detected is False
+    assert device.probes == 2
+    # Released long before the 30 s window
+    assert elapsed < 1.0
+
+
+# ============================================================
+# Best-of-N burst
+# ============================================================
+
+def _burst(session, monkeypatch, qualities, frames=5, excellent=101):
+    """Run a burst whose first frame scores qualities[0] and later captures the rest."""
+    images = [bytes([i]) * (WIDTH * HEIGHT) for i in range(len(qualities))]
+    session.device = ScriptedDevice(frames=list(zip(images[1:], qualities[1:])))
+    session.device.qualities[id(images[0])] = qualities[0]
+    events = []
+
+    async def send(event):
+        events.append(event)
+
+    monkeypatch.setattr(settings, "BURST_CAPTURE_FRAMES", frames)
+    monkeypatch.setattr(settings, "BURST_EXCELLENT_QUALITY", excellent)
+    monkeypatch.setattr(settings, "PRESCREEN_ENABLED", False)
+    result = run(session._capture_best_of_n(images[0], WIDTH, HEIGHT, send))
+    return result, [event["quality"] for event in events if event["type"] == "burst_frame"]
+
+
+def test_burst_keeps_the_best_frame(session, monkeypatch):
+    (quality, template, _), seen = _burst(session, monkeypatch, [40, 60, 85, 50], frames=4)
+    assert seen == [40, 60, 85, 50]
+    assert (quality, template) == (85, b"template-85")
+
+
+def test_burst_stops_at_the_quality_target(session, monkeypatch):
+    (quality, template, _), seen = _burst(session, monkeypatch, [50, 75, 90, 95], excellent=70)
+    assert seen == [50, 75]
+    assert (quality, template) == (75, b"template-75")
+    # The remaining frames were never captured
+    assert len(session.device.frames) == 2
+
+
+def test_lifted_finger_settles_for_the_best_so_far(session, monkeypatch):
+    # Five frames wanted, but the capture after the second one fails
+    (quality, template, _), seen = _burst(session, monkeypatch, [65, 30])
+    assert seen == [65, 30]
+    assert (quality, template) == (65, b"template-65")
+
+
+def test_frames_rejected_by_the_prescreen_are_never_chosen(session, image, monkeypatch):
+    blank = bytes(WIDTH * HEIGHT)
+    first = image.tobytes()
+    session.device = ScriptedDevice(frames=[(blank, 99)])
+    session.device.qualities[id(first)] = 45
+    monkeypatch.setattr(settings, "BURST_CAPTURE_FRAMES", 2)
+    quality, template, prescreen = run(session._capture_best_of_n(first, WIDTH, HEIGHT, _send))
+    assert (quality, template) == (45, b"template-45")
+    assert not prescreen.rejected
+    assert session.device.templates == [45]
+
+
+# ============================================================
+# Pre-screen
+# ============================================================
+
+def test_failing_prescreen_falls_back_to_sdk_scoring(session, image, monkeypatch):
+    def broken(img_buffer, width, height):
+        raise ValueError("cannot convert float NaN to integer")
+
+    monkeypatch.setattr(fingerprint_session, "assess_image", broken)
+    monkeypatch.setattr(settings, "BURST_CAPTURE_FRAMES", 1)
+    first = image.tobytes()
+    session.device = ScriptedDevice()
+    session.device.qualities[id(first)] = 64
+
+    quality, template, prescreen = run(session._capture_best_of_n(first, WIDTH, HEIGHT, _send))
+    assert (quality, template, prescreen) == (64, b"template-64", None)
+
+
+# ============================================================
+# Templates
+# ============================================================
+
+def test_standard_record_from_the_reader_is_stored_as_a_numpy_template(session, enrolled_template):
+    record = convert_template(enrolled_template, FORMAT_ISO19794)
+    session.device = ScriptedDevice()
+    session.device.create_template = lambda img_buffer, quality: record
+    assert run(session._create_template(b"", WIDTH, HEIGHT, 80)) == enrolled_template
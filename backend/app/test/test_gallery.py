@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.gallery import Gallery, enrollment_key, split_key
+from app.services.minutiae import encode_template
+from app.utils.identify_benchmark import synthetic_minutiae
+
+WIDTH, HEIGHT = 300, 400
+GENUINE = "4220112345671"
+
+
+def _gallery(genuine: bytes, indexed: bool, size: int = 300) -> Gallery:
+    gallery = Gallery(indexed=indexed)
+    rng = np.random.default_rng(1)
+    for i in range(size):
+        template = encode_template(synthetic_minutiae(rng, WIDTH, HEIGHT), WIDTH, HEIGHT)
+        gallery.add_template(enrollment_key(f"{i:013d}", 1), template)
+    gallery.add_template(enrollment_key(GENUINE, 2), genuine)
+    return gallery
+
+
+def test_keys_carry_the_finger_position():
+    assert split_key(enrollment_key(GENUINE, 7)) == (GENUINE, 7)
+    # Keys written before finger positions existed
+    assert split_key(GENUINE) == (GENUINE, 0)
+
+
+@pytest.mark.parametrize("screen", ["cylinder", "hough"])
+def test_genuine_ranks_first(enrolled_template, probe_minutiae, screen):
+    gallery = _gallery(enrolled_template, indexed=False)
+    candidates = gallery.identify(probe_minutiae, top_k=5, shortlist=32, screen=screen)
+    assert len(candidates) == 5
+    assert (candidates[0].identity_number, candidates[0].finger_position) == (GENUINE, 2)
+    assert candidates[0].score >= settings.MATCH_THRESHOLD
+    assert all(c.score < settings.MATCH_THRESHOLD for c in candidates[1:])
+    scores = [c.score for c in candidates]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_one_candidate_per_person_on_their_best_finger(enrolled_template, probe_minutiae):
+    gallery = _gallery(enrolled_template, indexed=False, size=50)
+    other_finger = encode_template(synthetic_minutiae(np.random.default_rng(2), WIDTH, HEIGHT), WIDTH, HEIGHT)
+    gallery.add_template(enrollment_key(GENUINE, 7), other_finger)
+
+    candidates = gallery.identify(probe_minutiae, top_k=10, shortlist=64)
+    identities = [c.identity_number for c in candidates]
+    assert len(identities) == len(set(identities))
+    assert (candidates[0].identity_number, candidates[0].finger_position) == (GENUINE, 2)
+
+
+def test_removed_enrollment_is_not_found(enrolled_template, probe_minutiae):
+    gallery = _gallery(enrolled_template, indexed=False, size=50)
+    gallery.remove(enrollment_key(GENUINE, 2))
+    assert enrollment_key(GENUINE, 2) not in gallery
+    assert GENUINE not in [c.identity_number for c in gallery.identify(probe_minutiae, top_k=5)]
+
+
+def test_empty_gallery_and_empty_probe(probe_minutiae):
+    assert Gallery(indexed=False).identify(probe_minutiae) == []
+    assert Gallery(indexed=False).identify(probe_minutiae[:0]) == []
+
+
+# ============================================================
+# Triplet index retrieval
+# ============================================================
+
+def test_index_retrieves_the_genuine_enrollment(enrolled_template, probe_minutiae):
+    gallery = _gallery(enrolled_template, indexed=True)
+    assert GENUINE in gallery.retrieve(probe_minutiae, 30)
+
+    candidates = gallery.identify(probe_minutiae, top_k=5, shortlist=16, retrieve=30)
+    assert candidates[0].identity_number == GENUINE
+    stats = gallery.stats()
+    assert stats["indexed_searches"] == 1
+    # Only the retrieved rows were screened
+    assert 0 < stats["mean_retrieved"] <= 30
+    assert stats["mean_penetration"] < 0.2
+
+
+def test_index_forgets_removed_enrollments(enrolled_template, probe_minutiae):
+    gallery = _gallery(enrolled_template, indexed=True, size=50)
+    gallery.remove(enrollment_key(GENUINE, 2))
+    assert GENUINE not in gallery.retrieve(probe_minutiae, 30)
+    assert GENUINE not in [c.identity_number for c in gallery.identify(probe_minutiae, top_k=5, retrieve=30)]
@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+from app.services.gallery_partitions import PartitionedGalleries
+
+PHYSICS = {"subject": "Physics"}
+CHEMISTRY = {"subject": "Chemistry"}
+BIOLOGY = {"subject": "Biology"}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class StubLoader:
+    """Partition loader that records its calls and finishes when told to."""
+
+    def __init__(self, fail_first: int = 0):
+        self.calls = []
+        self.fail_first = fail_first
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, gallery, scope):
+        self.calls.append(scope)
+        await self.release.wait()
+        if len(self.calls) <= self.fail_first:
+            raise ConnectionError("database went away")
+        return 0
+
+
+def _galleries(loader: StubLoader, max_partitions: int = 16, idle_seconds: int = 900) -> PartitionedGalleries:
+    return PartitionedGalleries(["subject"], loader, indexed=False,
+                                idle_seconds=idle_seconds, max_partitions=max_partitions)
+
+
+# ============================================================
+# Loading
+# ============================================================
+
+def test_concurrent_searches_share_one_load():
+    async def scenario():
+        loader = StubLoader()
+        loader.release.clear()
+        partitions = _galleries(loader)
+        seen = []
+
+        async def search():
+            async with partitions.use(PHYSICS) as gallery:
+                seen.append(gallery)
+
+        searches = [asyncio.ensure_future(search()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        loading = partitions.stats()
+        loader.release.set()
+        await asyncio.gather(*searches)
+        return loader.calls, seen, loading, partitions.is_loaded(PHYSICS)
+
+    calls, seen, loading, loaded = run(scenario())
+    assert calls == [PHYSICS]
+    assert seen[0] is seen[1]
+    assert loading[0]["loading"] and loading[0]["in_use"] == 2
+    assert loaded
+
+
+def test_failed_load_is_retried_by_the_next_search():
+    async def scenario():
+        loader = StubLoader(fail_first=1)
+        partitions = _galleries(loader)
+        with pytest.raises(ConnectionError):
+            async with partitions.use(PHYSICS):
+                pass
+        failed_loaded = partitions.loaded()
+        async with partitions.use(PHYSICS):
+            pass
+        return loader.calls, failed_loaded, partitions.is_loaded(PHYSICS)
+
+    calls, failed_loaded, loaded = run(scenario())
+    assert calls == [PHYSICS, PHYSICS]
+    assert not failed_loaded
+    assert loaded
+
+
+def test_cancelled_search_does_not_cancel_a_shared_load():
+    async def scenario():
+        loader = StubLoader()
+        loader.release.clear()
+        partitions = _galleries(loader)
+
+        async def search():
+            async with partitions.use(PHYSICS):
+                pass
+
+        first, second = asyncio.ensure_future(search()), asyncio.ensure_future(search())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        loader.release.set()
+        await second
+        return first.cancelled(), loader.calls, partitions.is_loaded(PHYSICS)
+
+    cancelled, calls, loaded = run(scenario())
+    assert cancelled and calls == [PHYSICS] and loaded
+
+
+def test_scope_must_use_partition_keys():
+    partitions = _galleries(StubLoader())
+    with pytest.raises(ValueError, match="exam_center"):
+        partitions.scope_key({"exam_center": "Lahore"})
+
+
+# ============================================================
+# Eviction
+# ============================================================
+
+def test_partition_in_use_survives_eviction_over_the_limit():
+    async def scenario():
+        partitions = _galleries(StubLoader(), max_partitions=1)
+        async with partitions.use(PHYSICS):
+            async with partitions.use(CHEMISTRY):
+                # Over the limit, but neither partition is idle
+                both = partitions.is_loaded(PHYSICS), partitions.is_loaded(CHEMISTRY)
+            partitions._evict_over_limit()
+            # Physics is older, but still in use: the idle one goes
+            during = partitions.is_loaded(PHYSICS), partitions.is_loaded(CHEMISTRY)
+        # Once released, Physics is evicted for the next new partition
+        async with partitions.use(BIOLOGY):
+            pass
+        after = [partitions.is_loaded(scope) for scope in (PHYSICS, CHEMISTRY, BIOLOGY)]
+        return both, during, after
+
+    both, during, after = run(scenario())
+    assert both == (True, True)
+    assert during == (True, False)
+    assert after == [False, False, True]
+
+
+def test_idle_loop_evicts_only_unused_partitions():
+    async def scenario():
+        partitions = _galleries(StubLoader(), idle_seconds=0)
+        partitions.start()
+        try:
+            async with partitions.use(CHEMISTRY):
+                pass
+            async with partitions.use(PHYSICS):
+                await asyncio.sleep(1.2)
+                during = partitions.is_loaded(PHYSICS), partitions.is_loaded(CHEMISTRY)
+            return during
+        finally:
+            await partitions.stop()
+
+    assert run(scenario()) == (True, False)
@@ -0,0 +1,159 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services.gallery import Gallery, enrollment_key
+from app.services.gallery_shards import GalleryShardError, ShardedGallery
+from app.services.minutiae import encode_template
+from app.utils.identify_benchmark import synthetic_minutiae
+
+WIDTH, HEIGHT = 300, 400
+GENUINE = "4220112345671"
+
+
+@pytest.fixture(scope="module")
+def items(enrolled_template) -> list:
+    """Enrollments of 40 synthetic people (two fingers each) and the genuine one."""
+    rng = np.random.default_rng(1)
+    items = [
+        (enrollment_key(f"{i:013d}", finger), encode_template(synthetic_minutiae(rng, WIDTH, HEIGHT), WIDTH, HEIGHT),
+         None)
+        for i in range(40) for finger in (1, 2)
+    ]
+    items.append((enrollment_key(GENUINE, 2), enrolled_template, None))
+    return items
+
+
+@pytest.fixture(scope="module")
+def sharded(items):
+    gallery = ShardedGallery(workers=2, request_timeout=10.0)
+    gallery.open()
+    gallery.add_templates(items)
+    yield gallery
+    gallery.close()
+
+
+def _ranking(candidates) -> list:
+    return [(c.identity_number, c.finger_position, c.score) for c in candidates]
+
+
+def _by_score(ranked) -> tuple:
+    identity_number, finger_position, score = ranked
+    return -score, identity_number, finger_position
+
+
+async def _open_without_health_checks(gallery: ShardedGallery, reload):
+    """Like start(), but the health loop only runs once _start_health_checks() is called."""
+    gallery._reload = reload
+    await asyncio.to_thread(gallery.open)
+
+
+def _start_health_checks(gallery: ShardedGallery):
+    gallery._health_task = asyncio.create_task(gallery._health_loop())
+
+
+async def _wait_ready(shard):
+    for _ in range(200):
+        if shard.ready:
+            return
+        await asyncio.sleep(0.05)
+
+
+def _reload_from(gallery: ShardedGallery, items: list):
+    """Reload callback that re-adds a shard's share of the enrollments."""
+    async def reload(shard_ids):
+        shard_items = [item for item in items if gallery.shard_of(item[0]) in shard_ids]
+        await asyncio.to_thread(gallery.add_templates, shard_items)
+    return reload
+
+
+def test_enrollments_are_routed_by_cnic(sharded, items):
+    assert len(sharded) == len(items)
+    assert all(len(shard.members) for shard in sharded._shards)
+    # Every finger of a person lives on one shard
+    for i in range(40):
+        assert sharded.shard_of(enrollment_key(f"{i:013d}", 1)) == sharded.shard_of(enrollment_key(f"{i:013d}", 2))
+
+
+def test_identify_matches_a_single_gallery(sharded, items, probe_minutiae):
+    single = Gallery()
+    single.add_templates(items)
+    # A shortlist covering every row makes both searches exhaustive; ties
+    # among the impostors may merge in either order
+    expected = single.identify(probe_minutiae, top_k=41, shortlist=128)
+    merged = sharded.identify(probe_minutiae, top_k=41, shortlist=128)
+    assert _ranking(merged)[0] == _ranking(expected)[0]
+    assert (expected[0].identity_number, expected[0].finger_position) == (GENUINE, 2)
+    assert sorted(_ranking(merged), key=_by_score) == sorted(_ranking(expected), key=_by_score)
+    assert [c.score for c in merged] == sorted((c.score for c in merged), reverse=True)
+
+
+def test_hung_request_kills_the_worker_and_health_loop_restores_it(items, probe_minutiae):
+    async def scenario():
+        gallery = ShardedGallery(workers=2, request_timeout=10.0, health_check_interval=0.05)
+        seen_while_reloading = []
+        reload = _reload_from(gallery, items)
+
+        async def reload_and_probe(shard_ids):
+            # Searches must not run on the half-filled shard
+            try:
+                await asyncio.to_thread(gallery.identify, probe_minutiae)
+            except GalleryShardError as e:
+                seen_while_reloading.append(e)
+            await reload(shard_ids)
+
+        await _open_without_health_checks(gallery, reload_and_probe)
+        try:
+            await asyncio.to_thread(gallery.add_templates, items)
+            expected = _ranking(await asyncio.to_thread(gallery.identify, probe_minutiae))
+            shard = gallery._shards[gallery.shard_of(enrollment_key(GENUINE, 2))]
+            worker = shard.process
+
+            # A reply that doesn't arrive in time counts as a hung worker
+            with pytest.raises(GalleryShardError, match="no reply"):
+                await asyncio.to_thread(gallery._call, shard, "identify", probe_minutiae, 5, 128, None, "cylinder",
+                                        timeout=1e-6)
+            assert not worker.is_alive() and not shard.ready
+            with pytest.raises(GalleryShardError, match="unavailable"):
+                await asyncio.to_thread(gallery.identify, probe_minutiae)
+
+            _start_health_checks(gallery)
+            await _wait_ready(shard)
+            restored = _ranking(await asyncio.to_thread(gallery.identify, probe_minutiae))
+            return shard, worker, expected, restored, seen_while_reloading
+        finally:
+            await gallery.stop()
+
+    shard, worker, expected, restored, seen_while_reloading = asyncio.run(scenario())
+    assert shard.restarts == 1 and shard.process is None
+    assert len(seen_while_reloading) == 1
+    assert restored == expected
+
+
+def test_killed_worker_fails_searches_until_reloaded(items, probe_minutiae):
+    async def scenario():
+        gallery = ShardedGallery(workers=2, request_timeout=10.0, health_check_interval=0.05)
+        await _open_without_health_checks(gallery, _reload_from(gallery, items))
+        try:
+            await asyncio.to_thread(gallery.add_templates, items)
+            expected = _ranking(await asyncio.to_thread(gallery.identify, probe_minutiae))
+            shard = gallery._shards[0]
+            members = set(shard.members)
+            shard.process.kill()
+            await asyncio.to_thread(shard.process.join)
+
+            # The first search finds the dead pipe; later ones fail fast
+            for _ in range(2):
+                with pytest.raises(GalleryShardError):
+                    await asyncio.to_thread(gallery.identify, probe_minutiae)
+            assert not shard.ready
+
+            _start_health_checks(gallery)
+            await _wait_ready(shard)
+            assert shard.ready and shard.members == members
+            return expected, _ranking(await asyncio.to_thread(gallery.identify, probe_minutiae)), shard.restarts
+        finally:
+            await gallery.stop()
+
+    expected, restored, restarts = asyncio.run(scenario())
+    assert restarts == 1
+    assert restored == expected
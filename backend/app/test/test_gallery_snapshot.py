@@ -0,0 +1,193 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+from app.core.config import settings
+from app.services import crypto, gallery_snapshot, identification
+from app.services.crypto import load_keys
+from app.services.gallery import Gallery, enrollment_key
+from app.services.gallery_snapshot import SEGMENT_HEADER, SnapshotError, remove_map, restore, runtime_directory, save
+from app.services.minutiae import encode_template
+from app.utils.identify_benchmark import synthetic_minutiae
+
+WIDTH, HEIGHT = 300, 400
+GENUINE = "4220112345671"
+
+
+def _synthetic(rng) -> bytes:
+    return encode_template(synthetic_minutiae(rng, WIDTH, HEIGHT), WIDTH, HEIGHT)
+
+
+def _gallery(genuine: bytes, size: int = 60) -> Gallery:
+    gallery = Gallery()
+    rng = np.random.default_rng(1)
+    for i in range(size):
+        gallery.add_template(enrollment_key(f"{i:013d}", 1), _synthetic(rng))
+    gallery.add_template(enrollment_key(GENUINE, 2), genuine)
+    return gallery
+
+
+def _ranking(gallery: Gallery, probe: np.ndarray) -> list:
+    return [(c.identity_number, c.finger_position, c.score) for c in gallery.identify(probe, top_k=5)]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Snapshot file and an explicitly configured runtime directory."""
+    runtime = tmp_path / "runtime"
+    runtime.mkdir()
+    return str(tmp_path / "gallery.snap"), str(runtime)
+
+
+# ============================================================
+# Base and delta segments
+# ============================================================
+
+def test_restored_base_searches_like_the_original(enrolled_template, probe_minutiae, paths):
+    path, runtime = paths
+    original = _gallery(enrolled_template)
+    assert save(original, path, watermark=100.0) == {"kind": "base", "rows": len(original)}
+
+    restored = Gallery()
+    info = restore(restored, path, runtime)
+    assert info["watermark"] == 100.0 and info["segments"] == 1
+    assert sorted(restored.keys()) == sorted(original.keys())
+    assert _ranking(restored, probe_minutiae) == _ranking(original, probe_minutiae)
+    assert os.path.dirname(info["map_path"]) == runtime
+
+
+def test_deltas_carry_additions_and_removals(enrolled_template, probe_minutiae, paths):
+    path, runtime = paths
+    gallery = _gallery(enrolled_template)
+    save(gallery, path, watermark=100.0)
+
+    added = enrollment_key("4220199999999", 3)
+    gallery.add_template(added, _synthetic(np.random.default_rng(7)))
+    gallery.remove(enrollment_key(GENUINE, 2))
+    assert save(gallery, path, watermark=200.0, changed={added, enrollment_key(GENUINE, 2)})["kind"] == "delta"
+
+    restored = Gallery()
+    info = restore(restored, path, runtime)
+    assert info["watermark"] == 200.0
+    assert info["segments"] == 2 and info["delta_rows"] == 2
+    assert sorted(restored.keys()) == sorted(gallery.keys())
+    assert GENUINE not in [identity for identity, _, _ in _ranking(restored, probe_minutiae)]
+
+
+def test_save_without_changes_rewrites_the_base(enrolled_template, paths):
+    path, _ = paths
+    gallery = _gallery(enrolled_template)
+    save(gallery, path, watermark=100.0)
+    save(gallery, path, watermark=150.0, changed={enrollment_key(GENUINE, 2)})
+    # changed=None forces a single base segment
+    assert save(gallery, path, watermark=200.0)["kind"] == "base"
+    headers, size = gallery_snapshot._segment_headers(path)
+    assert len(headers) == 1 and headers[0][2] == size
+
+
+# ============================================================
+# Damaged snapshots
+# ============================================================
+
+def test_truncated_delta_falls_back_to_the_base_watermark(enrolled_template, paths):
+    path, runtime = paths
+    gallery = _gallery(enrolled_template)
+    save(gallery, path, watermark=100.0)
+    base_size = os.path.getsize(path)
+    added = enrollment_key("4220199999999", 3)
+    gallery.add_template(added, _synthetic(np.random.default_rng(7)))
+    save(gallery, path, watermark=200.0, changed={added})
+
+    # A crash in the middle of appending the delta
+    with open(path, "r+b") as f:
+        f.truncate(base_size + (os.path.getsize(path) - base_size) // 2)
+
+    restored = Gallery()
+    info = restore(restored, path, runtime)
+    assert info["watermark"] == 100.0 and info["segments"] == 1
+    assert added not in restored.keys()
+    # The damaged tail is rewritten as a base rather than appended to
+    assert save(gallery, path, watermark=300.0, changed={added})["kind"] == "base"
+
+
+def test_checksum_mismatch_in_the_base_is_rejected(enrolled_template, paths):
+    path, runtime = paths
+    save(_gallery(enrolled_template), path, watermark=100.0)
+    with open(path, "r+b") as f:
+        f.seek(SEGMENT_HEADER.size + 100)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    gallery = Gallery()
+    with pytest.raises(SnapshotError, match="checksum mismatch"):
+        restore(gallery, path, runtime)
+    assert len(gallery) == 0
+    assert os.listdir(runtime) == []
+
+
+def test_snapshot_under_another_key_is_rejected(enrolled_template, paths, monkeypatch):
+    path, runtime = paths
+    save(_gallery(enrolled_template), path, watermark=100.0)
+
+    # Key 0 is derived from FERNET_KEY
+    monkeypatch.setattr(settings, "FERNET_KEY", Fernet.generate_key().decode())
+    monkeypatch.setattr(crypto, "_keys", None)
+    load_keys()
+    with pytest.raises(SnapshotError, match="unreadable directory"):
+        restore(Gallery(), path, runtime)
+
+
+def test_missing_snapshot_is_a_snapshot_error(paths):
+    path, runtime = paths
+    with pytest.raises(SnapshotError):
+        restore(Gallery(), path, runtime)
+
+
+# ============================================================
+# Plaintext map files
+# ============================================================
+
+def test_runtime_directory_never_falls_back_to_disk(monkeypatch, tmp_path):
+    assert runtime_directory(str(tmp_path)) == str(tmp_path)
+    monkeypatch.setattr(gallery_snapshot.os.path, "isdir", lambda path: False)
+    with pytest.raises(SnapshotError, match="IDENTIFY_SNAPSHOT_RUNTIME_DIR"):
+        runtime_directory()
+
+
+def test_restore_without_a_ram_backed_directory_is_refused(enrolled_template, paths, monkeypatch):
+    path, _ = paths
+    save(_gallery(enrolled_template), path, watermark=100.0)
+    monkeypatch.setattr(gallery_snapshot.os.path, "isdir", lambda path: False)
+    gallery = Gallery()
+    with pytest.raises(SnapshotError):
+        restore(gallery, path)
+    assert len(gallery) == 0
+
+
+def test_map_is_removed_once_the_gallery_is_released(enrolled_template, paths):
+    path, runtime = paths
+    save(_gallery(enrolled_template), path, watermark=100.0)
+    gallery = Gallery()
+    info = restore(gallery, path, runtime)
+    assert os.path.exists(info["map_path"])
+
+    gallery.clear()
+    remove_map(info["map_path"])
+    assert os.listdir(runtime) == []
+    # Removing twice (e.g. two shards sharing a runtime directory) is harmless
+    remove_map(info["map_path"])
+
+
+def test_close_gallery_removes_restored_maps(enrolled_template, paths, monkeypatch):
+    path, runtime = paths
+    save(_gallery(enrolled_template), path, watermark=100.0)
+    gallery = Gallery()
+    info = restore(gallery, path, runtime)
+    monkeypatch.setattr(identification, "gallery", gallery)
+    monkeypatch.setattr(identification, "_snapshot_maps", {info["map_path"]})
+
+    asyncio.run(identification.close_gallery())
+    assert len(gallery) == 0
+    assert os.listdir(runtime) == []
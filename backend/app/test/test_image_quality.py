@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from app.services.image_quality import assess_image
+
+WIDTH, HEIGHT = 300, 400
+
+
+def test_synthetic_print_passes(image):
+    report = assess_image(image.tobytes(), WIDTH, HEIGHT)
+    assert not report.rejected
+    assert report.score > 0
+    assert 0.0 < report.coverage <= 1.0
+
+
+def test_memoryview_buffers_are_accepted(image):
+    assert assess_image(memoryview(image.tobytes()), WIDTH, HEIGHT).score == \
+        assess_image(image.tobytes(), WIDTH, HEIGHT).score
+
+
+@pytest.mark.parametrize("level", [0, 128, 255])
+def test_blank_frames_are_rejected(level):
+    report = assess_image(bytes([level]) * (WIDTH * HEIGHT), WIDTH, HEIGHT)
+    assert report.reject_reason == "blank image"
+    assert report.score == 0
+
+
+def test_noise_is_rejected():
+    noise = np.random.default_rng(0).integers(0, 256, WIDTH * HEIGHT, dtype=np.uint8)
+    report = assess_image(noise.tobytes(), WIDTH, HEIGHT)
+    # Plenty of variance everywhere, but no ridge flow
+    assert report.coverage == 1.0
+    assert report.reject_reason == "smudged print"
+
+
+def test_partial_print_is_rejected(image):
+    partial = image.copy()
+    partial[:, WIDTH // 3:] = 255
+    assert assess_image(partial.tobytes(), WIDTH, HEIGHT).reject_reason == "partial or missing print"
+
+
+def test_print_only_in_the_last_block_row_is_rejected():
+    # The last 16 rows are the only foreground: the block row the
+    # coherence grid has to reach as well
+    frame = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    frame[-16:] = np.random.default_rng(0).integers(0, 256, (16, WIDTH), dtype=np.uint8)
+    report = assess_image(frame.tobytes(), WIDTH, HEIGHT)
+    assert report.reject_reason == "partial or missing print"
+    assert 0.0 <= report.coherence <= 1.0
+
+
+def test_wrong_size_is_rejected():
+    assert assess_image(bytes(100), WIDTH, HEIGHT).reject_reason == "wrong image size"
@@ -0,0 +1,69 @@
+import base64
+import os
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from app.core.config import settings
+from app.services import crypto
+from app.services.crypto import decrypt_bytes, encrypt_bytes, token_key_id
+from app.services.key_rotation import _reencrypt, _update_statement
+
+
+@pytest.fixture
+def stored_rows():
+    """Rows as the job reads them, written before key 1 became active."""
+    legacy = Fernet(settings.FERNET_KEY.encode())
+    return [
+        (1, legacy.encrypt(b"template-1"), None),
+        (2, encrypt_bytes(b"template-2"), encrypt_bytes(b"codes-2")),
+        (3, b"unreadable", encrypt_bytes(b"codes-3")),
+        (4, encrypt_bytes(b"template-4"), b"unreadable"),
+    ]
+
+
+@pytest.fixture
+def rotated_key(monkeypatch, stored_rows):
+    key = base64.urlsafe_b64encode(os.urandom(32)).decode()
+    monkeypatch.setattr(settings, "ENCRYPTION_KEYS", f"1:{key}")
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY_ID", 1)
+    monkeypatch.setattr(crypto, "_keys", None)
+    monkeypatch.setattr(crypto, "active_key_id", 1)
+
+
+def test_reencrypt_moves_readable_rows_to_the_active_key(stored_rows, rotated_key):
+    rows = _reencrypt(stored_rows)
+
+    # Row 3's template does not decrypt: it is skipped, not overwritten
+    assert [row_id for row_id, _, _, _ in rows] == [1, 2, 4]
+    for (row_id, stored, template, cylinders), original in zip(rows, [stored_rows[0], stored_rows[1], stored_rows[3]]):
+        # The stored blob is kept for the compare-and-swap UPDATE
+        assert stored == original[1]
+        assert token_key_id(template) == 1
+        assert decrypt_bytes(template) == f"template-{row_id}".encode()
+
+    assert rows[0][3] is None
+    assert token_key_id(rows[1][3]) == 1 and decrypt_bytes(rows[1][3]) == b"codes-2"
+    # Unreadable cylinder codes are dropped; the gallery recomputes them
+    assert rows[2][3] is None
+
+
+def test_update_statement_binds_every_row():
+    rows = [(7, b"old-7", b"new-7", b"codes-7"), (9, b"old-9", b"new-9", None)]
+    statement, values = _update_statement(rows)
+
+    assert values == {
+        "id_0": 7, "stored_0": b"old-7", "template_0": b"new-7", "cylinders_0": b"codes-7",
+        "id_1": 9, "stored_1": b"old-9", "template_1": b"new-9", "cylinders_1": None,
+    }
+    compiled = text(statement).bindparams(**values).compile(dialect=postgresql.dialect())
+    assert set(compiled.params) == set(values)
+
+
+def test_update_statement_only_replaces_the_blob_it_read():
+    statement, _ = _update_statement([(1, b"old", b"new", None)])
+    # Compare-and-swap: a row re-enrolled since it was read keeps its new template
+    assert "e.template_encrypted = v.stored" in statement
+    assert "UPDATE enrollments AS e" in statement
+    assert statement.endswith("RETURNING e.id")
+    assert statement.count("CAST(") == 4
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import pytest
+from app.services.device_executor import DeviceExecutor
+from app.services.led_signals import LedSignaller
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class RecordingDevice:
+    """Stands in for a reader handle and records every LED command."""
+
+    def __init__(self):
+        self.led_calls = []
+
+    def set_led(self, on: bool):
+        self.led_calls.append(on)
+
+
+@pytest.fixture
+def executor():
+    executor = DeviceExecutor("led")
+    yield executor
+    executor.stop()
+
+
+async def _drain(executor: DeviceExecutor):
+    await executor.call(lambda: None)
+
+
+# ============================================================
+# Detaching
+# ============================================================
+
+def test_detach_turns_the_led_off(executor):
+    device = RecordingDevice()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(device)
+        led.play("ready")
+        await _drain(executor)
+        led.attach(None)
+        await _drain(executor)
+
+    run(scenario())
+    assert device.led_calls == [True, False]
+
+
+def test_detach_with_a_command_still_queued_turns_the_led_off(executor):
+    device = RecordingDevice()
+    gate = threading.Event()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(device)
+        # A capture holds the reader thread while the pattern starts
+        executor.post(gate.wait)
+        led.play("ready")
+        led.attach(None)
+        gate.set()
+        await _drain(executor)
+
+    run(scenario())
+    assert device.led_calls == [False]
+
+
+def test_reattached_handle_gets_its_own_commands(executor):
+    old, new = RecordingDevice(), RecordingDevice()
+    gate = threading.Event()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(old)
+        executor.post(gate.wait)
+        led.play("ready")
+        led.attach(new)
+        led.play("ready")
+        gate.set()
+        await _drain(executor)
+        led.stop()
+        await _drain(executor)
+
+    run(scenario())
+    assert old.led_calls == [False]
+    assert new.led_calls == [True, False]
+
+
+# ============================================================
+# Release and coalescing
+# ============================================================
+
+def test_release_stops_looping_patterns(executor):
+    device = RecordingDevice()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(device)
+        led.play("busy")
+        led.release()
+        await _drain(executor)
+        return led.pattern
+
+    assert run(scenario()) is None
+    assert device.led_calls == [False]
+
+
+def test_release_lets_finite_patterns_finish(executor):
+    device = RecordingDevice()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(device)
+        led.play("error")
+        led.release()
+        still_playing = led.pattern
+        await asyncio.sleep(1.2)
+        await _drain(executor)
+        return still_playing, led.pattern
+
+    assert run(scenario()) == ("error", None)
+    assert device.led_calls == [True, False] * 3
+
+
+def test_steps_due_while_the_thread_is_busy_are_coalesced(executor):
+    device = RecordingDevice()
+    gate = threading.Event()
+
+    async def scenario():
+        led = LedSignaller(executor)
+        led.attach(device)
+        executor.post(gate.wait)
+        submitted = executor.submitted
+        led.play("busy")
+        # Several 0.1s steps fall due while the thread is blocked
+        await asyncio.sleep(0.35)
+        queued = executor.submitted - submitted
+        led.stop()
+        gate.set()
+        await _drain(executor)
+        return queued
+
+    assert run(scenario()) == 1
+    # Only the latest wanted state reaches the reader
+    assert device.led_calls == [False]
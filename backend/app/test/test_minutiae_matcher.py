@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.matcher import match_minutiae, match_templates
+from app.services.minutiae import decode_template, encode_template, extract_template, is_minutiae_template
+from app.utils.identify_benchmark import synthetic_minutiae, warp
+
+WIDTH, HEIGHT = 300, 400
+
+
+def _template(image: np.ndarray) -> bytes:
+    return extract_template(np.ascontiguousarray(image).tobytes(), WIDTH, HEIGHT)
+
+
+def test_extraction_is_deterministic(image, enrolled_template):
+    assert is_minutiae_template(enrolled_template)
+    assert _template(image) == enrolled_template
+    minutiae, width, height = decode_template(enrolled_template)
+    assert (width, height) == (WIDTH, HEIGHT)
+    assert len(minutiae) > 10
+
+
+def test_self_match_scores_100(enrolled_template):
+    assert match_templates(enrolled_template, enrolled_template) == 100
+
+
+@pytest.mark.parametrize("degrees, dx, dy", [(12, 10, -8), (-15, 5, 6), (0, 0, 10)])
+def test_shifted_and_rotated_captures_match(image, enrolled_template, degrees, dx, dy):
+    probe = _template(warp(image, degrees, dx, dy, np.random.default_rng(0)))
+    score = match_templates(probe, enrolled_template)
+    assert settings.MATCH_THRESHOLD <= score < 100
+
+
+@pytest.mark.parametrize("impostor", ["mirrored", "flipped", "synthetic"])
+def test_impostors_stay_below_threshold(image, enrolled_template, impostor):
+    if impostor == "mirrored":
+        probe = _template(image[:, ::-1])
+    elif impostor == "flipped":
+        probe = _template(image[::-1])
+    else:
+        probe = encode_template(synthetic_minutiae(np.random.default_rng(1), WIDTH, HEIGHT), WIDTH, HEIGHT)
+    assert match_templates(probe, enrolled_template) < settings.MATCH_THRESHOLD
+
+
+def test_swapped_sides_still_match_and_empty_probe_scores_zero(enrolled_template, probe_template):
+    assert match_templates(enrolled_template, probe_template) >= settings.MATCH_THRESHOLD
+    empty = decode_template(enrolled_template)[0][:0]
+    assert match_minutiae(empty, decode_template(enrolled_template)[0]) == 0
@@ -0,0 +1,121 @@
+import asyncio
+from app.services.template_cache import TemplateCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Loader:
+    """Loader returning two fingers per identity and counting calls."""
+
+    def __init__(self, enrolled=None):
+        self.calls = []
+        self.enrolled = enrolled
+
+    async def __call__(self, identity_number: str):
+        self.calls.append(identity_number)
+        if self.enrolled is not None and identity_number not in self.enrolled:
+            return None
+        return {1: identity_number.encode() * 4, 6: b"\xff" * 8}, {"full_name": f"Name {identity_number}"}
+
+
+def _zeroed(entries) -> bool:
+    return all(not any(entry.template) for entry in entries)
+
+
+def test_hit_skips_the_loader():
+    cache, loader = TemplateCache(10, 60), Loader()
+
+    async def scenario():
+        async with cache.lease("a", loader) as first:
+            assert [entry.finger_position for entry in first] == [1, 6]
+            assert bytes(first[0].template) == b"aaaa"
+            assert first[0].metadata["full_name"] == "Name a"
+        async with cache.lease("a", loader) as second:
+            assert second == first
+
+    run(scenario())
+    assert loader.calls == ["a"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_not_enrolled_is_not_cached():
+    cache, loader = TemplateCache(10, 60), Loader(enrolled=set())
+
+    async def scenario():
+        for _ in range(2):
+            async with cache.lease("a", loader) as entries:
+                assert entries is None
+
+    run(scenario())
+    assert loader.calls == ["a", "a"]
+    assert cache.stats()["entries"] == 0
+
+
+def test_eviction_zeroes_the_least_recently_used_identity():
+    # Two fingers each: room for two identities
+    cache, loader = TemplateCache(4, 60), Loader()
+
+    async def scenario():
+        async with cache.lease("a", loader) as a:
+            pass
+        async with cache.lease("b", loader) as b:
+            pass
+        async with cache.lease("a", loader):
+            pass
+        async with cache.lease("c", loader):
+            pass
+        return a, b
+
+    a, b = run(scenario())
+    assert _zeroed(b)
+    assert not _zeroed(a)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["identities"] == 2
+
+
+def test_entry_evicted_while_leased_is_zeroed_when_the_lease_ends():
+    cache, loader = TemplateCache(2, 60), Loader()
+
+    async def scenario():
+        async with cache.lease("a", loader) as a:
+            async with cache.lease("b", loader):
+                pass
+            # Evicted, but still in use by this lease
+            assert bytes(a[0].template) == b"aaaa"
+        return a
+
+    assert _zeroed(run(scenario()))
+
+
+def test_expired_entries_are_zeroed_and_reloaded():
+    cache, loader = TemplateCache(10, 0), Loader()
+
+    async def scenario():
+        async with cache.lease("a", loader) as first:
+            pass
+        async with cache.lease("a", loader) as second:
+            assert bytes(second[0].template) == b"aaaa"
+        return first
+
+    assert _zeroed(run(scenario()))
+    assert loader.calls == ["a", "a"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_and_clear_zero_entries():
+    cache, loader = TemplateCache(10, 60), Loader()
+
+    async def scenario():
+        async with cache.lease("a", loader) as a:
+            pass
+        async with cache.lease("b", loader) as b:
+            pass
+        cache.invalidate("a")
+        assert _zeroed(a) and not _zeroed(b)
+        cache.clear()
+        return b
+
+    assert _zeroed(run(scenario()))
+    assert cache.stats()["entries"] == 0
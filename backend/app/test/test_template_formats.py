@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from app.services.matcher import match_templates
+from app.services.minutiae import MINUTIA_DTYPE, TemplateFormatError, encode_template
+from app.services.template_formats import (
+    ANSI_HEADER, FORMAT_ANSI378, FORMAT_ISO19794, FORMAT_NUMPY, ISO_HEADER, MinutiaeArrays, convert_template,
+    detect_format, normalize_template, parse_template, serialize_template,
+)
+from app.utils.identify_benchmark import synthetic_minutiae
+
+WIDTH, HEIGHT = 300, 400
+
+
+@pytest.fixture
+def numpy_template() -> bytes:
+    return encode_template(synthetic_minutiae(np.random.default_rng(0), WIDTH, HEIGHT), WIDTH, HEIGHT)
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_NUMPY, FORMAT_ANSI378, FORMAT_ISO19794])
+def test_detect_format(numpy_template, fmt):
+    assert detect_format(convert_template(numpy_template, fmt)) == fmt
+
+
+def test_iso_round_trip_is_exact(numpy_template):
+    original = parse_template(numpy_template)
+    record = convert_template(numpy_template, FORMAT_ISO19794)
+    parsed = parse_template(record)
+    for field in MINUTIA_DTYPE.names:
+        np.testing.assert_array_equal(parsed[field], original[field])
+    assert (parsed.width, parsed.height) == (WIDTH, HEIGHT)
+    assert convert_template(record, FORMAT_NUMPY) == numpy_template
+
+
+def test_ansi_round_trip_is_exact_but_angles(numpy_template):
+    original = parse_template(numpy_template)
+    parsed = parse_template(convert_template(numpy_template, FORMAT_ANSI378))
+    for field in ("x", "y", "type", "quality"):
+        np.testing.assert_array_equal(parsed[field], original[field])
+    # ANSI stores 2-degree units: within one unit (256/180 NumPy steps)
+    diff = (parsed.angle.astype(int) - original.angle.astype(int)) % 256
+    assert np.minimum(diff, 256 - diff).max() <= 2
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_ANSI378, FORMAT_ISO19794])
+def test_converted_templates_match_the_original(numpy_template, fmt):
+    assert match_templates(convert_template(numpy_template, fmt), numpy_template) == 100
+
+
+def test_full_view_of_255_minutiae_round_trips():
+    rng = np.random.default_rng(0)
+    minutiae = np.zeros(255, dtype=MINUTIA_DTYPE)
+    minutiae["x"] = rng.integers(0, WIDTH, 255)
+    minutiae["y"] = rng.integers(0, HEIGHT, 255)
+    minutiae["type"] = 1
+    record = serialize_template(MinutiaeArrays.from_records(minutiae, WIDTH, HEIGHT), FORMAT_ANSI378)
+    assert detect_format(record) == FORMAT_ANSI378
+    parsed = parse_template(record)
+    np.testing.assert_array_equal(parsed.x, minutiae["x"])
+    np.testing.assert_array_equal(parsed.y, minutiae["y"])
+
+
+def test_parsing_reads_a_leased_buffer_in_place(numpy_template):
+    buffer = bytearray(convert_template(numpy_template, FORMAT_ISO19794))
+    parsed = parse_template(buffer)
+    x = parsed.x.copy()
+    buffer[:] = bytes(len(buffer))
+    # The columns are copies: zeroing the template buffer leaves them intact
+    np.testing.assert_array_equal(parsed.x, x)
+    assert parse_template(memoryview(convert_template(numpy_template, FORMAT_ANSI378))).width == WIDTH
+
+
+@pytest.mark.parametrize("blob", [b"", b"FMR\x00 20\x00", b"\x00" * 40, b"not a template at all"])
+def test_invalid_blobs_are_rejected(blob):
+    assert detect_format(blob) is None
+    with pytest.raises(TemplateFormatError):
+        parse_template(blob)
+
+
+def test_truncated_record_is_rejected(numpy_template):
+    record = convert_template(numpy_template, FORMAT_ISO19794)
+    with pytest.raises(TemplateFormatError):
+        parse_template(record[:-20], FORMAT_ISO19794)
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_ANSI378, FORMAT_ISO19794])
+def test_standard_records_are_normalized_to_numpy_templates(numpy_template, fmt):
+    record = convert_template(numpy_template, fmt)
+    assert normalize_template(record) == convert_template(record, FORMAT_NUMPY)
+    assert detect_format(normalize_template(record)) == FORMAT_NUMPY
+    # A view claiming more minutiae than the record holds
+    malformed = bytearray(record)
+    malformed[(ANSI_HEADER if fmt == FORMAT_ANSI378 else ISO_HEADER).size + 3] = 255
+    with pytest.raises(TemplateFormatError):
+        normalize_template(bytes(malformed))
+
+
+@pytest.mark.parametrize("blob", ["numpy", b"SG400" + bytes(395)])
+def test_numpy_and_sdk_templates_are_not_normalized(numpy_template, blob):
+    blob = numpy_template if blob == "numpy" else blob
+    assert normalize_template(blob) is blob
+
+
+def test_too_many_minutiae_for_one_view():
+    minutiae = np.zeros(256, dtype=MINUTIA_DTYPE)
+    with pytest.raises(TemplateFormatError):
+        serialize_template(MinutiaeArrays.from_records(minutiae, WIDTH, HEIGHT), FORMAT_ISO19794)
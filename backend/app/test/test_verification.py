@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from cryptography.fernet import Fernet
+from app.services import verification
+from app.services.crypto import encrypt_bytes
+from app.services.verification import VerificationError, load_enrolled_templates
+
+CNIC = "4220112345671"
+
+
+class StubDatabase:
+    """Answers the enrollment query with fixed rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch_all(self, query):
+        return self.rows
+
+
+def _load(monkeypatch, rows):
+    monkeypatch.setattr(verification, "database", StubDatabase(rows))
+    return asyncio.run(load_enrolled_templates(CNIC))
+
+
+def _row(finger_position, token):
+    return {"full_name": "Test Student", "finger_position": finger_position, "template_encrypted": token}
+
+
+def test_every_enrolled_finger_is_decrypted(monkeypatch):
+    templates, metadata = _load(monkeypatch, [_row(1, encrypt_bytes(b"right thumb")),
+                                              _row(6, encrypt_bytes(b"left thumb"))])
+    assert templates == {1: b"right thumb", 6: b"left thumb"}
+    assert metadata == {"full_name": "Test Student"}
+
+
+def test_unreadable_finger_is_skipped(monkeypatch):
+    # e.g. a finger left under a key retired by a rotation
+    retired = Fernet(Fernet.generate_key()).encrypt(b"right index")
+    templates, _ = _load(monkeypatch, [_row(2, retired), _row(1, encrypt_bytes(b"right thumb"))])
+    assert templates == {1: b"right thumb"}
+
+
+def test_no_readable_finger_counts_as_not_enrolled(monkeypatch):
+    retired = Fernet(Fernet.generate_key()).encrypt(b"right index")
+    assert _load(monkeypatch, [_row(2, retired)]) is None
+    # Application without any enrollment (outer join)
+    assert _load(monkeypatch, [_row(None, None)]) is None
+
+
+def test_unknown_identity_is_a_404(monkeypatch):
+    with pytest.raises(VerificationError) as error:
+        _load(monkeypatch, [])
+    assert error.value.status_code == 404
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Bulk NumPy minutiae extraction and extraction benchmark.
+
+Reprocesses stored raw captures (width x height 8-bit grayscale .raw files)
+into NumPy minutiae templates (.npmt) across a process pool, without the
+SecuGen SDK. With --benchmark nothing is written; every image is extracted
+--repeat times and per-image latency and throughput are reported.
+
+Usage (from the backend directory):
+    python -m app.utils.bulk_extract app/logs --output /tmp/templates --workers 8
+    python -m app.utils.bulk_extract app/logs/fingerprint_image.raw --benchmark --repeat 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from app.services.minutiae import extract_minutiae, encode_template
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk NumPy minutiae extraction")
+    parser.add_argument("input", help="Raw image file or directory of .raw files")
+    parser.add_argument("--output", help="Directory for .npmt templates (default: next to each image)")
+    parser.add_argument("--width", type=int, default=300, help="Image width in pixels")
+    parser.add_argument("--height", type=int, default=400, help="Image height in pixels")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunksize", type=int, default=4, help="Images handed to a worker at a time")
+    parser.add_argument("--benchmark", action="store_true", help="Measure extraction only, write nothing")
+    parser.add_argument("--repeat", type=int, default=1, help="Extractions per image (benchmark)")
+    return parser.parse_args()
+
+
+def find_images(path: str) -> List[str]:
+    """Resolve the input path into a sorted list of .raw files."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+            if name.endswith(".raw")
+        )
+    return [path] if os.path.isfile(path) else []
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def extract_file(job: Tuple[str, int, int, Optional[str], bool]) -> Tuple[str, int, float, Optional[str]]:
+    """
+    Worker: extract one image and optionally write its template.
+
+    Returns:
+        tuple: (image path, minutiae count, extraction seconds, error message)
+    """
+    path, width, height, output_dir, write = job
+    try:
+        with open(path, "rb") as f:
+            image = f.read()
+        started = time.perf_counter()
+        minutiae = extract_minutiae(image, width, height)
+        elapsed = time.perf_counter() - started
+
+        if write:
+            target_dir = output_dir or os.path.dirname(path)
+            target = os.path.join(target_dir, os.path.splitext(os.path.basename(path))[0] + ".npmt")
+            with open(target, "wb") as f:
+                f.write(encode_template(minutiae, width, height))
+        return path, len(minutiae), elapsed, None
+    except Exception as e:
+        return path, 0, 0.0, str(e)
+
+
+def main():
+    args = parse_args()
+    images = find_images(args.input)
+    if not images:
+        print(f"No .raw images found at {args.input}")
+        return 1
+    if args.output and not args.benchmark:
+        os.makedirs(args.output, exist_ok=True)
+
+    jobs = [
+        (path, args.width, args.height, args.output, not args.benchmark)
+        for path in images
+        for _ in range(max(1, args.repeat))
+    ]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(extract_file, jobs, chunksize=args.chunksize))
+    elapsed = time.perf_counter() - started
+
+    failures = [(path, error) for path, _, _, error in results if error]
+    timings = [seconds * 1000 for _, _, seconds, error in results if not error]
+    counts = [count for _, count, _, error in results if not error]
+
+    for path, error in failures[:10]:
+        print(f"FAILED {path}: {error}")
+
+    print(f"Images:        {len(images)} x {max(1, args.repeat)} ({args.workers} worker(s))")
+    print(f"Extracted:     {len(timings)}")
+    print(f"Failed:        {len(failures)}")
+    print(f"Wall time:     {elapsed:.2f}s")
+    print(f"Throughput:    {len(timings) / elapsed:.1f} images/s")
+    if timings:
+        print(f"Minutiae mean: {statistics.mean(counts):.1f}")
+        print(f"Extract mean:  {statistics.mean(timings):.1f} ms")
+        print(f"Extract p50:   {percentile(timings, 50):.1f} ms")
+        print(f"Extract p95:   {percentile(timings, 95):.1f} ms")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
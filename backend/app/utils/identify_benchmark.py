@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+1:N identification benchmark on a synthetic gallery.
+
+Fills an in-memory Gallery with --enrollees synthetic minutiae sets plus
+the recorded capture (app/logs/fingerprint_image.raw), then identifies
+rotated, shifted and noisy copies of that capture and reports search
+latency and the rank at which the true enrollee was returned. With
+--strategy index it also reports the triplet index's recall (probes whose
+true enrollee was among the retrieved rows) and penetration (share of the
+gallery screened per search). With --workers the gallery is sharded over
+worker processes (ShardedGallery) and --concurrency searches run at once,
+so throughput can be compared across worker counts.
+
+Synthetic enrollees are random minutiae sets, so the rank figures show
+the search working, not accuracy on real fingers.
+
+Usage (from the backend directory):
+    python -m app.utils.identify_benchmark --enrollees 100000 --probes 20
+    python -m app.utils.identify_benchmark --strategy screen --screen hough
+    python -m app.utils.identify_benchmark --workers 8 --concurrency 16 --probes 64
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.services.gallery import Gallery
+from app.services.gallery_shards import ShardedGallery
+from app.services.minutiae import MINUTIA_DTYPE, encode_template, extract_minutiae
+
+
+GENUINE_ID = "genuine"
+BUILD_BATCH_SIZE = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="1:N identification benchmark")
+    parser.add_argument("--enrollees", type=int, default=100000, help="Synthetic gallery size")
+    parser.add_argument("--probes", type=int, default=20, help="Genuine probes to identify")
+    parser.add_argument("--top-k", type=int, default=5, help="Candidates returned per search")
+    parser.add_argument("--shortlist", type=int, default=64, help="Rows reranked with the 1:1 matcher")
+    parser.add_argument("--strategy", choices=("index", "screen"), default="index",
+                        help="Screen triplet index candidates or the whole gallery")
+    parser.add_argument("--screen", choices=("cylinder", "hough"), default="cylinder",
+                        help="First-stage screen before the 1:1 rerank")
+    parser.add_argument("--index-candidates", type=int, default=1000, help="Rows retrieved from the triplet index")
+    parser.add_argument("--workers", type=int, default=0, help="Gallery worker processes (0 = in-process)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Searches in flight at once")
+    parser.add_argument("--image", default="app/logs/fingerprint_image.raw", help="Raw capture used as the genuine finger")
+    parser.add_argument("--width", type=int, default=300, help="Image width in pixels")
+    parser.add_argument("--height", type=int, default=400, help="Image height in pixels")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def synthetic_minutiae(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Random minutiae set with a realistic count and print area."""
+    count = int(rng.integers(20, 60))
+    minutiae = np.zeros(count, dtype=MINUTIA_DTYPE)
+    minutiae["x"] = rng.integers(30, width - 30, count)
+    minutiae["y"] = rng.integers(30, height - 30, count)
+    minutiae["angle"] = rng.integers(0, 256, count)
+    minutiae["type"] = rng.integers(1, 3, count)
+    minutiae["quality"] = np.sort(rng.integers(20, 100, count))[::-1]
+    return minutiae
+
+
+def warp(image: np.ndarray, degrees: float, dx: float, dy: float, rng: np.random.Generator) -> np.ndarray:
+    """Rotate and shift a capture about its centre and add sensor noise."""
+    height, width = image.shape
+    theta = np.deg2rad(degrees)
+    cos, sin = np.cos(theta), np.sin(theta)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = width / 2, height / 2
+    xs = cos * (xx - cx - dx) + sin * (yy - cy - dy) + cx
+    ys = -sin * (xx - cx - dx) + cos * (yy - cy - dy) + cy
+    warped = image[np.clip(np.rint(ys).astype(int), 0, height - 1),
+                   np.clip(np.rint(xs).astype(int), 0, width - 1)].astype(np.float32)
+    warped[(xs < 0) | (xs > width - 1) | (ys < 0) | (ys > height - 1)] = 245
+    warped += rng.normal(0, 8, warped.shape)
+    return np.clip(warped, 0, 255).astype(np.uint8)
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    with open(args.image, "rb") as f:
+        image = np.frombuffer(f.read(), dtype=np.uint8).reshape(args.height, args.width)
+
+    indexed = args.strategy == "index"
+    if args.workers > 0:
+        gallery = ShardedGallery(args.workers, indexed=indexed, request_timeout=600)
+        gallery.open()
+    else:
+        gallery = Gallery(indexed=indexed)
+
+    try:
+        return run(args, rng, image, gallery, indexed)
+    finally:
+        if args.workers > 0:
+            gallery.close()
+
+
+def run(args, rng: np.random.Generator, image: np.ndarray, gallery, indexed: bool) -> int:
+    # Built through add_templates, like the service's startup load
+    started = time.perf_counter()
+    genuine_row = int(rng.integers(0, args.enrollees + 1))
+    batch = []
+    for index in range(args.enrollees + 1):
+        if index == genuine_row:
+            minutiae, identity = extract_minutiae(image.tobytes(), args.width, args.height), GENUINE_ID
+        else:
+            minutiae, identity = synthetic_minutiae(rng, args.width, args.height), f"{index:013d}"
+        batch.append((identity, encode_template(minutiae, args.width, args.height), None))
+        if len(batch) >= BUILD_BATCH_SIZE:
+            gallery.add_templates(batch)
+            batch = []
+    gallery.add_templates(batch)
+    gallery.merge_index()
+    build_seconds = time.perf_counter() - started
+
+    probes = []
+    for _ in range(args.probes):
+        probe_image = warp(image, rng.uniform(-30, 30), rng.uniform(-30, 30), rng.uniform(-30, 30), rng)
+        probes.append(extract_minutiae(probe_image.tobytes(), args.width, args.height))
+
+    retrieve = args.index_candidates if indexed else None
+
+    def search(probe):
+        started = time.perf_counter()
+        candidates = gallery.identify(probe, top_k=args.top_k, shortlist=args.shortlist, retrieve=retrieve,
+                                      screen=args.screen)
+        return (time.perf_counter() - started) * 1000, [c.identity_number for c in candidates]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(search, probes))
+    wall_seconds = time.perf_counter() - started
+
+    timings = [elapsed for elapsed, _ in results]
+    ranks = [found.index(GENUINE_ID) + 1 if GENUINE_ID in found else None for _, found in results]
+    # Retrieval recall needs the index itself, so only the in-process gallery reports it
+    recalled = None
+    if indexed and isinstance(gallery, Gallery):
+        recalled = sum(GENUINE_ID in gallery.retrieve(probe, args.index_candidates) for probe in probes)
+
+    stats = gallery.stats()
+    hits = [rank for rank in ranks if rank is not None]
+    print(f"Gallery:        {stats['enrollments']} enrollments, {stats['minutiae']} minutiae, "
+          f"{stats['memory_bytes'] / 1e6:.1f} MB (built in {build_seconds:.1f}s)")
+    if args.workers > 0:
+        print(f"Workers:        {args.workers} (concurrency {args.concurrency})")
+    print(f"Probes:         {args.probes} ({args.screen} screen)")
+    if indexed:
+        if recalled is not None:
+            print(f"Index:          {stats['index']['postings']} postings, "
+                  f"{stats['index']['memory_bytes'] / 1e6:.1f} MB")
+            print(f"Index recall:   {recalled}/{args.probes}")
+        print(f"Penetration:    {stats['mean_penetration']:.2%} ({stats['mean_retrieved']:.0f} rows per search)")
+    print(f"Rank-1 hits:    {sum(1 for rank in hits if rank == 1)}")
+    print(f"Top-{args.top_k} hits:     {len(hits)}")
+    print(f"Search mean:    {statistics.mean(timings):.0f} ms")
+    print(f"Search p50:     {percentile(timings, 50):.0f} ms")
+    print(f"Search p95:     {percentile(timings, 95):.0f} ms")
+    print(f"Throughput:     {args.probes / wall_seconds:.1f} searches/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+One-off move of fingerprints from the legacy applications column
+(fingerprint_encrypted) into enrollments, as finger position 0 (unknown).
+
+A row is cleared from applications only once it has been copied. An
+identity that already has a finger 0 enrollment keeps its legacy column
+untouched and is reported; re-enroll it or clear it by hand. Safe to run
+again: rows already moved are not read twice.
+
+Usage (from the backend directory, with the server's .env):
+    python -m app.utils.move_legacy_fingerprints
+"""
+
+import asyncio
+import sys
+
+from app.db.db import engine, metadata
+from app.db.migrations import apply_migrations, move_legacy_fingerprints
+
+
+async def run() -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.run_sync(apply_migrations)
+        moved, left = await conn.run_sync(move_legacy_fingerprints)
+    await engine.dispose()
+
+    print(f"Moved:  {moved} fingerprint(s) from applications to enrollments")
+    if left:
+        print(f"Left:   {left} fingerprint(s) whose identity already has a finger 0 enrollment "
+              f"(legacy column untouched)")
+    return 0 if not left else 1
+
+
+def main() -> int:
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
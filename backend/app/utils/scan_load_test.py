@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Scan throughput load test using the simulated fingerprint device.
+
+Runs many ScanSession.run_scan workflows concurrently against the
+simulated backend and reports throughput and latency percentiles.
+
+Each simulated reader serves one session at a time, so --readers controls
+how many scans can actually run in parallel.
+
+Usage (from the backend directory):
+    python -m app.utils.scan_load_test --sessions 200 --concurrency 200 --readers 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated fingerprint scan load test")
+    parser.add_argument("--sessions", type=int, default=100, help="Total scan sessions to run")
+    parser.add_argument("--concurrency", type=int, default=100, help="Sessions running at once")
+    parser.add_argument("--readers", type=int, default=10, help="Simulated readers in the device pool")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+
+# The load test always runs against simulated readers
+os.environ["DEVICE_BACKEND"] = "simulated"
+if ARGS is not None:
+    os.environ["DEVICE_IDS"] = ",".join(str(i) for i in range(ARGS.readers))
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+os.environ.setdefault("SECUGEN_SGFPLIB_DLL_PATH", "unused")
+
+from app.services.device_pool import device_pool  # noqa: E402
+from app.services.fingerprint_session import ScanSession  # noqa: E402
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_one(index: int, semaphore: asyncio.Semaphore, results: list):
+    """Run a single simulated scan session and record its outcome."""
+    async def send_event(payload: dict):
+        pass
+
+    async with semaphore:
+        session = ScanSession(f"{index:013d}", f"Load {index}")
+        started = time.perf_counter()
+        template = await session.run_scan(send_event)
+        results.append((template is not None, time.perf_counter() - started))
+
+
+async def main_async(sessions: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    # Warm the pool first so reader setup is not part of the measurement
+    await device_pool.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(run_one(i, semaphore, results) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    await device_pool.stop()
+
+    latencies = [latency for ok, latency in results if ok]
+    succeeded = len(latencies)
+
+    print(f"Sessions:     {sessions} (concurrency {concurrency})")
+    print(f"Succeeded:    {succeeded}")
+    print(f"Failed:       {sessions - succeeded}")
+    print(f"Wall time:    {elapsed:.2f}s")
+    print(f"Throughput:   {succeeded / elapsed:.2f} scans/s")
+    if latencies:
+        print(f"Latency mean: {statistics.mean(latencies):.3f}s")
+        print(f"Latency p50:  {percentile(latencies, 50):.3f}s")
+        print(f"Latency p95:  {percentile(latencies, 95):.3f}s")
+        print(f"Latency p99:  {percentile(latencies, 99):.3f}s")
+    return 0 if succeeded else 1
+
+
+def main():
+    return asyncio.run(main_async(ARGS.sessions, ARGS.concurrency))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,21 @@
+import asyncio
 from urllib.parse import urlparse
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import applications, ws_routes
+from app.routes import applications, identification, verification, ws_routes
 from app.api.v1 import admin_auth
 from app.db.db import database, engine, metadata
+from app.db.migrations import apply_migrations
+from app.services.batch_verification import stop_batch_verification
+from app.services.crypto import load_keys
+from app.services.deduplication import stop_deduplication
+from app.services.device_pool import device_pool
+from app.services.identification import close_gallery, gallery_stats, load_gallery
+from app.services.key_rotation import resume_key_rotation, stop_key_rotation
+from app.services.verification import template_cache
 from app.utils.logger import logger
 from app.core.config import settings
-from app.api.v1 import students_applications
+from app.api.v1 import students_applications, duplicates, key_rotation
 
 app = FastAPI(title="Fingerprint Auth API")
 
@@ -48,7 +57,11 @@ def get_database_info():
 # include routers
 app.include_router(admin_auth.router, prefix="/api")
 app.include_router(applications.router, prefix="/api")
+app.include_router(verification.router, prefix="/api")
+app.include_router(identification.router, prefix="/api")
 app.include_router(students_applications.router, prefix="/api")
+app.include_router(duplicates.router, prefix="/api")
+app.include_router(key_rotation.router, prefix="/api")
 app.include_router(ws_routes.router)
 
 @app.get("/health")
@@ -56,19 +69,31 @@ async def health_check():
     """Health check endpoint to verify database connectivity."""
     try:
         await database.fetch_one("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "devices": device_pool.stats(),
+            "template_cache": template_cache.stats(),
+            "database_pool": database.pool_stats(),
+            "gallery": await gallery_stats(),
+        }
     except Exception as e:
         logger.error("Health check failed: {}", str(e))
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
 @app.on_event("startup")
 async def startup():
+    # Refuse to start with keys that cannot read or write stored templates
+    load_keys()
+
     # Get database information
     db_info = get_database_info()
     
     try:
         # create tables if not exist - in production use alembic migrations
-        metadata.create_all(engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+            await conn.run_sync(apply_migrations)
         await database.connect()
         
         # Test database connection
@@ -89,8 +114,27 @@ async def startup():
         logger.error("Failed to connect to database: {}", str(e))
         raise
 
+    # Pick up a template key rotation interrupted by the last shutdown
+    await resume_key_rotation()
+
+    # Open fingerprint readers once; scan sessions check out warm handles
+    await device_pool.start()
+
+    # Load the 1:N gallery in the background; identification answers 503 until done
+    if settings.IDENTIFICATION_ENABLED:
+        app.state.gallery_loader = asyncio.create_task(load_gallery())
+
 @app.on_event("shutdown")
 async def shutdown():
+    loader = getattr(app.state, "gallery_loader", None)
+    if loader and not loader.done():
+        loader.cancel()
+    await stop_deduplication()
+    await stop_key_rotation()
+    await device_pool.stop()
+    template_cache.clear()
+    stop_batch_verification()
+    await close_gallery()
     await database.disconnect()
     logger.info("Database disconnected")
 
@@ -210,6 +210,11 @@ export const FingerprintPage = () => {
                 setStatusMessage(data.message);
                 break;
 
+            case "queued":
+                setStage("connecting");
+                setStatusMessage(data.message);
+                break;
+
             case "device_configured":
                 setStage("connecting");
                 setStatusMessage(data.message);
@@ -251,6 +256,11 @@ export const FingerprintPage = () => {
                 setCaptureCountdown(0);
                 break;
 
+            case "burst_frame":
+                setStage("scanning");
+                setStatusMessage(data.message);
+                break;
+
             case "quality_check":
                 setStage("scanning");
                 setStatusMessage(data.message);
@@ -287,6 +297,7 @@ export const FingerprintPage = () => {
                 setDeviceBlinking(true);
                 break;
 
+            case "image_rejected":
             case "capture_error":
                 setStage("scanning");
                 setStatusMessage(data.message);